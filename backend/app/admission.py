@@ -0,0 +1,199 @@
+import asyncio
+import itertools
+import math
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Hashable, List, Optional
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# ลำดับความสำคัญ ค่าน้อยได้ slot ก่อน
+PRIORITY_INTERACTIVE = 0  # /ai/analyze ที่ผู้ใช้รอผลอยู่
+PRIORITY_BACKGROUND = 1   # /ai/suggest-improvements, /ai/security-analysis และงานในคิว
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BACKGROUND: "background",
+}
+
+
+class QueueFullError(Exception):
+    """คิวรอ Ollama เต็ม ให้ตอบ 429 พร้อม Retry-After"""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ("priority", "user_key", "seq", "future", "enqueued_at")
+
+    def __init__(self, priority: int, user_key: Hashable, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.user_key = user_key
+        self.seq = seq
+        self.future = future
+        self.enqueued_at = time.perf_counter()
+
+
+class AdmissionController:
+    """
+    ควบคุมจำนวน generation ที่ส่งไป Ollama พร้อมกันภายใน process
+
+    - จำกัด concurrency รวมไว้ที่ max_concurrency
+    - เมื่อ slot ว่าง เลือก request ที่ priority สูงสุดก่อน ภายใน priority เดียวกันเลือก user
+      ที่มี generation ทำงานอยู่น้อยที่สุด (fair ระหว่างผู้ใช้) แล้วจึงตามลำดับการมาถึง
+    - ปฏิเสธด้วย QueueFullError เมื่อคิวรวมหรือคิวของผู้ใช้คนนั้นเต็ม
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        max_queue_depth: int = 20,
+        max_queue_per_user: int = 3,
+        min_retry_after: int = 5,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = max_queue_depth
+        self.max_queue_per_user = max_queue_per_user
+        self.min_retry_after = min_retry_after
+        self._active = 0
+        self._active_by_user: Dict[Hashable, int] = {}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._avg_duration: Optional[float] = None
+        self._wait_samples: Dict[int, Deque[float]] = {p: deque(maxlen=1000) for p in PRIORITY_NAMES}
+        self._admitted = {p: 0 for p in PRIORITY_NAMES}
+        self._rejected = 0
+
+    # ---- สถานะ ----
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        """ประมาณเวลาที่คิวจะว่าง จากเวลาเฉลี่ยต่อ generation และความยาวคิว"""
+        average = self._avg_duration or 0.0
+        estimate = average * (len(self._waiters) + 1) / max(self.max_concurrency, 1)
+        return max(self.min_retry_after, math.ceil(estimate))
+
+    def check_capacity(self, user_id: Optional[int] = None):
+        """ตรวจว่ารับ request เพิ่มได้หรือไม่ (ไม่จอง slot) raise QueueFullError ถ้าไม่ได้"""
+        if self._active < self.max_concurrency and not self._waiters:
+            return
+        if len(self._waiters) >= self.max_queue_depth:
+            self._rejected += 1
+            raise QueueFullError(self.retry_after(), "AI queue is full")
+        user_waiting = sum(1 for waiter in self._waiters if waiter.user_key == user_id)
+        if user_waiting >= self.max_queue_per_user:
+            self._rejected += 1
+            raise QueueFullError(self.retry_after(), "Too many pending AI requests for this user")
+
+    # ---- acquire / release ----
+
+    async def acquire(self, user_id: Optional[int] = None, priority: int = PRIORITY_INTERACTIVE, reject_when_full: bool = True):
+        if self._active < self.max_concurrency and not self._waiters:
+            self._grant(user_id)
+            self._record_wait(priority, 0.0)
+            return
+        if reject_when_full:
+            self.check_capacity(user_id)
+
+        waiter = _Waiter(priority, user_id, next(self._seq), asyncio.get_running_loop().create_future())
+        self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            elif waiter.future.done() and not waiter.future.cancelled():
+                # ได้ slot แล้วแต่ caller ถูกยกเลิกก่อนใช้ ต้องคืน slot
+                # (future ที่ถูกยกเลิกไปก่อน _dispatch ถูกข้ามไปโดยไม่ได้ slot จึงไม่ต้องคืน)
+                self.release(user_id)
+            raise
+        self._record_wait(priority, time.perf_counter() - waiter.enqueued_at)
+
+    def release(self, user_id: Optional[int] = None, duration: Optional[float] = None):
+        self._active -= 1
+        remaining = self._active_by_user.get(user_id, 1) - 1
+        if remaining > 0:
+            self._active_by_user[user_id] = remaining
+        else:
+            self._active_by_user.pop(user_id, None)
+        if duration is not None:
+            # exponential moving average ของเวลาต่อ generation ใช้ประมาณ Retry-After
+            self._avg_duration = duration if self._avg_duration is None else 0.8 * self._avg_duration + 0.2 * duration
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[int] = None, priority: int = PRIORITY_INTERACTIVE, reject_when_full: bool = True):
+        await self.acquire(user_id, priority, reject_when_full)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.perf_counter() - started)
+
+    def _grant(self, user_id: Optional[int]):
+        self._active += 1
+        self._active_by_user[user_id] = self._active_by_user.get(user_id, 0) + 1
+
+    def _dispatch(self):
+        while self._active < self.max_concurrency and self._waiters:
+            waiter = min(
+                self._waiters,
+                key=lambda w: (w.priority, self._active_by_user.get(w.user_key, 0), w.seq),
+            )
+            self._waiters.remove(waiter)
+            if waiter.future.done():  # caller ถูกยกเลิกระหว่างรอ
+                continue
+            self._grant(waiter.user_key)
+            waiter.future.set_result(None)
+
+    # ---- metrics ----
+
+    def _record_wait(self, priority: int, seconds: float):
+        self._admitted[priority] = self._admitted.get(priority, 0) + 1
+        self._wait_samples.setdefault(priority, deque(maxlen=1000)).append(seconds)
+
+    def metrics(self) -> Dict[str, Any]:
+        queue_wait = {}
+        for priority, samples in self._wait_samples.items():
+            ordered = sorted(samples)
+            name = PRIORITY_NAMES.get(priority, str(priority))
+            queue_wait[name] = {
+                "admitted": self._admitted.get(priority, 0),
+                "p50_ms": round(ordered[len(ordered) // 2] * 1000, 1) if ordered else None,
+                "p95_ms": round(ordered[max(math.ceil(len(ordered) * 0.95) - 1, 0)] * 1000, 1) if ordered else None,
+                "max_ms": round(ordered[-1] * 1000, 1) if ordered else None,
+            }
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queued": len(self._waiters),
+            "queued_by_priority": {
+                PRIORITY_NAMES.get(p, str(p)): sum(1 for w in self._waiters if w.priority == p)
+                for p in PRIORITY_NAMES
+            },
+            "rejected": self._rejected,
+            "average_generation_seconds": round(self._avg_duration, 2) if self._avg_duration else None,
+            "queue_wait": queue_wait,
+        }
+
+# Global instance
+admission = AdmissionController(
+    max_concurrency=settings.OLLAMA_MAX_CONCURRENCY,
+    max_queue_depth=settings.OLLAMA_MAX_QUEUE_DEPTH,
+    max_queue_per_user=settings.OLLAMA_MAX_QUEUE_PER_USER,
+    min_retry_after=settings.OLLAMA_MIN_RETRY_AFTER,
+)
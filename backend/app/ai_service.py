@@ -1,46 +1,124 @@
-import json
 import asyncio
+import hashlib
 import aiohttp
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple, NamedTuple
 from .config import settings
+from . import fast_json
+from .ollama_health import OllamaHealthMonitor
+from .model_catalog import ModelCatalog
+from .analysis_cache import AnalysisCache, topology_cache_key
+from .topology_encoder import ENCODER_VERSION, encode_context
+from .admission import admission, PRIORITY_INTERACTIVE
+from .singleflight import SingleFlight
+from .topology_graph import TopologyGraph
+from .capacity import CapacityAnalyzer
+from .rule_engine import RuleEngine, INTENT_CAPACITY
+from .topology_rules import topology_rules, sample_labels
 import logging
 
 logger = logging.getLogger(__name__)
 
+# system prompt สำหรับ network topology analysis (เป็นส่วนหนึ่งของ cache key ด้วย)
+SYSTEM_PROMPT = """คุณเป็นผู้เชี่ยวชาญด้านเครือข่ายคอมพิวเตอร์ ให้คำแนะนำเกี่ยวกับการออกแบบและวิเคราะห์แผนผังเครือข่าย 
+        ให้คำตอบเป็นภาษาไทยที่เข้าใจง่าย และให้คำแนะนำที่เป็นประโยชน์"""
+
+# เปลี่ยนค่านี้เมื่อผลของ analyze_network_topology ที่ใส่ใน prompt เปลี่ยนรูปแบบ (เป็นส่วนหนึ่งของ cache key)
+ANALYSIS_VERSION = "rules-v1"
+
+class AnalysisResult(NamedTuple):
+    text: str
+    cached: bool = False  # True ถ้าได้ผลจาก response cache โดยไม่เรียก Ollama
+    rule_based: bool = False  # True ถ้า rule engine ตอบจากโครงสร้างแผนผังโดยไม่เรียก Ollama
+    ok: bool = True  # False ถ้าเรียก Ollama ไม่สำเร็จ (timeout, เชื่อมต่อไม่ได้, circuit เปิด) และ text เป็นข้อความแจ้งข้อผิดพลาด
+
 class OllamaService:
     def __init__(self):
         self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.OLLAMA_MODEL
         self.timeout = settings.OLLAMA_TIMEOUT
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.health = OllamaHealthMonitor(
+            probe=self.check_ollama_health,
+            interval=settings.OLLAMA_HEALTH_INTERVAL,
+            failure_threshold=settings.OLLAMA_CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=settings.OLLAMA_CIRCUIT_RESET_TIMEOUT,
+        )
+        self.catalog = ModelCatalog(self.fetch_available_models, ttl=settings.OLLAMA_MODELS_CACHE_TTL)
+    
+    async def start(self):
+        """สร้าง ClientSession ที่ใช้ร่วมกันและเริ่ม health monitor (เรียกจาก lifespan ของ FastAPI)"""
+        await self._open_session()
+        self.health.start()
+    
+    async def close(self):
+        """หยุด health monitor ปิด ClientSession และคืน connection ทั้งหมดใน pool"""
+        await self.health.stop()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            logger.info("Ollama session closed")
+        self._session = None
+    
+    async def _open_session(self):
+        if self._session is not None and not self._session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=settings.OLLAMA_POOL_LIMIT,
+            limit_per_host=settings.OLLAMA_POOL_LIMIT_PER_HOST,
+            keepalive_timeout=settings.OLLAMA_KEEPALIVE_TIMEOUT,
+            use_dns_cache=True,
+            ttl_dns_cache=settings.OLLAMA_DNS_CACHE_TTL,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            json_serialize=fast_json.dumps,
+        )
+        logger.info(
+            f"Ollama session started (limit={settings.OLLAMA_POOL_LIMIT}, "
+            f"limit_per_host={settings.OLLAMA_POOL_LIMIT_PER_HOST})"
+        )
+    
+    async def get_session(self) -> aiohttp.ClientSession:
+        """คืน session ที่ใช้ร่วมกัน สร้างใหม่ถ้ายังไม่ได้เรียก start() (เช่น ใช้งานนอก FastAPI)"""
+        if self._session is None or self._session.closed:
+            await self._open_session()
+        return self._session
+    
+    def unavailable_message(self) -> str:
+        return f"ไม่สามารถเชื่อมต่อกับ Ollama ได้ กรุณาตรวจสอบว่า Ollama ทำงานอยู่ที่ {self.base_url}"
     
     async def check_ollama_health(self) -> bool:
-        """ตรวจสอบว่า Ollama ทำงานอยู่หรือไม่"""
+        """ตรวจสอบว่า Ollama ทำงานอยู่หรือไม่ (live probe ใช้โดย health monitor)"""
         try:
-            async with aiohttp.ClientSession() as session:
-                # ใช้ v1 API format สำหรับ health check
-                async with session.get(f"{self.base_url}/v1/models", timeout=self.timeout) as response:
-                    return response.status == 200
+            session = await self.get_session()
+            # ใช้ v1 API format สำหรับ health check
+            async with session.get(f"{self.base_url}/v1/models", timeout=aiohttp.ClientTimeout(total=settings.OLLAMA_HEALTH_TIMEOUT)) as response:
+                return response.status == 200
         except Exception as e:
             logger.error(f"Ollama health check failed: {e}")
             return False
     
-    async def get_available_models(self) -> List[str]:
-        """ดึงรายการ models ที่มีใน Ollama"""
+    async def get_available_models(self, force_refresh: bool = False) -> List[str]:
+        """ดึงรายการ models ที่มีใน Ollama (ผ่าน cache)"""
+        return await self.catalog.get_models(force_refresh=force_refresh)
+    
+    async def fetch_available_models(self) -> List[str]:
+        """ดึงรายการ models จาก Ollama โดยตรง"""
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{self.base_url}/v1/models", timeout=5) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        models = []
-                        for model in result.get("data", []):
-                            model_id = model.get("id", "")
-                            if model_id:  # เฉพาะ models ที่มีชื่อ
-                                models.append(model_id)
-                        logger.info(f"Found {len(models)} models in Ollama")
-                        return sorted(models)  # เรียงตามตัวอักษร
-                    else:
-                        logger.error(f"Failed to get models: {response.status}")
-                        return []
+            session = await self.get_session()
+            async with session.get(f"{self.base_url}/v1/models", timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status == 200:
+                    result = await response.json(loads=fast_json.loads)
+                    models = []
+                    for model in result.get("data", []):
+                        model_id = model.get("id", "")
+                        if model_id:  # เฉพาะ models ที่มีชื่อ
+                            models.append(model_id)
+                    logger.info(f"Found {len(models)} models in Ollama")
+                    return sorted(models)  # เรียงตามตัวอักษร
+                else:
+                    logger.error(f"Failed to get models: {response.status}")
+                    return []
         except asyncio.TimeoutError:
             logger.error("Timeout getting models from Ollama")
             return []
@@ -56,66 +134,169 @@ class OllamaService:
     
     async def validate_model(self, model_name: str) -> bool:
         """ตรวจสอบว่า model มีอยู่จริงใน Ollama"""
-        available_models = await self.get_available_models()
-        return model_name in available_models
+        return await self.catalog.contains(model_name)
+    
+    def build_payload(self, prompt: str, context: Optional[Dict] = None, stream: bool = False) -> Dict[str, Any]:
+        """สร้าง payload สำหรับ Ollama v1 chat completions"""
+        # สร้าง full prompt
+        full_prompt = f"{SYSTEM_PROMPT}\n\nคำถาม: {prompt}"
+        
+        if context:
+            full_prompt += f"\n\nข้อมูลแผนผังเครือข่าย:\n{self.encode_context(context)}"
+
+        # ใช้ Ollama v1 chat completions API format
+        return {
+            "model": self.model,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": full_prompt
+                }
+            ],
+            "stream": stream,
+            "options": {
+                "temperature": 0.7,
+                "top_p": 0.9,
+                "max_tokens": 1000
+            }
+        }
+    
+    def encode_context(self, context: Dict[str, Any]) -> str:
+        """แปลง context เป็นข้อความ ตัดข้อมูล UI และใช้รูปแบบตารางเพื่อลดจำนวน token"""
+        if settings.PROMPT_TOPOLOGY_FORMAT == "json":
+            return fast_json.dumps(context, indent=True)
+        return encode_context(context)
     
     async def generate_response(self, prompt: str, context: Optional[Dict] = None) -> str:
         """สร้างคำตอบจาก Ollama"""
+        text, _ = await self.complete(prompt, context)
+        return text
+    
+    @staticmethod
+    def payload_key(payload: Dict[str, Any]) -> str:
+        """hash ของ payload สุดท้ายที่จะส่งไป Ollama ใช้รวม request ที่เหมือนกัน"""
+        return hashlib.sha256(fast_json.dumps_bytes(payload, sort_keys=True)).hexdigest()
+    
+    async def complete(self, prompt: str, context: Optional[Dict] = None) -> Tuple[str, bool]:
+        """สร้างคำตอบจาก Ollama คืน (ข้อความ, สำเร็จหรือไม่) ข้อความแจ้งข้อผิดพลาดจะมาพร้อม False"""
+        return await self.complete_payload(self.build_payload(prompt, context))
+    
+    async def complete_payload(self, payload: Dict[str, Any]) -> Tuple[str, bool]:
+        # circuit เปิดอยู่ = Ollama ล่ม ตอบกลับทันทีแทนการรอ timeout
+        if not self.health.allow_request():
+            return self.unavailable_message(), False
         try:
-            # สร้าง system prompt สำหรับ network topology analysis
-            system_prompt = """คุณเป็นผู้เชี่ยวชาญด้านเครือข่ายคอมพิวเตอร์ ให้คำแนะนำเกี่ยวกับการออกแบบและวิเคราะห์แผนผังเครือข่าย 
-            ให้คำตอบเป็นภาษาไทยที่เข้าใจง่าย และให้คำแนะนำที่เป็นประโยชน์"""
-
-            # สร้าง full prompt
-            full_prompt = f"{system_prompt}\n\nคำถาม: {prompt}"
-            
-            if context:
-                full_prompt += f"\n\nข้อมูลแผนผังเครือข่าย: {json.dumps(context, ensure_ascii=False, indent=2)}"
-
-            # ใช้ Ollama v1 chat completions API format
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": full_prompt
-                    }
-                ],
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 1000
-                }
-            }
-
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.base_url}/v1/chat/completions",
-                    json=payload,
-                    timeout=self.timeout
-                ) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        return result.get("choices", [{}])[0].get("message", {}).get("content", "ไม่สามารถสร้างคำตอบได้")
-                    else:
-                        error_text = await response.text()
-                        logger.error(f"Ollama API error: {response.status} - {error_text}")
-                        return f"เกิดข้อผิดพลาดในการเชื่อมต่อกับ AI (Status: {response.status})"
+            session = await self.get_session()
+            async with session.post(
+                f"{self.base_url}/v1/chat/completions",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                if response.status == 200:
+                    result = await response.json(loads=fast_json.loads)
+                    self.health.record_success()
+                    content = result.get("choices", [{}])[0].get("message", {}).get("content")
+                    if not content:
+                        return "ไม่สามารถสร้างคำตอบได้", False
+                    return content, True
+                else:
+                    return await self._handle_error_response(response), False
 
         except asyncio.TimeoutError:
             logger.error("Ollama request timeout")
-            return "การเชื่อมต่อกับ AI ใช้เวลานานเกินไป กรุณาลองใหม่อีกครั้ง"
+            self.health.record_failure("timeout")
+            return "การเชื่อมต่อกับ AI ใช้เวลานานเกินไป กรุณาลองใหม่อีกครั้ง", False
         except Exception as e:
             logger.error(f"Error generating response: {e}")
-            return f"เกิดข้อผิดพลาดในการเชื่อมต่อกับ AI: {str(e)}"
+            self.health.record_failure(str(e))
+            return f"เกิดข้อผิดพลาดในการเชื่อมต่อกับ AI: {str(e)}", False
+    
+    async def generate_response_stream(self, prompt: str, context: Optional[Dict] = None) -> AsyncIterator[str]:
+        """
+        สร้างคำตอบจาก Ollama แบบ streaming คืนข้อความทีละส่วน (delta) ตามที่ Ollama ส่งมา
+        
+        ถ้าเกิดข้อผิดพลาดจะ yield ข้อความแจ้งข้อผิดพลาดแบบเดียวกับ generate_response
+        """
+        async for delta, _ in self.complete_stream(prompt, context):
+            yield delta
+    
+    async def complete_stream(self, prompt: str, context: Optional[Dict] = None) -> AsyncIterator[Tuple[str, bool]]:
+        """เหมือน generate_response_stream แต่ yield (delta, สำเร็จหรือไม่) ข้อความแจ้งข้อผิดพลาดจะมาพร้อม False"""
+        if not self.health.allow_request():
+            yield self.unavailable_message(), False
+            return
+        received_any = False
+        try:
+            payload = self.build_payload(prompt, context, stream=True)
+
+            session = await self.get_session()
+            async with session.post(
+                f"{self.base_url}/v1/chat/completions",
+                json=payload,
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            ) as response:
+                if response.status != 200:
+                    yield await self._handle_error_response(response), False
+                    return
+                self.health.record_success()
+                # Ollama ส่งเป็น SSE: "data: {...}" ทีละบรรทัด ปิดท้ายด้วย "data: [DONE]"
+                async for raw_line in response.content:
+                    line = raw_line.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    chunk = fast_json.loads(data)
+                    delta = chunk.get("choices", [{}])[0].get("delta", {}).get("content")
+                    if delta:
+                        received_any = True
+                        yield delta, True
+
+            if not received_any:
+                yield "ไม่สามารถสร้างคำตอบได้", False
+
+        except asyncio.TimeoutError:
+            logger.error("Ollama streaming request timeout")
+            self.health.record_failure("timeout")
+            yield "การเชื่อมต่อกับ AI ใช้เวลานานเกินไป กรุณาลองใหม่อีกครั้ง", False
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            self.health.record_failure(str(e))
+            yield f"เกิดข้อผิดพลาดในการเชื่อมต่อกับ AI: {str(e)}", False
+    
+    async def _handle_error_response(self, response: aiohttp.ClientResponse) -> str:
+        error_text = await response.text()
+        logger.error(f"Ollama API error: {response.status} - {error_text}")
+        # 4xx (เช่น model ไม่พบ) แปลว่า Ollama ยังตอบได้ นับเฉพาะ 5xx เป็นความล้มเหลว
+        if response.status >= 500:
+            self.health.record_failure(f"HTTP {response.status}")
+        else:
+            self.health.record_success()
+        return f"เกิดข้อผิดพลาดในการเชื่อมต่อกับ AI (Status: {response.status})"
 
 class NetworkTopologyAnalyzer:
+    # จำนวนชื่ออุปกรณ์/สายสูงสุดที่ใส่ในผลวิเคราะห์แต่ละหัวข้อ
+    GRAPH_SAMPLE_LIMIT = 10
+
     def __init__(self):
         self.ollama_service = OllamaService()
+        self.cache = AnalysisCache(
+            max_entries=settings.ANALYSIS_CACHE_MAX_ENTRIES,
+            ttl=settings.ANALYSIS_CACHE_TTL,
+            db_path=settings.ANALYSIS_CACHE_DB_PATH or None,
+            enabled=settings.ANALYSIS_CACHE_ENABLED
+        )
+        self.admission = admission
+        # รวม generation ที่ payload เหมือนกันซึ่งทำงานพร้อมกันให้เรียก Ollama ครั้งเดียว
+        self._inflight = SingleFlight()
+        self.coalesced_requests = 0
+        self.rules = RuleEngine(self.GRAPH_SAMPLE_LIMIT)
+        self.topology_rules = topology_rules
+        self.rule_answers = 0
     
-    def analyze_network_topology(self, nodes: List[Dict], edges: List[Dict]) -> Dict[str, Any]:
-        """วิเคราะห์แผนผังเครือข่าย"""
+    def analyze_network_topology(self, nodes: List[Dict], edges: List[Dict], include_capacity: bool = True) -> Dict[str, Any]:
+        """วิเคราะห์แผนผังเครือข่าย (include_capacity=False ข้ามการวิเคราะห์ bandwidth ซึ่งใช้เวลามากที่สุด)"""
         analysis = {
             "device_count": len(nodes),
             "connection_count": len(edges),
@@ -124,57 +305,107 @@ class NetworkTopologyAnalyzer:
             "recommendations": []
         }
         
-        # นับประเภทอุปกรณ์
-        for node in nodes:
-            device_type = node.get("type", "unknown")
-            analysis["device_types"][device_type] = analysis["device_types"].get(device_type, 0) + 1
+        # วิเคราะห์โครงสร้างกราฟ (สร้าง adjacency index ครั้งเดียว แล้วทุก rule ใช้ index ชุดเดียวกัน)
+        graph = TopologyGraph(nodes, edges)
+        report = self.topology_rules.run(graph, self.GRAPH_SAMPLE_LIMIT)
+        analysis["potential_issues"].extend(report.issues)
+        analysis["rule_timings_ms"] = {name: round(ms, 3) for name, ms in report.timings_ms.items()}
         
-        # ตรวจสอบปัญหาที่อาจเกิดขึ้น
-        if len(nodes) == 0:
-            analysis["potential_issues"].append("ไม่มีอุปกรณ์ในแผนผังเครือข่าย")
-        
-        if len(edges) == 0 and len(nodes) > 1:
-            analysis["potential_issues"].append("อุปกรณ์ไม่มีการเชื่อมต่อกัน")
-        
-        # ตรวจสอบการเชื่อมต่อที่ซ้ำซ้อน
-        connections = set()
-        for edge in edges:
-            connection = tuple(sorted([edge.get("source"), edge.get("target")]))
-            if connection in connections:
-                analysis["potential_issues"].append("มีการเชื่อมต่อซ้ำซ้อน")
-                break
-            connections.add(connection)
+        # นับประเภทอุปกรณ์ (ใช้ index ของ rule)
+        analysis["device_types"] = {device_type: len(members) for device_type, members in report.context.build("types").items()}
+        analysis["graph"] = self.analyze_graph(graph)
         
         # ให้คำแนะนำพื้นฐาน
         if len(nodes) > 0:
             analysis["recommendations"].append("ตรวจสอบให้แน่ใจว่าอุปกรณ์ทั้งหมดมีการตั้งค่าที่เหมาะสม")
         
-        if len(edges) > 0:
+        if not include_capacity:
+            return analysis
+        capacity = self.analyze_capacity(graph, analysis["potential_issues"], analysis["recommendations"])
+        if capacity is not None:
+            analysis["capacity"] = capacity
+        elif len(edges) > 0:
             analysis["recommendations"].append("ตรวจสอบ bandwidth และ latency ของการเชื่อมต่อ")
         
         return analysis
     
-    async def get_ai_analysis(self, nodes: List[Dict], edges: List[Dict], user_question: str = "") -> str:
-        """รับการวิเคราะห์จาก AI"""
-        # ตรวจสอบ Ollama health
-        if not await self.ollama_service.check_ollama_health():
-            return "ไม่สามารถเชื่อมต่อกับ Ollama ได้ กรุณาตรวจสอบว่า Ollama ทำงานอยู่ที่ http://localhost:11434"
-        
-        # วิเคราะห์แผนผังเครือข่าย
-        analysis = self.analyze_network_topology(nodes, edges)
-        
-        # สร้าง context สำหรับ AI
-        context = {
-            "analysis": analysis,
-            "nodes": nodes,
-            "edges": edges
+    def analyze_graph(self, graph: TopologyGraph) -> Dict[str, Any]:
+        """สรุป connectivity, อุปกรณ์ที่ไม่ได้เชื่อมต่อ, single point of failure และสายที่ไม่มีเส้นทางสำรอง (ผลถูก cache ใน graph)"""
+        component_sizes = graph.component_sizes()
+        isolated = graph.isolated_nodes()
+        articulation = graph.articulation_points()
+        critical = graph.critical_articulation_points()
+        backbone_bridges = graph.backbone_bridges()
+        # ไม่นับอุปกรณ์เดี่ยวเป็นส่วนแยก
+        segments = sum(1 for size in component_sizes if size > 1)
+
+        limit = self.GRAPH_SAMPLE_LIMIT
+        return {
+            "components": len(component_sizes),
+            "segments": segments,
+            "largest_component": max(component_sizes, default=0),
+            "isolated_devices": len(isolated),
+            "isolated_device_labels": [graph.label(i) for i in isolated[:limit]],
+            "duplicate_links": len(graph.duplicate_edges),
+            "duplicate_link_labels": [
+                f"{graph.label(graph.index[edge.get('source')])} - {graph.label(graph.index[edge.get('target')])}"
+                for edge in (graph.edges[position] for position in graph.duplicate_edges[:limit])
+            ],
+            "dangling_links": len(graph.dangling_edges),
+            "articulation_points": len(articulation),
+            "critical_device_count": len(critical),
+            "critical_devices": [graph.label(i) for i in critical[:limit]],
+            "bridges": len(graph.bridges()),
+            "backbone_bridge_count": len(backbone_bridges),
+            "backbone_bridges": [graph.edge_label(e) for e in backbone_bridges[:limit]],
         }
-        
-        # สร้าง prompt
-        if user_question:
-            prompt = f"วิเคราะห์แผนผังเครือข่ายนี้และตอบคำถาม: {user_question}"
+
+    def analyze_capacity(self, graph: TopologyGraph, issues: List[str], recommendations: List[str]) -> Optional[Dict[str, Any]]:
+        """เทียบ bandwidth/throughput กับ demand ของผู้ใช้ คืน None ถ้าแผนผังไม่มีข้อมูลพอ (ไม่มี Core หรือ demand)"""
+        capacity = CapacityAnalyzer(
+            graph,
+            per_user_bps=settings.CAPACITY_PER_USER_MBPS * 1e6,
+            max_flow_nodes=settings.CAPACITY_MAXFLOW_MAX_NODES,
+        ).analyze(self.GRAPH_SAMPLE_LIMIT)
+        if capacity is None:
+            return None
+
+        if capacity["links_without_bandwidth"]:
+            issues.append(f"มีสาย {capacity['links_without_bandwidth']} เส้นที่ไม่ได้ระบุ bandwidth")
+        if capacity["overloaded_link_count"]:
+            links = sample_labels(
+                (f"{item['link']} ({item['capacity']} < {item['demand']})" for item in capacity["overloaded_links"]),
+                self.GRAPH_SAMPLE_LIMIT
+            )
+            issues.append(f"สายที่ bandwidth ไม่พอกับ demand ด้านล่าง {capacity['overloaded_link_count']} เส้น: {links}")
+        if capacity["overloaded_device_count"]:
+            devices = sample_labels(
+                (f"{item['device']} ({item['capacity']} < {item['demand']})" for item in capacity["overloaded_devices"]),
+                self.GRAPH_SAMPLE_LIMIT
+            )
+            issues.append(f"อุปกรณ์ที่ throughput ไม่พอกับ demand {capacity['overloaded_device_count']} ตัว: {devices}")
+        if capacity.get("bottlenecks"):
+            issues.append(
+                f"เครือข่ายรองรับ demand ได้ {capacity['satisfied_percent']}% "
+                f"({capacity['deliverable']} จาก {capacity['total_demand']}) คอขวด: {sample_labels(capacity['bottlenecks'], self.GRAPH_SAMPLE_LIMIT)}"
+            )
+
+        if capacity["overloaded_link_count"] or capacity["overloaded_device_count"]:
+            recommendations.append("เพิ่ม bandwidth หรือทำ link aggregation ให้สาย/อุปกรณ์ที่เป็นคอขวด")
         else:
-            prompt = """วิเคราะห์แผนผังเครือข่ายนี้อย่างครอบคลุม โดยให้ข้อมูลในหัวข้อต่อไปนี้:
+            recommendations.append(
+                f"bandwidth เพียงพอกับ demand โดยประมาณ ({capacity['per_user']} ต่อผู้ใช้ รวม {capacity['total_demand']})"
+            )
+        return capacity
+
+    def build_question_prompt(self, user_question: str = "") -> str:
+        """สร้าง prompt จากคำถามของผู้ใช้ (หรือ prompt วิเคราะห์แบบครอบคลุมเมื่อไม่มีคำถาม)"""
+        if user_question:
+            return (
+                "วิเคราะห์แผนผังเครือข่ายนี้และตอบคำถาม โดยใช้ข้อเท็จจริงใน findings ที่คำนวณไว้แล้ว "
+                f"ไม่ต้องนับอุปกรณ์หรือสายใหม่: {user_question}"
+            )
+        return """วิเคราะห์แผนผังเครือข่ายนี้อย่างครอบคลุม โดยให้ข้อมูลในหัวข้อต่อไปนี้:
 
 1. **ภาพรวมของเครือข่าย**: อธิบายโครงสร้างและองค์ประกอบหลัก
 2. **การวิเคราะห์ประสิทธิภาพ**: ประเมินประสิทธิภาพและจุดคอขวด
@@ -183,10 +414,145 @@ class NetworkTopologyAnalyzer:
 5. **ข้อควรระวัง**: สิ่งที่ควรติดตามและดูแลรักษา
 
 ให้คำตอบเป็นภาษาไทยที่เข้าใจง่าย พร้อมเหตุผลและตัวอย่างที่ชัดเจน"""
+    
+    def build_prompt(self, nodes: List[Dict], edges: List[Dict], user_question: str = "") -> Tuple[str, Dict[str, Any]]:
+        """สร้าง prompt และ context ที่จะส่งให้ AI"""
+        # วิเคราะห์แผนผังเครือข่าย
+        analysis = self.analyze_network_topology(nodes, edges)
+        
+        # สร้าง context สำหรับ AI (ใส่เฉพาะ findings ของ rule engine แทนผลวิเคราะห์ทั้งก้อน prompt จึงสั้นลง)
+        context = {
+            "findings": self.rules.findings(analysis),
+            "nodes": nodes,
+            "edges": edges
+        }
+        
+        return self.build_question_prompt(user_question), context
+    
+    def rule_answer(self, nodes: List[Dict], edges: List[Dict], user_question: str = "") -> Optional[str]:
+        """คำตอบจาก rule engine ถ้าคำถามตอบได้จากโครงสร้างแผนผังอย่างเดียว ไม่เช่นนั้นคืน None"""
+        intents = self.rules.classify(user_question)
+        if not intents:
+            return None
+        analysis = self.analyze_network_topology(
+            nodes, edges, include_capacity=any(intent.name == INTENT_CAPACITY for intent in intents)
+        )
+        return self.rules.answer(intents, analysis, nodes)
+    
+    def cache_key(self, nodes: List[Dict], edges: List[Dict], user_question: str = "") -> str:
+        return topology_cache_key(
+            nodes,
+            edges,
+            prompt=self.build_question_prompt(user_question),
+            model=self.ollama_service.model,
+            template=f"{SYSTEM_PROMPT}|{settings.PROMPT_TOPOLOGY_FORMAT}|{ENCODER_VERSION}|{ANALYSIS_VERSION}"
+        )
+    
+    # งานด้านล่างเป็น CPU ล้วน (วิเคราะห์กราฟ, serialize และ hash แผนผัง) จึงรันใน thread pool
+    # ด้วย asyncio.to_thread เพื่อไม่ให้แผนผังขนาดใหญ่บล็อก event loop
+    def _rule_answer_or_key(self, nodes: List[Dict], edges: List[Dict], user_question: str) -> Tuple[Optional[str], Optional[str]]:
+        """(คำตอบจาก rule engine, None) หรือ (None, cache key) ถ้า rule engine ตอบไม่ได้"""
+        answer = self.rule_answer(nodes, edges, user_question)
+        if answer is not None:
+            return answer, None
+        return None, self.cache_key(nodes, edges, user_question)
+    
+    def _build_payload(self, nodes: List[Dict], edges: List[Dict], user_question: str) -> Tuple[Dict[str, Any], str]:
+        """payload ที่จะส่งให้ Ollama พร้อม key สำหรับรวม request ที่เหมือนกัน"""
+        prompt, context = self.build_prompt(nodes, edges, user_question)
+        payload = self.ollama_service.build_payload(prompt, context)
+        return payload, self.ollama_service.payload_key(payload)
+    
+    async def run_analysis(
+        self,
+        nodes: List[Dict],
+        edges: List[Dict],
+        user_question: str = "",
+        user_id: Optional[int] = None,
+        priority: int = PRIORITY_INTERACTIVE,
+        reject_when_full: bool = True
+    ) -> AnalysisResult:
+        """
+        วิเคราะห์ด้วย AI โดยใช้ response cache ถ้าแผนผังและคำถามเหมือนเดิม
+        
+        cache miss ต้องได้ slot จาก admission controller ก่อนเรียก Ollama
+        (raise QueueFullError เมื่อคิวเต็มและ reject_when_full เป็น True)
+        คำถามเชิงโครงสร้างที่ rule engine ตอบได้จะไม่ผ่าน cache และ Ollama เลย
+        """
+        answer, key = await asyncio.to_thread(self._rule_answer_or_key, nodes, edges, user_question)
+        if answer is not None:
+            self.rule_answers += 1
+            return AnalysisResult(answer, rule_based=True)
+        
+        cached = await self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Analysis cache hit ({key[:12]})")
+            return AnalysisResult(cached, cached=True)
+        
+        payload, payload_key = await asyncio.to_thread(self._build_payload, nodes, edges, user_question)
+        
+        async def generate() -> Tuple[str, bool]:
+            # เรียกใช้ Ollama และ cache เฉพาะคำตอบที่สำเร็จ
+            async with self.admission.slot(user_id, priority, reject_when_full):
+                text, ok = await self.ollama_service.complete_payload(payload)
+            if ok:
+                await self.cache.set(key, text)
+            return text, ok
+        
+        # request ที่เหมือนกันซึ่งกำลังทำงานอยู่จะรอผลเดียวกันโดยไม่ใช้ slot เพิ่ม
+        if self._inflight.in_flight(payload_key):
+            self.coalesced_requests += 1
+            logger.info(f"Coalescing identical generation ({payload_key[:12]})")
+        text, ok = await self._inflight.do(payload_key, generate)
+        return AnalysisResult(text, ok=ok)
+    
+    def in_flight_generations(self) -> int:
+        return len(self._inflight)
+    
+    async def get_ai_analysis(
+        self,
+        nodes: List[Dict],
+        edges: List[Dict],
+        user_question: str = "",
+        user_id: Optional[int] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> str:
+        """รับการวิเคราะห์จาก AI"""
+        # สถานะ Ollama มาจาก health monitor ที่ cache ไว้ (ดู OllamaService.complete)
+        result = await self.run_analysis(nodes, edges, user_question, user_id=user_id, priority=priority)
+        return result.text
+    
+    async def stream_ai_analysis(
+        self,
+        nodes: List[Dict],
+        edges: List[Dict],
+        user_question: str = "",
+        user_id: Optional[int] = None,
+        priority: int = PRIORITY_INTERACTIVE
+    ) -> AsyncIterator[AnalysisResult]:
+        """รับการวิเคราะห์จาก AI แบบ streaming (cache hit และคำตอบจาก rule engine จะได้ทั้งหมดใน chunk เดียว)"""
+        answer, key = await asyncio.to_thread(self._rule_answer_or_key, nodes, edges, user_question)
+        if answer is not None:
+            self.rule_answers += 1
+            yield AnalysisResult(answer, rule_based=True)
+            return
+        
+        cached = await self.cache.get(key)
+        if cached is not None:
+            logger.info(f"Analysis cache hit ({key[:12]})")
+            yield AnalysisResult(cached, cached=True)
+            return
         
-        # เรียกใช้ Ollama
-        response = await self.ollama_service.generate_response(prompt, context)
-        return response
+        prompt, context = await asyncio.to_thread(self.build_prompt, nodes, edges, user_question)
+        parts = []
+        all_ok = True
+        async with self.admission.slot(user_id, priority):
+            async for delta, ok in self.ollama_service.complete_stream(prompt, context):
+                all_ok = all_ok and ok
+                parts.append(delta)
+                yield AnalysisResult(delta, ok=ok)
+        if all_ok and parts:
+            await self.cache.set(key, "".join(parts))
 
 # Global instance
 analyzer = NetworkTopologyAnalyzer() 
\ No newline at end of file
@@ -0,0 +1,175 @@
+import asyncio
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from . import fast_json
+
+logger = logging.getLogger(__name__)
+
+# fields ของ React Flow ที่เป็นเรื่อง layout/UI เท่านั้น ไม่มีผลต่อผลการวิเคราะห์
+LAYOUT_ONLY_FIELDS = {
+    "position", "positionAbsolute", "width", "height", "measured",
+    "selected", "dragging", "dragHandle", "style", "className",
+    "zIndex", "hidden", "focusable", "resizing",
+    "sourceHandle", "targetHandle", "animated", "markerStart", "markerEnd",
+}
+
+
+def _strip_layout(item: Dict[str, Any], drop: tuple = ()) -> Dict[str, Any]:
+    return {
+        key: value for key, value in item.items()
+        if key not in LAYOUT_ONLY_FIELDS and key not in drop
+    }
+
+
+def canonical_topology(nodes: List[Dict], edges: List[Dict]) -> Dict[str, List[Dict]]:
+    """
+    รูปแบบมาตรฐานของแผนผังสำหรับคำนวณ hash
+
+    ตัด fields ที่เป็น layout ออก เรียง nodes ตาม id และเรียง edges ตามเนื้อหา
+    id ของ edge ถูกตัดออกเพราะถูกสร้างใหม่ทุกครั้งที่ลากสายใหม่แม้จะเป็นการเชื่อมต่อเดิม
+    """
+    canonical_nodes = sorted(
+        (_strip_layout(node) for node in nodes),
+        key=lambda node: str(node.get("id")),
+    )
+    canonical_edges = sorted(
+        (_strip_layout(edge, drop=("id",)) for edge in edges),
+        key=lambda edge: fast_json.dumps(edge, sort_keys=True, default=str),
+    )
+    return {"nodes": canonical_nodes, "edges": canonical_edges}
+
+
+def topology_hash(nodes: List[Dict], edges: List[Dict]) -> str:
+    """SHA-256 ของแผนผัง (canonical) อย่างเดียว ใช้จับคู่ประวัติการวิเคราะห์กับ revision ของ project"""
+    material = fast_json.dumps_bytes(canonical_topology(nodes, edges), sort_keys=True, default=str)
+    return hashlib.sha256(material).hexdigest()
+
+
+def topology_cache_key(nodes: List[Dict], edges: List[Dict], prompt: str, model: str, template: str) -> str:
+    """SHA-256 ของแผนผัง (canonical) + prompt + model + prompt template"""
+    material = {
+        "topology": canonical_topology(nodes, edges),
+        "prompt": prompt,
+        "model": model,
+        "template": template,
+    }
+    return hashlib.sha256(fast_json.dumps_bytes(material, sort_keys=True, default=str)).hexdigest()
+
+
+class AnalysisCache:
+    """
+    Cache ผลการวิเคราะห์ของ AI แบบ content-addressed
+
+    ชั้นแรกเป็น LRU ใน memory (หมดอายุตาม ttl) ชั้นที่สอง (optional) เป็นไฟล์ SQLite
+    แยกจากฐานข้อมูลหลัก เพื่อให้ cache อยู่รอดหลัง restart
+
+    get/set/invalidate เป็น coroutine: การอ่านเขียนไฟล์ SQLite ทำใน thread pool (asyncio.to_thread)
+    ไม่ block event loop ส่วน cache hit ใน memory ตอบทันทีโดยไม่สลับ thread
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 86400.0, db_path: Optional[str] = None, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()  # connection เดียวใช้ร่วมกันระหว่าง thread ของ to_thread
+        self.hits = 0
+        self.misses = 0
+        if enabled and db_path:
+            # เปิดไฟล์ครั้งเดียวตอนสร้าง (ตอนเริ่ม process ก่อนมี event loop)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS analysis_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if now - created_at < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        row = await asyncio.to_thread(self._get_persistent, key, now) if self._db is not None else None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            # พบในชั้น SQLite ดึงขึ้นมาไว้ใน memory
+            self._put_memory(key, row[0], row[1])
+            self.hits += 1
+        return row[0]
+
+    async def set(self, key: str, value: str):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            self._put_memory(key, value, now)
+        if self._db is not None:
+            await asyncio.to_thread(
+                self._execute_persistent,
+                "INSERT OR REPLACE INTO analysis_cache (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, now),
+            )
+
+    async def invalidate(self, key: Optional[str] = None):
+        """ลบ key เดียว หรือล้างทั้ง cache เมื่อไม่ระบุ key"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+        if self._db is not None:
+            if key is None:
+                await asyncio.to_thread(self._execute_persistent, "DELETE FROM analysis_cache", ())
+            else:
+                await asyncio.to_thread(self._execute_persistent, "DELETE FROM analysis_cache WHERE key = ?", (key,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "persistent": self._db is not None,
+        }
+
+    def _put_memory(self, key: str, value: str, created_at: float):
+        self._entries[key] = (value, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _execute_persistent(self, sql: str, params: tuple):
+        with self._db_lock:
+            self._db.execute(sql, params)
+            self._db.commit()
+
+    def _get_persistent(self, key: str, now: float) -> Optional[tuple]:
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT value, created_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.ttl:
+                self._db.execute("DELETE FROM analysis_cache WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            return row
@@ -0,0 +1,229 @@
+import asyncio
+import time
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models, crud, fast_json
+from .admission import PRIORITY_BACKGROUND
+from .ai_service import analyzer
+from .config import settings
+from .database import SessionLocal
+from .rule_engine import RULE_ENGINE_MODEL
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATUSES = (JOB_SUCCEEDED, JOB_FAILED)
+
+
+class AnalysisJobQueue:
+    """
+    คิวงานวิเคราะห์ AI แบบ asynchronous
+
+    งานถูกบันทึกในตาราง ai_analysis_jobs ก่อนเข้าคิว worker แต่ละตัวเปิด DB session
+    เฉพาะตอนอ่าน/เขียนสถานะ ไม่ถือ session ไว้ระหว่างรอ LLM
+    งานที่ค้างอยู่ (queued/running) ตอน process หยุดจะถูกนำกลับเข้าคิวเมื่อ start ใหม่
+    """
+
+    def __init__(self, session_factory: sessionmaker, analyzer, workers: int = 2):
+        self._session_factory = session_factory
+        self._analyzer = analyzer
+        self.worker_count = workers
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        if self._workers:
+            return
+        self._queue = asyncio.Queue()
+        for job_id in self._recover_pending_jobs():
+            self._queue.put_nowait(job_id)
+        self._workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.worker_count)
+        ]
+        logger.info(f"Analysis job queue started with {self.worker_count} worker(s)")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        for task in self._workers:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._workers = []
+        self._queue = None
+
+    def _recover_pending_jobs(self) -> List[str]:
+        """นำงานที่ค้างจากรอบก่อนกลับเข้าคิวตามลำดับเวลาที่สร้าง"""
+        db = self._session_factory()
+        try:
+            db.query(models.AIAnalysisJob).filter(
+                models.AIAnalysisJob.status == JOB_RUNNING
+            ).update({"status": JOB_QUEUED, "started_at": None})
+            db.commit()
+            pending = db.query(models.AIAnalysisJob.id).filter(
+                models.AIAnalysisJob.status == JOB_QUEUED
+            ).order_by(models.AIAnalysisJob.created_at).all()
+            if pending:
+                logger.info(f"Recovered {len(pending)} pending analysis job(s)")
+            return [row.id for row in pending]
+        finally:
+            db.close()
+
+    def submit(
+        self,
+        db: Session,
+        user_id: int,
+        nodes: List[Dict[str, Any]],
+        edges: List[Dict[str, Any]],
+        question: str = "",
+        project_id: Optional[int] = None,
+    ) -> models.AIAnalysisJob:
+        """บันทึกงานใหม่ลงฐานข้อมูลแล้วใส่เข้าคิว คืน job ทันที"""
+        job = models.AIAnalysisJob(
+            user_id=user_id,
+            project_id=project_id,
+            status=JOB_QUEUED,
+            request_data=fast_json.dumps({"nodes": nodes, "edges": edges, "question": question or ""}),
+        )
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        if self._queue is not None:
+            self._queue.put_nowait(job.id)
+        else:
+            logger.warning(f"Job queue is not running, job {job.id} will run after restart")
+        return job
+
+    async def wait_for(self, job_id: str, timeout: Optional[float] = None) -> bool:
+        """
+        รอจนงานเสร็จ (สำหรับ subscriber ใน process เดียวกัน) คืน False ถ้าหมดเวลา
+        subscriber แต่ละตัวมี Event ของตัวเอง และถูกลบออกเมื่อเลิกรอ (หมดเวลาหรือ client ปิด stream)
+        """
+        event = asyncio.Event()
+        waiters = self._waiters.setdefault(job_id, set())
+        waiters.add(event)
+        try:
+            if self._is_finished(job_id):
+                return True
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters.discard(event)
+            if not waiters and self._waiters.get(job_id) is waiters:
+                del self._waiters[job_id]
+
+    def _is_finished(self, job_id: str) -> bool:
+        db = self._session_factory()
+        try:
+            job = db.get(models.AIAnalysisJob, job_id)
+            return job is None or job.status in FINISHED_STATUSES
+        finally:
+            db.close()
+
+    def _notify(self, job_id: str):
+        for event in self._waiters.pop(job_id, ()):
+            event.set()
+
+    async def _worker(self, index: int):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run_job(job_id)
+            except Exception as e:
+                logger.error(f"Analysis job {job_id} crashed in worker {index}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run_job(self, job_id: str):
+        # 1. อ่านงานและเปลี่ยนสถานะเป็น running แล้วคืน session ทันที
+        db = self._session_factory()
+        try:
+            job = db.get(models.AIAnalysisJob, job_id)
+            if job is None or job.status != JOB_QUEUED:
+                return
+            job.status = JOB_RUNNING
+            job.started_at = models.bangkok_now()
+            job.attempts = (job.attempts or 0) + 1
+            db.commit()
+            user_id = job.user_id
+            project_id = job.project_id
+            request_data = fast_json.loads(job.request_data)
+        finally:
+            db.close()
+
+        # 2. เรียก LLM โดยไม่ถือ DB session
+        start_time = time.time()
+        try:
+            result = await self._analyzer.run_analysis(
+                nodes=request_data["nodes"],
+                edges=request_data["edges"],
+                user_question=request_data.get("question", ""),
+                user_id=user_id,
+                priority=PRIORITY_BACKGROUND,
+                reject_when_full=False,  # งานอยู่ในคิวของตัวเองแล้ว รอ slot ได้โดยไม่ถูกปฏิเสธ
+            )
+        except Exception as e:
+            logger.error(f"Analysis job {job_id} failed: {e}")
+            self._finish(job_id, JOB_FAILED, error=str(e))
+            return
+        if not result.ok:
+            # Ollama ล้มเหลว: text เป็นข้อความแจ้งข้อผิดพลาด ไม่บันทึกเป็นผลวิเคราะห์
+            logger.error(f"Analysis job {job_id} failed: {result.text}")
+            self._finish(job_id, JOB_FAILED, error=result.text)
+            return
+        elapsed = time.time() - start_time
+
+        # 3. บันทึกประวัติและผลของงานใน transaction สั้น ๆ
+        db = self._session_factory()
+        try:
+            analysis_history = crud.create_analysis_history(
+                db,
+                user_id=user_id,
+                project_id=project_id,
+                model_used=RULE_ENGINE_MODEL if result.rule_based else self._analyzer.ollama_service.model,
+                nodes=request_data["nodes"],
+                edges=request_data["edges"],
+                analysis_result=result.text,
+                execution_time_seconds=int(elapsed),
+                is_cached=result.cached,
+            )
+            analysis_id = analysis_history.id
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Saving result of analysis job {job_id} failed: {e}")
+            self._finish(job_id, JOB_FAILED, error=str(e))
+            return
+        finally:
+            db.close()
+        self._finish(job_id, JOB_SUCCEEDED, analysis_id=analysis_id)
+
+    def _finish(self, job_id: str, status: str, analysis_id: Optional[int] = None, error: Optional[str] = None):
+        db = self._session_factory()
+        try:
+            db.query(models.AIAnalysisJob).filter(models.AIAnalysisJob.id == job_id).update({
+                "status": status,
+                "analysis_id": analysis_id,
+                "error": error,
+                "finished_at": models.bangkok_now(),
+            })
+            db.commit()
+        finally:
+            db.close()
+        self._notify(job_id)
+
+# Global instance
+job_queue = AnalysisJobQueue(SessionLocal, analyzer, workers=settings.ANALYSIS_JOB_WORKERS)
@@ -0,0 +1,207 @@
+"""
+ดัชนีค้นหาข้อความในประวัติการวิเคราะห์ AI ด้วย SQLite FTS5 (ตาราง analysis_search)
+
+เป็น external content table ของ ai_analysis_history (ผ่าน view analysis_search_content) ดัชนีไม่เก็บข้อความซ้ำ
+และถูกอัปเดตด้วย trigger ทุกครั้งที่ insert/update/delete ai_analysis_history ไม่ว่าจะเขียนจาก crud, router หรือ cascade
+
+ใช้ tokenizer trigram เพราะผลวิเคราะห์เป็นภาษาไทย (ไม่มีช่องว่างระหว่างคำ unicode61 จึงแยกคำไม่ได้)
+การค้นหาจึงเป็นแบบ substring ไม่สนตัวพิมพ์ใหญ่เล็กเหมือน LIKE '%...%' เดิม แต่ใช้ดัชนี คำค้นต้องยาวอย่างน้อย 3 ตัวอักษร
+
+user_id เก็บเป็น token "u<id>u" ในคอลัมน์ owner การค้นหา MATCH เจ้าของก่อน แถวของผู้ใช้อื่นจึงไม่ถูกนำมาจัดอันดับ
+
+ถ้าฐานข้อมูลไม่ใช่ SQLite หรือ SQLite ไม่มี FTS5/trigram การค้นหาจะปิดไว้ (available() = False)
+"""
+import html
+import logging
+import re
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from . import models
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+MIN_TERM_CHARS = 3  # trigram: คำที่สั้นกว่านี้ไม่มี token ให้ค้น
+SNIPPET_CHARS = 160
+SNIPPET_OPEN = "<mark>"
+SNIPPET_CLOSE = "</mark>"
+
+SORT_RELEVANCE = "relevance"
+SORT_RECENT = "recent"
+
+_OWNER = "'u' || {row}.user_id || 'u'"
+
+CREATE_STATEMENTS = [
+    "CREATE VIEW IF NOT EXISTS analysis_search_content AS "
+    f"SELECT id, analysis_result, {_OWNER.format(row='ai_analysis_history')} AS owner FROM ai_analysis_history",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS analysis_search USING fts5("
+    "analysis_result, owner, content = 'analysis_search_content', content_rowid = 'id', tokenize = 'trigram')",
+    "CREATE TRIGGER IF NOT EXISTS ai_analysis_history_search_insert AFTER INSERT ON ai_analysis_history BEGIN "
+    f"INSERT INTO analysis_search (rowid, analysis_result, owner) VALUES (new.id, new.analysis_result, {_OWNER.format(row='new')}); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS ai_analysis_history_search_delete AFTER DELETE ON ai_analysis_history BEGIN "
+    "INSERT INTO analysis_search (analysis_search, rowid, analysis_result, owner) "
+    f"VALUES ('delete', old.id, old.analysis_result, {_OWNER.format(row='old')}); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS ai_analysis_history_search_update AFTER UPDATE OF analysis_result, user_id ON ai_analysis_history BEGIN "
+    "INSERT INTO analysis_search (analysis_search, rowid, analysis_result, owner) "
+    f"VALUES ('delete', old.id, old.analysis_result, {_OWNER.format(row='old')}); "
+    f"INSERT INTO analysis_search (rowid, analysis_result, owner) VALUES (new.id, new.analysis_result, {_OWNER.format(row='new')}); "
+    "END",
+]
+REBUILD = "INSERT INTO analysis_search (analysis_search) VALUES ('rebuild')"
+
+_available = False
+
+
+def ensure_index(engine: Engine) -> bool:
+    """
+    สร้าง view, ตาราง FTS5 และ trigger ถ้ายังไม่มี (เรียกตอนเริ่ม app หลัง create_all)
+    ครั้งแรกที่สร้างบนฐานข้อมูลที่มีประวัติอยู่แล้วจะ rebuild ดัชนีจากแถวเดิม (external content ต้องตรงกับตารางเสมอ)
+    """
+    global _available
+    if engine.dialect.name != "sqlite":
+        _available = False
+        return False
+    try:
+        with engine.begin() as conn:
+            exists = conn.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'analysis_search'"
+            ).first() is not None
+            for statement in CREATE_STATEMENTS:
+                conn.exec_driver_sql(statement)
+            if not exists and conn.exec_driver_sql("SELECT 1 FROM ai_analysis_history LIMIT 1").first():
+                conn.exec_driver_sql(REBUILD)
+        _available = True
+    except Exception as e:
+        logger.warning(f"Analysis history search disabled (SQLite FTS5 trigram not available): {e}")
+        _available = False
+    return _available
+
+
+def available() -> bool:
+    return _available
+
+
+def owner_token(user_id: int) -> str:
+    return f"u{int(user_id)}u"
+
+
+def phrases(query: str) -> List[str]:
+    """
+    แยกข้อความที่ผู้ใช้พิมพ์ด้วยช่องว่าง แต่ละคำค้นแบบ substring และทุกคำต้องพบ (AND)
+    คำที่สั้นกว่า 3 ตัวอักษรรวมกับคำข้างเคียงเป็นวลี (เช่น "OSPF area 5" -> "OSPF", "area 5")
+    """
+    result: List[str] = []
+    for term in (query or "").split():
+        if result and (len(term) < MIN_TERM_CHARS or len(result[-1]) < MIN_TERM_CHARS):
+            result[-1] += " " + term
+        else:
+            result.append(term)
+    return [phrase for phrase in result if len(phrase) >= MIN_TERM_CHARS]
+
+
+def match_query(query: str) -> Optional[str]:
+    """FTS5 query ของ phrases() (คืน None ถ้าไม่มีคำที่ยาวพอให้ค้น)"""
+    quoted = ['"' + phrase.replace('"', '""') + '"' for phrase in phrases(query)]
+    return " ".join(quoted) if quoted else None
+
+
+def score(text_value: str, terms: List[str], average_length: float) -> float:
+    """
+    คะแนนแบบ BM25 (k1=1.2, b=0.75) จากจำนวนครั้งที่พบแต่ละคำและความยาวข้อความ
+    ไม่ใช้ IDF: ทุกผลพบทุกคำอยู่แล้ว และ bm25() ของ FTS5 คำนวณ IDF ของวลี trigram ด้วยการ scan ผลที่ตรงทั้งหมด
+    """
+    folded = text_value.lower()
+    norm = 1.2 * (0.25 + 0.75 * len(folded) / (average_length or 1))
+    total = 0.0
+    for term in terms:
+        frequency = folded.count(term)
+        total += frequency * 2.2 / (frequency + norm)
+    return total
+
+
+def snippet(text_value: str, terms: List[str], width: int = SNIPPET_CHARS) -> str:
+    """
+    ข้อความประมาณ width ตัวอักษรรอบคำแรกที่พบ ครอบทุกคำที่พบด้วย <mark></mark>
+    ข้อความส่วนอื่น escape เป็น HTML แล้ว (ทำใน Python เพราะ snippet() ของ FTS5 กับ trigram ช้ากว่าการค้นหาเอง)
+    """
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+    first = pattern.search(text_value)
+    start = max(0, (first.start() if first else 0) - width // 4)
+    end = min(len(text_value), start + width)
+    parts = ["…"] if start > 0 else []
+    position = start
+    for found in pattern.finditer(text_value, start, end):
+        parts.append(html.escape(text_value[position:found.start()]))
+        parts.append(SNIPPET_OPEN + html.escape(found.group()) + SNIPPET_CLOSE)
+        position = found.end()
+    parts.append(html.escape(text_value[position:end]))
+    if end < len(text_value):
+        parts.append("…")
+    return " ".join("".join(parts).split())
+
+
+def search(
+    db: Session,
+    user_id: int,
+    query: str,
+    project_id: Optional[int] = None,
+    model_filter: Optional[str] = None,
+    sort: str = SORT_RELEVANCE,
+    skip: int = 0,
+    limit: int = 20,
+    rank_window: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    ประวัติการวิเคราะห์ของผู้ใช้ที่ตรงกับ query พร้อม snippet
+
+    sort="relevance" จัดอันดับด้วย score() ภายในผลที่ตรงล่าสุด rank_window รายการ (ANALYSIS_SEARCH_RANK_WINDOW)
+    คำที่พบในเกือบทุกรายการจึงไม่ต้องอ่านข้อความทั้งตาราง sort="recent" เรียงใหม่สุดก่อน (อ่านเพียง skip + limit แถว)
+    """
+    match = match_query(query)
+    if match is None:
+        return []
+    params: Dict[str, Any] = {"match": f'owner : "{owner_token(user_id)}" AND analysis_result : ({match})'}
+    conditions = []
+    if project_id is not None:
+        conditions.append("h.project_id = :project_id")
+        params["project_id"] = project_id
+    if model_filter:
+        conditions.append("h.model_used LIKE '%' || :model_filter || '%'")
+        params["model_filter"] = model_filter
+
+    # rowid = ai_analysis_history.id เรียงตามเวลาที่บันทึก FTS5 อ่าน ORDER BY rowid DESC จากดัชนีและหยุดที่ LIMIT ได้
+    # CROSS JOIN ให้ FTS5 เป็น loop นอก (SQLite ไม่สลับลำดับ) การอ่านจึงหยุดที่ LIMIT จริง
+    if sort == SORT_RECENT:
+        params.update(limit=limit, skip=skip)
+    else:
+        params.update(limit=max(skip + limit, rank_window or settings.ANALYSIS_SEARCH_RANK_WINDOW), skip=0)
+    candidates = db.execute(text(
+        "SELECT s.rowid, h.analysis_result FROM analysis_search s CROSS JOIN ai_analysis_history h ON h.id = s.rowid "
+        f"WHERE {' AND '.join(['s.analysis_search MATCH :match', *conditions])} "
+        "ORDER BY s.rowid DESC LIMIT :limit OFFSET :skip"
+    ), params).all()
+
+    terms = [phrase.lower() for phrase in phrases(query)]
+    if sort != SORT_RECENT:
+        average_length = sum(len(value) for _, value in candidates) / len(candidates) if candidates else 0.0
+        # คะแนนเท่ากันให้รายการใหม่กว่าก่อน (candidates เรียงใหม่สุดก่อนอยู่แล้วและ sorted คงลำดับเดิม)
+        candidates = sorted(candidates, key=lambda row: -score(row[1], terms, average_length))[skip:skip + limit]
+    if not candidates:
+        return []
+
+    History = models.AIAnalysisHistory
+    details = {
+        row.id: row for row in db.query(
+            History.id, History.project_id, History.model_used, History.device_count, History.created_at
+        ).filter(History.id.in_([analysis_id for analysis_id, _ in candidates]))
+    }
+    return [
+        {**details[analysis_id]._asdict(), "snippet": snippet(value, terms)}
+        for analysis_id, value in candidates
+    ]
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from . import models, fast_json, diagram_store
+from .admission import PRIORITY_BACKGROUND
+from .ai_service import analyzer
+from .analysis_jobs import JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+from .config import settings
+from .database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# จำนวน project ต่อหนึ่งงานที่ส่งให้ worker process (ลด overhead ของการ pickle ต่อ project)
+CHUNK_SIZE = 16
+
+
+def analyze_project_diagram(project_id: int, diagram_data: Optional[str]) -> Dict[str, Any]:
+    """parse diagram_data และวิเคราะห์โครงสร้าง คืนแถวสำหรับตาราง batch_analysis_results"""
+    row = {
+        "project_id": project_id,
+        "device_count": 0,
+        "connection_count": 0,
+        "issue_count": 0,
+        "analysis": None,
+        "llm_result": None,
+        "error": None,
+    }
+    try:
+        diagram = fast_json.loads(diagram_data) if diagram_data else {}
+        nodes = diagram.get("nodes") or []
+        edges = diagram.get("edges") or []
+        analysis = analyzer.analyze_network_topology(nodes, edges)
+        analysis.pop("rule_timings_ms", None)
+        row.update(
+            device_count=len(nodes),
+            connection_count=len(edges),
+            issue_count=len(analysis["potential_issues"]),
+            analysis=fast_json.dumps(analysis),
+        )
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def analyze_project_chunk(items: List[Tuple[int, Optional[str]]]) -> List[Dict[str, Any]]:
+    """รันใน worker process (ต้องเป็นฟังก์ชันระดับ module เพื่อให้ pickle ได้)"""
+    return [analyze_project_diagram(project_id, diagram_data) for project_id, diagram_data in items]
+
+
+class BatchAnalysisRunner:
+    """
+    วิเคราะห์โครงสร้างของหลาย project พร้อมกัน (เช่น ทุก project ทุกคืน)
+
+    อ่าน project จากฐานข้อมูลทีละหน้าแบบ keyset (id > last_project_id) โดยโหลดเฉพาะ id และ diagram_data
+    ส่งให้ process pool parse และวิเคราะห์ แล้วเขียนผลทั้งหน้าด้วย executemany ใน transaction เดียว
+    ความคืบหน้าถูกบันทึกทุกหน้า run ที่ค้างตอน process หยุดจะทำต่อจาก project ล่าสุดเมื่อ start ใหม่
+
+    include_llm ส่งผลวิเคราะห์ของแต่ละ project ให้ Ollama ต่อ (ผ่าน admission controller ด้วย priority ต่ำ)
+    """
+
+    def __init__(self, session_factory: sessionmaker, analyzer, workers: int = 0, page_size: int = 200):
+        self._session_factory = session_factory
+        self._analyzer = analyzer
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self.page_size = page_size
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ---- lifecycle ----
+
+    def start(self):
+        """ทำ run ที่ค้างจากรอบก่อนต่อ (เรียกตอน startup ของ API)"""
+        db = self._session_factory()
+        try:
+            pending = db.query(models.BatchAnalysisRun.id).filter(
+                models.BatchAnalysisRun.status.in_((JOB_QUEUED, JOB_RUNNING))
+            ).order_by(models.BatchAnalysisRun.created_at).all()
+        finally:
+            db.close()
+        for row in pending:
+            logger.info(f"Resuming batch analysis run {row.id}")
+            self.launch(row.id)
+
+    async def stop(self):
+        for task in list(self._tasks):
+            task.cancel()
+        for task in list(self._tasks):
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks.clear()
+
+    def create_run(
+        self,
+        db: Session,
+        user_id: Optional[int],
+        include_llm: bool = False,
+        project_ids: Optional[List[int]] = None,
+    ) -> models.BatchAnalysisRun:
+        run = models.BatchAnalysisRun(
+            user_id=user_id,
+            status=JOB_QUEUED,
+            include_llm=include_llm,
+            project_ids=fast_json.dumps(sorted(set(project_ids))) if project_ids else None,
+        )
+        db.add(run)
+        db.commit()
+        db.refresh(run)
+        return run
+
+    def launch(self, run_id: str) -> asyncio.Task:
+        """รัน batch เป็น background task ใน event loop ปัจจุบัน"""
+        task = asyncio.create_task(self.execute(run_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    # ---- การทำงานหลัก ----
+
+    async def execute(self, run_id: str) -> Optional[models.BatchAnalysisRun]:
+        run = self._mark_running(run_id)
+        if run is None:
+            return None
+        started = time.perf_counter()
+        elapsed_before = run["elapsed_seconds"]
+        processed, failed = run["processed_count"], run["failed_count"]
+        after_id = run["last_project_id"]
+
+        executor: Optional[Executor] = ProcessPoolExecutor(max_workers=self.workers) if self.workers > 1 else None
+        try:
+            while True:
+                page = self._fetch_page(run, after_id)
+                if not page:
+                    break
+                rows = await self._analyze_page(executor, page)
+                if run["include_llm"]:
+                    await self._add_llm_results(rows, page, run["user_id"])
+                after_id = page[-1][0]
+                processed += len(rows)
+                failed += sum(1 for row in rows if row["error"])
+                elapsed = elapsed_before + time.perf_counter() - started
+                self._write_page(run_id, rows, {
+                    "processed_count": processed,
+                    "failed_count": failed,
+                    "last_project_id": after_id,
+                    "elapsed_seconds": elapsed,
+                    "diagrams_per_second": processed / elapsed if elapsed > 0 else None,
+                })
+        except asyncio.CancelledError:
+            # หยุดกลางคัน (server shutdown) ให้ start() ทำต่อจากหน้าล่าสุดที่บันทึกแล้ว
+            raise
+        except Exception as e:
+            logger.error(f"Batch analysis run {run_id} failed: {e}")
+            self._finish(run_id, JOB_FAILED, error=str(e))
+            return self._get_run(run_id)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+        self._finish(run_id, JOB_SUCCEEDED)
+        logger.info(
+            f"Batch analysis run {run_id} finished: {processed} diagram(s) "
+            f"in {elapsed_before + time.perf_counter() - started:.2f}s"
+        )
+        return self._get_run(run_id)
+
+    def _mark_running(self, run_id: str) -> Optional[Dict[str, Any]]:
+        db = self._session_factory()
+        try:
+            run = db.get(models.BatchAnalysisRun, run_id)
+            if run is None or run.status not in (JOB_QUEUED, JOB_RUNNING):
+                return None
+            run.status = JOB_RUNNING
+            run.started_at = run.started_at or models.bangkok_now()
+            db.commit()
+            return {
+                "user_id": run.user_id,
+                "include_llm": bool(run.include_llm),
+                "project_ids": fast_json.loads(run.project_ids) if run.project_ids else None,
+                "processed_count": run.processed_count or 0,
+                "failed_count": run.failed_count or 0,
+                "last_project_id": run.last_project_id or 0,
+                "elapsed_seconds": run.elapsed_seconds or 0.0,
+            }
+        finally:
+            db.close()
+
+    def _fetch_page(self, run: Dict[str, Any], after_id: int) -> List[Tuple[int, Optional[str]]]:
+        """project หน้าถัดไปแบบ keyset โหลดเฉพาะคอลัมน์ที่ต้องใช้"""
+        db = self._session_factory()
+        try:
+            query = db.query(models.Project.id, models.Project.diagram_data, models.Project.storage).filter(models.Project.id > after_id)
+            if run["user_id"] is not None:
+                query = query.filter(models.Project.owner_id == run["user_id"])
+            if run["project_ids"]:
+                query = query.filter(models.Project.id.in_(run["project_ids"]))
+            rows = query.order_by(models.Project.id).limit(self.page_size).all()
+            # project ที่เก็บแบบ normalized ประกอบ diagram_data จากตาราง node/edge ทั้งหน้าในสอง query
+            normalized = diagram_store.load_many(
+                db, [project_id for project_id, _, storage in rows if storage == diagram_store.STORAGE_NORMALIZED]
+            )
+            return [(project_id, normalized.get(project_id, diagram_data)) for project_id, diagram_data, _ in rows]
+        finally:
+            db.close()
+
+    async def _analyze_page(self, executor: Optional[Executor], page: List[Tuple[int, Optional[str]]]) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        if executor is None:
+            # worker เดียว: วิเคราะห์ใน thread เพื่อไม่ block event loop
+            return await loop.run_in_executor(None, analyze_project_chunk, page)
+        chunks = [page[i:i + CHUNK_SIZE] for i in range(0, len(page), CHUNK_SIZE)]
+        results = await asyncio.gather(*(loop.run_in_executor(executor, analyze_project_chunk, chunk) for chunk in chunks))
+        return [row for chunk in results for row in chunk]
+
+    async def _add_llm_results(self, rows: List[Dict[str, Any]], page: List[Tuple[int, Optional[str]]], user_id: Optional[int]):
+        diagrams = dict(page)
+
+        async def generate(row):
+            diagram = fast_json.loads(diagrams[row["project_id"]])
+            try:
+                result = await self._analyzer.run_analysis(
+                    nodes=diagram.get("nodes") or [],
+                    edges=diagram.get("edges") or [],
+                    user_id=user_id,
+                    priority=PRIORITY_BACKGROUND,
+                    reject_when_full=False,
+                )
+                row["llm_result"] = result.text
+            except Exception as e:
+                row["error"] = f"LLM: {e}"
+
+        # admission controller จำกัดจำนวนที่เรียก Ollama พร้อมกันอยู่แล้ว
+        await asyncio.gather(*(generate(row) for row in rows if not row["error"] and row["device_count"]))
+
+    def _write_page(self, run_id: str, rows: List[Dict[str, Any]], progress: Dict[str, Any]):
+        """เขียนผลทั้งหน้า (executemany) และความคืบหน้าของ run ใน transaction เดียว"""
+        db = self._session_factory()
+        try:
+            db.execute(insert(models.BatchAnalysisResult), [dict(row, run_id=run_id) for row in rows])
+            db.query(models.BatchAnalysisRun).filter(models.BatchAnalysisRun.id == run_id).update(progress)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _finish(self, run_id: str, status: str, error: Optional[str] = None):
+        db = self._session_factory()
+        try:
+            db.query(models.BatchAnalysisRun).filter(models.BatchAnalysisRun.id == run_id).update({
+                "status": status,
+                "error": error,
+                "finished_at": models.bangkok_now(),
+            })
+            db.commit()
+        finally:
+            db.close()
+
+    def _get_run(self, run_id: str) -> Optional[models.BatchAnalysisRun]:
+        db = self._session_factory()
+        try:
+            return db.get(models.BatchAnalysisRun, run_id)
+        finally:
+            db.close()
+
+# Global instance
+batch_runner = BatchAnalysisRunner(
+    SessionLocal,
+    analyzer,
+    workers=settings.BATCH_ANALYSIS_WORKERS,
+    page_size=settings.BATCH_ANALYSIS_PAGE_SIZE,
+)
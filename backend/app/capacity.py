@@ -0,0 +1,437 @@
+import re
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .topology_graph import TopologyGraph
+
+try:
+    import numpy as np
+except ImportError:  # NumPy เป็น optional ถ้าไม่มีจะใช้ list ของ Python แทน (ผลเหมือนกัน)
+    np = None
+
+INF = float("inf")
+EPSILON = 1e-9
+
+# หน่วยเป็นแบบ SI (1 Kbps = 1000 bps) ตามที่ frontend ใช้ (bps, Kbps, Mbps, Gbps)
+UNIT_PREFIXES = {"": 1.0, "k": 1e3, "m": 1e6, "g": 1e9, "t": 1e12}
+DEFAULT_UNIT = "Mbps"  # หน่วยเริ่มต้นของ PropertiesPanel เมื่อไม่ได้ระบุ
+
+INFRASTRUCTURE_TYPES = {"router", "switch", "firewall"}
+
+_RATE_PATTERN = re.compile(r"^\s*([0-9]+(?:\.[0-9]*)?|\.[0-9]+)\s*([a-zA-Z/]*)\s*$")
+
+
+def unit_multiplier(unit: Optional[str]) -> Optional[float]:
+    """แปลงชื่อหน่วย (bps, Kbps, Mb/s, G, ...) เป็นตัวคูณเป็น bps คืน None ถ้าไม่รู้จัก"""
+    if unit is None:
+        return None
+    text = unit.strip().lower().replace("bit/s", "bps").replace("b/s", "bps")
+    if text.endswith("bps"):
+        text = text[:-3]
+    return UNIT_PREFIXES.get(text)
+
+
+def parse_rate(value: Any, unit: Optional[str] = None) -> Optional[float]:
+    """
+    แปลงค่า bandwidth/throughput เป็น bits per second
+
+    รับได้ทั้งตัวเลข, "1000" + unit="Mbps", หรือข้อความที่มีหน่วยในตัว เช่น "1 Gbps", "1.5Gb/s"
+    หน่วยในข้อความมีผลก่อน unit ที่ส่งมา ถ้าไม่มีหน่วยเลยใช้ Mbps คืน None ถ้าแปลงไม่ได้
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        multiplier = unit_multiplier(unit or DEFAULT_UNIT)
+        return float(value) * multiplier if multiplier is not None and value >= 0 else None
+    return _parse_text_rate(str(value), unit)
+
+
+@lru_cache(maxsize=1024)
+def _parse_text_rate(text: str, unit: Optional[str]) -> Optional[float]:
+    # แผนผังหนึ่งมีค่า bandwidth ซ้ำกันไม่กี่แบบ cache ไว้เพื่อไม่ต้องรัน regex ทุกสาย
+    match = _RATE_PATTERN.match(text)
+    if not match:
+        return None
+    multiplier = unit_multiplier(match.group(2) or unit or DEFAULT_UNIT)
+    if multiplier is None:
+        return None
+    return float(match.group(1)) * multiplier
+
+
+def format_rate(bps: float) -> str:
+    """แสดงค่า bps ในหน่วยที่อ่านง่าย เช่น 1.25 Gbps"""
+    if bps == INF:
+        return "ไม่จำกัด"
+    for prefix, multiplier in (("T", 1e12), ("G", 1e9), ("M", 1e6), ("K", 1e3)):
+        if bps >= multiplier:
+            return f"{bps / multiplier:.3g} {prefix}bps"
+    return f"{bps:.3g} bps"
+
+
+def link_capacity(edge: Dict[str, Any]) -> Optional[float]:
+    """capacity ของสาย จาก data.bandwidth + bandwidthUnit หรือ label เช่น "1 Gbps" (diagram เก่า)"""
+    data = edge.get("data") or {}
+    rate = parse_rate(data.get("bandwidth"), data.get("bandwidthUnit"))
+    if rate is None and data.get("label"):
+        rate = parse_rate(data.get("label"))
+    return rate
+
+
+def device_capacity(node: Dict[str, Any]) -> Optional[float]:
+    data = node.get("data") or {}
+    return parse_rate(data.get("maxThroughput"), data.get("throughputUnit"))
+
+
+def device_users(node: Dict[str, Any]) -> int:
+    """จำนวนผู้ใช้ของอุปกรณ์ปลายทาง (userCapacity ของ PC) ค่าเริ่มต้น 1"""
+    value = (node.get("data") or {}).get("userCapacity")
+    if value is None or value == "":
+        return 1
+    try:
+        users = int(value)
+    except (TypeError, ValueError):
+        return 1
+    return max(users, 0)
+
+
+def is_core(node: Dict[str, Any]) -> bool:
+    return str((node.get("data") or {}).get("deviceRole", "")).lower() == "core"
+
+
+def core_device_indices(nodes: Sequence[Dict[str, Any]]) -> List[int]:
+    """ต้นทางของ demand: อุปกรณ์ที่ deviceRole เป็น Core ถ้าไม่มีใช้ router แล้วจึง firewall"""
+    core = [i for i, node in enumerate(nodes) if is_core(node)]
+    if core:
+        return core
+    for device_type in ("router", "firewall"):
+        matches = [i for i, node in enumerate(nodes) if node.get("type", "unknown") == device_type]
+        if matches:
+            return matches
+    return []
+
+
+def utilization(load: float, capacity: float) -> float:
+    """สัดส่วน load ต่อ capacity (INF ถ้า capacity เป็น 0 เช่นสายที่ตั้ง bandwidth เป็น 0 แต่มี demand ผ่าน)"""
+    return load / capacity if capacity > 0 else INF
+
+
+def _rounded_utilization(load: float, capacity: float) -> Optional[float]:
+    value = utilization(load, capacity)
+    return round(value, 2) if value < INF else None
+
+
+def _to_list(values) -> List[float]:
+    return values.tolist() if np is not None and isinstance(values, np.ndarray) else list(values)
+
+
+class CapacityAnalyzer:
+    """
+    วิเคราะห์ capacity ของเครือข่ายจาก TopologyGraph
+
+    - demand: อุปกรณ์ปลายทางแต่ละตัวใช้ userCapacity × per_user_bps
+    - load ต่อสาย: ไล่ demand ขึ้นจากอุปกรณ์ปลายทางไปหา Core ตามลำดับชั้น (BFS จาก Core)
+      โดยแบ่ง demand เท่า ๆ กันให้ uplink ทุกเส้น (เหมือน ECMP) แล้วเทียบกับ bandwidth ของสาย
+    - max-flow / min-cut (Dinic) จาก Core ไปยังอุปกรณ์ปลายทาง โดยคิด throughput ของอุปกรณ์ด้วย
+      บอกว่าเครือข่ายรองรับ demand ได้กี่เปอร์เซ็นต์ และสาย/อุปกรณ์ใดเป็นคอขวด
+
+    capacity, demand และ load เก็บเป็น vector (NumPy ถ้ามี) index ตรงกับ edge/อุปกรณ์ภายในของ TopologyGraph
+    """
+
+    def __init__(self, graph: TopologyGraph, per_user_bps: float, max_flow_nodes: Optional[int] = None):
+        self.graph = graph
+        self.per_user_bps = per_user_bps
+        self.max_flow_nodes = max_flow_nodes
+        n = graph.node_count
+
+        capacities = [link_capacity(graph.edge_data(e)) for e in range(graph.edge_count)]
+        self.links_without_bandwidth = sum(1 for rate in capacities if rate is None)
+        self.link_capacity = self._vector([INF if rate is None else rate for rate in capacities])
+
+        self.infrastructure = [graph.node_type(i) in INFRASTRUCTURE_TYPES for i in range(n)]
+        device_capacities, demand = [], []
+        for i, node in enumerate(graph.nodes):
+            if self.infrastructure[i]:
+                rate = device_capacity(node)
+                device_capacities.append(INF if rate is None else rate)
+                demand.append(0.0)
+            else:
+                device_capacities.append(INF)
+                demand.append(device_users(node) * per_user_bps)
+        self.device_capacity = self._vector(device_capacities)
+        self.demand = self._vector(demand)
+
+        self.sources = core_device_indices(graph.nodes)
+        self.levels = self._levels(self.sources)
+
+    @staticmethod
+    def _vector(values: List[float]):
+        return np.array(values, dtype=np.float64) if np is not None else values
+
+    # ---- ลำดับชั้น ----
+
+    def _levels(self, sources: Sequence[int]) -> List[int]:
+        """ระยะห่าง (จำนวน hop) จาก Core ที่ใกล้ที่สุด -1 = ไปไม่ถึง"""
+        graph = self.graph
+        level = [-1] * graph.node_count
+        queue = deque(sources)
+        for source in sources:
+            level[source] = 0
+        adjacency, ends_xor = graph.adjacency, graph.ends_xor
+        while queue:
+            u = queue.popleft()
+            next_level = level[u] + 1
+            for e in adjacency[u]:
+                v = ends_xor[e] ^ u
+                if level[v] == -1:
+                    level[v] = next_level
+                    queue.append(v)
+        return level
+
+    # ---- load ต่อสาย ----
+
+    def link_loads(self) -> Tuple[Any, Any]:
+        """คืน (load ต่อสาย, demand รวมที่ผ่านอุปกรณ์แต่ละตัว) เป็น bps"""
+        if np is not None:
+            return self._link_loads_numpy()
+        return self._link_loads_python()
+
+    def _link_loads_numpy(self):
+        graph = self.graph
+        n, m = graph.node_count, graph.edge_count
+        level = np.asarray(self.levels, dtype=np.int64)
+        source = np.asarray(graph.edge_source, dtype=np.int64)
+        target = np.asarray(graph.edge_target, dtype=np.int64)
+        source_level, target_level = level[source], level[target]
+        source_is_child = (source_level == target_level + 1) & (target_level >= 0)
+        target_is_child = (target_level == source_level + 1) & (source_level >= 0)
+
+        uplinks = np.concatenate([np.flatnonzero(source_is_child), np.flatnonzero(target_is_child)])
+        child = np.concatenate([source[source_is_child], target[target_is_child]])
+        parent = np.concatenate([target[source_is_child], source[target_is_child]])
+        uplink_count = np.bincount(child, minlength=n)
+
+        # ประมวลผลทีละชั้นจากชั้นล่างสุดขึ้นไป demand ของชั้นล่างต้องรวมเสร็จก่อนส่งต่อขึ้นไป
+        order = np.argsort(-level[child], kind="stable")
+        uplinks, child, parent = uplinks[order], child[order], parent[order]
+        child_level = level[child]
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(child_level)) + 1])
+        ends = np.concatenate([starts[1:], [len(child)]])
+
+        aggregate = np.where(level >= 0, self.demand, 0.0)
+        load = np.zeros(m, dtype=np.float64)
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            children = child[start:end]
+            share = aggregate[children] / uplink_count[children]
+            load[uplinks[start:end]] = share
+            np.add.at(aggregate, parent[start:end], share)
+        return load, aggregate
+
+    def _link_loads_python(self):
+        graph = self.graph
+        level = self.levels
+        uplinks = []
+        uplink_count = [0] * graph.node_count
+        for e, (a, b) in enumerate(zip(graph.edge_source, graph.edge_target)):
+            if level[a] < 0 or level[b] < 0:
+                continue
+            if level[a] == level[b] + 1:
+                uplinks.append((level[a], e, a, b))
+                uplink_count[a] += 1
+            elif level[b] == level[a] + 1:
+                uplinks.append((level[b], e, b, a))
+                uplink_count[b] += 1
+        uplinks.sort(key=lambda uplink: -uplink[0])
+
+        aggregate = [d if lv >= 0 else 0.0 for d, lv in zip(self.demand, level)]
+        load = [0.0] * graph.edge_count
+        for _, e, child, parent in uplinks:
+            share = aggregate[child] / uplink_count[child]
+            load[e] = share
+            aggregate[parent] += share
+        return load, aggregate
+
+    # ---- max-flow / min-cut ----
+
+    def max_flow(self) -> Tuple[float, List[Tuple[str, int]]]:
+        """
+        Dinic จาก Core (super source) ไปยังอุปกรณ์ปลายทาง (super sink, capacity = demand)
+
+        อุปกรณ์ที่มี maxThroughput ถูกแยกเป็น in/out เพื่อคิด capacity ของอุปกรณ์ด้วย
+        คืน (flow สูงสุด, min-cut เป็น list ของ ("link", e) / ("device", i))
+        """
+        graph = self.graph
+        n = graph.node_count
+        level = self.levels
+        device_capacity = _to_list(self.device_capacity)
+        link_capacity = _to_list(self.link_capacity)
+        demand = _to_list(self.demand)
+
+        node_out = list(range(n))
+        size = n
+        for i in range(n):
+            if level[i] >= 0 and device_capacity[i] < INF:
+                node_out[i] = size
+                size += 1
+        source, sink = size, size + 1
+        size += 2
+
+        head = [-1] * size
+        nxt: List[int] = []
+        to: List[int] = []
+        cap: List[float] = []
+        tags: List[Optional[Tuple[str, int]]] = []  # ต่อคู่ arc (forward = 2k, reverse = 2k+1)
+
+        def add_arc(u: int, v: int, capacity: float, tag: Optional[Tuple[str, int]]):
+            for a, b, c in ((u, v, capacity), (v, u, 0.0)):
+                to.append(b)
+                cap.append(c)
+                nxt.append(head[a])
+                head[a] = len(to) - 1
+            tags.append(tag)
+
+        for i in range(n):
+            if node_out[i] != i:
+                add_arc(i, node_out[i], device_capacity[i], ("device", i))
+        for i in self.sources:
+            add_arc(source, i, INF, None)
+        for e, (a, b) in enumerate(zip(graph.edge_source, graph.edge_target)):
+            if level[a] < 0 or level[b] < 0:
+                continue
+            add_arc(node_out[a], b, link_capacity[e], ("link", e))
+            add_arc(node_out[b], a, link_capacity[e], ("link", e))
+        for i in range(n):
+            if level[i] >= 0 and demand[i] > 0:
+                add_arc(node_out[i], sink, demand[i], None)
+
+        flow = 0.0
+        while True:
+            depth = [-1] * size
+            depth[source] = 0
+            queue = deque([source])
+            while queue:
+                u = queue.popleft()
+                a = head[u]
+                while a != -1:
+                    if cap[a] > EPSILON and depth[to[a]] < 0:
+                        depth[to[a]] = depth[u] + 1
+                        queue.append(to[a])
+                    a = nxt[a]
+            if depth[sink] < 0:
+                break
+            flow += self._blocking_flow(source, sink, head, nxt, to, cap, depth)
+
+        # min-cut: arc ที่ออกจากฝั่งที่ source ยังไปถึงได้ใน residual graph ไปยังฝั่งที่ไปไม่ถึง
+        cut = []
+        seen = set()
+        for k, tag in enumerate(tags):
+            a = 2 * k
+            if tag is None or tag in seen:
+                continue
+            if depth[to[a + 1]] >= 0 and depth[to[a]] < 0:
+                seen.add(tag)
+                cut.append(tag)
+        return flow, cut
+
+    @staticmethod
+    def _blocking_flow(source, sink, head, nxt, to, cap, depth) -> float:
+        """หา augmenting path ซ้ำใน level graph แบบ iterative (ไม่ใช้ recursion)"""
+        pointer = head[:]
+        total = 0.0
+        while True:
+            path: List[int] = []
+            u = source
+            while u != sink:
+                a = pointer[u]
+                while a != -1 and not (cap[a] > EPSILON and depth[to[a]] == depth[u] + 1):
+                    a = nxt[a]
+                pointer[u] = a
+                if a != -1:
+                    path.append(a)
+                    u = to[a]
+                    continue
+                if u == source:
+                    return total
+                # ทางตัน ตัด node นี้ออกจาก level graph แล้วถอยกลับ
+                depth[u] = -1
+                u = to[path.pop() ^ 1]
+            bottleneck = min(cap[a] for a in path)
+            for a in path:
+                cap[a] -= bottleneck
+                cap[a ^ 1] += bottleneck
+            total += bottleneck
+
+    # ---- สรุปผล ----
+
+    def analyze(self, sample_limit: int = 10) -> Optional[Dict[str, Any]]:
+        """ผลการวิเคราะห์ capacity หรือ None ถ้าไม่มี Core/router หรือไม่มี demand"""
+        if not self.sources:
+            return None
+        graph = self.graph
+        level = self.levels
+        demand = _to_list(self.demand)
+        total_demand = sum(d for d, lv in zip(demand, level) if lv >= 0)
+        if total_demand <= 0:
+            return None
+
+        load, aggregate = self.link_loads()
+        if np is not None:
+            overloaded_links = np.flatnonzero(load > self.link_capacity * (1 + EPSILON)).tolist()
+            infrastructure = np.asarray(self.infrastructure, dtype=bool)
+            overloaded_devices = np.flatnonzero(
+                infrastructure & (aggregate > self.device_capacity * (1 + EPSILON))
+            ).tolist()
+        else:
+            overloaded_links = [
+                e for e, (l, c) in enumerate(zip(load, self.link_capacity)) if l > c * (1 + EPSILON)
+            ]
+            overloaded_devices = [
+                i for i, (a, c) in enumerate(zip(aggregate, self.device_capacity))
+                if self.infrastructure[i] and a > c * (1 + EPSILON)
+            ]
+        load, aggregate = _to_list(load), _to_list(aggregate)
+        link_capacity, device_capacity = _to_list(self.link_capacity), _to_list(self.device_capacity)
+        # สายที่เกินมากที่สุดก่อน
+        overloaded_links.sort(key=lambda e: utilization(load[e], link_capacity[e]), reverse=True)
+        overloaded_devices.sort(key=lambda i: utilization(aggregate[i], device_capacity[i]), reverse=True)
+
+        result: Dict[str, Any] = {
+            "engine": "numpy" if np is not None else "python",
+            "per_user": format_rate(self.per_user_bps),
+            "total_demand": format_rate(total_demand),
+            "total_demand_bps": total_demand,
+            "links_without_bandwidth": self.links_without_bandwidth,
+            "overloaded_link_count": len(overloaded_links),
+            "overloaded_links": [
+                {
+                    "link": graph.edge_label(e),
+                    "capacity": format_rate(link_capacity[e]),
+                    "demand": format_rate(load[e]),
+                    "utilization": _rounded_utilization(load[e], link_capacity[e]),
+                }
+                for e in overloaded_links[:sample_limit]
+            ],
+            "overloaded_device_count": len(overloaded_devices),
+            "overloaded_devices": [
+                {
+                    "device": graph.label(i),
+                    "capacity": format_rate(device_capacity[i]),
+                    "demand": format_rate(aggregate[i]),
+                    "utilization": _rounded_utilization(aggregate[i], device_capacity[i]),
+                }
+                for i in overloaded_devices[:sample_limit]
+            ],
+        }
+
+        if self.max_flow_nodes is None or graph.node_count <= self.max_flow_nodes:
+            flow, cut = self.max_flow()
+            result["deliverable"] = format_rate(flow)
+            result["deliverable_bps"] = flow
+            result["satisfied_percent"] = round(min(flow / total_demand, 1.0) * 100, 1)
+            if flow < total_demand * (1 - 1e-6):
+                result["bottlenecks"] = [
+                    graph.edge_label(index) if kind == "link" else graph.label(index)
+                    for kind, index in cut[:sample_limit]
+                ]
+                result["bottleneck_count"] = len(cut)
+        return result
@@ -12,6 +12,41 @@ class Settings(BaseSettings):
     # OLLAMA_MODEL: str = "llama3.2"
     OLLAMA_MODEL: str = "deepseek-r1:14b"   # ใช้ model เดียวกับโปรเจคเก่า
     OLLAMA_TIMEOUT: int = 600  # 10 minutes timeout
+    # Connection pool ของ ClientSession ที่ใช้ร่วมกันทั้ง process
+    OLLAMA_POOL_LIMIT: int = 100  # จำนวน connection สูงสุดทั้งหมด
+    OLLAMA_POOL_LIMIT_PER_HOST: int = 20  # จำนวน connection สูงสุดต่อ host
+    OLLAMA_KEEPALIVE_TIMEOUT: float = 30.0  # วินาทีที่เก็บ idle connection ไว้ใช้ซ้ำ
+    OLLAMA_DNS_CACHE_TTL: int = 300  # วินาทีที่ cache ผล DNS lookup
+    # Health monitor และ circuit breaker
+    OLLAMA_HEALTH_INTERVAL: float = 30.0  # วินาทีระหว่าง health probe แต่ละครั้ง
+    OLLAMA_HEALTH_TIMEOUT: float = 5.0  # timeout ของ health probe
+    OLLAMA_CIRCUIT_FAILURE_THRESHOLD: int = 3  # ล้มเหลวติดกันกี่ครั้งจึงเปิด circuit
+    OLLAMA_CIRCUIT_RESET_TIMEOUT: float = 30.0  # วินาทีก่อนลองส่ง request ใหม่หลัง circuit เปิด
+    OLLAMA_MODELS_CACHE_TTL: float = 60.0  # วินาทีที่ cache รายการ models
+    # Admission control หน้า Ollama
+    OLLAMA_MAX_CONCURRENCY: int = 2  # จำนวน generation ที่ส่งไป Ollama พร้อมกันสูงสุด
+    OLLAMA_MAX_QUEUE_DEPTH: int = 20  # จำนวน request ที่รอคิวได้ทั้งหมด เกินนี้ตอบ 429
+    OLLAMA_MAX_QUEUE_PER_USER: int = 3  # จำนวน request ที่รอคิวได้ต่อผู้ใช้
+    OLLAMA_MIN_RETRY_AFTER: int = 5  # ค่า Retry-After ขั้นต่ำ (วินาที)
+    PROMPT_TOPOLOGY_FORMAT: str = "compact"  # "compact" (ตารางกระชับ) หรือ "json" (รูปแบบเดิม)
+    # Response cache ของผลวิเคราะห์ (key = hash ของแผนผัง คำถาม model และ prompt template)
+    ANALYSIS_CACHE_ENABLED: bool = True
+    ANALYSIS_CACHE_MAX_ENTRIES: int = 256
+    ANALYSIS_CACHE_TTL: float = 86400.0  # วินาที
+    ANALYSIS_CACHE_DB_PATH: str = ""  # ไฟล์ SQLite สำหรับ cache ถาวร (ว่าง = เก็บใน memory อย่างเดียว)
+    ANALYSIS_JOB_WORKERS: int = 2  # จำนวน worker ที่รันงานวิเคราะห์แบบ job พร้อมกัน
+    ANALYSIS_SEARCH_RANK_WINDOW: int = 500  # ค้นหาประวัติการวิเคราะห์: จัดอันดับเฉพาะผลที่ตรงล่าสุดกี่รายการ
+    # การวิเคราะห์ capacity
+    CAPACITY_PER_USER_MBPS: float = 10.0  # ปริมาณการใช้งานต่อผู้ใช้ที่ใช้ประมาณ demand ของอุปกรณ์ปลายทาง
+    CAPACITY_MAXFLOW_MAX_NODES: int = 200000  # แผนผังที่ใหญ่กว่านี้คำนวณเฉพาะ load ต่อสาย ไม่คำนวณ max-flow
+    TOPOLOGY_STATE_MAX_PROJECTS: int = 64  # จำนวน project ที่เก็บ state การวิเคราะห์แบบ incremental ไว้ใน memory
+    BATCH_ANALYSIS_WORKERS: int = 0  # จำนวน process ที่วิเคราะห์ batch พร้อมกัน (0 = จำนวน CPU, 1 = ไม่ใช้ process pool)
+    BATCH_ANALYSIS_PAGE_SIZE: int = 200  # จำนวน project ที่อ่านจากฐานข้อมูลและเขียนผลต่อรอบ
+    # การเก็บ Project.diagram_data
+    DIAGRAM_COMPRESSION: str = "zlib"  # "zstd" (ต้องติดตั้ง zstandard), "zlib" หรือ "none"
+    DIAGRAM_COMPRESSION_MIN_BYTES: int = 512  # แผนผังที่เล็กกว่านี้เก็บโดยไม่บีบอัด
+    DIAGRAM_STORAGE: str = "blob"  # "blob" (JSON ก้อนเดียวใน diagram_data) หรือ "normalized" (ตาราง diagram_nodes/diagram_edges)
+    DIAGRAM_SNAPSHOT_INTERVAL: int = 20  # ประวัติแผนผัง: เก็บ snapshot เต็มทุก ๆ กี่ revision (ระหว่างนั้นเก็บ delta)
     # OLLAMA_MODEL: str = "mistral:latest" 
     class Config:
         env_file = ".env"
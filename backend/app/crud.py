@@ -1,6 +1,8 @@
-from sqlalchemy.orm import Session
-from . import models, schemas
-from typing import List, Optional
+from sqlalchemy.orm import Session, defer
+from . import models, schemas, fast_json, diagram_patch, diagram_store, device_search, project_revisions, analysis_cache
+from typing import Any, Callable, Dict, List, Optional
+import hashlib
+import json
 
 # User CRUD
 def create_user(db: Session, user: schemas.UserCreate):
@@ -34,45 +36,277 @@ def update_user_password(db: Session, user_id: int, new_password: str):
     return db_user
 
 # Project CRUD
+def diagram_summary(diagram_data: Optional[str], document: Any = None) -> Dict[str, int]:
+    """จำนวน node/edge และขนาดของ diagram_data (เก็บคู่กับ project ตอนบันทึก) ส่ง document ที่ parse แล้วมาได้"""
+    if not diagram_data:
+        return {"node_count": 0, "edge_count": 0, "diagram_size": 0}
+    try:
+        diagram = fast_json.loads(diagram_data) if document is None else document
+        node_count, edge_count = len(diagram.get("nodes") or []), len(diagram.get("edges") or [])
+    except (ValueError, AttributeError, TypeError):
+        node_count = edge_count = 0  # API รับ diagram_data เป็น string ใด ๆ ก็ได้
+    return {"node_count": node_count, "edge_count": edge_count, "diagram_size": len(diagram_data.encode("utf-8"))}
+
+def project_content_hash(name: Optional[str], description: Optional[str], diagram_data: Optional[str]) -> str:
+    """hash ของเนื้อหาที่ผู้ใช้แก้ไขได้ (ไม่รวมตัวนับการวิเคราะห์) ใช้เป็น ETag ของ project"""
+    return hashlib.sha256(fast_json.dumps_bytes([name, description, diagram_data])).hexdigest()
+
+class ProjectConflictError(Exception):
+    """project ถูกแก้ไขไปแล้ว (content_hash ไม่ตรงกับที่ client ส่งมาใน If-Match)"""
+
+    def __init__(self, current_hash: Optional[str]):
+        super().__init__("Project has been modified")
+        self.current_hash = current_hash
+
 def create_project(db: Session, project: schemas.ProjectCreate, owner_id: int):
+    document = project_revisions.parse_document(project.diagram_data) if project.diagram_data else None
+    normalized = diagram_store.prepare(project.diagram_data, document)
+    diagram_data = normalized["diagram_data"] if normalized else project.diagram_data
     db_project = models.Project(
-        **project.dict(),
+        **project.dict(exclude={"diagram_data"}),
+        diagram_data=None if normalized else diagram_data,
+        storage=diagram_store.STORAGE_NORMALIZED if normalized else diagram_store.STORAGE_BLOB,
+        **diagram_summary(diagram_data, document),
+        content_hash=project_content_hash(project.name, project.description, diagram_data),
         owner_id=owner_id
     )
     db.add(db_project)
+    db.flush()
+    if normalized:
+        diagram_store.write(db, db_project.id, document, normalized["serialized"])
+    diagram_store.attach(db, db_project, diagram_data)
+    device_search.index_project(db, db_project.id, owner_id, document)
+    project_revisions.record_initial_revision(db, db_project)
     db.commit()
     db.refresh(db_project)
-    return db_project
+    return diagram_store.attach(db, db_project, diagram_data)
 
-def get_user_projects(db: Session, owner_id: int, skip: int = 0, limit: int = 100):
-    return db.query(models.Project).filter(
-        models.Project.owner_id == owner_id
-    ).offset(skip).limit(limit).all()
+def get_user_project_summaries(db: Session, owner_id: int, after_id: int = 0, limit: int = 100):
+    """รายการ project แบบ keyset (id > after_id) โดยไม่โหลด diagram_data"""
+    return db.query(models.Project).options(defer(models.Project.diagram_data)).filter(
+        models.Project.owner_id == owner_id,
+        models.Project.id > after_id
+    ).order_by(models.Project.id).limit(limit).all()
 
-def get_project(db: Session, project_id: int, owner_id: int):
-    return db.query(models.Project).filter(
+def get_project(db: Session, project_id: int, owner_id: int, with_diagram: bool = True):
+    """project พร้อม diagram_data (ประกอบจากตาราง node/edge ถ้าเก็บแบบ normalized) with_diagram=False ไม่โหลดแผนผัง"""
+    query = db.query(models.Project)
+    if not with_diagram:
+        query = query.options(defer(models.Project.diagram_data))
+    db_project = query.filter(
         models.Project.id == project_id,
         models.Project.owner_id == owner_id
     ).first()
+    if db_project is not None and with_diagram:
+        diagram_store.attach(db, db_project)
+    return db_project
 
-def update_project(db: Session, project_id: int, project_update: schemas.ProjectUpdate, owner_id: int):
-    db_project = get_project(db, project_id, owner_id)
-    if not db_project:
-        return None
+def owns_project(db: Session, project_id: int, owner_id: int) -> bool:
+    """ตรวจสิทธิ์โดยไม่โหลด project (diagram_data)"""
+    return db.query(models.Project.id).filter(
+        models.Project.id == project_id,
+        models.Project.owner_id == owner_id
+    ).first() is not None
+
+def _ensure_content_hash(db: Session, db_project: models.Project):
+    if db_project.content_hash is None:
+        # แถวเดิมก่อนมี content_hash (ดู migrate_add_project_content_hash.py)
+        db_project.content_hash = project_content_hash(db_project.name, db_project.description, db_project.diagram_data)
+        db.commit()
+
+def _save_project(
+    db: Session,
+    db_project: models.Project,
+    update_data: Dict[str, Any],
+    expected_hash: Optional[str],
+    document: Any = None,
+):
+    """
+    เขียน update_data พร้อมสรุปและ content_hash ใหม่ ถ้ามี expected_hash จะเขียนเฉพาะเมื่อ hash ในฐานข้อมูลยังตรง
+    แผนผังที่เปลี่ยนถูกเก็บเป็น revision ใหม่ใน transaction เดียวกัน (document = diagram_data ที่ parse แล้ว ถ้ามี)
+    """
+    previous_data, previous_storage = db_project.diagram_data, db_project.storage
+    normalized = None
+    if "diagram_data" in update_data:
+        if document is None and update_data["diagram_data"]:
+            document = project_revisions.parse_document(update_data["diagram_data"])
+        normalized = diagram_store.prepare(update_data["diagram_data"], document)
+        if normalized:
+            update_data["diagram_data"] = normalized["diagram_data"]
+        storage = diagram_store.STORAGE_NORMALIZED if normalized else diagram_store.STORAGE_BLOB
+        if update_data["diagram_data"] == previous_data and storage == previous_storage:
+            for key in ("diagram_data", "node_count", "edge_count", "diagram_size"):
+                update_data.pop(key, None)  # แผนผังไม่เปลี่ยน ไม่ต้องเขียนใหม่
+    diagram_changed = "diagram_data" in update_data
+    if diagram_changed and "diagram_size" not in update_data:
+        update_data.update(diagram_summary(update_data["diagram_data"], document))
+    diagram_data = update_data.get("diagram_data", previous_data)
+    update_data["content_hash"] = project_content_hash(
+        update_data.get("name", db_project.name),
+        update_data.get("description", db_project.description),
+        diagram_data,
+    )
     
-    update_data = project_update.dict(exclude_unset=True)
-    for field, value in update_data.items():
-        setattr(db_project, field, value)
+    values = dict(update_data)
+    if diagram_changed:
+        values["storage"] = storage
+        if normalized:
+            values["diagram_data"] = None  # แผนผังอยู่ใน diagram_nodes/diagram_edges
+    if expected_hash is None:
+        for field, value in values.items():
+            setattr(db_project, field, value)
+    else:
+        updated = db.query(models.Project).filter(
+            models.Project.id == db_project.id,
+            models.Project.content_hash == expected_hash
+        ).update(values, synchronize_session=False)
+        if not updated:
+            db.rollback()
+            db.refresh(db_project)
+            raise ProjectConflictError(db_project.content_hash)
     
+    if diagram_changed:
+        if normalized:
+            diagram_store.write(db, db_project.id, document, normalized["serialized"])
+        elif previous_storage == diagram_store.STORAGE_NORMALIZED:
+            diagram_store.clear(db, db_project.id)
+        device_search.index_project(db, db_project.id, db_project.owner_id, document)
+        project_revisions.record_revision(
+            db,
+            db_project,
+            previous_data=previous_data,
+            diagram_data=update_data["diagram_data"],
+            summary={key: update_data[key] for key in ("node_count", "edge_count", "diagram_size")},
+            content_hash=update_data["content_hash"],
+            document=document,
+        )
     db.commit()
     db.refresh(db_project)
-    return db_project
+    return diagram_store.attach(db, db_project, diagram_data)
 
-def delete_project(db: Session, project_id: int, owner_id: int):
+def update_project(
+    db: Session,
+    project_id: int,
+    project_update: schemas.ProjectUpdate,
+    owner_id: int,
+    expected_hash: Optional[str] = None,
+):
+    """
+    แก้ไข project และคำนวณ content_hash ใหม่
+
+    expected_hash (จาก If-Match) ทำให้ UPDATE มีเงื่อนไข content_hash = expected_hash
+    ถ้ามีการบันทึกอื่นเกิดขึ้นก่อน (เช่น อีกแท็บ) จะ raise ProjectConflictError แทนการเขียนทับ
+    """
     db_project = get_project(db, project_id, owner_id)
+    if not db_project:
+        return None
+    _ensure_content_hash(db, db_project)
+    if expected_hash is not None and db_project.content_hash != expected_hash:
+        raise ProjectConflictError(db_project.content_hash)
+    return _save_project(db, db_project, project_update.dict(exclude_unset=True), expected_hash)
+
+# จำนวนครั้งที่ลองใช้ patch ใหม่เมื่อมีการบันทึกอื่นแทรกระหว่างอ่านและเขียน (กรณีไม่ได้ส่ง If-Match)
+PATCH_RETRIES = 3
+
+def patch_project_diagram(
+    db: Session,
+    project_id: int,
+    owner_id: int,
+    apply_patch: Callable[[Any], Any],
+    expected_hash: Optional[str] = None,
+):
+    """
+    ใช้ delta กับ diagram_data ที่เก็บไว้ (apply_patch รับเอกสารที่ parse แล้ว คืนเอกสารใหม่)
+
+    การเขียนมีเงื่อนไขว่า content_hash ยังเป็นค่าที่อ่านมาเสมอ patch จึงไม่ทับการบันทึกที่แทรกเข้ามา
+    ถ้าไม่ได้ส่ง expected_hash จะอ่านใหม่และใช้ patch ซ้ำ (สูงสุด PATCH_RETRIES ครั้ง)
+    error ของ patch (diagram_patch.PatchError) ส่งต่อให้ผู้เรียก
+    """
+    for _ in range(PATCH_RETRIES):
+        db_project = get_project(db, project_id, owner_id)
+        if not db_project:
+            return None
+        _ensure_content_hash(db, db_project)
+        if expected_hash is not None and db_project.content_hash != expected_hash:
+            raise ProjectConflictError(db_project.content_hash)
+        # JSON Patch แทนที่ /nodes หรือทั้งเอกสารได้ ตรวจรูปแบบผลลัพธ์ก่อนบันทึก
+        document = diagram_patch.validate_document(apply_patch(diagram_patch.load_document(db_project.diagram_data)))
+        diagram_data = fast_json.dumps(document)
+        update_data = {"diagram_data": diagram_data, **diagram_summary(diagram_data, document)}
+        try:
+            return _save_project(db, db_project, update_data, db_project.content_hash, document)
+        except ProjectConflictError:
+            if expected_hash is not None:
+                raise
+    raise ProjectConflictError(db_project.content_hash)
+
+def delete_project(db: Session, project_id: int, owner_id: int):
+    db_project = get_project(db, project_id, owner_id, with_diagram=False)
     if not db_project:
         return False
     
+    # SQLite ไม่บังคับ ON DELETE CASCADE ลบ revision, node/edge และดัชนีค้นหาด้วย bulk DELETE แทนการโหลดทีละแถว
+    diagram_store.clear(db, project_id)
+    device_search.remove_project(db, project_id)
+    db.query(models.AIAnalysisHistory).filter(models.AIAnalysisHistory.project_id == project_id).update(
+        {"revision_id": None}, synchronize_session=False
+    )
+    db.query(models.ProjectRevision).filter(models.ProjectRevision.project_id == project_id).delete(synchronize_session=False)
     db.delete(db_project)
     db.commit()
-    return True 
\ No newline at end of file
+    return True
+
+# AI Analysis History CRUD
+def create_analysis_history(
+    db: Session,
+    user_id: int,
+    project_id: Optional[int],
+    model_used: str,
+    nodes: List[Dict[str, Any]],
+    analysis_result: str,
+    execution_time_seconds: Optional[int] = None,
+    time_to_first_token_ms: Optional[int] = None,
+    is_cached: bool = False,
+    edges: Optional[List[Dict[str, Any]]] = None
+):
+    """
+    บันทึกประวัติการวิเคราะห์ และอัปเดตตัวนับของ user และ project
+    ถ้าส่ง edges มาด้วย จะเชื่อมกับ revision ล่าสุดของ project ที่มีแผนผังตรงกับที่วิเคราะห์ (revision_id)
+    """
+    # สร้าง device types summary
+    device_types = {}
+    for node in nodes:
+        device_type = node.get("type", "unknown")
+        device_types[device_type] = device_types.get(device_type, 0) + 1
+    
+    analysis_history = models.AIAnalysisHistory(
+        user_id=user_id,
+        project_id=project_id,
+        model_used=model_used,
+        device_count=len(nodes),
+        device_types=json.dumps(device_types, ensure_ascii=False),
+        analysis_result=analysis_result,
+        execution_time_seconds=execution_time_seconds,
+        time_to_first_token_ms=time_to_first_token_ms,
+        is_cached=is_cached
+    )
+    db.add(analysis_history)
+    
+    # อัปเดต user total_analyses
+    db.query(models.User).filter(models.User.id == user_id).update({
+        "total_analyses": models.User.total_analyses + 1
+    })
+    
+    # อัปเดต project analysis_count และ last_analysis_at ถ้ามี project_id
+    if project_id:
+        project = get_project(db, project_id, user_id, with_diagram=False)
+        if project:
+            project.analysis_count += 1
+            project.last_analysis_at = models.bangkok_now()
+            if edges is not None:
+                revision = project_revisions.revision_for_topology(db, project_id, analysis_cache.topology_hash(nodes, edges))
+                analysis_history.revision_id = revision.id if revision else None
+    
+    db.commit()
+    db.refresh(analysis_history)
+    return analysis_history 
\ No newline at end of file
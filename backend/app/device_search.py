@@ -0,0 +1,167 @@
+"""
+ดัชนีค้นหาอุปกรณ์ข้ามโปรเจกต์ด้วย SQLite FTS5 (ตาราง device_search)
+
+หนึ่งแถวต่อ node: label, ชนิดอุปกรณ์, role และ attributes อื่นใน data (เช่น IP, throughput) เป็นข้อความ
+อัปเดตใน transaction เดียวกับการสร้าง/แก้ไข/ลบ project (crud) การค้นหาจึงไม่ต้องโหลดหรือ parse diagram_data
+
+rowid = project_id * ROWID_STRIDE + ลำดับของ node การลบแถวของ project ทั้งหมดจึงเป็นช่วงของ rowid
+(คอลัมน์ UNINDEXED ของ FTS5 ไม่มี index การ DELETE ด้วย project_id จะ scan ทั้งตาราง)
+owner_id เก็บเป็น token ในคอลัมน์ owner ที่ถูกทำดัชนี การค้นหา MATCH เจ้าของก่อน แถวของผู้ใช้อื่นจึงไม่ถูกนำมาจัดอันดับ
+
+ถ้าฐานข้อมูลไม่ใช่ SQLite หรือ SQLite ไม่มี FTS5 การค้นหาจะปิดไว้ (available() = False) และการบันทึก project ทำงานตามปกติ
+"""
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+ROWID_STRIDE = 1 << 20  # node สูงสุดต่อ project ที่ถูกทำดัชนี
+MAX_ATTRIBUTE_CHARS = 2000
+
+# fields ใน data ที่มีคอลัมน์ของตัวเองแล้ว หรือไม่ใช่ข้อมูลที่ผู้ใช้ค้นหา
+_OWN_COLUMNS = {"label", "type", "deviceRole"}
+
+CREATE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS device_search USING fts5("
+    "label, device_type, role, attributes, owner, "
+    "project_id UNINDEXED, node_id UNINDEXED, "
+    "tokenize = 'unicode61')"
+)
+INSERT_ROW = text(
+    "INSERT INTO device_search (rowid, label, device_type, role, attributes, owner, project_id, node_id) "
+    "VALUES (:rowid, :label, :device_type, :role, :attributes, :owner, :project_id, :node_id)"
+)
+DELETE_PROJECT = text("DELETE FROM device_search WHERE rowid >= :first AND rowid < :last")
+# จัดอันดับเฉพาะ rowid ก่อน แล้วอ่านคอลัมน์ของแถวที่ติดอันดับ (ถ้า SELECT คอลัมน์พร้อม bm25 FTS5 จะอ่านทุกแถวที่ตรง)
+# น้ำหนัก bm25 ต่อคอลัมน์: label, device_type, role, attributes, owner
+SEARCH = text(
+    "SELECT s.project_id, p.name, s.node_id, s.label, s.device_type, s.role FROM ("
+    "SELECT rowid, bm25(device_search, 10.0, 4.0, 4.0, 1.0, 0.0) AS score FROM device_search "
+    "WHERE device_search MATCH :match ORDER BY score LIMIT :limit"
+    ") top JOIN device_search s ON s.rowid = top.rowid JOIN projects p ON p.id = s.project_id "
+    "ORDER BY top.score"
+)
+TEXT_COLUMNS = "{label device_type role attributes}"
+
+_available = False
+
+
+def ensure_index(engine: Engine) -> bool:
+    """สร้างตาราง FTS5 ถ้ายังไม่มี (เรียกตอนเริ่ม app หลัง create_all)"""
+    global _available
+    if engine.dialect.name != "sqlite":
+        _available = False
+        return False
+    try:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(CREATE_TABLE)
+        _available = True
+    except Exception as e:
+        logger.warning(f"Device search disabled (SQLite FTS5 not available): {e}")
+        _available = False
+    return _available
+
+
+def available() -> bool:
+    return _available
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value)
+
+
+def _attributes(data: Dict[str, Any]) -> str:
+    """data อื่น ๆ เป็นข้อความ "key value ..." (ค่าที่เป็น object/list ข้าม)"""
+    parts = [
+        f"{key} {value}" for key, value in data.items()
+        if key not in _OWN_COLUMNS and isinstance(value, (str, int, float)) and not isinstance(value, bool) and value != ""
+    ]
+    return " ".join(parts)[:MAX_ATTRIBUTE_CHARS]
+
+
+def node_rows(project_id: int, owner_id: int, nodes: Iterable[Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for seq, node in enumerate(nodes):
+        if seq >= ROWID_STRIDE:
+            break
+        if not isinstance(node, dict) or node.get("id") is None:
+            continue
+        data = node.get("data") if isinstance(node.get("data"), dict) else {}
+        rows.append({
+            "rowid": project_id * ROWID_STRIDE + seq,
+            "label": _text(data.get("label")),
+            "device_type": _text(data.get("type") or node.get("type")),
+            "role": _text(data.get("deviceRole")),
+            "attributes": _attributes(data),
+            "owner": str(owner_id),
+            "project_id": project_id,
+            "node_id": str(node["id"]),
+        })
+    return rows
+
+
+def remove_project(db: Session, project_id: int):
+    if _available:
+        db.execute(DELETE_PROJECT, {"first": project_id * ROWID_STRIDE, "last": (project_id + 1) * ROWID_STRIDE})
+
+
+def index_project(db: Session, project_id: int, owner_id: int, document: Any):
+    """แทนที่แถวของ project ด้วย node ใน document (ผู้เรียก commit พร้อมการบันทึก project)"""
+    if not _available:
+        return
+    remove_project(db, project_id)
+    nodes = document.get("nodes") if isinstance(document, dict) else None
+    rows = node_rows(project_id, owner_id, nodes if isinstance(nodes, list) else [])
+    if rows:
+        db.execute(INSERT_ROW, rows)
+
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def match_query(query: str) -> Optional[str]:
+    """
+    ข้อความที่ผู้ใช้พิมพ์เป็น FTS5 query: ทุกคำต้องพบ (AND) และคำสุดท้ายค้นแบบขึ้นต้นด้วย (prefix)
+    syntax ของ FTS5 ในข้อความ (", *, OR, column:) ถูกตัดทิ้ง คืน None ถ้าไม่มีคำให้ค้น
+    """
+    tokens = _TOKEN.findall(query or "")
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search(
+    db: Session,
+    owner_id: int,
+    query: str,
+    device_type: Optional[str] = None,
+    limit: int = 50,
+) -> List[Dict[str, Any]]:
+    """อุปกรณ์ของ owner ที่ตรงกับ query เรียงตาม bm25 (label มีน้ำหนักมากที่สุด)"""
+    terms = match_query(query)
+    if terms is None:
+        return []
+    match = f'owner : "{int(owner_id)}" AND {TEXT_COLUMNS} : ({terms})'
+    if device_type:
+        device_match = match_query(device_type)
+        if device_match:
+            match += f" AND device_type : ({device_match.rstrip('*')})"
+    rows = db.execute(SEARCH, {"match": match, "limit": limit})
+    return [
+        {
+            "project_id": project_id,
+            "project_name": project_name,
+            "node_id": node_id,
+            "label": label or None,
+            "device_type": device_type or None,
+            "role": role or None,
+        }
+        for project_id, project_name, node_id, label, device_type, role in rows
+    ]
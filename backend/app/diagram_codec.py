@@ -0,0 +1,69 @@
+"""
+รูปแบบการเก็บ Project.diagram_data แบบบีบอัด
+
+ค่าที่เก็บเป็น bytes โดย byte แรกบอกรูปแบบ ตามด้วยข้อมูล:
+    0x00  JSON (UTF-8) ไม่บีบอัด (แผนผังเล็กกว่า min_size)
+    0x01  zlib
+    0x02  zstd (ต้องติดตั้ง zstandard)
+ค่าที่เป็น str คือแถวเดิมก่อน migrate_compress_diagram_data.py ซึ่งยังอ่านได้ตามปกติ
+"""
+import zlib
+from typing import Optional, Union
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+FORMAT_RAW = 0x00
+FORMAT_ZLIB = 0x01
+FORMAT_ZSTD = 0x02
+
+CODECS = ("zstd", "zlib", "none")
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+# แผนผังที่เล็กกว่านี้ (bytes) บีบอัดแล้วไม่คุ้ม overhead
+DEFAULT_MIN_SIZE = 512
+
+
+def available_codec(codec: str) -> str:
+    """codec ที่ใช้ได้จริง (zstd ที่ไม่ได้ติดตั้งจะใช้ zlib แทน)"""
+    if codec not in CODECS:
+        raise ValueError(f"ไม่รู้จักรูปแบบการบีบอัด '{codec}' (ใช้ได้: {', '.join(CODECS)})")
+    if codec == "zstd" and zstandard is None:
+        return "zlib"
+    return codec
+
+
+def encode(text: Optional[str], codec: str = "zlib", min_size: int = DEFAULT_MIN_SIZE) -> Optional[bytes]:
+    if text is None:
+        return None
+    raw = text.encode("utf-8")
+    codec = available_codec(codec)
+    if codec == "none" or len(raw) < min_size:
+        return bytes((FORMAT_RAW,)) + raw
+    if codec == "zstd":
+        return bytes((FORMAT_ZSTD,)) + zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return bytes((FORMAT_ZLIB,)) + zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decode(value: Union[str, bytes, memoryview, None]) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if not value:
+        return ""
+    version, payload = value[0], value[1:]
+    if version == FORMAT_RAW:
+        return payload.decode("utf-8")
+    if version == FORMAT_ZLIB:
+        return zlib.decompress(payload).decode("utf-8")
+    if version == FORMAT_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("diagram_data ถูกบีบอัดด้วย zstd แต่ไม่ได้ติดตั้ง zstandard")
+        return zstandard.ZstdDecompressor().decompress(payload).decode("utf-8")
+    raise ValueError(f"ไม่รู้จักรูปแบบ diagram_data version {version}")
+
+
+def is_encoded(value) -> bool:
+    return isinstance(value, (bytes, memoryview))
@@ -0,0 +1,264 @@
+"""
+ใช้ delta กับ diagram_data ที่เก็บไว้ (PATCH /projects/{id}) แทนการส่งแผนผังทั้งหมดทุกครั้งที่บันทึก
+
+รองรับสองรูปแบบ:
+- RFC 6902 JSON Patch: list ของ operation (add, remove, replace, move, copy, test) บนเอกสาร {"nodes": [...], "edges": [...]}
+- node/edge delta: {"nodes": {"added", "removed", "changed"}, "edges": {...}} รูปแบบเดียวกับ TopologyDiff
+  ของการวิเคราะห์แบบ incremental (removed เป็น id, added/changed เป็น object เต็ม)
+"""
+import copy
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+from . import fast_json
+
+JSON_PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+
+
+class PatchError(ValueError):
+    """patch ใช้กับเอกสารไม่ได้ (path ไม่มีอยู่, operation ผิดรูปแบบ, ...)"""
+
+
+class PatchTestFailed(PatchError):
+    """operation test ของ JSON Patch ไม่ผ่าน (เอกสารไม่ได้อยู่ในสถานะที่ client คาดไว้)"""
+
+
+def load_document(diagram_data: Optional[str]) -> Dict[str, Any]:
+    if not diagram_data:
+        return {"nodes": [], "edges": []}
+    try:
+        return fast_json.loads(diagram_data)
+    except ValueError as e:
+        raise PatchError(f"diagram_data เดิมไม่ใช่ JSON ที่ถูกต้อง: {e}") from None
+
+
+def validate_document(document: Any) -> Dict[str, Any]:
+    """เอกสารที่จะบันทึกต้องเป็น object และ nodes/edges (ถ้ามี) ต้องเป็น list"""
+    if not isinstance(document, dict):
+        raise PatchError("diagram_data ต้องเป็น object ที่มี nodes และ edges")
+    for key in ("nodes", "edges"):
+        if not isinstance(document.get(key) or [], list):
+            raise PatchError(f"diagram_data.{key} ต้องเป็น list")
+    return document
+
+
+# ---- node/edge delta ----
+
+def _apply_changes(items: List[Any], changes: Dict[str, list], kind: str) -> List[Any]:
+    removed = set()
+    for item_id in changes.get("removed") or []:
+        try:
+            removed.add(item_id)
+        except TypeError:
+            raise PatchError(f"id ของ {kind} ต้องเป็นค่าเดี่ยว: {item_id!r}") from None
+    upserts: Dict[Hashable, Dict[str, Any]] = {}
+    for item in (changes.get("added") or []) + (changes.get("changed") or []):
+        item_id = item.get("id") if isinstance(item, dict) else None
+        if item_id is None:
+            raise PatchError(f"{kind} ที่เพิ่มหรือแก้ไขต้องมี id")
+        try:
+            upserts[item_id] = item
+        except TypeError:
+            raise PatchError(f"id ของ {kind} ต้องเป็นค่าเดี่ยว: {item_id!r}") from None
+
+    # คงลำดับเดิมของรายการ (ลำดับการวาดใน React Flow) ของใหม่ต่อท้าย
+    result = []
+    for item in items:
+        item_id = item.get("id") if isinstance(item, dict) else None
+        if item_id in upserts:
+            result.append(upserts.pop(item_id))
+        elif item_id not in removed:
+            result.append(item)
+    result.extend(upserts.values())
+    return result
+
+
+def apply_topology_diff(document: Any, diff: Dict[str, Dict[str, list]]) -> Dict[str, Any]:
+    """
+    ใช้ node/edge delta กับเอกสาร ลำดับเหมือน TopologyState.apply_diff: ลบก่อนแล้วจึงเพิ่ม/แทนที่
+    added ที่ id มีอยู่แล้วถือเป็น changed, changed ที่ยังไม่มีถือเป็น added, removed ที่ไม่มีถูกข้าม
+    """
+    validate_document(document)
+    for key in ("nodes", "edges"):
+        items = document.get(key) or []
+        changes = diff.get(key) or {}
+        if any(changes.get(part) for part in ("added", "removed", "changed")):
+            document[key] = _apply_changes(items, changes, key[:-1])
+    return document
+
+
+def _index_items(items: Any) -> Optional[Dict[Hashable, Any]]:
+    """item ตาม id (None ถ้ามี item ที่ไม่มี id หรือ id ซ้ำ ซึ่ง delta แทนไม่ได้)"""
+    if not isinstance(items, list):
+        return None
+    indexed = {}
+    for item in items:
+        item_id = item.get("id") if isinstance(item, dict) else None
+        try:
+            if item_id is None or item_id in indexed:
+                return None
+            indexed[item_id] = item
+        except TypeError:
+            return None
+    return indexed
+
+
+def diff_documents(old: Any, new: Any, keep_order: bool = True) -> Optional[Dict[str, Dict[str, list]]]:
+    """
+    node/edge delta ที่ apply_topology_diff(old, delta) ได้เอกสารเท่ากับ new
+    คืน None ถ้าแทนด้วย delta ไม่ได้ (field อื่นนอกจาก nodes/edges เปลี่ยน, item ไม่มี id หรือ id ซ้ำ)
+    keep_order=False ยอมให้ลำดับของ item ต่างกัน (ใช้แสดงความต่างเท่านั้น apply แล้วลำดับอาจไม่ตรงกับ new)
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        return None
+    rest = lambda document: fast_json.dumps_bytes({k: v for k, v in document.items() if k not in ("nodes", "edges")})
+    if rest(old) != rest(new):
+        return None
+    diff = {}
+    for key in ("nodes", "edges"):
+        old_items, new_items = _index_items(old.get(key) or []), _index_items(new.get(key) or [])
+        if old_items is None or new_items is None:
+            return None
+        added = [item for item_id, item in new_items.items() if item_id not in old_items]
+        # เทียบแบบ serialize: ต่างกันที่ชนิด (true กับ 1) หรือลำดับ key ก็นับเป็น changed
+        changed = [
+            item for item_id, item in new_items.items()
+            if item_id in old_items and (old_items[item_id] is not item)
+            and fast_json.dumps_bytes(old_items[item_id]) != fast_json.dumps_bytes(item)
+        ]
+        removed = [item_id for item_id in old_items if item_id not in new_items]
+        # apply_topology_diff คงลำดับเดิมและต่อท้ายของใหม่ ลำดับใน new ต้องเป็นแบบนั้นด้วย
+        kept = [item_id for item_id in new_items if item_id in old_items]
+        if keep_order and (
+            kept != [item_id for item_id in old_items if item_id in new_items]
+            or list(new_items)[len(kept):] != [item["id"] for item in added]
+        ):
+            return None
+        diff[key] = {"added": added, "removed": removed, "changed": changed}
+    return diff
+
+
+# ---- RFC 6902 JSON Patch ----
+
+def _parse_pointer(pointer: Any) -> List[str]:
+    """RFC 6901 JSON Pointer เป็น list ของ token"""
+    if not isinstance(pointer, str) or (pointer and not pointer.startswith("/")):
+        raise PatchError(f"path ไม่ถูกต้อง: {pointer!r}")
+    if pointer == "":
+        return []
+    return [token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")]
+
+
+def _list_index(container: list, token: str, pointer: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == "0"):
+        raise PatchError(f"index ของ list ไม่ถูกต้องใน {pointer}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"index เกินขนาดของ list ใน {pointer}")
+    return index
+
+
+def _resolve(document: Any, tokens: List[str], pointer: str) -> Any:
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise PatchError(f"ไม่พบ path {pointer}")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[_list_index(value, token, pointer, allow_end=False)]
+        else:
+            raise PatchError(f"ไม่พบ path {pointer}")
+    return value
+
+
+def _parent(document: Any, pointer: str) -> Tuple[Any, str]:
+    tokens = _parse_pointer(pointer)
+    return _resolve(document, tokens[:-1], pointer), tokens[-1]
+
+
+def _add(document: Any, pointer: str, value: Any) -> Any:
+    if pointer == "":
+        return value
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(_list_index(parent, token, pointer, allow_end=True), value)
+    else:
+        raise PatchError(f"ไม่พบ path {pointer}")
+    return document
+
+
+def _remove(document: Any, pointer: str) -> Tuple[Any, Any]:
+    """คืน (เอกสาร, ค่าที่ถูกลบ)"""
+    if pointer == "":
+        return None, document
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise PatchError(f"ไม่พบ path {pointer}")
+        return document, parent.pop(token)
+    if isinstance(parent, list):
+        return document, parent.pop(_list_index(parent, token, pointer, allow_end=False))
+    raise PatchError(f"ไม่พบ path {pointer}")
+
+
+def _replace(document: Any, pointer: str, value: Any) -> Any:
+    # แทนที่ในตำแหน่งเดิม (ลำดับ key ของ object ไม่เปลี่ยน)
+    if pointer == "":
+        return value
+    parent, token = _parent(document, pointer)
+    if isinstance(parent, dict) and token in parent:
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent[_list_index(parent, token, pointer, allow_end=False)] = value
+    else:
+        raise PatchError(f"ไม่พบ path {pointer}")
+    return document
+
+
+def _json_equal(a: Any, b: Any) -> bool:
+    # Python ถือว่า True == 1 แต่ใน JSON เป็นคนละชนิดกัน
+    if isinstance(a, bool) or isinstance(b, bool):
+        return type(a) is type(b) and a == b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_json_equal(a[key], b[key]) for key in a)
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def apply_json_patch(document: Any, operations: List[Dict[str, Any]]) -> Any:
+    """
+    ใช้ RFC 6902 operations ตามลำดับ (แก้ document ในที่ ผู้เรียกต้องส่งสำเนาที่ทิ้งได้ถ้า patch ล้มเหลว)
+    operation test ที่ไม่ผ่าน raise PatchTestFailed ส่วนข้อผิดพลาดอื่น raise PatchError
+    """
+    for number, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get("op") not in JSON_PATCH_OPS:
+            raise PatchError(f"operation ที่ {number} ไม่ถูกต้อง (op ต้องเป็นหนึ่งใน {', '.join(JSON_PATCH_OPS)})")
+        op, path = operation["op"], operation.get("path")
+        _parse_pointer(path)
+        if op in ("add", "replace", "test") and "value" not in operation:
+            raise PatchError(f"operation ที่ {number} ({op}) ต้องมี value")
+        if op in ("move", "copy"):
+            source = operation.get("from")
+            source_tokens = _parse_pointer(source)
+
+        if op == "add":
+            document = _add(document, path, operation["value"])
+        elif op == "remove":
+            document, _ = _remove(document, path)
+        elif op == "replace":
+            document = _replace(document, path, operation["value"])
+        elif op == "move":
+            if path != source and path.startswith(source + "/"):
+                raise PatchError(f"move จาก {source} ไปยัง path ที่อยู่ข้างในตัวเองไม่ได้")
+            document, value = _remove(document, source)
+            document = _add(document, path, value)
+        elif op == "copy":
+            document = _add(document, path, copy.deepcopy(_resolve(document, source_tokens, source)))
+        elif not _json_equal(_resolve(document, _parse_pointer(path), path), operation["value"]):
+            raise PatchTestFailed(f"test ไม่ผ่านที่ {path}")
+    return document
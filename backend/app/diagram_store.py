@@ -0,0 +1,171 @@
+"""
+เก็บแผนผังแบบ normalized: หนึ่งแถวต่อ node ใน diagram_nodes และหนึ่งแถวต่อ edge ใน diagram_edges
+
+เปิดด้วย DIAGRAM_STORAGE = "normalized" (ค่าเริ่มต้น "blob" เก็บ JSON ก้อนเดียวใน Project.diagram_data)
+แถวมีคอลัมน์ที่ query ได้ (ชนิดอุปกรณ์, role, throughput, ...) พร้อม JSON เดิมของ node/edge ทั้งก้อน
+การโหลดกลับเป็น diagram_data จึงแค่ต่อ string ตามลำดับ seq โดยไม่ต้อง parse และได้ค่าเดียวกับ fast_json.dumps ของเอกสาร
+
+เอกสารที่มี field อื่นนอกจาก nodes/edges หรือมี item ที่ไม่มี id ยังเก็บแบบ blob เสมอ
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import capacity, fast_json, models
+from .config import settings
+
+STORAGE_BLOB = "blob"
+STORAGE_NORMALIZED = "normalized"
+
+
+def normalizable(document: Any) -> bool:
+    if not isinstance(document, dict) or not set(document) <= {"nodes", "edges"}:
+        return False
+    for key in ("nodes", "edges"):
+        items = document.get(key, [])
+        if not isinstance(items, list) or not all(isinstance(item, dict) and item.get("id") is not None for item in items):
+            return False
+    return True
+
+
+def _text(value: Any, limit: Optional[int] = None) -> Optional[str]:
+    if value is None or value == "":
+        return None
+    text = str(value)
+    return text[:limit] if limit else text
+
+
+def node_row(project_id: int, seq: int, node: Dict[str, Any], data: str) -> Dict[str, Any]:
+    """แถวของ diagram_nodes (data = JSON ของ node ที่ serialize แล้ว)"""
+    node_data = node.get("data") if isinstance(node.get("data"), dict) else {}
+    return {
+        "project_id": project_id,
+        "seq": seq,
+        "node_id": str(node["id"]),
+        "device_type": _text(node_data.get("type") or node.get("type"), 50),
+        "role": _text(node_data.get("deviceRole"), 50),
+        "label": _text(node_data.get("label")),
+        "throughput_bps": capacity.device_capacity(node),
+        "data": data,
+    }
+
+
+def edge_row(project_id: int, seq: int, edge: Dict[str, Any], data: str) -> Dict[str, Any]:
+    return {
+        "project_id": project_id,
+        "seq": seq,
+        "edge_id": _text(edge.get("id")),
+        "source": _text(edge.get("source")),
+        "target": _text(edge.get("target")),
+        "bandwidth_bps": capacity.link_capacity(edge),
+        "data": data,
+    }
+
+
+def assemble(node_data: Iterable[str], edge_data: Iterable[str]) -> str:
+    """diagram_data จาก JSON ของแต่ละ item เท่ากับ fast_json.dumps({"nodes": [...], "edges": [...]})"""
+    return '{"nodes":[' + ",".join(node_data) + '],"edges":[' + ",".join(edge_data) + "]}"
+
+
+def serialize(document: Dict[str, Any]) -> Dict[str, List[str]]:
+    """JSON ของแต่ละ node/edge ซึ่งเป็นทั้ง data ของแถวและส่วนประกอบของ diagram_data"""
+    return {key: [fast_json.dumps(item) for item in document.get(key, [])] for key in ("nodes", "edges")}
+
+
+def clear(db: Session, project_id: int):
+    db.query(models.DiagramNode).filter(models.DiagramNode.project_id == project_id).delete(synchronize_session=False)
+    db.query(models.DiagramEdge).filter(models.DiagramEdge.project_id == project_id).delete(synchronize_session=False)
+
+
+def write(db: Session, project_id: int, document: Dict[str, Any], serialized: Dict[str, List[str]]):
+    """เขียน node/edge ทั้งหมดของ project ใหม่ (executemany หนึ่งครั้งต่อตาราง) ผู้เรียก commit"""
+    clear(db, project_id)
+    if serialized["nodes"]:
+        db.execute(insert(models.DiagramNode), [
+            node_row(project_id, seq, node, data)
+            for seq, (node, data) in enumerate(zip(document["nodes"], serialized["nodes"]))
+        ])
+    if serialized["edges"]:
+        db.execute(insert(models.DiagramEdge), [
+            edge_row(project_id, seq, edge, data)
+            for seq, (edge, data) in enumerate(zip(document["edges"], serialized["edges"]))
+        ])
+
+
+def prepare(diagram_data: Optional[str], document: Any) -> Optional[Dict[str, Any]]:
+    """
+    ถ้าแผนผังนี้ควรเก็บแบบ normalized คืน {"diagram_data": ค่า canonical, "serialized": ...} ไม่เช่นนั้นคืน None
+    diagram_data canonical คือค่าที่โหลดกลับได้ ใช้คำนวณ content_hash และ revision แทนค่าที่ client ส่งมา
+    """
+    if settings.DIAGRAM_STORAGE != STORAGE_NORMALIZED or not diagram_data or not normalizable(document):
+        return None
+    serialized = serialize(document)
+    return {"diagram_data": assemble(serialized["nodes"], serialized["edges"]), "serialized": serialized}
+
+
+def load_many(db: Session, project_ids: List[int]) -> Dict[int, str]:
+    """diagram_data ของหลาย project ที่เก็บแบบ normalized (สอง query รวม)"""
+    if not project_ids:
+        return {}
+    parts = {project_id: {"nodes": [], "edges": []} for project_id in project_ids}
+    for model, key in ((models.DiagramNode, "nodes"), (models.DiagramEdge, "edges")):
+        rows = db.query(model.project_id, model.data).filter(
+            model.project_id.in_(project_ids)
+        ).order_by(model.project_id, model.seq)
+        for project_id, data in rows:
+            parts[project_id][key].append(data)
+    return {
+        project_id: assemble(items["nodes"], items["edges"])
+        for project_id, items in parts.items()
+    }
+
+
+def load(db: Session, project_id: int) -> str:
+    return load_many(db, [project_id])[project_id]
+
+
+def attach(db: Session, project: models.Project, diagram_data: Optional[str] = None):
+    """
+    ใส่ diagram_data ที่ประกอบจากตารางให้ project ที่เก็บแบบ normalized (ไม่นับเป็นการแก้ไขของ session)
+    ทำเมื่อต้องใช้แผนผังเท่านั้น รายการ project และการตรวจสิทธิ์ไม่เรียกฟังก์ชันนี้
+    """
+    if project.storage == STORAGE_NORMALIZED:
+        set_committed_value(project, "diagram_data", load(db, project.id) if diagram_data is None else diagram_data)
+    return project
+
+
+# ---- queries ที่ทำได้เฉพาะ project ที่เก็บแบบ normalized ----
+
+def projects_with_device_type(db: Session, owner_id: int, device_type: str) -> List[int]:
+    """id ของ project ที่มีอุปกรณ์ชนิดนี้ (เช่น "firewall")"""
+    rows = db.query(models.DiagramNode.project_id).join(models.Project, models.Project.id == models.DiagramNode.project_id).filter(
+        models.Project.owner_id == owner_id,
+        models.DiagramNode.device_type == device_type
+    ).distinct().order_by(models.DiagramNode.project_id)
+    return [project_id for (project_id,) in rows]
+
+
+def find_devices(
+    db: Session,
+    owner_id: int,
+    device_type: Optional[str] = None,
+    role: Optional[str] = None,
+    min_throughput_bps: Optional[float] = None,
+    max_throughput_bps: Optional[float] = None,
+    limit: int = 100,
+):
+    """อุปกรณ์ในทุก project ของ user ที่ตรงเงื่อนไข (ใช้ index ของ device_type/role/throughput_bps)"""
+    query = db.query(models.DiagramNode).join(models.Project, models.Project.id == models.DiagramNode.project_id).filter(
+        models.Project.owner_id == owner_id
+    )
+    if device_type:
+        query = query.filter(models.DiagramNode.device_type == device_type)
+    if role:
+        query = query.filter(models.DiagramNode.role == role)
+    if min_throughput_bps is not None:
+        query = query.filter(models.DiagramNode.throughput_bps >= min_throughput_bps)
+    if max_throughput_bps is not None:
+        query = query.filter(models.DiagramNode.throughput_bps < max_throughput_bps)
+    return query.order_by(models.DiagramNode.project_id, models.DiagramNode.seq).limit(limit).all()
@@ -0,0 +1,87 @@
+"""
+JSON encode/decode ที่ใช้ orjson หรือ msgspec ถ้าติดตั้งไว้ ไม่เช่นนั้นใช้ json มาตรฐาน
+
+output ของ dumps() เท่ากับ json.dumps(obj, ensure_ascii=False, separators=(",", ":")) ทุก backend
+ยกเว้น float ที่เขียนแบบ exponent (1e16 กับ 1e+16) และ NaN/Infinity ซึ่งแทบไม่มีในแผนผัง
+hash ที่คำนวณจาก dumps (cache key) จึงไม่เปลี่ยนตาม backend
+"""
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+BACKENDS = ("orjson", "msgspec", "json")
+
+_backend = "orjson" if orjson is not None else "msgspec" if msgspec is not None else "json"
+_msgspec_decoder = msgspec.json.Decoder() if msgspec is not None else None
+
+
+def backend() -> str:
+    return _backend
+
+
+def set_backend(name: str):
+    """เลือก backend (สำหรับ benchmark/test) ValueError ถ้าไม่ได้ติดตั้ง"""
+    global _backend
+    if name not in BACKENDS or (name == "orjson" and orjson is None) or (name == "msgspec" and msgspec is None):
+        raise ValueError(f"JSON backend '{name}' ไม่พร้อมใช้งาน")
+    _backend = name
+
+
+def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+    """parse JSON ข้อผิดพลาดเป็น json.JSONDecodeError เสมอ (FastAPI แปลงเป็น 422 ได้เหมือนเดิม)"""
+    if _backend == "orjson":
+        return orjson.loads(data)  # orjson.JSONDecodeError เป็น subclass ของ json.JSONDecodeError
+    if _backend == "msgspec":
+        try:
+            return _msgspec_decoder.decode(data)
+        except msgspec.DecodeError as e:
+            raise json.JSONDecodeError(str(e), data if isinstance(data, str) else "", 0) from None
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    try:
+        return json.loads(data)
+    except UnicodeDecodeError as e:
+        raise json.JSONDecodeError(str(e), "", e.start) from None
+
+
+def _stdlib_dumps(obj: Any, sort_keys: bool, indent: bool, default: Optional[Callable]) -> str:
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, indent=2, default=default)
+    return json.dumps(obj, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"), default=default)
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = False, indent: bool = False, default: Optional[Callable] = None) -> bytes:
+    """JSON แบบกระชับเป็น UTF-8 bytes (indent=True ย่อหน้า 2 ช่องเหมือน json.dumps(indent=2))"""
+    if _backend == "orjson":
+        option = orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        try:
+            return orjson.dumps(obj, default=default, option=option)
+        except (TypeError, orjson.JSONEncodeError):
+            pass  # เช่น int เกิน 64 bit ให้ json มาตรฐานจัดการ
+    elif _backend == "msgspec":
+        try:
+            encoded = msgspec.json.encode(obj, enc_hook=default, order="sorted" if sort_keys else None)
+            return msgspec.json.format(encoded, indent=2) if indent else encoded
+        except (TypeError, msgspec.EncodeError):
+            pass
+    return _stdlib_dumps(obj, sort_keys, indent, default).encode("utf-8")
+
+
+def dumps(obj: Any, sort_keys: bool = False, indent: bool = False, default: Optional[Callable] = None) -> str:
+    """เหมือน dumps_bytes แต่คืน str"""
+    if _backend == "json":
+        return _stdlib_dumps(obj, sort_keys, indent, default)
+    return dumps_bytes(obj, sort_keys, indent, default).decode("utf-8")
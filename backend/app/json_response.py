@@ -0,0 +1,40 @@
+from typing import Any, Callable
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from . import fast_json
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse ที่ render ด้วย fast_json (orjson/msgspec ถ้ามี) ใช้เป็น default_response_class ของ app"""
+
+    def render(self, content: Any) -> bytes:
+        return fast_json.dumps_bytes(content)
+
+
+class FastJSONRequest(Request):
+    """Request ที่ parse body ด้วย fast_json แทน json.loads"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = fast_json.loads(await self.body())
+        return self._json
+
+
+class FastJSONRoute(APIRoute):
+    """
+    route class สำหรับ router ที่รับ body ขนาดใหญ่ (แผนผังเครือข่าย)
+
+    FastAPI อ่าน body ผ่าน request.json() จึงเปลี่ยนแค่ request class
+    JSON ที่ผิดรูปแบบยังได้ 422 เหมือนเดิมเพราะ fast_json.loads raise json.JSONDecodeError
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_route_handler = super().get_route_handler()
+
+        async def route_handler(request: Request) -> Response:
+            return await original_route_handler(FastJSONRequest(request.scope, request.receive))
+
+        return route_handler
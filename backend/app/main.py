@@ -1,13 +1,41 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import auth, projects, ai, analysis_history
 from .database import engine
-from . import models
+from .ai_service import analyzer
+from .analysis_jobs import job_queue
+from .batch_analysis import batch_runner
+from .json_response import FastJSONResponse
+from . import models, device_search, analysis_search
 
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
+# ตาราง FTS5 สำหรับค้นหาอุปกรณ์ (SQLAlchemy สร้าง virtual table ไม่ได้)
+device_search.ensure_index(engine)
+# ดัชนี FTS5 ของ ai_analysis_history พร้อม trigger ที่อัปเดตดัชนีทุกครั้งที่ตารางเปลี่ยน
+analysis_search.ensure_index(engine)
 
-app = FastAPI(title="Network Topology API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # เปิด connection pool ไปยัง Ollama ครั้งเดียวต่อ process และปิดตอน shutdown
+    await analyzer.ollama_service.start()
+    await job_queue.start()
+    batch_runner.start()
+    try:
+        yield
+    finally:
+        await batch_runner.stop()
+        await job_queue.stop()
+        await analyzer.ollama_service.close()
+
+# render response ด้วย orjson/msgspec ถ้าติดตั้งไว้ (ดู app/fast_json.py)
+app = FastAPI(
+    title="Network Topology API",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
+)
 
 # CORS middleware
 app.add_middleware(
@@ -16,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 # Include routers
@@ -0,0 +1,55 @@
+import time
+import logging
+from typing import Awaitable, Callable, List, Optional
+
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+
+class ModelCatalog:
+    """
+    Cache รายการ models ของ Ollama แบบมี TTL
+
+    caller ที่ขอพร้อมกันตอน cache หมดอายุจะใช้ fetch เดียวกัน (single-flight)
+    ผลลัพธ์ว่างถือว่าดึงไม่สำเร็จและจะไม่ถูก cache
+    """
+
+    def __init__(self, fetch: Callable[[], Awaitable[List[str]]], ttl: float = 60.0):
+        self._fetch = fetch
+        self.ttl = ttl
+        self._models: Optional[List[str]] = None
+        self._fetched_at = 0.0
+        self._flight = SingleFlight()
+
+    def is_fresh(self) -> bool:
+        return self._models is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    def invalidate(self):
+        """ล้าง cache ให้ call ถัดไปดึงรายการใหม่จาก Ollama"""
+        self._models = None
+        self._fetched_at = 0.0
+
+    async def get_models(self, force_refresh: bool = False) -> List[str]:
+        if not force_refresh and self.is_fresh():
+            return list(self._models)
+        return list(await self._flight.do("models", self._refresh))
+
+    async def contains(self, model_name: str) -> bool:
+        """ตรวจว่ามี model นี้หรือไม่ ดึงใหม่จาก Ollama อย่างมากหนึ่งครั้ง"""
+        was_fresh = self.is_fresh()
+        models = await self.get_models()
+        if model_name in models or not was_fresh:
+            return model_name in models
+        # model อาจเพิ่งถูก pull มาหลังจาก cache ครั้งล่าสุด
+        models = await self.get_models(force_refresh=True)
+        return model_name in models
+
+    async def _refresh(self) -> List[str]:
+        models = await self._fetch()
+        if models:
+            self._models = models
+            self._fetched_at = time.monotonic()
+        else:
+            logger.warning("Model list from Ollama is empty, not caching")
+        return models
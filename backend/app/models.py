@@ -1,15 +1,40 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Boolean, Float, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 from .database import Base
+from .config import settings
+from . import diagram_codec
 
 from datetime import datetime, timedelta, timezone
+import uuid
 
 # Timezone for Bangkok (GMT+7)
 bangkok_tz = timezone(timedelta(hours=7))
 def bangkok_now():
     return datetime.now(bangkok_tz)
 
+class CompressedText(TypeDecorator):
+    """
+    ข้อความที่เก็บแบบบีบอัด (ดูรูปแบบใน diagram_codec) ฝั่งโค้ดยังเห็นเป็น str เหมือน Text
+
+    บน SQLite ประกาศคอลัมน์เป็น TEXT เหมือนเดิม (SQLite เก็บ BLOB ในคอลัมน์ TEXT ได้) ฐานข้อมูลเดิมจึงไม่ต้องเปลี่ยน schema
+    และแถวเดิมที่ยังไม่บีบอัดอ่านได้ตามปกติ
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(Text())
+        return dialect.type_descriptor(LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        return diagram_codec.encode(value, settings.DIAGRAM_COMPRESSION, settings.DIAGRAM_COMPRESSION_MIN_BYTES)
+
+    def process_result_value(self, value, dialect):
+        return diagram_codec.decode(value)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -25,6 +50,8 @@ class User(Base):
     # Relationships
     projects = relationship("Project", back_populates="owner", cascade="all, delete-orphan")
     ai_analyses = relationship("AIAnalysisHistory", back_populates="user", cascade="all, delete-orphan")
+    analysis_jobs = relationship("AIAnalysisJob", back_populates="user", cascade="all, delete-orphan")
+    batch_runs = relationship("BatchAnalysisRun", back_populates="user", cascade="all, delete-orphan")
 
 class Project(Base):
     __tablename__ = "projects"
@@ -32,16 +59,84 @@ class Project(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(Text, nullable=True)
-    diagram_data = Column(Text, nullable=True)  # JSON string ของ nodes และ edges
+    diagram_data = Column(CompressedText, nullable=True)  # JSON string ของ nodes และ edges (เก็บแบบบีบอัด)
+    # สรุปของ diagram_data คำนวณตอนบันทึก เพื่อให้รายการ project ไม่ต้องโหลดแผนผัง
+    node_count = Column(Integer, default=0)
+    edge_count = Column(Integer, default=0)
+    diagram_size = Column(Integer, default=0)  # bytes ของ JSON ก่อนบีบอัด
+    content_hash = Column(String(64), nullable=True)  # sha256 ของ name/description/diagram_data ใช้เป็น ETag
+    # "blob" = แผนผังอยู่ใน diagram_data, "normalized" = อยู่ใน diagram_nodes/diagram_edges (diagram_data เป็น NULL ดู diagram_store.py)
+    storage = Column(String(10), default="blob", nullable=False, server_default="blob")
     analysis_count = Column(Integer, default=0)
     last_analysis_at = Column(DateTime(timezone=True), nullable=True)
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), default=bangkok_now)
     updated_at = Column(DateTime(timezone=True), default=bangkok_now, onupdate=bangkok_now)
     
     # Relationships
     owner = relationship("User", back_populates="projects")
     ai_analyses = relationship("AIAnalysisHistory", back_populates="project", cascade="all, delete-orphan")
+    # ลบด้วย bulk DELETE ใน crud.delete_project (ไม่โหลดทุก revision ขึ้นมาก่อนลบ)
+    revisions = relationship("ProjectRevision", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+
+class DiagramNode(Base):
+    """
+    node ของแผนผังที่เก็บแบบ normalized หนึ่งแถวต่อ node (ดู diagram_store.py)
+    คอลัมน์ device_type/role/label/throughput_bps ดึงจาก node ไว้ query ได้ data เก็บ JSON เดิมของ node ทั้งก้อน
+    """
+    __tablename__ = "diagram_nodes"
+    __table_args__ = (UniqueConstraint("project_id", "seq"),)
+    
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)  # ลำดับใน nodes ของ React Flow
+    node_id = Column(String, nullable=False)
+    device_type = Column(String(50), nullable=True, index=True)
+    role = Column(String(50), nullable=True, index=True)
+    label = Column(String, nullable=True)
+    throughput_bps = Column(Float, nullable=True, index=True)
+    data = Column(Text, nullable=False)
+
+class DiagramEdge(Base):
+    """edge ของแผนผังที่เก็บแบบ normalized หนึ่งแถวต่อ edge"""
+    __tablename__ = "diagram_edges"
+    __table_args__ = (UniqueConstraint("project_id", "seq"),)
+    
+    id = Column(Integer, primary_key=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False)
+    seq = Column(Integer, nullable=False)
+    edge_id = Column(String, nullable=True)
+    source = Column(String, nullable=True, index=True)
+    target = Column(String, nullable=True, index=True)
+    bandwidth_bps = Column(Float, nullable=True)
+    data = Column(Text, nullable=False)
+
+class ProjectRevision(Base):
+    """
+    ประวัติของ diagram_data หนึ่งแถวต่อการบันทึกแผนผัง (ดู project_revisions.py)
+
+    kind = "snapshot" เก็บ diagram_data ทั้งหมด, "delta" เก็บ node/edge delta จาก revision ก่อนหน้า
+    base_revision คือ snapshot ที่ delta chain เริ่มต้น การสร้าง revision ใดก็ตามอ่านแค่แถว base_revision..revision
+    """
+    __tablename__ = "project_revisions"
+    __table_args__ = (UniqueConstraint("project_id", "revision"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), nullable=False, index=True)
+    revision = Column(Integer, nullable=False)  # เริ่มที่ 1 ต่อ project
+    kind = Column(String(10), nullable=False)  # snapshot, delta
+    base_revision = Column(Integer, nullable=False)
+    data = Column(CompressedText, nullable=True)  # diagram_data (snapshot) หรือ JSON ของ delta
+    content_hash = Column(String(64), nullable=True)  # content_hash ของ project ตอนบันทึก revision นี้
+    topology_hash = Column(String(64), nullable=True)  # analysis_cache.topology_hash ใช้จับคู่กับประวัติการวิเคราะห์
+    node_count = Column(Integer, default=0)
+    edge_count = Column(Integer, default=0)
+    diagram_size = Column(Integer, default=0)
+    changed_count = Column(Integer, default=0)  # จำนวน node/edge ที่เพิ่ม ลบ หรือแก้ไขจาก revision ก่อนหน้า
+    created_at = Column(DateTime(timezone=True), default=bangkok_now)
+    
+    # Relationships
+    project = relationship("Project", back_populates="revisions")
 
 class AIAnalysisHistory(Base):
     __tablename__ = "ai_analysis_history"
@@ -49,13 +144,78 @@ class AIAnalysisHistory(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     project_id = Column(Integer, ForeignKey("projects.id"), nullable=True)
+    revision_id = Column(Integer, ForeignKey("project_revisions.id", ondelete="SET NULL"), nullable=True)  # revision ของแผนผังที่ถูกวิเคราะห์
     model_used = Column(String(100), nullable=False)
     device_count = Column(Integer, nullable=False)
     device_types = Column(Text, nullable=True)  # JSON string
     analysis_result = Column(Text, nullable=False)
     execution_time_seconds = Column(Integer, nullable=True)
+    time_to_first_token_ms = Column(Integer, nullable=True)  # latency จนได้ข้อความแรกจาก AI
+    is_cached = Column(Boolean, default=False)  # ได้ผลจาก response cache โดยไม่เรียก AI
     created_at = Column(DateTime(timezone=True), default=bangkok_now)
     
     # Relationships
     user = relationship("User", back_populates="ai_analyses")
-    project = relationship("Project", back_populates="ai_analyses") 
\ No newline at end of file
+    project = relationship("Project", back_populates="ai_analyses")
+    revision = relationship("ProjectRevision")
+
+def new_job_id():
+    return uuid.uuid4().hex
+
+class AIAnalysisJob(Base):
+    __tablename__ = "ai_analysis_jobs"
+    
+    id = Column(String(32), primary_key=True, default=new_job_id)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    request_data = Column(Text, nullable=False)  # JSON string ของ nodes, edges และ question
+    analysis_id = Column(Integer, ForeignKey("ai_analysis_history.id", ondelete="SET NULL"), nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), default=bangkok_now)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="analysis_jobs")
+    history = relationship("AIAnalysisHistory")  # ไม่ใช้ชื่อ analysis เพราะชนกับ field ข้อความของ schemas.AIAnalysisJob
+
+class BatchAnalysisRun(Base):
+    __tablename__ = "batch_analysis_runs"
+    
+    id = Column(String(32), primary_key=True, default=new_job_id)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)  # None = ทุก project (รันจาก CLI)
+    status = Column(String(20), nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    include_llm = Column(Boolean, default=False)
+    project_ids = Column(Text, nullable=True)  # JSON list ถ้าเลือกเฉพาะบาง project
+    processed_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    last_project_id = Column(Integer, default=0)  # keyset สำหรับทำต่อหลัง restart
+    elapsed_seconds = Column(Float, nullable=True)
+    diagrams_per_second = Column(Float, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=bangkok_now)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    
+    # Relationships
+    user = relationship("User", back_populates="batch_runs")
+    results = relationship("BatchAnalysisResult", back_populates="run", cascade="all, delete-orphan")
+
+class BatchAnalysisResult(Base):
+    __tablename__ = "batch_analysis_results"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    run_id = Column(String(32), ForeignKey("batch_analysis_runs.id", ondelete="CASCADE"), nullable=False, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="SET NULL"), nullable=True, index=True)
+    device_count = Column(Integer, default=0)
+    connection_count = Column(Integer, default=0)
+    issue_count = Column(Integer, default=0)
+    analysis = Column(Text, nullable=True)  # JSON string ของผล analyze_network_topology
+    llm_result = Column(Text, nullable=True)  # ผลจาก AI เมื่อเปิด include_llm
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), default=bangkok_now)
+    
+    # Relationships
+    run = relationship("BatchAnalysisRun", back_populates="results")
@@ -0,0 +1,147 @@
+import asyncio
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# สถานะของ circuit breaker
+CIRCUIT_CLOSED = "closed"        # ปกติ ส่ง request ได้
+CIRCUIT_OPEN = "open"            # Ollama ล่ม ตอบกลับทันทีโดยไม่เรียก Ollama
+CIRCUIT_HALF_OPEN = "half_open"  # ครบเวลา reset แล้ว ปล่อย request ทดลองผ่านหนึ่งครั้ง
+
+
+class OllamaHealthMonitor:
+    """
+    เก็บสถานะสุขภาพของ Ollama ไว้ใน memory แทนการ probe ทุกครั้งที่วิเคราะห์
+
+    - active health: background task เรียก probe ทุก ๆ interval วินาที
+    - passive health: ผลของการ generate จริงถูกรายงานผ่าน record_success/record_failure
+    - circuit breaker: ล้มเหลวติดกันครบ failure_threshold ครั้งจะเปิด circuit
+      และปฏิเสธ request ทันทีจนกว่าจะครบ reset_timeout
+    - สถานะที่ cache ไว้ถือว่าเก่าเมื่อไม่ได้อัปเดตนานกว่าสองรอบของ interval (เช่น background task ไม่ได้ทำงาน)
+      current() จะ probe ใหม่เฉพาะกรณีนั้น
+    """
+
+    def __init__(
+        self,
+        probe: Callable[[], Awaitable[bool]],
+        interval: float = 30.0,
+        failure_threshold: int = 3,
+        reset_timeout: float = 30.0,
+    ):
+        self._probe = probe
+        self.interval = interval
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.healthy: Optional[bool] = None  # None = ยังไม่เคยตรวจสอบ
+        self.circuit_state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.last_checked_at: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self._opened_at = 0.0
+        self._updated_at: Optional[float] = None  # time.monotonic() ที่สถานะถูกอัปเดตครั้งล่าสุด
+        self._trial_in_flight = False
+        self._task: Optional[asyncio.Task] = None
+
+    # ---- circuit breaker ----
+
+    def allow_request(self) -> bool:
+        """ตรวจว่าควรส่ง request ไปที่ Ollama หรือไม่ (fail fast เมื่อ circuit เปิด)"""
+        if self.circuit_state == CIRCUIT_CLOSED:
+            return True
+        if self.circuit_state == CIRCUIT_OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                return False
+            self.circuit_state = CIRCUIT_HALF_OPEN
+            self._trial_in_flight = False
+        # half-open: ปล่อยผ่านเพียง request เดียวเพื่อทดสอบ
+        if self._trial_in_flight:
+            return False
+        self._trial_in_flight = True
+        return True
+
+    def record_success(self):
+        if self.circuit_state != CIRCUIT_CLOSED:
+            logger.info("Ollama recovered, closing circuit")
+        self.healthy = True
+        self.circuit_state = CIRCUIT_CLOSED
+        self.consecutive_failures = 0
+        self.last_error = None
+        self._trial_in_flight = False
+        self.last_checked_at = datetime.now(timezone.utc)
+        self._updated_at = time.monotonic()
+
+    def record_failure(self, error: str, trip: bool = False):
+        """บันทึกความล้มเหลว trip=True จะเปิด circuit ทันที (ใช้กับผล probe)"""
+        self.healthy = False
+        self.consecutive_failures += 1
+        self.last_error = error
+        self._trial_in_flight = False
+        self.last_checked_at = datetime.now(timezone.utc)
+        self._updated_at = time.monotonic()
+        if (
+            trip
+            or self.circuit_state == CIRCUIT_HALF_OPEN
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            if self.circuit_state != CIRCUIT_OPEN:
+                logger.warning(f"Opening Ollama circuit after {self.consecutive_failures} failure(s): {error}")
+            self.circuit_state = CIRCUIT_OPEN
+            self._opened_at = time.monotonic()
+
+    # ---- active health check ----
+
+    async def refresh(self) -> bool:
+        """probe Ollama หนึ่งครั้งและอัปเดตสถานะ"""
+        try:
+            ok = await self._probe()
+        except Exception as e:
+            ok = False
+            error = str(e)
+        else:
+            error = "health probe failed"
+        if ok:
+            self.record_success()
+        else:
+            self.record_failure(error, trip=True)
+        return ok
+
+    def is_stale(self) -> bool:
+        """ยังไม่เคยตรวจ หรือสถานะไม่ได้อัปเดต (ทั้ง probe และผล generate จริง) นานกว่าสองรอบของ interval"""
+        return self._updated_at is None or time.monotonic() - self._updated_at >= 2 * self.interval
+
+    async def current(self) -> bool:
+        """สถานะสุขภาพที่ cache ไว้ probe ใหม่เฉพาะเมื่อสถานะเก่าเกินไป"""
+        if self.is_stale():
+            await self.refresh()
+        return bool(self.healthy)
+
+    async def _run(self):
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "healthy": bool(self.healthy),
+            "circuit_state": self.circuit_state,
+            "consecutive_failures": self.consecutive_failures,
+            "last_checked_at": self.last_checked_at.isoformat() if self.last_checked_at else None,
+            "last_error": self.last_error,
+        }
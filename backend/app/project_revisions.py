@@ -0,0 +1,205 @@
+"""
+ประวัติ revision ของ Project.diagram_data
+
+ทุกการบันทึกแผนผัง (PUT/PATCH) เพิ่มหนึ่งแถวใน project_revisions ภายใน transaction เดียวกับการแก้ project
+เก็บ snapshot เต็มทุก ๆ DIAGRAM_SNAPSHOT_INTERVAL revision ระหว่างนั้นเก็บเฉพาะ node/edge delta จาก revision ก่อนหน้า
+(รูปแบบเดียวกับ PATCH /projects/{id}) พื้นที่ที่ใช้จึงโตตามขนาดการแก้ไข ไม่ใช่ขนาดแผนผัง × จำนวนครั้งที่บันทึก
+
+การสร้าง revision ใดก็ตามอ่านเฉพาะแถว base_revision..revision (ไม่เกิน interval แถว) แล้วใช้ delta ต่อจาก snapshot
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session, defer
+
+from . import analysis_cache, diagram_patch, fast_json, models
+from .config import settings
+
+KIND_SNAPSHOT = "snapshot"
+KIND_DELTA = "delta"
+
+
+def parse_document(diagram_data: Optional[str]) -> Any:
+    try:
+        return diagram_patch.load_document(diagram_data)
+    except diagram_patch.PatchError:
+        return None  # diagram_data ที่ไม่ใช่ JSON เก็บเป็น snapshot เสมอ
+
+
+def document_topology_hash(document: Any) -> Optional[str]:
+    if not isinstance(document, dict):
+        return None
+    try:
+        return analysis_cache.topology_hash(document.get("nodes") or [], document.get("edges") or [])
+    except (AttributeError, TypeError):
+        return None
+
+
+def latest_revision(db: Session, project_id: int) -> Optional[models.ProjectRevision]:
+    return db.query(models.ProjectRevision).options(defer(models.ProjectRevision.data)).filter(
+        models.ProjectRevision.project_id == project_id
+    ).order_by(models.ProjectRevision.revision.desc()).first()
+
+
+def _snapshot(project: models.Project, revision: int, diagram_data: Optional[str], document: Any, summary: Dict[str, int], content_hash: Optional[str]):
+    return models.ProjectRevision(
+        project_id=project.id,
+        revision=revision,
+        kind=KIND_SNAPSHOT,
+        base_revision=revision,
+        data=diagram_data,
+        content_hash=content_hash,
+        topology_hash=document_topology_hash(document),
+        changed_count=summary["node_count"] + summary["edge_count"],
+        **summary,
+    )
+
+
+def record_revision(
+    db: Session,
+    project: models.Project,
+    previous_data: Optional[str],
+    diagram_data: Optional[str],
+    summary: Dict[str, int],
+    content_hash: Optional[str],
+    document: Any = None,
+    interval: Optional[int] = None,
+) -> models.ProjectRevision:
+    """
+    เพิ่ม revision ของ diagram_data ใหม่ลงใน session (ผู้เรียก commit พร้อมการแก้ project)
+
+    previous_data คือ diagram_data ก่อนบันทึก ใช้คำนวณ delta และเป็น revision แรกของ project เดิมที่ยังไม่มีประวัติ
+    เก็บเป็น snapshot เมื่อ delta แทนไม่ได้ ห่างจาก snapshot ล่าสุดครบ interval หรือ delta ใหญ่เกินครึ่งของแผนผัง
+    """
+    interval = max(1, interval or settings.DIAGRAM_SNAPSHOT_INTERVAL)
+    if document is None:
+        document = parse_document(diagram_data)
+    last = latest_revision(db, project.id)
+    if last is None and previous_data:
+        # project ที่สร้างก่อนมีประวัติ: เก็บสถานะเดิมเป็น revision แรก
+        from .crud import diagram_summary  # crud import โมดูลนี้
+        previous_document = parse_document(previous_data)
+        last = _snapshot(project, 1, previous_data, previous_document, diagram_summary(previous_data, previous_document), None)
+        db.add(last)
+    else:
+        previous_document = parse_document(previous_data) if last is not None else None
+
+    if last is None:
+        revision = _snapshot(project, 1, diagram_data, document, summary, content_hash)
+    else:
+        number = last.revision + 1
+        diff = None
+        if number - last.base_revision < interval and previous_document is not None:
+            diff = diagram_patch.diff_documents(previous_document, document)
+        delta = fast_json.dumps(diff) if diff is not None else None
+        if delta is None or len(delta) * 2 >= summary["diagram_size"]:
+            revision = _snapshot(project, number, diagram_data, document, summary, content_hash)
+        else:
+            revision = models.ProjectRevision(
+                project_id=project.id,
+                revision=number,
+                kind=KIND_DELTA,
+                base_revision=last.base_revision,
+                data=delta,
+                content_hash=content_hash,
+                topology_hash=document_topology_hash(document),
+                changed_count=sum(len(part) for changes in diff.values() for part in changes.values()),
+                **summary,
+            )
+    db.add(revision)
+    return revision
+
+
+def record_initial_revision(db: Session, project: models.Project) -> models.ProjectRevision:
+    """revision 1 ของ project ที่เพิ่งสร้าง (project ต้อง flush แล้วเพื่อให้มี id)"""
+    document = parse_document(project.diagram_data)
+    summary = {"node_count": project.node_count or 0, "edge_count": project.edge_count or 0, "diagram_size": project.diagram_size or 0}
+    revision = _snapshot(project, 1, project.diagram_data, document, summary, project.content_hash)
+    db.add(revision)
+    return revision
+
+
+def list_revisions(db: Session, project_id: int, before: Optional[int] = None, limit: int = 50) -> List[models.ProjectRevision]:
+    """revision ใหม่สุดก่อน แบบ keyset (revision < before) โดยไม่โหลด data"""
+    query = db.query(models.ProjectRevision).options(defer(models.ProjectRevision.data)).filter(
+        models.ProjectRevision.project_id == project_id
+    )
+    if before is not None:
+        query = query.filter(models.ProjectRevision.revision < before)
+    return query.order_by(models.ProjectRevision.revision.desc()).limit(limit).all()
+
+
+def get_revision(db: Session, project_id: int, revision: int, load_data: bool = False) -> Optional[models.ProjectRevision]:
+    query = db.query(models.ProjectRevision)
+    if not load_data:
+        query = query.options(defer(models.ProjectRevision.data))
+    return query.filter(
+        models.ProjectRevision.project_id == project_id,
+        models.ProjectRevision.revision == revision
+    ).first()
+
+
+def rebuild(chain: List[models.ProjectRevision]) -> Any:
+    """
+    เอกสารของ revision สุดท้ายใน chain (เรียงตาม revision เริ่มที่ snapshot)
+    คืน diagram_data เดิมเป็น str ถ้า revision สุดท้ายเป็น snapshot ที่ไม่ใช่ JSON
+    """
+    document = None
+    for row in chain:
+        if row.kind == KIND_SNAPSHOT:
+            document = parse_document(row.data)
+            if document is None and row is chain[-1]:
+                return row.data
+        else:
+            document = diagram_patch.apply_topology_diff(document, fast_json.loads(row.data))
+    return document
+
+
+def revision_chain(db: Session, target: models.ProjectRevision) -> List[models.ProjectRevision]:
+    return db.query(models.ProjectRevision).filter(
+        models.ProjectRevision.project_id == target.project_id,
+        models.ProjectRevision.revision >= target.base_revision,
+        models.ProjectRevision.revision <= target.revision
+    ).order_by(models.ProjectRevision.revision).all()
+
+
+def revision_diagram_data(db: Session, target: models.ProjectRevision) -> Optional[str]:
+    """diagram_data ของ revision (snapshot คืนค่าที่เก็บไว้ตรง ๆ delta สร้างจาก snapshot ต้น chain)"""
+    if target.kind == KIND_SNAPSHOT:
+        return db.query(models.ProjectRevision.data).filter(models.ProjectRevision.id == target.id).scalar()
+    document = rebuild(revision_chain(db, target))
+    return document if isinstance(document, str) else fast_json.dumps(document)
+
+
+def diff_revisions(db: Session, project_id: int, from_revision: int, to_revision: int) -> Optional[Dict[str, Any]]:
+    """
+    node/edge delta จาก from_revision ไป to_revision
+    revision ที่ติดกันและเก็บเป็น delta ใช้ข้อมูลที่เก็บไว้โดยไม่ต้องสร้างแผนผัง
+    คืน None ถ้าไม่พบ revision และ raise diagram_patch.PatchError ถ้าแผนผังเทียบเป็น delta ไม่ได้
+    """
+    older = get_revision(db, project_id, from_revision)
+    newer = get_revision(db, project_id, to_revision)
+    if older is None or newer is None:
+        return None
+    if to_revision == from_revision + 1 and newer.kind == KIND_DELTA:
+        return fast_json.loads(db.query(models.ProjectRevision.data).filter(models.ProjectRevision.id == newer.id).scalar())
+
+    if older.base_revision == newer.base_revision and from_revision <= to_revision:
+        # chain เดียวกัน: อ่านแถวครั้งเดียว (rebuild parse snapshot ใหม่ทุกครั้ง สองเอกสารจึงไม่ใช้ object ร่วมกัน)
+        chain = revision_chain(db, newer)
+        old_document = rebuild([row for row in chain if row.revision <= from_revision])
+        new_document = rebuild(chain)
+    else:
+        old_document = rebuild(revision_chain(db, older))
+        new_document = rebuild(revision_chain(db, newer))
+    diff = diagram_patch.diff_documents(old_document, new_document, keep_order=False)
+    if diff is None:
+        raise diagram_patch.PatchError("แผนผังของสอง revision นี้เทียบเป็น node/edge delta ไม่ได้")
+    return diff
+
+
+def revision_for_topology(db: Session, project_id: int, topology_hash: str) -> Optional[models.ProjectRevision]:
+    """revision ล่าสุดของ project ที่มีแผนผัง (ไม่นับ layout) ตรงกับ topology_hash"""
+    return db.query(models.ProjectRevision).options(defer(models.ProjectRevision.data)).filter(
+        models.ProjectRevision.project_id == project_id,
+        models.ProjectRevision.topology_hash == topology_hash
+    ).order_by(models.ProjectRevision.revision.desc()).first()
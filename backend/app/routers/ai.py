@@ -1,16 +1,73 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
-from .. import schemas, auth, models
-from ..database import get_db
-from ..ai_service import analyzer
+from typing import List, Optional
+from .. import schemas, auth, models, crud
+from ..database import get_db, SessionLocal
+from ..ai_service import AnalysisResult, analyzer
+from ..rule_engine import RULE_ENGINE_MODEL
+from ..analysis_jobs import job_queue, FINISHED_STATUSES
+from ..batch_analysis import batch_runner
+from ..topology_state import TopologyState, topology_states
+from ..config import settings
+from ..json_response import FastJSONRoute
+from .. import fast_json
+from ..admission import QueueFullError, PRIORITY_INTERACTIVE, PRIORITY_BACKGROUND
 import logging
-import json
 import time
 
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+def _release_db(db: Session):
+    """
+    คืน connection ของ session ที่ใช้ตรวจสอบ token ให้ pool ก่อนรอ LLM หลายนาที
+    ข้อมูลที่โหลดไว้แล้ว (เช่น current_user.id) ยังอ่านได้หลังปิด session
+    """
+    db.close()
+
+def _queue_full(e: QueueFullError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=f"AI กำลังประมวลผลคำขออื่นอยู่ กรุณาลองใหม่ภายหลัง ({e.reason})",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def _analysis_failed(result: AnalysisResult) -> HTTPException:
+    """AI ตอบไม่สำเร็จ (Ollama ล่ม, timeout, circuit เปิด) ไม่ถือเป็นผลวิเคราะห์"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=result.text
+    )
+
+def _save_history(user_id: int, project_id: Optional[int], nodes, edges, result: AnalysisResult, start_time: float) -> int:
+    """
+    บันทึกประวัติการวิเคราะห์ที่ตอบแบบไม่ streaming ด้วย session ใหม่ (session ของ request ถูกคืนไปแล้ว)
+    คืน id ของประวัติที่บันทึก
+    """
+    model_used = RULE_ENGINE_MODEL if result.rule_based else analyzer.ollama_service.model
+    # แบบไม่ streaming ไม่ได้วัดเวลาถึงข้อความแรก จึงไม่บันทึก time_to_first_token_ms
+    elapsed = time.time() - start_time
+    write_db = SessionLocal()
+    try:
+        analysis_history = crud.create_analysis_history(
+            write_db,
+            user_id=user_id,
+            project_id=project_id,
+            model_used=model_used,
+            nodes=nodes,
+            edges=edges,
+            analysis_result=result.text,
+            execution_time_seconds=int(elapsed),
+            is_cached=result.cached
+        )
+        return analysis_history.id
+    except Exception:
+        write_db.rollback()
+        raise
+    finally:
+        write_db.close()
 
 @router.post("/analyze", response_model=schemas.AIAnalysisResponse)
 async def analyze_network_topology(
@@ -23,71 +80,304 @@ async def analyze_network_topology(
     """
     start_time = time.time()
     
+    # 1. อ่านข้อมูลที่ต้องใช้ แล้วคืน session ก่อนเริ่ม generate
+    user_id = current_user.id
+    _release_db(db)
+    
     try:
-        logger.info(f"AI analysis requested by user {current_user.id}")
+        logger.info(f"AI analysis requested by user {user_id}")
         
-        # เรียกใช้ AI analysis
-        analysis_result = await analyzer.get_ai_analysis(
+        # 2. เรียกใช้ AI analysis โดยไม่ถือ DB connection
+        result = await analyzer.run_analysis(
             nodes=request.nodes,
             edges=request.edges,
-            user_question=request.question
+            user_question=request.question,
+            user_id=user_id,
+            priority=PRIORITY_INTERACTIVE
         )
         
-        # คำนวณเวลาที่ใช้
-        execution_time = int(time.time() - start_time)
-        
-        # สร้าง device types summary
-        device_types = {}
-        for node in request.nodes:
-            device_type = node.get("type", "unknown")
-            device_types[device_type] = device_types.get(device_type, 0) + 1
-        
-        # บันทึกประวัติการวิเคราะห์
-        analysis_history = models.AIAnalysisHistory(
-            user_id=current_user.id,
-            project_id=request.project_id,
-            model_used=analyzer.ollama_service.model,
-            device_count=len(request.nodes),
-            device_types=json.dumps(device_types, ensure_ascii=False),
-            analysis_result=analysis_result,
-            execution_time_seconds=execution_time
-        )
-        
-        db.add(analysis_history)
-        
-        # อัปเดต user total_analyses
-        db.query(models.User).filter(models.User.id == current_user.id).update({
-            "total_analyses": models.User.total_analyses + 1
-        })
+        # 3. AI ตอบไม่สำเร็จ: แจ้ง error โดยไม่บันทึกประวัติและไม่นับเป็นการวิเคราะห์
+        if not result.ok:
+            raise _analysis_failed(result)
         
-        # อัปเดต project analysis_count และ last_analysis_at ถ้ามี project_id
-        if request.project_id:
-            project = db.query(models.Project).filter(
-                models.Project.id == request.project_id,
-                models.Project.owner_id == current_user.id
-            ).first()
-            
-            if project:
-                project.analysis_count += 1
-                project.last_analysis_at = models.bangkok_now()
-        
-        db.commit()
-        db.refresh(analysis_history)
+        # 4. บันทึกประวัติและอัปเดตตัวนับใน transaction สั้น ๆ
+        analysis_id = _save_history(user_id, request.project_id, request.nodes, request.edges, result, start_time)
         
         return schemas.AIAnalysisResponse(
-            analysis=analysis_result,
+            analysis=result.text,
             status="success",
-            analysis_id=analysis_history.id
+            analysis_id=analysis_id
         )
         
+    except QueueFullError as e:
+        raise _queue_full(e)
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
         logger.error(f"AI analysis failed: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"เกิดข้อผิดพลาดในการวิเคราะห์: {str(e)}"
         )
 
+def _sse(event: str, data: dict) -> str:
+    """จัดรูปแบบข้อความ Server-Sent Events"""
+    return f"event: {event}\ndata: {fast_json.dumps(data)}\n\n"
+
+@router.post("/analyze/stream")
+async def analyze_network_topology_stream(
+    request: schemas.AIAnalysisRequest,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    วิเคราะห์แผนผังเครือข่ายด้วย AI แบบ streaming (Server-Sent Events)
+    
+    events: start -> token (หลายครั้ง) -> done หรือ error
+    ประวัติการวิเคราะห์ถูกบันทึกเมื่อ stream จบ
+    """
+    user_id = current_user.id
+    model_used = analyzer.ollama_service.model
+    _release_db(db)
+    logger.info(f"Streaming AI analysis requested by user {user_id}")
+    
+    # ตรวจคิวก่อนเริ่ม stream เพื่อให้ตอบ 429 ได้ (หลังส่ง header แล้วเปลี่ยน status ไม่ได้)
+    # คำถามที่ rule engine ตอบได้ไม่ต้องรอคิว Ollama
+    if not analyzer.rules.classify(request.question):
+        try:
+            analyzer.admission.check_capacity(user_id)
+        except QueueFullError as e:
+            raise _queue_full(e)
+    
+    async def event_stream():
+        start_time = time.perf_counter()
+        time_to_first_token_ms = None
+        parts = []
+        is_cached = False
+        rule_based = False
+        
+        yield _sse("start", {"model": model_used})
+        try:
+            async for chunk in analyzer.stream_ai_analysis(
+                nodes=request.nodes,
+                edges=request.edges,
+                user_question=request.question,
+                user_id=user_id,
+                priority=PRIORITY_INTERACTIVE
+            ):
+                if not chunk.ok:
+                    # AI ตอบไม่สำเร็จ: แจ้ง error โดยไม่บันทึกประวัติ (เหมือนงานใน job queue)
+                    logger.error(f"Streaming AI analysis failed: {chunk.text}")
+                    yield _sse("error", {"detail": chunk.text})
+                    return
+                delta = chunk.text
+                is_cached = is_cached or chunk.cached
+                rule_based = rule_based or chunk.rule_based
+                if time_to_first_token_ms is None:
+                    time_to_first_token_ms = int((time.perf_counter() - start_time) * 1000)
+                    logger.info(f"Time to first token: {time_to_first_token_ms} ms (user {user_id})")
+                parts.append(delta)
+                yield _sse("token", {"content": delta})
+            
+            execution_time = int(time.perf_counter() - start_time)
+            
+            # session ของ dependency ถูกปิดไปแล้วเมื่อเริ่ม stream จึงเปิด session สั้น ๆ สำหรับบันทึกผล
+            write_db = SessionLocal()
+            try:
+                analysis_history = crud.create_analysis_history(
+                    write_db,
+                    user_id=user_id,
+                    project_id=request.project_id,
+                    model_used=RULE_ENGINE_MODEL if rule_based else model_used,
+                    nodes=request.nodes,
+                    edges=request.edges,
+                    analysis_result="".join(parts),
+                    execution_time_seconds=execution_time,
+                    time_to_first_token_ms=time_to_first_token_ms,
+                    is_cached=is_cached
+                )
+                analysis_id = analysis_history.id
+            except Exception:
+                write_db.rollback()
+                raise
+            finally:
+                write_db.close()
+            
+            yield _sse("done", {
+                "status": "success",
+                "analysis_id": analysis_id,
+                "execution_time_seconds": execution_time,
+                "time_to_first_token_ms": time_to_first_token_ms,
+                "cached": is_cached,
+                "rule_based": rule_based
+            })
+        except QueueFullError as e:
+            yield _sse("error", {"detail": e.reason, "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Streaming AI analysis failed: {e}")
+            yield _sse("error", {"detail": f"เกิดข้อผิดพลาดในการวิเคราะห์: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _job_response(job: models.AIAnalysisJob) -> schemas.AIAnalysisJob:
+    response = schemas.AIAnalysisJob.model_validate(job)
+    if job.history is not None:
+        response.analysis = job.history.analysis_result
+    return response
+
+def _get_user_job(db: Session, job_id: str, user_id: int) -> models.AIAnalysisJob:
+    job = db.query(models.AIAnalysisJob).filter(
+        models.AIAnalysisJob.id == job_id,
+        models.AIAnalysisJob.user_id == user_id
+    ).first()
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ไม่พบงานวิเคราะห์"
+        )
+    return job
+
+@router.post("/jobs", response_model=schemas.AIAnalysisJob, status_code=status.HTTP_202_ACCEPTED)
+async def submit_analysis_job(
+    request: schemas.AIAnalysisRequest,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    ส่งงานวิเคราะห์เข้าคิว คืน job id ทันทีโดยไม่รอผลจาก AI
+    """
+    job = job_queue.submit(
+        db,
+        user_id=current_user.id,
+        nodes=request.nodes,
+        edges=request.edges,
+        question=request.question,
+        project_id=request.project_id
+    )
+    logger.info(f"Analysis job {job.id} queued by user {current_user.id}")
+    return _job_response(job)
+
+@router.get("/jobs/{job_id}", response_model=schemas.AIAnalysisJob)
+async def get_analysis_job(
+    job_id: str,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    ดึงสถานะและผลของงานวิเคราะห์ (polling)
+    """
+    job = _get_user_job(db, job_id, current_user.id)
+    return _job_response(job)
+
+@router.get("/jobs/{job_id}/events")
+async def subscribe_analysis_job(
+    job_id: str,
+    timeout: float = 600,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    ติดตามงานวิเคราะห์แบบ Server-Sent Events ส่ง event "status" ครั้งเดียวเมื่องานเสร็จ
+    """
+    job = _get_user_job(db, job_id, current_user.id)
+    initial_status = job.status
+    
+    async def event_stream():
+        yield _sse("status", {"job_id": job_id, "status": initial_status})
+        if initial_status not in FINISHED_STATUSES:
+            finished = await job_queue.wait_for(job_id, timeout=timeout)
+            if not finished:
+                yield _sse("timeout", {"job_id": job_id})
+                return
+        session = SessionLocal()
+        try:
+            final_job = session.get(models.AIAnalysisJob, job_id)
+            yield _sse("status", _job_response(final_job).model_dump(mode="json"))
+        finally:
+            session.close()
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _get_user_batch_run(db: Session, run_id: str, user_id: int) -> models.BatchAnalysisRun:
+    run = db.query(models.BatchAnalysisRun).filter(
+        models.BatchAnalysisRun.id == run_id,
+        models.BatchAnalysisRun.user_id == user_id
+    ).first()
+    if run is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="ไม่พบงานวิเคราะห์แบบ batch"
+        )
+    return run
+
+@router.post("/batch", response_model=schemas.BatchAnalysisRun, status_code=status.HTTP_202_ACCEPTED)
+async def submit_batch_analysis(
+    request: schemas.BatchAnalysisRequest,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    วิเคราะห์โครงสร้างของหลาย project (ทุก project ของผู้ใช้ หรือเฉพาะ project_ids) ใน background
+    ติดตามความคืบหน้าและ throughput ได้ที่ GET /ai/batch/{run_id}
+    """
+    run = batch_runner.create_run(
+        db,
+        user_id=current_user.id,
+        include_llm=request.include_llm,
+        project_ids=request.project_ids
+    )
+    batch_runner.launch(run.id)
+    logger.info(f"Batch analysis run {run.id} started by user {current_user.id}")
+    return run
+
+@router.get("/batch/{run_id}", response_model=schemas.BatchAnalysisRun)
+async def get_batch_analysis(
+    run_id: str,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    สถานะ, จำนวน project ที่วิเคราะห์แล้ว และ diagrams_per_second ของงาน batch
+    """
+    return _get_user_batch_run(db, run_id, current_user.id)
+
+@router.get("/batch/{run_id}/results", response_model=List[schemas.BatchAnalysisResult])
+async def get_batch_analysis_results(
+    run_id: str,
+    after_id: int = 0,
+    limit: int = 100,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    ผลวิเคราะห์ของแต่ละ project เรียงตาม project_id (ส่ง project_id สุดท้ายเป็น after_id เพื่ออ่านหน้าถัดไป)
+    """
+    _get_user_batch_run(db, run_id, current_user.id)
+    rows = db.query(models.BatchAnalysisResult).filter(
+        models.BatchAnalysisResult.run_id == run_id,
+        models.BatchAnalysisResult.project_id > after_id
+    ).order_by(models.BatchAnalysisResult.project_id).limit(min(max(limit, 1), 1000)).all()
+    return [
+        schemas.BatchAnalysisResult(
+            project_id=row.project_id,
+            device_count=row.device_count,
+            connection_count=row.connection_count,
+            issue_count=row.issue_count,
+            analysis=fast_json.loads(row.analysis) if row.analysis else None,
+            llm_result=row.llm_result,
+            error=row.error
+        )
+        for row in rows
+    ]
+
 @router.get("/health")
 async def check_ai_health(
     current_user: schemas.User = Depends(auth.get_current_active_user)
@@ -96,13 +386,20 @@ async def check_ai_health(
     ตรวจสอบสถานะการเชื่อมต่อกับ Ollama
     """
     try:
-        is_healthy = await analyzer.ollama_service.check_ollama_health()
+        health = analyzer.ollama_service.health
+        # อ่านจากสถานะที่ health monitor cache ไว้ probe เองเฉพาะตอนที่ยังไม่เคยตรวจหรือสถานะเก่าเกินไป
+        await health.current()
+        snapshot = health.snapshot()
+        is_healthy = snapshot["healthy"]
         return {
             "status": "healthy" if is_healthy else "unhealthy",
             "ollama_connected": is_healthy,
             "model": analyzer.ollama_service.model,
             "base_url": analyzer.ollama_service.base_url,
-            "api_version": "v1"  # ระบุว่าใช้ v1 API
+            "api_version": "v1",  # ระบุว่าใช้ v1 API
+            "circuit_state": snapshot["circuit_state"],
+            "last_checked_at": snapshot["last_checked_at"],
+            "last_error": snapshot["last_error"]
         }
     except Exception as e:
         logger.error(f"Health check failed: {e}")
@@ -113,31 +410,137 @@ async def check_ai_health(
             "api_version": "v1"
         }
 
+@router.get("/metrics")
+async def get_ai_metrics(
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """
+    สถิติคิวรอ Ollama (concurrency, ความยาวคิว, เวลารอคิว), response cache และเวลาของ topology rule แต่ละข้อ
+    """
+    return {
+        "admission": analyzer.admission.metrics(),
+        "cache": analyzer.cache.stats(),
+        "coalescing": {
+            "in_flight": analyzer.in_flight_generations(),
+            "coalesced_requests": analyzer.coalesced_requests
+        },
+        "rule_answers": analyzer.rule_answers,
+        "topology_rules": analyzer.topology_rules.stats()
+    }
+
+def _get_user_project(db: Session, project_id: int, user_id: int) -> models.Project:
+    project = crud.get_project(db, project_id=project_id, owner_id=user_id)
+    if project is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Project not found")
+    return project
+
+@router.put("/projects/{project_id}/topology", response_model=schemas.TopologyStateResponse)
+def load_topology_state(
+    project_id: int,
+    request: schemas.TopologyStateRequest,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    ส่งแผนผังทั้งหมดเพื่อสร้าง state การวิเคราะห์ของ project (เรียกตอนเปิด project หรือเมื่อ PATCH ตอบ 409)
+    """
+    _get_user_project(db, project_id, current_user.id)
+    key = (current_user.id, project_id)
+    started = time.perf_counter()
+    with topology_states.lock(key):
+        try:
+            state = TopologyState(request.nodes, request.edges, settings.CAPACITY_PER_USER_MBPS * 1e6)
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        previous = topology_states.get(key)
+        if previous is not None:
+            state.version = previous.version + 1
+        summary = state.summary()
+        topology_states.put(key, state)
+    return {
+        "project_id": project_id,
+        "version": state.version,
+        "mode": "full",
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "summary": summary
+    }
+
+@router.patch("/projects/{project_id}/topology", response_model=schemas.TopologyStateResponse)
+def apply_topology_diff(
+    project_id: int,
+    request: schemas.TopologyDiffRequest,
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    อัปเดต state ด้วย diff ของ nodes/edges (added, removed, changed) แล้วคืนผลวิเคราะห์ล่าสุด
+    ใช้สำหรับ feedback ระหว่างแก้ไขแผนผัง โดยไม่ต้องส่งแผนผังทั้งหมดทุกครั้ง
+    """
+    _get_user_project(db, project_id, current_user.id)
+    key = (current_user.id, project_id)
+    started = time.perf_counter()
+    with topology_states.lock(key):
+        state = topology_states.get(key)
+        if state is None or state.version != request.base_version:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Topology state is missing or out of date, send the full diagram with PUT"
+            )
+        try:
+            mode = state.apply_diff(request.diff.model_dump())
+        except ValueError as e:
+            # diff ถูกใช้ไปบางส่วนแล้ว state ไม่น่าเชื่อถือ ให้ client ส่งแผนผังทั้งหมดใหม่
+            topology_states.discard(key)
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        summary = state.summary()
+    return {
+        "project_id": project_id,
+        "version": state.version,
+        "mode": mode,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+        "summary": summary
+    }
+
 @router.post("/suggest-improvements", response_model=schemas.AIAnalysisResponse)
 async def suggest_network_improvements(
     topology_data: schemas.NetworkTopologyData,
-    current_user: schemas.User = Depends(auth.get_current_active_user)
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
 ):
     """
     ขอคำแนะนำในการปรับปรุงแผนผังเครือข่าย
     """
+    start_time = time.time()
+    user_id = current_user.id
+    _release_db(db)
+    
     try:
-        logger.info(f"Improvement suggestions requested by user {current_user.id}")
+        logger.info(f"Improvement suggestions requested by user {user_id}")
         
         # สร้าง prompt เฉพาะสำหรับการปรับปรุง
         improvement_prompt = "ให้คำแนะนำในการปรับปรุงแผนผังเครือข่ายนี้ โดยพิจารณาจากประสิทธิภาพ ความปลอดภัย และความน่าเชื่อถือ"
         
-        analysis_result = await analyzer.get_ai_analysis(
+        result = await analyzer.run_analysis(
             nodes=topology_data.nodes,
             edges=topology_data.edges,
-            user_question=improvement_prompt
+            user_question=improvement_prompt,
+            user_id=user_id,
+            priority=PRIORITY_BACKGROUND
         )
+        if not result.ok:
+            raise _analysis_failed(result)
+        analysis_id = _save_history(user_id, topology_data.project_id, topology_data.nodes, topology_data.edges, result, start_time)
         
         return schemas.AIAnalysisResponse(
-            analysis=analysis_result,
-            status="success"
+            analysis=result.text,
+            status="success",
+            analysis_id=analysis_id
         )
         
+    except QueueFullError as e:
+        raise _queue_full(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Improvement suggestions failed: {e}")
         raise HTTPException(
@@ -148,28 +551,43 @@ async def suggest_network_improvements(
 @router.post("/security-analysis", response_model=schemas.AIAnalysisResponse)
 async def analyze_network_security(
     topology_data: schemas.NetworkTopologyData,
-    current_user: schemas.User = Depends(auth.get_current_active_user)
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
 ):
     """
     วิเคราะห์ความปลอดภัยของแผนผังเครือข่าย
     """
+    start_time = time.time()
+    user_id = current_user.id
+    _release_db(db)
+    
     try:
-        logger.info(f"Security analysis requested by user {current_user.id}")
+        logger.info(f"Security analysis requested by user {user_id}")
         
         # สร้าง prompt เฉพาะสำหรับการวิเคราะห์ความปลอดภัย
         security_prompt = "วิเคราะห์ความปลอดภัยของแผนผังเครือข่ายนี้ และระบุจุดอ่อนที่อาจเกิดขึ้น พร้อมคำแนะนำในการแก้ไข"
         
-        analysis_result = await analyzer.get_ai_analysis(
+        result = await analyzer.run_analysis(
             nodes=topology_data.nodes,
             edges=topology_data.edges,
-            user_question=security_prompt
+            user_question=security_prompt,
+            user_id=user_id,
+            priority=PRIORITY_BACKGROUND
         )
+        if not result.ok:
+            raise _analysis_failed(result)
+        analysis_id = _save_history(user_id, topology_data.project_id, topology_data.nodes, topology_data.edges, result, start_time)
         
         return schemas.AIAnalysisResponse(
-            analysis=analysis_result,
-            status="success"
+            analysis=result.text,
+            status="success",
+            analysis_id=analysis_id
         )
         
+    except QueueFullError as e:
+        raise _queue_full(e)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Security analysis failed: {e}")
         raise HTTPException(
@@ -179,13 +597,14 @@ async def analyze_network_security(
 
 @router.get("/models")
 async def get_available_models(
+    refresh: bool = False,
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
     """
-    ดึงรายการ models ที่มีใน Ollama
+    ดึงรายการ models ที่มีใน Ollama (refresh=true เพื่อข้าม cache)
     """
     try:
-        models = await analyzer.ollama_service.get_available_models()
+        models = await analyzer.ollama_service.get_available_models(force_refresh=refresh)
         return {
             "models": models,
             "current_model": analyzer.ollama_service.model,
@@ -218,11 +637,10 @@ async def set_model(
         
         logger.info(f"Attempting to set model to: {model_name}")
         
-        # ตรวจสอบว่า model มีอยู่จริงใน Ollama
-        available_models = await analyzer.ollama_service.get_available_models()
-        logger.info(f"Available models: {available_models}")
-        
+        # ตรวจสอบว่า model มีอยู่จริงใน Ollama (ใช้ cache ดึงใหม่อย่างมากหนึ่งครั้ง)
         if not await analyzer.ollama_service.validate_model(model_name):
+            available_models = await analyzer.ollama_service.get_available_models()
+            logger.info(f"Available models: {available_models}")
             raise HTTPException(
                 status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
                 detail=f"Model '{model_name}' ไม่พบใน Ollama. Models ที่มีอยู่: {', '.join(available_models)}"
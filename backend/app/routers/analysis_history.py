@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func, text
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
 import json
 
-from .. import models, schemas_enhanced as schemas, auth
+from .. import models, schemas_enhanced as schemas, auth, analysis_search
 from ..database import get_db
 
 router = APIRouter()
@@ -27,7 +28,9 @@ async def create_analysis_history(
             device_count=analysis.device_count,
             device_types=analysis.device_types,
             analysis_result=analysis.analysis_result,
-            execution_time_seconds=analysis.execution_time_seconds
+            execution_time_seconds=analysis.execution_time_seconds,
+            time_to_first_token_ms=analysis.time_to_first_token_ms,
+            is_cached=analysis.is_cached
         )
         
         db.add(db_analysis)
@@ -87,6 +90,36 @@ async def get_analysis_history(
     
     return analyses
 
+@router.get("/search", response_model=List[schemas.AnalysisSearchHit])
+async def search_analysis_history(
+    q: str = Query(..., min_length=1, max_length=200),
+    project_id: Optional[int] = Query(None),
+    model_filter: Optional[str] = Query(None),
+    sort: str = Query(analysis_search.SORT_RELEVANCE, pattern="^(relevance|recent)$"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: schemas.User = Depends(auth.get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    ค้นหาข้อความในผลการวิเคราะห์ AI (เช่น "VLAN", "คอขวด") เรียงตามความเกี่ยวข้องหรือใหม่สุดก่อน พร้อม snippet
+    ใช้ดัชนี FTS5 แทน LIKE '%...%' ทั้งตาราง
+    """
+    if not analysis_search.available():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="การค้นหาประวัติการวิเคราะห์ไม่พร้อมใช้งาน (ต้องใช้ SQLite ที่มี FTS5 trigram)"
+        )
+    if analysis_search.match_query(q) is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"คำค้นต้องยาวอย่างน้อย {analysis_search.MIN_TERM_CHARS} ตัวอักษร"
+        )
+    return analysis_search.search(
+        db, user_id=current_user.id, query=q, project_id=project_id, model_filter=model_filter,
+        sort=sort, skip=skip, limit=limit
+    )
+
 @router.get("/{analysis_id}", response_model=schemas.AIAnalysisHistory)
 async def get_analysis_by_id(
     analysis_id: int,
@@ -180,27 +213,37 @@ async def get_analysis_stats(
     # Most used model
     most_used_model_result = db.query(
         models.AIAnalysisHistory.model_used,
-        db.func.count(models.AIAnalysisHistory.model_used).label('count')
+        func.count(models.AIAnalysisHistory.model_used).label('count')
     ).filter(
         models.AIAnalysisHistory.user_id == current_user.id,
         models.AIAnalysisHistory.created_at >= from_date
-    ).group_by(models.AIAnalysisHistory.model_used).order_by(db.text('count DESC')).first()
+    ).group_by(models.AIAnalysisHistory.model_used).order_by(text('count DESC')).first()
     
     most_used_model = most_used_model_result[0] if most_used_model_result else None
     
     # Average execution time
     avg_execution_time = db.query(
-        db.func.avg(models.AIAnalysisHistory.execution_time_seconds)
+        func.avg(models.AIAnalysisHistory.execution_time_seconds)
     ).filter(
         models.AIAnalysisHistory.user_id == current_user.id,
         models.AIAnalysisHistory.created_at >= from_date,
         models.AIAnalysisHistory.execution_time_seconds.isnot(None)
     ).scalar()
     
+    # Average time to first token (latency หลักที่ผู้ใช้รู้สึก)
+    avg_time_to_first_token = db.query(
+        func.avg(models.AIAnalysisHistory.time_to_first_token_ms)
+    ).filter(
+        models.AIAnalysisHistory.user_id == current_user.id,
+        models.AIAnalysisHistory.created_at >= from_date,
+        models.AIAnalysisHistory.time_to_first_token_ms.isnot(None)
+    ).scalar()
+    
     return {
         "period_days": days,
         "total_analyses": total_analyses,
         "most_used_model": most_used_model,
         "average_execution_time_seconds": int(avg_execution_time) if avg_execution_time else None,
+        "average_time_to_first_token_ms": int(avg_time_to_first_token) if avg_time_to_first_token else None,
         "total_lifetime_analyses": current_user.total_analyses
     }
\ No newline at end of file
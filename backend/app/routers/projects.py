@@ -1,52 +1,240 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session
-from typing import List
-from .. import crud, schemas, auth
+from typing import Any, Dict, List, Optional, Union
+from .. import crud, schemas, auth, diagram_patch, diagram_store, device_search, project_revisions
 from ..database import get_db
+from ..json_response import FastJSONRoute
 
-router = APIRouter()
+router = APIRouter(route_class=FastJSONRoute)
+
+def _etag(project) -> str:
+    content_hash = project.content_hash or crud.project_content_hash(project.name, project.description, project.diagram_data)
+    return f'"{content_hash}"'
+
+def _etag_headers(project) -> dict:
+    # no-cache: browser เก็บ response ไว้แต่ต้องถามด้วย If-None-Match ทุกครั้ง (ได้ 304 ถ้าไม่เปลี่ยน)
+    return {"ETag": _etag(project), "Cache-Control": "private, no-cache"}
+
+def _etag_list(header: str) -> List[str]:
+    return [value.strip() for value in header.split(",") if value.strip()]
+
+def _if_match_hash(if_match: Optional[str]) -> Optional[str]:
+    """content_hash ที่ client คาดหวังจาก If-Match (None = ไม่มีเงื่อนไข หรือ *)"""
+    if if_match is None:
+        return None
+    values = _etag_list(if_match)
+    if "*" in values:
+        return None
+    # If-Match ใช้ strong comparison เท่านั้น weak ETag (W/"...") ไม่มีทางตรง
+    strong = [value for value in values if not value.startswith("W/")]
+    return strong[0].strip('"') if strong else ""
+
+def _precondition_failed(current_hash: Optional[str]) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="โปรเจกต์ถูกแก้ไขจากที่อื่นแล้ว กรุณาโหลดโปรเจกต์ใหม่ก่อนบันทึก",
+        headers={"ETag": f'"{current_hash}"'} if current_hash else None
+    )
 
 @router.post("/", response_model=schemas.Project)
 def create_project(
     project: schemas.ProjectCreate,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
-    return crud.create_project(db=db, project=project, owner_id=current_user.id)
+    db_project = crud.create_project(db=db, project=project, owner_id=current_user.id)
+    response.headers.update(_etag_headers(db_project))
+    return db_project
 
-@router.get("/", response_model=List[schemas.Project])
+@router.get("/", response_model=List[schemas.ProjectSummary])
 def read_projects(
-    skip: int = 0,
-    limit: int = 100,
+    after_id: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
-    projects = crud.get_user_projects(db, owner_id=current_user.id, skip=skip, limit=limit)
+    """รายการ project เรียงตาม id (หน้าถัดไปใช้ after_id = id สุดท้ายของหน้านี้) ไม่มี diagram_data"""
+    projects = crud.get_user_project_summaries(db, owner_id=current_user.id, after_id=after_id, limit=limit)
     return projects
 
+@router.get("/search", response_model=List[schemas.DeviceSearchHit])
+def search_devices(
+    q: str = Query(..., min_length=1, max_length=200),
+    device_type: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """
+    ค้นหาอุปกรณ์ในทุกโปรเจกต์จาก label, ชนิด, role และ attributes (เช่น IP) คำสุดท้ายค้นแบบขึ้นต้นด้วย
+    ใช้ดัชนี FTS5 ไม่ได้โหลด diagram_data
+    """
+    if not device_search.available():
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="การค้นหาอุปกรณ์ไม่พร้อมใช้งาน (ต้องใช้ SQLite ที่มี FTS5)")
+    return device_search.search(db, owner_id=current_user.id, query=q, device_type=device_type, limit=limit)
+
+@router.get("/devices", response_model=List[schemas.DiagramDevice])
+def find_devices(
+    device_type: Optional[str] = None,
+    role: Optional[str] = None,
+    min_throughput_mbps: Optional[float] = Query(None, ge=0),
+    max_throughput_mbps: Optional[float] = Query(None, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """
+    อุปกรณ์ในทุกโปรเจกต์ที่ตรงเงื่อนไข เช่น ?device_type=firewall หรือ ?max_throughput_mbps=100
+    ค้นได้เฉพาะโปรเจกต์ที่เก็บแบบ normalized (DIAGRAM_STORAGE=normalized หรือผ่าน migrate_normalize_diagram_data.py)
+    """
+    to_bps = lambda mbps: mbps * 1e6 if mbps is not None else None
+    return diagram_store.find_devices(
+        db,
+        owner_id=current_user.id,
+        device_type=device_type,
+        role=role,
+        min_throughput_bps=to_bps(min_throughput_mbps),
+        max_throughput_bps=to_bps(max_throughput_mbps),
+        limit=limit,
+    )
+
 @router.get("/{project_id}", response_model=schemas.Project)
 def read_project(
     project_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
+    """project พร้อม diagram_data ตอบ 304 โดยไม่ส่งแผนผังถ้า If-None-Match ตรงกับ ETag ปัจจุบัน"""
     project = crud.get_project(db, project_id=project_id, owner_id=current_user.id)
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
+    headers = _etag_headers(project)
+    if if_none_match is not None:
+        candidates = _etag_list(if_none_match)
+        # If-None-Match ใช้ weak comparison
+        if "*" in candidates or headers["ETag"] in candidates or f"W/{headers['ETag']}" in candidates:
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
     return project
 
 @router.put("/{project_id}", response_model=schemas.Project)
 def update_project(
     project_id: int,
     project_update: schemas.ProjectUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: schemas.User = Depends(auth.get_current_active_user)
 ):
-    project = crud.update_project(db, project_id=project_id, project_update=project_update, owner_id=current_user.id)
+    """แก้ไข project ถ้าส่ง If-Match มาและ project ถูกแก้ไขไปแล้วจะตอบ 412 แทนการเขียนทับ"""
+    try:
+        project = crud.update_project(
+            db,
+            project_id=project_id,
+            project_update=project_update,
+            owner_id=current_user.id,
+            expected_hash=_if_match_hash(if_match),
+        )
+    except crud.ProjectConflictError as e:
+        raise _precondition_failed(e.current_hash)
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
+    response.headers.update(_etag_headers(project))
     return project
 
+@router.patch("/{project_id}", response_model=schemas.ProjectPatchResult)
+def patch_project(
+    project_id: int,
+    response: Response,
+    patch: Union[List[Dict[str, Any]], schemas.TopologyDiff] = Body(...),
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """
+    แก้ไข diagram_data ด้วย delta แทนการส่งแผนผังทั้งหมด คืน content_hash ใหม่ (ไม่ส่งแผนผังกลับ)
+
+    body เป็น RFC 6902 JSON Patch (array ของ operation บน {"nodes": [...], "edges": [...]})
+    หรือ node/edge delta {"nodes": {"added", "removed", "changed"}, "edges": {...}}
+    """
+    if isinstance(patch, list):
+        apply_patch = lambda document: diagram_patch.apply_json_patch(document, patch)
+    else:
+        diff = patch.model_dump()
+        apply_patch = lambda document: diagram_patch.apply_topology_diff(document, diff)
+    try:
+        project = crud.patch_project_diagram(
+            db,
+            project_id=project_id,
+            owner_id=current_user.id,
+            apply_patch=apply_patch,
+            expected_hash=_if_match_hash(if_match),
+        )
+    except crud.ProjectConflictError as e:
+        if if_match is not None:
+            raise _precondition_failed(e.current_hash)
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="โปรเจกต์ถูกแก้ไขพร้อมกันหลายครั้ง กรุณาลองใหม่")
+    except diagram_patch.PatchTestFailed as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except diagram_patch.PatchError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    response.headers.update(_etag_headers(project))
+    return project
+
+def _require_project(db: Session, project_id: int, owner_id: int):
+    if not crud.owns_project(db, project_id, owner_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+
+@router.get("/{project_id}/revisions", response_model=List[schemas.ProjectRevisionSummary])
+def read_project_revisions(
+    project_id: int,
+    before: Optional[int] = Query(None, ge=1),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """ประวัติแผนผัง ใหม่สุดก่อน (หน้าถัดไปใช้ before = revision สุดท้ายของหน้านี้) ไม่มีข้อมูลแผนผัง"""
+    _require_project(db, project_id, current_user.id)
+    return project_revisions.list_revisions(db, project_id, before=before, limit=limit)
+
+@router.get("/{project_id}/revisions/diff", response_model=schemas.ProjectRevisionDiff)
+def diff_project_revisions(
+    project_id: int,
+    from_revision: int = Query(..., ge=1),
+    to_revision: int = Query(..., ge=1),
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """node/edge delta จาก from_revision ไป to_revision (รูปแบบเดียวกับ body ของ PATCH)"""
+    _require_project(db, project_id, current_user.id)
+    try:
+        diff = project_revisions.diff_revisions(db, project_id, from_revision, to_revision)
+    except diagram_patch.PatchError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+    if diff is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    return {"from_revision": from_revision, "to_revision": to_revision, **diff}
+
+@router.get("/{project_id}/revisions/{revision}", response_model=schemas.ProjectRevision)
+def read_project_revision(
+    project_id: int,
+    revision: int,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_active_user)
+):
+    """diagram_data ของ revision (สร้างจาก snapshot ต้น chain และ delta ที่ตามมา)"""
+    _require_project(db, project_id, current_user.id)
+    db_revision = project_revisions.get_revision(db, project_id, revision)
+    if db_revision is None:
+        raise HTTPException(status_code=404, detail="Revision not found")
+    result = schemas.ProjectRevisionSummary.model_validate(db_revision).model_dump()
+    return {**result, "diagram_data": project_revisions.revision_diagram_data(db, db_revision)}
+
 @router.delete("/{project_id}")
 def delete_project(
     project_id: int,
@@ -0,0 +1,288 @@
+import re
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from .capacity import device_users
+from .topology_rules import sample_labels
+
+# ชื่อที่บันทึกใน model_used ของประวัติเมื่อคำตอบมาจาก rule engine
+RULE_ENGINE_MODEL = "rule-engine"
+
+# คำถามยาวมักมีหลายประเด็นหรือต้องการคำอธิบาย ให้ LLM ตอบ
+MAX_RULE_QUESTION_LENGTH = 160
+
+INTENT_DEVICE_COUNT = "device_count"
+INTENT_LINK_COUNT = "link_count"
+INTENT_USER_COUNT = "user_count"
+INTENT_ISOLATED = "isolated"
+INTENT_DUPLICATES = "duplicates"
+INTENT_CONNECTIVITY = "connectivity"
+INTENT_SPOF = "single_point_of_failure"
+INTENT_CAPACITY = "capacity"
+
+# node type -> คำที่ผู้ใช้ใช้เรียก (คำภาษาอังกฤษจับเป็นคำ ส่วนภาษาไทยจับเป็น substring)
+DEVICE_KEYWORDS = {
+    "switch": ("switch", "switches", "สวิตช์", "สวิทช์", "สวิตซ์"),
+    "router": ("router", "routers", "เราเตอร์", "เร้าเตอร์"),
+    "firewall": ("firewall", "firewalls", "ไฟร์วอลล์", "ไฟร์วอล", "ไฟวอล"),
+    "server": ("server", "servers", "เซิร์ฟเวอร์", "เซิฟเวอร์"),
+    "pc": ("pc", "pcs", "computer", "computers", "คอมพิวเตอร์", "เครื่องลูกข่าย"),
+}
+GENERIC_DEVICE_KEYWORDS = ("device", "devices", "node", "nodes", "อุปกรณ์")
+LINK_KEYWORDS = ("link", "links", "connection", "connections", "cable", "cables", "edge", "edges", "สาย", "การเชื่อมต่อ", "ลิงก์")
+USER_KEYWORDS = ("user", "users", "ผู้ใช้")
+ISOLATED_KEYWORDS = (
+    "isolated", "unconnected", "not connected", "orphan", "disconnected device",
+    "ไม่ได้เชื่อมต่อ", "ไม่มีการเชื่อมต่อ", "ไม่ได้ต่อ", "ไม่ได้เสียบ",
+)
+DUPLICATE_KEYWORDS = ("duplicate", "duplicated", "ซ้ำ")
+CONNECTIVITY_KEYWORDS = (
+    "fully connected", "all connected", "connected component", "segment", "partition",
+    "เชื่อมต่อถึงกัน", "แยกส่วน", "แยกเป็น", "ขาดจากกัน",
+)
+SPOF_KEYWORDS = ("single point of failure", "spof", "articulation", "จุดล้มเหลว", "จุดเสี่ยง", "ไม่มีเส้นทางสำรอง", "no redundancy")
+CAPACITY_KEYWORDS = ("bottleneck", "overload", "oversubscri", "enough bandwidth", "คอขวด", "bandwidth พอ", "bandwidth ไม่พอ", "แบนด์วิดท์พอ", "รับโหลด")
+# คำถามที่ต้องการคำแนะนำหรือคำอธิบาย ส่งให้ LLM เสมอแม้จะมี keyword ด้านบน
+ADVISORY_KEYWORDS = (
+    "why", "how to", "how can", "how do", "how should", "should", "recommend", "suggest", "improve",
+    "explain", "design", "secure", "security", "best", "fix",
+    "ทำไม", "อย่างไร", "ยังไง", "ควร", "แนะนำ", "ปรับปรุง", "อธิบาย", "ออกแบบ", "ความปลอดภัย", "วิธี", "แก้",
+)
+# คำถามเชิงวางแผน/สมมติ ("ต้องใช้ switch กี่ตัว", "if we add a bridge ...") ไม่ได้ถามถึงแผนผังที่มีอยู่ ส่งให้ LLM
+DESIGN_KEYWORDS = (
+    "need", "needed", "require", "required", "plan", "planning", "would", "could", "if", "add", "adding",
+    "expand", "build", "future", "want", "assume", "suppose",
+    "ต้องใช้", "ต้องการ", "ต้องมี", "ถ้า", "หาก", "สมมติ", "เพิ่ม", "ขยาย", "วางแผน", "อยาก", "จะ",
+)
+# อุปกรณ์/แนวคิดที่ analyze_network_topology ไม่ได้วิเคราะห์ คำตอบจาก rule engine จะไม่ตรงคำถาม
+UNMODELED_KEYWORDS = (
+    "bridge", "bridges", "hub", "hubs", "vlan", "vlans", "ring", "mesh", "wireless", "wifi", "wi-fi",
+    "บริดจ์", "ฮับ", "ไร้สาย",
+)
+
+_ascii_word = re.compile(r"^[a-z0-9 ]+$")
+# จุดจบประโยค (จุดที่ตามด้วยช่องว่างเท่านั้น ไม่นับจุดใน IP หรือชื่อ model)
+_sentence_end = re.compile(r"[.!?;](?:\s|$)")
+
+
+def _count_pattern(keywords) -> "re.Pattern[str]":
+    """
+    คำถามนับจำนวนที่คำนับอยู่ติดกับคำนามที่นับเท่านั้น เช่น "how many switches", "number of links",
+    "switch กี่ตัว", "มีอุปกรณ์ทั้งหมดกี่ตัว", "จำนวนสาย" (ไม่จับ "total bandwidth of the switch uplinks")
+    """
+    nouns = "|".join(re.escape(keyword) for keyword in sorted(keywords, key=len, reverse=True))
+    return re.compile(
+        rf"\b(?:how many|number of|count of|total number of)\s+(?:the\s+|all\s+)?(?:{nouns})(?![a-z0-9])"
+        rf"|(?<![a-z0-9])(?:{nouns})\s*(?:ทั้งหมด\s*)?(?:มี\s*)?กี่"
+        rf"|จำนวน\s*(?:ของ\s*)?(?:{nouns})"
+    )
+
+
+DEVICE_COUNT_PATTERN = _count_pattern(
+    [keyword for keywords in DEVICE_KEYWORDS.values() for keyword in keywords] + list(GENERIC_DEVICE_KEYWORDS)
+)
+LINK_COUNT_PATTERN = _count_pattern(LINK_KEYWORDS)
+USER_COUNT_PATTERN = _count_pattern(USER_KEYWORDS)
+
+
+class Intent(NamedTuple):
+    name: str
+    device_types: Tuple[str, ...] = ()
+
+
+def _contains(text: str, keywords) -> bool:
+    for keyword in keywords:
+        if _ascii_word.match(keyword):
+            if re.search(rf"\b{re.escape(keyword)}\b", text):
+                return True
+        elif keyword in text:
+            return True
+    return False
+
+
+def _usage(item: Dict[str, Any]) -> str:
+    # utilization เป็น None เมื่อ capacity เป็น 0 (เช่นสายที่ตั้ง bandwidth เป็น 0)
+    if item["utilization"] is None:
+        return "capacity เป็น 0"
+    return f"ใช้งาน {item['utilization']:.0%}"
+
+
+class RuleEngine:
+    """
+    ตอบคำถามเชิงโครงสร้าง (นับอุปกรณ์, อุปกรณ์ที่ไม่ได้เชื่อมต่อ, สายซ้ำ, single point of failure, คอขวด)
+    จากผลของ analyze_network_topology โดยไม่เรียก LLM
+
+    classify() ตอบเฉพาะคำถามประโยคเดียวที่ตรงรูปแบบเชิงโครงสร้าง (คำถามนับจำนวนต้องมีคำนับติดกับสิ่งที่นับ
+    ส่วนหัวข้ออื่นจับด้วยวลีเฉพาะ) คำถามที่ต้องการคำแนะนำ คำอธิบาย เป็นการวางแผน/สมมติ
+    หรือพูดถึงสิ่งที่ไม่ได้วิเคราะห์ (bridge, VLAN, ...) จะไม่ถูกจับ
+    (คืน list ว่าง) และส่งต่อให้ Ollama พร้อม findings() แทนผลวิเคราะห์แบบเต็ม
+    """
+
+    def __init__(self, sample_limit: int = 10):
+        self.sample_limit = sample_limit
+
+    def classify(self, question: Optional[str]) -> List[Intent]:
+        text = " ".join((question or "").lower().split())
+        if (
+            not text
+            or len(text) > MAX_RULE_QUESTION_LENGTH
+            or len([part for part in _sentence_end.split(text) if part.strip()]) > 1
+            or _contains(text, ADVISORY_KEYWORDS)
+            or _contains(text, DESIGN_KEYWORDS)
+            or _contains(text, UNMODELED_KEYWORDS)
+        ):
+            return []
+
+        intents: List[Intent] = []
+        if _contains(text, ISOLATED_KEYWORDS):
+            intents.append(Intent(INTENT_ISOLATED))
+        elif DEVICE_COUNT_PATTERN.search(text):
+            device_types = tuple(
+                device_type for device_type, keywords in DEVICE_KEYWORDS.items() if _contains(text, keywords)
+            )
+            intents.append(Intent(INTENT_DEVICE_COUNT, device_types))
+        if _contains(text, DUPLICATE_KEYWORDS):
+            intents.append(Intent(INTENT_DUPLICATES))
+        elif LINK_COUNT_PATTERN.search(text):
+            intents.append(Intent(INTENT_LINK_COUNT))
+        if USER_COUNT_PATTERN.search(text):
+            intents.append(Intent(INTENT_USER_COUNT))
+        if _contains(text, CONNECTIVITY_KEYWORDS):
+            intents.append(Intent(INTENT_CONNECTIVITY))
+        if _contains(text, SPOF_KEYWORDS):
+            intents.append(Intent(INTENT_SPOF))
+        if _contains(text, CAPACITY_KEYWORDS):
+            intents.append(Intent(INTENT_CAPACITY))
+        return intents
+
+    # ---- คำตอบ ----
+
+    def answer(self, intents: List[Intent], analysis: Dict[str, Any], nodes: List[Dict]) -> Optional[str]:
+        """คำตอบภาษาไทยสำหรับทุก intent หรือ None ถ้ามี intent ที่ตอบจากข้อมูลที่มีไม่ได้"""
+        parts = []
+        for intent in intents:
+            text = getattr(self, f"_answer_{intent.name}")(intent, analysis, nodes)
+            if text is None:
+                return None
+            parts.append(text)
+        if not parts:
+            return None
+        parts.append("_(ตอบจากการวิเคราะห์โครงสร้างแผนผังโดยอัตโนมัติ ไม่ได้ใช้ AI)_")
+        return "\n\n".join(parts)
+
+    def _answer_device_count(self, intent: Intent, analysis, nodes) -> str:
+        device_types = analysis["device_types"]
+        if intent.device_types:
+            return "\n".join(
+                f"- {device_type}: {device_types.get(device_type, 0)} ตัว" for device_type in intent.device_types
+            )
+        breakdown = ", ".join(f"{device_type} {count}" for device_type, count in sorted(device_types.items()))
+        return f"แผนผังมีอุปกรณ์ทั้งหมด {analysis['device_count']} ตัว ({breakdown})" if breakdown else "แผนผังไม่มีอุปกรณ์"
+
+    def _answer_link_count(self, intent, analysis, nodes) -> str:
+        graph = analysis["graph"]
+        text = f"แผนผังมีการเชื่อมต่อทั้งหมด {analysis['connection_count']} เส้น"
+        notes = []
+        if graph["duplicate_links"]:
+            notes.append(f"ซ้ำซ้อน {graph['duplicate_links']} เส้น")
+        if graph["dangling_links"]:
+            notes.append(f"อ้างถึงอุปกรณ์ที่ไม่มีอยู่ {graph['dangling_links']} เส้น")
+        return text + (f" ({', '.join(notes)})" if notes else "")
+
+    def _answer_user_count(self, intent, analysis, nodes) -> str:
+        pcs = [node for node in nodes if node.get("type") == "pc"]
+        users = sum(device_users(node) for node in pcs)
+        return f"PC {len(pcs)} เครื่อง รองรับผู้ใช้รวม {users} คน (PC ที่ไม่ได้ระบุจำนวนผู้ใช้นับเป็น 1 คน)"
+
+    def _answer_isolated(self, intent, analysis, nodes) -> str:
+        graph = analysis["graph"]
+        if not graph["isolated_devices"]:
+            return "ไม่มีอุปกรณ์ที่ไม่ได้เชื่อมต่อ อุปกรณ์ทุกตัวมีการเชื่อมต่ออย่างน้อยหนึ่งเส้น"
+        return (
+            f"มีอุปกรณ์ที่ไม่ได้เชื่อมต่อ {graph['isolated_devices']} ตัว: "
+            f"{sample_labels(graph['isolated_device_labels'], self.sample_limit, graph['isolated_devices'])}"
+        )
+
+    def _answer_duplicates(self, intent, analysis, nodes) -> str:
+        graph = analysis["graph"]
+        if not graph["duplicate_links"]:
+            return "ไม่มีการเชื่อมต่อซ้ำซ้อน (ไม่มีอุปกรณ์คู่ใดที่ต่อกันมากกว่าหนึ่งเส้น)"
+        return (
+            f"มีการเชื่อมต่อซ้ำซ้อน {graph['duplicate_links']} เส้น: "
+            f"{sample_labels(graph['duplicate_link_labels'], self.sample_limit, graph['duplicate_links'])}"
+        )
+
+    def _answer_connectivity(self, intent, analysis, nodes) -> str:
+        graph = analysis["graph"]
+        segments = graph["segments"]
+        isolated = graph["isolated_devices"]
+        if segments <= 1 and not isolated:
+            return "อุปกรณ์ทั้งหมดเชื่อมต่อถึงกันเป็นเครือข่ายเดียว"
+        if segments <= 1:
+            text = "อุปกรณ์ที่มีการเชื่อมต่ออยู่ในเครือข่ายเดียวกัน"
+        else:
+            text = f"เครือข่ายแยกออกเป็น {segments} ส่วน (ส่วนที่ใหญ่ที่สุดมี {graph['largest_component']} อุปกรณ์)"
+        if isolated:
+            text += (
+                f" แต่มีอุปกรณ์ที่ไม่ได้เชื่อมต่อ {isolated} ตัว: "
+                f"{sample_labels(graph['isolated_device_labels'], self.sample_limit, isolated)}"
+            )
+        return text
+
+    def _answer_single_point_of_failure(self, intent, analysis, nodes) -> str:
+        graph = analysis["graph"]
+        lines = []
+        if graph["critical_devices"]:
+            lines.append(
+                f"- อุปกรณ์ที่เป็นจุดล้มเหลวเดี่ยว {graph['critical_device_count']} ตัว: "
+                f"{sample_labels(graph['critical_devices'], self.sample_limit, graph['critical_device_count'])}"
+            )
+        if graph["backbone_bridges"]:
+            lines.append(
+                f"- สายเชื่อมต่อหลักที่ไม่มีเส้นทางสำรอง {graph['backbone_bridge_count']} เส้น: "
+                f"{sample_labels(graph['backbone_bridges'], self.sample_limit, graph['backbone_bridge_count'])}"
+            )
+        if not lines:
+            return "ไม่พบ single point of failure ในส่วนหลักของเครือข่าย (ไม่นับอุปกรณ์ปลายทางที่ต่อสายเดียว)"
+        return "\n".join(lines)
+
+    def _answer_capacity(self, intent, analysis, nodes) -> Optional[str]:
+        capacity = analysis.get("capacity")
+        if capacity is None:
+            return None  # ไม่มี Core/router หรือไม่มี demand ให้ LLM ตอบจากข้อมูลที่มี
+        lines = [f"demand รวมประมาณ {capacity['total_demand']} ({capacity['per_user']} ต่อผู้ใช้)"]
+        if "satisfied_percent" in capacity:
+            lines.append(f"เครือข่ายรองรับได้ {capacity['deliverable']} ({capacity['satisfied_percent']}%)")
+        for item in capacity["overloaded_links"]:
+            lines.append(f"- สาย {item['link']}: {item['capacity']} < {item['demand']} ({_usage(item)})")
+        for item in capacity["overloaded_devices"]:
+            lines.append(f"- อุปกรณ์ {item['device']}: {item['capacity']} < {item['demand']} ({_usage(item)})")
+        hidden = (
+            capacity["overloaded_link_count"] - len(capacity["overloaded_links"])
+            + capacity["overloaded_device_count"] - len(capacity["overloaded_devices"])
+        )
+        if hidden > 0:
+            lines.append(f"- และอีก {hidden} รายการ")
+        if capacity.get("bottlenecks"):
+            lines.append(f"คอขวด: {', '.join(capacity['bottlenecks'])}")
+        if not capacity["overloaded_link_count"] and not capacity["overloaded_device_count"]:
+            lines.append("ไม่พบสายหรืออุปกรณ์ที่ bandwidth ไม่พอกับ demand")
+        return "\n".join(lines)
+
+    # ---- findings สำหรับ prompt ----
+
+    def findings(self, analysis: Dict[str, Any]) -> List[str]:
+        """ข้อเท็จจริงที่คำนวณแล้วแบบกระชับ ใส่ใน prompt แทนผลวิเคราะห์ทั้งก้อน LLM จะได้ไม่ต้องนับเอง"""
+        graph = analysis["graph"]
+        breakdown = ", ".join(f"{device_type} {count}" for device_type, count in sorted(analysis["device_types"].items()))
+        facts = [
+            f"อุปกรณ์ {analysis['device_count']} ตัว ({breakdown}), การเชื่อมต่อ {analysis['connection_count']} เส้น",
+            f"เครือข่าย {max(graph['segments'], 1)} ส่วน, articulation point {graph['articulation_points']} จุด, bridge {graph['bridges']} เส้น",
+        ]
+        facts.extend(analysis["potential_issues"])
+        capacity = analysis.get("capacity")
+        if capacity is not None and "satisfied_percent" in capacity:
+            facts.append(
+                f"demand รวม {capacity['total_demand']} ({capacity['per_user']} ต่อผู้ใช้), "
+                f"รองรับได้ {capacity['satisfied_percent']}%"
+            )
+        return facts
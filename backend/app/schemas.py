@@ -1,8 +1,21 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List, Dict, Any
+from pydantic import BaseModel, EmailStr, AfterValidator, WithJsonSchema
+from typing import Optional, List, Dict, Any, Annotated
 from datetime import datetime
 from datetime import timezone
 
+def _require_objects(items: List[Any]) -> List[Any]:
+    if not all(isinstance(item, dict) for item in items):
+        raise ValueError("ทุกรายการต้องเป็น object")
+    return items
+
+# nodes/edges ของ React Flow: ตรวจแค่ว่าเป็น list ของ object ไม่สร้าง dict ใหม่ทีละ node แบบ List[Dict[str, Any]]
+# (แผนผัง 10k อุปกรณ์ validation เดิมใช้เวลามากกว่าการวิเคราะห์)
+DiagramItems = Annotated[
+    List[Any],
+    AfterValidator(_require_objects),
+    WithJsonSchema({"type": "array", "items": {"type": "object"}}),
+]
+
 # User Schemas
 class UserBase(BaseModel):
     email: EmailStr
@@ -37,9 +50,12 @@ class ProjectUpdate(BaseModel):
     description: Optional[str] = None
     diagram_data: Optional[str] = None
 
-class Project(ProjectBase):
+class ProjectSummary(ProjectBase):
+    """project ในรายการ (ไม่มี diagram_data ใช้ GET /projects/{id} เพื่อโหลดแผนผัง)"""
     id: int
-    diagram_data: Optional[str] = None
+    node_count: int = 0
+    edge_count: int = 0
+    diagram_size: int = 0
     analysis_count: int = 0
     last_analysis_at: Optional[datetime] = None
     owner_id: int
@@ -52,6 +68,74 @@ class Project(ProjectBase):
             datetime: lambda v: v.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
         }
 
+class Project(ProjectSummary):
+    diagram_data: Optional[str] = None
+    content_hash: Optional[str] = None  # ค่าเดียวกับ ETag ส่งกลับใน If-Match ตอนแก้ไข
+    storage: str = "blob"  # blob หรือ normalized (ดู DIAGRAM_STORAGE)
+
+class ProjectPatchResult(BaseModel):
+    """ผลของ PATCH /projects/{id} (ไม่ส่งแผนผังกลับ)"""
+    id: int
+    content_hash: str
+    node_count: int = 0
+    edge_count: int = 0
+    diagram_size: int = 0
+    updated_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: lambda v: v.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+        }
+
+class DiagramDevice(BaseModel):
+    """อุปกรณ์จากตาราง diagram_nodes (project ที่เก็บแบบ normalized)"""
+    project_id: int
+    node_id: str
+    label: Optional[str] = None
+    device_type: Optional[str] = None
+    role: Optional[str] = None
+    throughput_bps: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class DeviceSearchHit(BaseModel):
+    """ผลค้นหาอุปกรณ์ข้ามโปรเจกต์ (เปิดด้วย project_id แล้วเลือก node_id ในแผนผัง)"""
+    project_id: int
+    project_name: str
+    node_id: str
+    label: Optional[str] = None
+    device_type: Optional[str] = None
+    role: Optional[str] = None
+
+class ProjectRevisionSummary(BaseModel):
+    """revision ในประวัติของแผนผัง (ไม่มีข้อมูลแผนผัง)"""
+    revision: int
+    kind: str  # snapshot หรือ delta
+    base_revision: int
+    content_hash: Optional[str] = None
+    node_count: int = 0
+    edge_count: int = 0
+    diagram_size: int = 0
+    changed_count: int = 0
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+        json_encoders = {
+            datetime: lambda v: v.astimezone(timezone.utc).isoformat().replace('+00:00', 'Z')
+        }
+
+class ProjectRevision(ProjectRevisionSummary):
+    diagram_data: Optional[str] = None
+
+class ProjectRevisionDiff(BaseModel):
+    from_revision: int
+    to_revision: int
+    nodes: Dict[str, List[Any]]
+    edges: Dict[str, List[Any]]
+
 # Token Schemas
 class Token(BaseModel):
     access_token: str
@@ -72,6 +156,8 @@ class AIAnalysisHistoryBase(BaseModel):
     device_types: Optional[str] = None  # JSON string
     analysis_result: str
     execution_time_seconds: Optional[int] = None
+    time_to_first_token_ms: Optional[int] = None
+    is_cached: bool = False
 
 class AIAnalysisHistoryCreate(AIAnalysisHistoryBase):
     project_id: Optional[int] = None
@@ -80,14 +166,15 @@ class AIAnalysisHistory(AIAnalysisHistoryBase):
     id: int
     user_id: int
     project_id: Optional[int] = None
+    revision_id: Optional[int] = None  # revision ของแผนผังที่ถูกวิเคราะห์
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 class AIAnalysisRequest(BaseModel):
-    nodes: List[Dict[str, Any]]
-    edges: List[Dict[str, Any]]
+    nodes: DiagramItems
+    edges: DiagramItems
     question: Optional[str] = ""
     project_id: Optional[int] = None  # เพิ่มเพื่อเชื่อมโยงกับ project
 
@@ -97,7 +184,75 @@ class AIAnalysisResponse(BaseModel):
     analysis_id: Optional[int] = None  # ID ของ analysis ที่เก็บใน database
     timestamp: datetime = datetime.now()
 
+class AIAnalysisJob(BaseModel):
+    id: str
+    status: str  # queued, running, succeeded, failed
+    project_id: Optional[int] = None
+    analysis_id: Optional[int] = None
+    analysis: Optional[str] = None  # ผลการวิเคราะห์เมื่อ status เป็น succeeded
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class TopologyChanges(BaseModel):
+    added: DiagramItems = []
+    removed: List[Any] = []  # id ของ node/edge ที่ถูกลบ
+    changed: DiagramItems = []
+
+class TopologyDiff(BaseModel):
+    nodes: TopologyChanges = TopologyChanges()
+    edges: TopologyChanges = TopologyChanges()
+
+class TopologyStateRequest(BaseModel):
+    nodes: DiagramItems
+    edges: DiagramItems
+
+class TopologyDiffRequest(BaseModel):
+    base_version: int  # version ของ state ที่ diff นี้อ้างอิง ไม่ตรงตอบ 409 ให้ส่งแผนผังทั้งหมดใหม่
+    diff: TopologyDiff
+
+class TopologyStateResponse(BaseModel):
+    project_id: int
+    version: int
+    mode: str  # "full" หรือ "incremental"
+    elapsed_ms: float
+    summary: Dict[str, Any]
+
+class BatchAnalysisRequest(BaseModel):
+    project_ids: Optional[List[int]] = None  # None = ทุก project ของผู้ใช้
+    include_llm: bool = False  # ส่งผลวิเคราะห์ของแต่ละ project ให้ AI ต่อด้วย
+
+class BatchAnalysisRun(BaseModel):
+    id: str
+    status: str  # queued, running, succeeded, failed
+    include_llm: bool
+    processed_count: int = 0
+    failed_count: int = 0
+    elapsed_seconds: Optional[float] = None
+    diagrams_per_second: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class BatchAnalysisResult(BaseModel):
+    project_id: Optional[int] = None
+    device_count: int
+    connection_count: int
+    issue_count: int
+    analysis: Optional[Dict[str, Any]] = None
+    llm_result: Optional[str] = None
+    error: Optional[str] = None
+
 class NetworkTopologyData(BaseModel):
-    nodes: List[Dict[str, Any]]
-    edges: List[Dict[str, Any]]
-    project_name: Optional[str] = None 
\ No newline at end of file
+    nodes: DiagramItems
+    edges: DiagramItems
+    project_name: Optional[str] = None
+    project_id: Optional[int] = None  # เชื่อมประวัติการวิเคราะห์กับ project 
\ No newline at end of file
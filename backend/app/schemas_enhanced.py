@@ -62,6 +62,8 @@ class AIAnalysisHistoryBase(BaseModel):
     device_types: Optional[str] = None  # JSON string
     analysis_result: str
     execution_time_seconds: Optional[int] = None
+    time_to_first_token_ms: Optional[int] = None
+    is_cached: bool = False
 
 class AIAnalysisHistoryCreate(AIAnalysisHistoryBase):
     project_id: Optional[int] = None
@@ -70,11 +72,21 @@ class AIAnalysisHistory(AIAnalysisHistoryBase):
     id: int
     user_id: int
     project_id: Optional[int] = None
+    revision_id: Optional[int] = None  # revision ของแผนผังที่ถูกวิเคราะห์
     created_at: datetime
 
     class Config:
         from_attributes = True
 
+class AnalysisSearchHit(BaseModel):
+    """ผลค้นหาประวัติการวิเคราะห์ (ข้อความเต็มดูได้ที่ GET /analysis-history/{id})"""
+    id: int
+    project_id: Optional[int] = None
+    model_used: str
+    device_count: int
+    created_at: datetime
+    snippet: str  # HTML ที่ escape แล้ว คำที่พบอยู่ใน <mark></mark>
+
 # User Preferences Schemas
 class UserPreferencesBase(BaseModel):
     preferred_ai_model: Optional[str] = None
@@ -0,0 +1,35 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    รวม call ที่ทำงานซ้ำกันพร้อม ๆ กันให้เหลือครั้งเดียว (single-flight)
+
+    caller ที่ใช้ key เดียวกันขณะที่งานแรกยังไม่เสร็จจะรอผลของงานเดียวกัน
+    งานถูกรันเป็น task แยก ถ้า caller คนแรกถูกยกเลิก caller อื่นยังได้ผลตามปกติ
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._inflight
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._done(k, t))
+        return await asyncio.shield(task)
+
+    def _done(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # กัน warning "exception was never retrieved" เมื่อ caller ทุกคนถูกยกเลิกไปก่อน
+        if not task.cancelled():
+            task.exception()
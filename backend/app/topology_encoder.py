@@ -0,0 +1,148 @@
+from collections import Counter
+from typing import Any, Dict, List, Tuple
+
+from . import fast_json
+from .analysis_cache import LAYOUT_ONLY_FIELDS
+
+# เปลี่ยนค่านี้ทุกครั้งที่รูปแบบ output เปลี่ยน (เป็นส่วนหนึ่งของ cache key)
+ENCODER_VERSION = "compact-v1"
+
+# คู่ค่ากับหน่วยที่ frontend เก็บแยกกัน เช่น bandwidth="1000", bandwidthUnit="Mbps"
+UNIT_FIELDS = {
+    "bandwidth": "bandwidthUnit",
+    "maxThroughput": "throughputUnit",
+}
+
+
+def _clean(value: Any) -> str:
+    """แปลงค่าเป็นข้อความบรรทัดเดียวที่ไม่ชนกับตัวคั่นของตาราง"""
+    if isinstance(value, (dict, list)):
+        value = fast_json.dumps(value)
+    return str(value).replace("|", "/").replace("\n", " ").strip()
+
+
+def _merge_units(data: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(data)
+    for field, unit_field in UNIT_FIELDS.items():
+        unit = merged.pop(unit_field, None)
+        value = merged.get(field)
+        if value in (None, ""):
+            merged.pop(field, None)
+            continue
+        text = _clean(value)
+        # ใส่หน่วยต่อท้ายเฉพาะเมื่อค่ายังไม่มีหน่วย (เช่น "1000" + "Mbps" แต่ไม่ใช่ "1 Gbps")
+        if unit and not any(ch.isalpha() for ch in text):
+            text = f"{text}{unit}"
+        merged[field] = text.replace(" ", "")
+    return merged
+
+
+def _node_attributes(node: Dict[str, Any]) -> Dict[str, str]:
+    data = node.get("data") or {}
+    attrs = _merge_units({
+        key: value for key, value in data.items()
+        if key not in LAYOUT_ONLY_FIELDS and key not in ("label", "type")
+    })
+    # ค่า type ใน data ต่างจากของ node (เกิดได้จาก diagram เก่า) จึงเก็บไว้
+    if data.get("type") and data.get("type") != node.get("type"):
+        attrs["dataType"] = data["type"]
+    return {key: _clean(value) for key, value in attrs.items() if value not in (None, "")}
+
+
+def _edge_attributes(edge: Dict[str, Any], labels: Dict[str, str]) -> Dict[str, str]:
+    data = edge.get("data") or {}
+    attrs = _merge_units({
+        key: value for key, value in data.items()
+        if key not in LAYOUT_ONLY_FIELDS
+    })
+    label = attrs.get("label")
+    if label is not None:
+        label_text = _clean(label)
+        source_label = labels.get(edge.get("source"), "")
+        target_label = labels.get(edge.get("target"), "")
+        # label ที่ frontend สร้างอัตโนมัติ ("1000 Mbps" หรือ "A → B") ซ้ำกับข้อมูลที่มีอยู่แล้ว
+        if (
+            label_text.replace(" ", "") == attrs.get("bandwidth")
+            or label_text == f"{source_label} → {target_label}"
+        ):
+            attrs.pop("label")
+    return {key: _clean(value) for key, value in attrs.items() if value not in (None, "")}
+
+
+def _hoist_common(rows: List[Dict[str, str]]) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+    """ดึง attribute ที่ทุกแถวมีค่าเดียวกันออกมาเป็นค่า default (เมื่อมีอย่างน้อย 2 แถว)"""
+    if len(rows) < 2:
+        return {}, rows
+    counts = Counter(pair for row in rows for pair in row.items())
+    common = {key: value for (key, value), count in counts.items() if count == len(rows)}
+    if not common:
+        return {}, rows
+    return common, [
+        {key: value for key, value in row.items() if key not in common}
+        for row in rows
+    ]
+
+
+def _format_attrs(attrs: Dict[str, str]) -> str:
+    return ",".join(f"{key}={value}" for key, value in attrs.items())
+
+
+def encode_topology(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]) -> str:
+    """
+    แปลง nodes/edges ของ React Flow เป็นตารางข้อความแบบกระชับสำหรับใส่ใน prompt
+
+    - ตัด fields ที่เป็น UI/layout (position, style, ...) ออก
+    - แทน id ยาว ๆ ของ React Flow ด้วย alias สั้น (n1, n2, ...)
+    - รวมค่ากับหน่วย (bandwidth + bandwidthUnit) เป็นค่าเดียว
+    - attribute ที่อุปกรณ์ประเภทเดียวกันมีค่าเหมือนกันทั้งหมดถูกเขียนครั้งเดียวในบรรทัด TYPE
+    """
+    aliases: Dict[str, str] = {}
+    labels: Dict[str, str] = {}
+    by_type: Dict[str, List[Tuple[str, str, Dict[str, str]]]] = {}
+    for index, node in enumerate(nodes, start=1):
+        node_id = node.get("id")
+        alias = f"n{index}"
+        aliases[node_id] = alias
+        label = _clean((node.get("data") or {}).get("label", ""))
+        labels[node_id] = label
+        device_type = _clean(node.get("type", "unknown"))
+        by_type.setdefault(device_type, []).append((alias, label, _node_attributes(node)))
+
+    lines = [f"DEVICES {len(nodes)} (alias|label|attrs)"]
+    for device_type, devices in by_type.items():
+        common, rows = _hoist_common([attrs for _, _, attrs in devices])
+        header = f"TYPE {device_type} x{len(devices)}"
+        if common:
+            header += f" {_format_attrs(common)}"
+        lines.append(header)
+        for (alias, label, _), attrs in zip(devices, rows):
+            line = f"{alias}|{label}"
+            if attrs:
+                line += f"|{_format_attrs(attrs)}"
+            lines.append(line)
+
+    edge_rows = [_edge_attributes(edge, labels) for edge in edges]
+    common, edge_rows = _hoist_common(edge_rows)
+    header = f"LINKS {len(edges)} (source-target|attrs)"
+    if common:
+        header += f" default {_format_attrs(common)}"
+    lines.append(header)
+    for edge, attrs in zip(edges, edge_rows):
+        source = aliases.get(edge.get("source"), _clean(edge.get("source")))
+        target = aliases.get(edge.get("target"), _clean(edge.get("target")))
+        line = f"{source}-{target}"
+        if attrs:
+            line += f"|{_format_attrs(attrs)}"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def encode_context(context: Dict[str, Any]) -> str:
+    """แปลง context ทั้งหมด (findings + nodes + edges) เป็นข้อความสำหรับ prompt"""
+    if "nodes" not in context and "edges" not in context:
+        return fast_json.dumps(context)
+    parts = [encode_topology(context.get("nodes") or [], context.get("edges") or [])]
+    extra = {key: value for key, value in context.items() if key not in ("nodes", "edges")}
+    for key, value in extra.items():
+        parts.append(f"{key.upper()} {fast_json.dumps(value)}")
+    return "\n".join(parts)
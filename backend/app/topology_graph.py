@@ -0,0 +1,226 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class TopologyGraph:
+    """
+    ดัชนีกราฟของแผนผังเครือข่าย สร้างครั้งเดียวต่อ request แล้วใช้ร่วมกันทุกการวิเคราะห์
+
+    อุปกรณ์ถูกแทนด้วยเลข index 0..n-1 ส่วน adjacency เก็บเป็นรายการเลข edge ต่ออุปกรณ์
+    ปลายอีกด้านของ edge e จาก u หาได้จาก ends_xor[e] ^ u (ไม่ต้องเก็บ tuple)
+    การวิเคราะห์ทุกตัวเป็น O(V+E) และไม่ใช้ recursion จึงรองรับแผนผังขนาดใหญ่ได้
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]]):
+        self.nodes = nodes
+        self.edges = edges
+        self.ids: List[Any] = [node.get("id") for node in nodes]
+        self.index: Dict[Any, int] = {node_id: i for i, node_id in enumerate(self.ids)}
+        n = len(self.ids)
+
+        self.adjacency: List[List[int]] = [[] for _ in range(n)]
+        self.edge_source: List[int] = []
+        self.edge_target: List[int] = []
+        self.edge_refs: List[int] = []  # ตำแหน่งของ edge ใน list edges เดิม
+        self.ends_xor: List[int] = []
+        self.dangling_edges: List[int] = []  # อ้างถึงอุปกรณ์ที่ไม่มีอยู่
+        self.self_loops: List[int] = []
+        self.duplicate_edges: List[int] = []
+        seen_pairs = set()
+
+        index_get = self.index.get
+        adjacency = self.adjacency
+        edge_source, edge_target = self.edge_source, self.edge_target
+        edge_refs, ends_xor = self.edge_refs, self.ends_xor
+        for position, edge in enumerate(edges):
+            u = index_get(edge.get("source"))
+            v = index_get(edge.get("target"))
+            if u is None or v is None:
+                self.dangling_edges.append(position)
+                continue
+            if u == v:
+                self.self_loops.append(position)
+                continue
+            pair = u * n + v if u < v else v * n + u
+            if pair in seen_pairs:
+                self.duplicate_edges.append(position)
+            else:
+                seen_pairs.add(pair)
+            adjacency[u].append(len(edge_source))
+            adjacency[v].append(len(edge_source))
+            edge_source.append(u)
+            edge_target.append(v)
+            edge_refs.append(position)
+            ends_xor.append(u ^ v)
+
+        self._components: Optional[List[int]] = None
+        self._component_sizes: Optional[List[int]] = None
+        self._cut_result: Optional[Tuple[List[int], List[int], List[int]]] = None
+
+    # ---- ข้อมูลพื้นฐาน ----
+
+    @property
+    def node_count(self) -> int:
+        return len(self.ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.edge_source)
+
+    def degree(self, i: int) -> int:
+        return len(self.adjacency[i])
+
+    def degrees(self) -> List[int]:
+        return [len(edges) for edges in self.adjacency]
+
+    def neighbors(self, i: int) -> List[int]:
+        ends_xor = self.ends_xor
+        return [ends_xor[e] ^ i for e in self.adjacency[i]]
+
+    def node_type(self, i: int) -> str:
+        return self.nodes[i].get("type", "unknown")
+
+    def label(self, i: int) -> str:
+        node = self.nodes[i]
+        return (node.get("data") or {}).get("label") or str(node.get("id"))
+
+    def isolated_nodes(self) -> List[int]:
+        return [i for i, edges in enumerate(self.adjacency) if not edges]
+
+    # ---- connected components ----
+
+    def components(self) -> List[int]:
+        """component id ของแต่ละอุปกรณ์ (iterative DFS)"""
+        if self._components is None:
+            n = self.node_count
+            component = [-1] * n
+            sizes: List[int] = []
+            adjacency, ends_xor = self.adjacency, self.ends_xor
+            for start in range(n):
+                if component[start] != -1:
+                    continue
+                cid = len(sizes)
+                component[start] = cid
+                stack = [start]
+                size = 0
+                while stack:
+                    u = stack.pop()
+                    size += 1
+                    for e in adjacency[u]:
+                        v = ends_xor[e] ^ u
+                        if component[v] == -1:
+                            component[v] = cid
+                            stack.append(v)
+                sizes.append(size)
+            self._components = component
+            self._component_sizes = sizes
+        return self._components
+
+    def component_sizes(self) -> List[int]:
+        self.components()
+        return self._component_sizes
+
+    # ---- articulation points และ bridges ----
+
+    def _cuts(self) -> Tuple[List[int], List[int], List[int]]:
+        """
+        Tarjan แบบ iterative คืน (articulation points, critical articulation points, bridges)
+
+        critical = การเอาอุปกรณ์นั้นออกทำให้เกิดอย่างน้อยสองส่วนที่มีอุปกรณ์ตั้งแต่ 2 ตัวขึ้นไป
+        (ไม่นับกรณีที่แยกออกมาแค่อุปกรณ์ปลายทางเดี่ยว ๆ เช่น PC ที่ต่อกับ access switch)
+        """
+        if self._cut_result is not None:
+            return self._cut_result
+        n = self.node_count
+        adjacency, ends_xor = self.adjacency, self.ends_xor
+        component_sizes = self.component_sizes()
+        component = self.components()
+
+        disc = [-1] * n
+        low = [0] * n
+        subtree = [1] * n
+        parent_edge = [-1] * n
+        pointer = [0] * n
+        separated: Dict[int, List[int]] = {}  # articulation point -> ขนาดของแต่ละส่วนที่ถูกแยก
+        roots = set()  # articulation point ที่เป็น root ของ DFS ไม่มีส่วน "ที่เหลือ" ด้านบน
+        bridges: List[int] = []
+        timer = 0
+
+        for root in range(n):
+            if disc[root] != -1:
+                continue
+            disc[root] = low[root] = timer
+            timer += 1
+            root_children: List[int] = []
+            stack = [root]
+            while stack:
+                u = stack[-1]
+                edges_u = adjacency[u]
+                p = pointer[u]
+                if p < len(edges_u):
+                    pointer[u] = p + 1
+                    e = edges_u[p]
+                    if e == parent_edge[u]:
+                        continue
+                    v = ends_xor[e] ^ u
+                    if disc[v] == -1:
+                        parent_edge[v] = e
+                        disc[v] = low[v] = timer
+                        timer += 1
+                        stack.append(v)
+                    elif disc[v] < low[u]:
+                        low[u] = disc[v]
+                    continue
+                stack.pop()
+                if not stack:
+                    continue
+                w = stack[-1]
+                subtree[w] += subtree[u]
+                if low[u] < low[w]:
+                    low[w] = low[u]
+                if low[u] > disc[w]:
+                    bridges.append(parent_edge[u])
+                if w == root:
+                    root_children.append(subtree[u])
+                elif low[u] >= disc[w]:
+                    separated.setdefault(w, []).append(subtree[u])
+            if len(root_children) > 1:
+                separated[root] = root_children
+                roots.add(root)
+
+        articulation = sorted(separated)
+        critical = []
+        for w in articulation:
+            pieces = separated[w]
+            parts = pieces
+            if w not in roots:
+                parts = pieces + [component_sizes[component[w]] - 1 - sum(pieces)]
+            if sum(1 for size in parts if size >= 2) >= 2:
+                critical.append(w)
+        self._cut_result = (articulation, critical, bridges)
+        return self._cut_result
+
+    def articulation_points(self) -> List[int]:
+        return self._cuts()[0]
+
+    def critical_articulation_points(self) -> List[int]:
+        return self._cuts()[1]
+
+    def bridges(self) -> List[int]:
+        """index ภายในของ edge ที่เป็น bridge (ไม่มีเส้นทางสำรอง)"""
+        return self._cuts()[2]
+
+    def backbone_bridges(self) -> List[int]:
+        """bridge ที่ปลายทั้งสองด้านไม่ใช่อุปกรณ์ปลายทาง (degree มากกว่า 1)"""
+        adjacency = self.adjacency
+        return [
+            e for e in self.bridges()
+            if len(adjacency[self.edge_source[e]]) > 1 and len(adjacency[self.edge_target[e]]) > 1
+        ]
+
+    def edge_data(self, e: int) -> Dict[str, Any]:
+        """edge เดิมของ React Flow ที่ตรงกับ edge ภายใน e"""
+        return self.edges[self.edge_refs[e]]
+
+    def edge_label(self, e: int) -> str:
+        return f"{self.label(self.edge_source[e])} - {self.label(self.edge_target[e])}"
+
@@ -0,0 +1,457 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter, deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .topology_graph import TopologyGraph
+
+logger = logging.getLogger(__name__)
+
+INFRASTRUCTURE_TYPES = ("router", "switch", "firewall")
+HOST_TYPES = ("pc", "server")
+# switch ในบทบาทเหล่านี้มักเป็น managed switch ที่เปิด STP ได้ (หรือระบุ data.stp ที่อุปกรณ์โดยตรง)
+STP_ROLES = ("Core", "Distribution")
+
+
+def sample_labels(labels: Iterable[str], limit: int, total: Optional[int] = None) -> str:
+    """
+    รายชื่อไม่เกิน limit รายการ เพื่อไม่ให้ prompt ยาวเกินไปในแผนผังขนาดใหญ่
+    total คือจำนวนทั้งหมดเมื่อ labels เป็นตัวอย่างที่ตัดมาแล้ว (ค่าเริ่มต้นคือจำนวนของ labels)
+    """
+    items = list(labels)
+    shown = items[:limit]
+    text = ", ".join(shown)
+    remaining = (len(items) if total is None else total) - len(shown)
+    if remaining > 0:
+        text += f" และอีก {remaining} รายการ"
+    return text
+
+
+class RuleContext:
+    """
+    index ที่ rule ใช้ร่วมกันบน TopologyGraph เดียว แต่ละ index สร้างครั้งเดียวเมื่อมี rule ประกาศใน requires
+
+    rule อ่าน index ด้วย ctx["degrees"] ถ้าไม่ได้ประกาศไว้จะได้ KeyError เพื่อให้ requires ตรงกับที่ใช้จริง
+    """
+
+    def __init__(self, graph: TopologyGraph, sample_limit: int = 10):
+        self.graph = graph
+        self.sample_limit = sample_limit
+        self._indexes: Dict[str, object] = {}
+        self.timings_ms: Dict[str, float] = {}
+
+    def build(self, name: str):
+        if name not in self._indexes:
+            builder = getattr(self, f"_build_{name}", None)
+            if builder is None:
+                raise ValueError(f"ไม่รู้จัก index '{name}'")
+            started = time.perf_counter()
+            self._indexes[name] = builder()
+            self.timings_ms[f"index:{name}"] = (time.perf_counter() - started) * 1000
+        return self._indexes[name]
+
+    def __getitem__(self, name: str):
+        try:
+            return self._indexes[name]
+        except KeyError:
+            raise KeyError(f"index '{name}' ไม่ได้ประกาศใน requires ของ rule") from None
+
+    def sample(self, labels: Iterable[str]) -> str:
+        return sample_labels(labels, self.sample_limit)
+
+    # ---- index ที่ใช้ร่วมกัน ----
+
+    def _build_degrees(self) -> List[int]:
+        return self.graph.degrees()
+
+    def _build_types(self) -> Dict[str, List[int]]:
+        """node type -> index ของอุปกรณ์ประเภทนั้น"""
+        by_type: Dict[str, List[int]] = {}
+        for i, node in enumerate(self.graph.nodes):
+            by_type.setdefault(node.get("type", "unknown"), []).append(i)
+        return by_type
+
+    def _build_components(self) -> Tuple[List[int], List[int]]:
+        return self.graph.components(), self.graph.component_sizes()
+
+    def _build_cuts(self) -> Dict[str, List[int]]:
+        graph = self.graph
+        return {
+            "articulation": graph.articulation_points(),
+            "critical": graph.critical_articulation_points(),
+            "bridges": graph.bridges(),
+            "backbone_bridges": graph.backbone_bridges(),
+        }
+
+
+class TopologyRule(ABC):
+    """
+    rule ตรวจแผนผังหนึ่งข้อ
+
+    rule_id ใช้เป็นชื่อใน timing/metrics, requires คือชื่อ index ใน RuleContext ที่ rule อ่าน
+    check() คืนข้อความปัญหา (ภาษาไทย) ที่จะต่อท้าย potential_issues
+    subclass ที่ไม่ได้ implement check() สร้าง instance ไม่ได้ (TypeError) จึงลงทะเบียนไม่ได้ตั้งแต่แรก
+    """
+    rule_id = ""
+    requires: Tuple[str, ...] = ()
+
+    @abstractmethod
+    def check(self, ctx: RuleContext) -> List[str]:
+        ...
+
+
+class RuleReport(NamedTuple):
+    issues: List[str]
+    timings_ms: Dict[str, float]  # rule_id และ index:<name> -> มิลลิวินาที
+    context: RuleContext
+
+
+class TopologyRuleRegistry:
+    """รายการ rule ตามลำดับที่ลงทะเบียน พร้อมสถิติเวลาสะสมของแต่ละ rule"""
+
+    def __init__(self, rules: Optional[List[TopologyRule]] = None):
+        self._rules: List[TopologyRule] = []
+        self._stats: Dict[str, Dict[str, float]] = {}
+        # run ถูกเรียกจาก thread pool (asyncio.to_thread, batch analysis) พร้อมกันได้
+        self._stats_lock = threading.Lock()
+        for rule in rules or []:
+            self.register(rule)
+
+    def register(self, rule: TopologyRule) -> TopologyRule:
+        if not rule.rule_id:
+            raise ValueError("rule ต้องมี rule_id")
+        if any(existing.rule_id == rule.rule_id for existing in self._rules):
+            raise ValueError(f"rule '{rule.rule_id}' ลงทะเบียนไว้แล้ว")
+        for name in rule.requires:
+            if not hasattr(RuleContext, f"_build_{name}"):
+                raise ValueError(f"rule '{rule.rule_id}' ต้องการ index ที่ไม่รู้จัก '{name}'")
+        self._rules.append(rule)
+        with self._stats_lock:
+            self._stats[rule.rule_id] = {"runs": 0, "total_ms": 0.0, "max_ms": 0.0}
+        return rule
+
+    def unregister(self, rule_id: str):
+        self._rules = [rule for rule in self._rules if rule.rule_id != rule_id]
+        with self._stats_lock:
+            self._stats.pop(rule_id, None)
+
+    @property
+    def rules(self) -> List[TopologyRule]:
+        return list(self._rules)
+
+    def run(self, graph: TopologyGraph, sample_limit: int = 10, context: Optional[RuleContext] = None) -> RuleReport:
+        """สร้าง index ที่ทุก rule ต้องการครั้งเดียว แล้วรันทุก rule บน index ชุดเดียวกัน"""
+        ctx = context or RuleContext(graph, sample_limit)
+        for rule in self._rules:
+            for name in rule.requires:
+                ctx.build(name)
+
+        issues: List[str] = []
+        for rule in self._rules:
+            started = time.perf_counter()
+            try:
+                issues.extend(rule.check(ctx))
+            except Exception as e:
+                # rule ที่เสียไม่ควรทำให้การวิเคราะห์ทั้งหมดล้ม
+                logger.error(f"Topology rule {rule.rule_id} failed: {e}")
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            ctx.timings_ms[rule.rule_id] = elapsed_ms
+            with self._stats_lock:
+                stats = self._stats.get(rule.rule_id)
+                if stats is not None:
+                    stats["runs"] += 1
+                    stats["total_ms"] += elapsed_ms
+                    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        return RuleReport(issues, dict(ctx.timings_ms), ctx)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._stats_lock:
+            snapshot = {rule_id: dict(stats) for rule_id, stats in self._stats.items()}
+        return {
+            rule_id: {
+                "runs": int(stats["runs"]),
+                "avg_ms": round(stats["total_ms"] / stats["runs"], 3) if stats["runs"] else 0.0,
+                "max_ms": round(stats["max_ms"], 3),
+            }
+            for rule_id, stats in snapshot.items()
+        }
+
+
+# ---- rule พื้นฐาน ----
+
+class EmptyTopologyRule(TopologyRule):
+    rule_id = "empty_topology"
+
+    def check(self, ctx):
+        return ["ไม่มีอุปกรณ์ในแผนผังเครือข่าย"] if ctx.graph.node_count == 0 else []
+
+
+class NoConnectionsRule(TopologyRule):
+    rule_id = "no_connections"
+
+    def check(self, ctx):
+        graph = ctx.graph
+        return ["อุปกรณ์ไม่มีการเชื่อมต่อกัน"] if not graph.edges and graph.node_count > 1 else []
+
+
+class DuplicateLinksRule(TopologyRule):
+    rule_id = "duplicate_links"
+
+    def check(self, ctx):
+        count = len(ctx.graph.duplicate_edges)
+        return [f"มีการเชื่อมต่อซ้ำซ้อน {count} เส้น"] if count else []
+
+
+class DanglingLinksRule(TopologyRule):
+    rule_id = "dangling_links"
+
+    def check(self, ctx):
+        count = len(ctx.graph.dangling_edges)
+        return [f"มีการเชื่อมต่อที่อ้างถึงอุปกรณ์ที่ไม่มีอยู่ {count} เส้น"] if count else []
+
+
+class SelfLoopsRule(TopologyRule):
+    rule_id = "self_loops"
+
+    def check(self, ctx):
+        count = len(ctx.graph.self_loops)
+        return [f"มีการเชื่อมต่ออุปกรณ์เข้ากับตัวเอง {count} เส้น"] if count else []
+
+
+class IsolatedDevicesRule(TopologyRule):
+    rule_id = "isolated_devices"
+    requires = ("degrees",)
+
+    def check(self, ctx):
+        graph = ctx.graph
+        isolated = [i for i, degree in enumerate(ctx["degrees"]) if degree == 0]
+        if not isolated or graph.node_count <= 1:
+            return []
+        return [f"อุปกรณ์ที่ไม่มีการเชื่อมต่อ {len(isolated)} ตัว: {ctx.sample(graph.label(i) for i in isolated)}"]
+
+
+class DisconnectedSegmentsRule(TopologyRule):
+    rule_id = "disconnected_segments"
+    requires = ("components",)
+
+    def check(self, ctx):
+        # ไม่นับอุปกรณ์เดี่ยวเป็นส่วนแยก เพราะ isolated_devices รายงานไว้แล้ว
+        _, sizes = ctx["components"]
+        segments = sum(1 for size in sizes if size > 1)
+        return [f"เครือข่ายแยกออกเป็น {segments} ส่วนที่ไม่เชื่อมต่อถึงกัน"] if segments > 1 else []
+
+
+class SinglePointOfFailureRule(TopologyRule):
+    rule_id = "single_point_of_failure"
+    requires = ("cuts",)
+
+    def check(self, ctx):
+        critical = ctx["cuts"]["critical"]
+        if not critical:
+            return []
+        return [
+            f"จุดล้มเหลวเดี่ยว (single point of failure) {len(critical)} อุปกรณ์: "
+            f"{ctx.sample(ctx.graph.label(i) for i in critical)}"
+        ]
+
+
+class BackboneBridgesRule(TopologyRule):
+    rule_id = "backbone_bridges"
+    requires = ("cuts",)
+
+    def check(self, ctx):
+        bridges = ctx["cuts"]["backbone_bridges"]
+        if not bridges:
+            return []
+        return [
+            f"สายเชื่อมต่อหลักที่ไม่มีเส้นทางสำรอง {len(bridges)} เส้น: "
+            f"{ctx.sample(ctx.graph.edge_label(e) for e in bridges)}"
+        ]
+
+
+# ---- rule ด้านการออกแบบ ----
+
+class SwitchLoopWithoutStpRule(TopologyRule):
+    """
+    วงวนระหว่าง switch (layer 2) ที่ไม่มี switch ตัวใดรองรับ STP ทำให้เกิด broadcast storm
+
+    ถือว่า switch รองรับ STP เมื่อระบุ data.stp หรือมี deviceRole เป็น Core/Distribution
+    """
+    rule_id = "switch_loop_without_stp"
+    requires = ("types",)
+
+    def check(self, ctx):
+        graph = ctx.graph
+        switches = ctx["types"].get("switch", [])
+        if len(switches) < 2:
+            return []
+        # union-find เฉพาะสายระหว่าง switch โดยไล่จาก adjacency ของ switch (ไม่ต้องสแกนสายทั้งหมด)
+        parent = {i: i for i in switches}
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        switch_links: Dict[int, int] = {}
+        for u in switches:
+            for e in graph.adjacency[u]:
+                v = graph.ends_xor[e] ^ u
+                if v in parent and u < v:
+                    root_u, root_v = find(u), find(v)
+                    if root_u != root_v:
+                        parent[root_u] = root_v
+                    switch_links[e] = u
+        members: Dict[int, List[int]] = {}
+        for i in switches:
+            members.setdefault(find(i), []).append(i)
+        link_counts: Dict[int, int] = {}
+        for u in switch_links.values():
+            root = find(u)
+            link_counts[root] = link_counts.get(root, 0) + 1
+
+        loops = []
+        for root, group in members.items():
+            # component ที่มีจำนวนสายไม่น้อยกว่าจำนวน switch ต้องมีวงวน
+            if link_counts.get(root, 0) >= len(group) and not any(self._stp_capable(graph.nodes[i]) for i in group):
+                loops.append(graph.label(min(group)))
+        if not loops:
+            return []
+        return [f"วงวนระหว่าง switch ที่ไม่มีอุปกรณ์รองรับ STP {len(loops)} กลุ่ม (เช่น {ctx.sample(loops)})"]
+
+    @staticmethod
+    def _stp_capable(node) -> bool:
+        data = node.get("data") or {}
+        return bool(data.get("stp")) or data.get("deviceRole") in STP_ROLES
+
+
+class FirewallNotOnEdgePathRule(TopologyRule):
+    """
+    firewall ที่ traffic ระหว่าง router (ขอบเครือข่าย) กับอุปกรณ์ปลายทางไม่จำเป็นต้องผ่าน
+
+    แบ่งแผนผังเป็นส่วน ๆ โดยตัด firewall ออก แล้วตรวจ firewall แต่ละตัว
+    - มีเส้นทางอ้อม: เพื่อนบ้านสองตัวของ firewall อยู่ในส่วนเดียวกัน
+    - อยู่นอกเส้นทาง: เพื่อนบ้านทั้งหมดอยู่ในส่วนเดียวที่มี router แต่ไม่ได้ต่อกับ router โดยตรง
+    firewall ที่อยู่หน้า router (ต่อกับ router เพียงด้านเดียว) ถือว่าอยู่บนเส้นทางแล้ว
+    """
+    rule_id = "firewall_not_on_edge_path"
+    requires = ("types",)
+
+    def check(self, ctx):
+        graph = ctx.graph
+        types = ctx["types"]
+        firewalls = types.get("firewall", [])
+        if not firewalls or not types.get("router"):
+            return []
+        adjacency, ends_xor = graph.adjacency, graph.ends_xor
+        region = [-1] * graph.node_count
+        for f in firewalls:
+            region[f] = -2
+        has_router: List[bool] = []
+        hosts: List[List[int]] = []
+        for start in range(graph.node_count):
+            if region[start] != -1:
+                continue
+            rid = len(hosts)
+            region[start] = rid
+            stack = [start]
+            members_router, members_hosts = False, []
+            while stack:
+                u = stack.pop()
+                device_type = graph.node_type(u)
+                if device_type == "router":
+                    members_router = True
+                elif device_type in HOST_TYPES:
+                    members_hosts.append(u)
+                for e in adjacency[u]:
+                    v = ends_xor[e] ^ u
+                    if region[v] == -1:
+                        region[v] = rid
+                        stack.append(v)
+            has_router.append(members_router)
+            hosts.append(members_hosts)
+
+        flagged, exposed_regions = [], set()
+        for f in firewalls:
+            neighbors = {ends_xor[e] ^ f for e in adjacency[f]}
+            regions = [region[v] for v in neighbors if region[v] >= 0]
+            bypassed = {r for r, count in Counter(regions).items() if count > 1}
+            off_path = (
+                len(set(regions)) == 1
+                and not any(graph.node_type(v) == "router" for v in neighbors)
+            )
+            affected = {r for r in (bypassed or (set(regions) if off_path else ())) if has_router[r] and hosts[r]}
+            if affected:
+                flagged.append(f)
+                exposed_regions |= affected
+        if not flagged:
+            return []
+        exposed = sorted(i for r in exposed_regions for i in hosts[r])
+        return [
+            f"firewall ไม่ได้อยู่บนเส้นทางระหว่าง router กับอุปกรณ์ปลายทาง {len(flagged)} ตัว "
+            f"({ctx.sample(graph.label(i) for i in flagged)}) อุปกรณ์ปลายทาง {len(exposed)} ตัวไปถึง router "
+            f"ได้โดยไม่ผ่าน firewall: {ctx.sample(graph.label(i) for i in exposed)}"
+        ]
+
+
+class ServerBehindPcRule(TopologyRule):
+    """server ที่เชื่อมต่อกับอุปกรณ์เครือข่ายได้ผ่าน PC เท่านั้น (PC ไม่ควรเป็นทางผ่านของ traffic)"""
+    rule_id = "server_behind_pc"
+    requires = ("types",)
+
+    def check(self, ctx):
+        graph = ctx.graph
+        types = ctx["types"]
+        servers = types.get("server", [])
+        if not servers:
+            return []
+        sources = [i for device_type in INFRASTRUCTURE_TYPES for i in types.get(device_type, [])]
+        if not sources:
+            return []
+        # ไล่จากอุปกรณ์เครือข่าย เดินเข้า PC ได้แต่ไม่เดินต่อผ่าน PC
+        seen = set(sources)
+        queue = deque(sources)
+        adjacency, ends_xor = graph.adjacency, graph.ends_xor
+        while queue:
+            u = queue.popleft()
+            if graph.node_type(u) == "pc":
+                continue
+            for e in adjacency[u]:
+                v = ends_xor[e] ^ u
+                if v not in seen:
+                    seen.add(v)
+                    queue.append(v)
+        behind_pc = [
+            i for i in servers
+            if i not in seen and any(graph.node_type(ends_xor[e] ^ i) == "pc" for e in adjacency[i])
+        ]
+        if not behind_pc:
+            return []
+        return [
+            f"server ที่เข้าถึงได้ผ่าน PC เท่านั้น {len(behind_pc)} ตัว: "
+            f"{ctx.sample(graph.label(i) for i in behind_pc)}"
+        ]
+
+
+def default_rules() -> List[TopologyRule]:
+    return [
+        EmptyTopologyRule(),
+        NoConnectionsRule(),
+        DuplicateLinksRule(),
+        DanglingLinksRule(),
+        SelfLoopsRule(),
+        IsolatedDevicesRule(),
+        DisconnectedSegmentsRule(),
+        SinglePointOfFailureRule(),
+        BackboneBridgesRule(),
+        SwitchLoopWithoutStpRule(),
+        FirewallNotOnEdgePathRule(),
+        ServerBehindPcRule(),
+    ]
+
+
+# Global instance
+topology_rules = TopologyRuleRegistry(default_rules())
@@ -0,0 +1,642 @@
+import threading
+from collections import Counter, OrderedDict, deque
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from .config import settings
+from .topology_graph import TopologyGraph
+from .capacity import (
+    CapacityAnalyzer, EPSILON, INF, INFRASTRUCTURE_TYPES,
+    device_capacity, device_users, is_core, link_capacity,
+)
+
+# diff ที่เปลี่ยนเกินสัดส่วนนี้ของแผนผัง สร้าง state ใหม่ทั้งหมดเร็วกว่าอัปเดตทีละรายการ
+REBUILD_RATIO = 0.25
+
+
+def _sorted_ids(ids: Iterable[Any]) -> List[Any]:
+    return sorted(ids, key=str)
+
+
+class TopologyState:
+    """
+    สถานะการวิเคราะห์ของแผนผังหนึ่ง ที่อัปเดตได้ด้วย diff แทนการคำนวณใหม่ทั้งหมด
+
+    อัปเดตแบบ incremental: จำนวนอุปกรณ์ตามประเภท, degree, การเชื่อมต่อซ้ำ/อ้างถึงอุปกรณ์ที่ไม่มีอยู่,
+    connected components (รวม component เมื่อเพิ่มสาย และ BFS สองทางเฉพาะส่วนที่อาจแยกเมื่อลบสาย)
+    และผล capacity (ไล่ผลต่างของ demand ขึ้นไปตาม uplink) เมื่อเปลี่ยน bandwidth/throughput/userCapacity,
+    เพิ่ม/ลบอุปกรณ์ปลายทาง หรือเพิ่ม/ลบ uplink ที่ไม่ทำให้ลำดับชั้นจาก Core เปลี่ยน
+
+    การเปลี่ยนที่ทำให้ลำดับชั้นเปลี่ยน (เช่น ตัด uplink เส้นสุดท้ายของ switch, เปลี่ยน type หรือ deviceRole)
+    mark capacity ว่าต้องคำนวณใหม่ และคำนวณตอนเรียก summary() ครั้งถัดไป
+    ผลของ summary() ต้องเท่ากับ full_summary() ของแผนผังเดียวกันเสมอ
+
+    การโหลดทั้งหมดและการคำนวณ capacity ใหม่ใช้ TopologyGraph/CapacityAnalyzer ตัวเดียวกับ full_summary
+    ส่วนที่ทำซ้ำใน class นี้มีเฉพาะการอัปเดตทีละรายการ ซึ่งต้องใช้โครงสร้างตาม id ที่แก้ไขได้
+    (TopologyGraph ใช้ index ที่คงที่ สร้างแล้วแก้ไขไม่ได้)
+    """
+
+    def __init__(self, nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], per_user_bps: float):
+        self.per_user_bps = per_user_bps
+        self.version = 0
+        self.rebuild(nodes, edges)
+
+    def _reset(self):
+        self.nodes: Dict[Hashable, Dict[str, Any]] = {}
+        self.edges: Dict[Hashable, Dict[str, Any]] = {}
+        self.edge_ends: Dict[Hashable, Tuple[Hashable, Hashable]] = {}  # เฉพาะสายที่ใช้งานได้
+        self.incident: Dict[Hashable, Set[Hashable]] = {}
+        self.other_refs: Dict[Hashable, Set[Hashable]] = {}  # id อุปกรณ์ -> สายที่อ้างถึงแต่ใช้งานไม่ได้ (dangling/self-loop)
+        self.dangling: Set[Hashable] = set()
+        self.self_loops: Set[Hashable] = set()
+        self.device_types: Counter = Counter()
+        self.degree_histogram: Counter = Counter()
+        self.pair_counts: Counter = Counter()
+        self.duplicate_links = 0
+        self.component_of: Dict[Hashable, int] = {}
+        self.members: Dict[int, Set[Hashable]] = {}
+        self._next_component = 0
+
+        self.link_capacity: Dict[Hashable, float] = {}
+        self.device_capacity: Dict[Hashable, float] = {}
+        self.demand: Dict[Hashable, float] = {}
+        self.infrastructure: Set[Hashable] = set()
+        self.links_without_bandwidth = 0
+        self._capacity_dirty = True
+        self.levels: Dict[Hashable, int] = {}
+        self.uplinks: Dict[Hashable, List[Tuple[Hashable, Hashable]]] = {}
+        self.load: Dict[Hashable, float] = {}
+        self.aggregate: Dict[Hashable, float] = {}
+        self.total_demand = 0.0
+        self.overloaded_links: Set[Hashable] = set()
+        self.overloaded_devices: Set[Hashable] = set()
+
+    # ---- diff ----
+
+    def apply_diff(self, diff: Dict[str, Dict[str, list]]) -> str:
+        """
+        ใช้ diff รูปแบบ {"nodes": {"added", "removed", "changed"}, "edges": {...}}
+        removed เป็น list ของ id ส่วน added/changed เป็น object เต็มของ node/edge
+        added ที่ id มีอยู่แล้วถือเป็น changed, changed ที่ยังไม่มีถือเป็น added, removed ที่ไม่มีถูกข้าม
+
+        คืน "incremental" หรือ "full" (diff ใหญ่จนสร้าง state ใหม่ทั้งหมดคุ้มกว่า)
+        """
+        node_diff = diff.get("nodes") or {}
+        edge_diff = diff.get("edges") or {}
+        size = sum(len(part.get(key) or []) for part in (node_diff, edge_diff) for key in ("added", "removed", "changed"))
+        self.version += 1
+        if size > REBUILD_RATIO * max(len(self.nodes) + len(self.edges), 1):
+            nodes, edges = self._apply_to_lists(node_diff, edge_diff)
+            self.rebuild(nodes, edges)
+            return "full"
+
+        for edge_id in edge_diff.get("removed") or []:
+            self._remove_edge(edge_id)
+        for node_id in node_diff.get("removed") or []:
+            self._remove_node(node_id)
+        for node in (node_diff.get("added") or []) + (node_diff.get("changed") or []):
+            self._add_node(node)
+        for edge in (edge_diff.get("added") or []) + (edge_diff.get("changed") or []):
+            self._add_edge(edge)
+        return "incremental"
+
+    def rebuild(self, nodes: Optional[List[Dict]] = None, edges: Optional[List[Dict]] = None):
+        """คำนวณใหม่ทั้งหมด (fallback) จากแผนผังที่ส่งมาหรือจากข้อมูลปัจจุบันของ state"""
+        nodes = list(self.nodes.values()) if nodes is None else nodes
+        edges = list(self.edges.values()) if edges is None else edges
+        self._reset()
+        self._bulk_load(nodes, edges)
+
+    def _bulk_load(self, nodes: List[Dict], edges: List[Dict]):
+        """
+        โหลดแผนผังทั้งหมดผ่าน TopologyGraph/CapacityAnalyzer (ตัวเดียวกับ full_summary)
+        แล้วแปลงผลจาก index เป็นโครงสร้างตาม id ที่ใช้อัปเดตแบบ incremental
+        """
+        for node in nodes:
+            self.nodes[node.get("id")] = node
+        for edge in edges:
+            self.edges[self._edge_id(edge)] = edge
+        self.device_types = Counter(node.get("type", "unknown") for node in self.nodes.values())
+
+        graph = TopologyGraph(list(self.nodes.values()), list(self.edges.values()))
+        ids, edge_ids = graph.ids, list(self.edges)
+        self.incident = {node_id: set() for node_id in ids}
+        for position in graph.dangling_edges + graph.self_loops:
+            self._link_edge(edge_ids[position])
+        for e, position in enumerate(graph.edge_refs):
+            edge_id = edge_ids[position]
+            u, v = ids[graph.edge_source[e]], ids[graph.edge_target[e]]
+            self.edge_ends[edge_id] = (u, v)
+            self.incident[u].add(edge_id)
+            self.incident[v].add(edge_id)
+            self.pair_counts[self._pair(u, v)] += 1
+        self.duplicate_links = len(graph.duplicate_edges)
+        self.degree_histogram = Counter(graph.degrees())
+
+        components: Dict[int, int] = {}
+        for node_id, graph_component in zip(ids, graph.components()):
+            component = components.get(graph_component)
+            if component is None:
+                component = components[graph_component] = self._new_component()
+                self.members[component] = set()
+            self.component_of[node_id] = component
+            self.members[component].add(node_id)
+        self._load_capacity(graph)
+
+    def _apply_to_lists(self, node_diff, edge_diff) -> Tuple[List[Dict], List[Dict]]:
+        nodes = dict(self.nodes)
+        edges = dict(self.edges)
+        for node_id in node_diff.get("removed") or []:
+            nodes.pop(node_id, None)
+        for edge_id in edge_diff.get("removed") or []:
+            edges.pop(edge_id, None)
+        for node in (node_diff.get("added") or []) + (node_diff.get("changed") or []):
+            nodes[node.get("id")] = node
+        for edge in (edge_diff.get("added") or []) + (edge_diff.get("changed") or []):
+            edges[self._edge_id(edge)] = edge
+        return list(nodes.values()), list(edges.values())
+
+    @staticmethod
+    def _edge_id(edge: Dict[str, Any]) -> Hashable:
+        edge_id = edge.get("id")
+        if edge_id is None:
+            raise ValueError("edge ต้องมี id สำหรับการวิเคราะห์แบบ incremental")
+        return edge_id
+
+    # ---- nodes ----
+
+    def _add_node(self, node: Dict[str, Any]):
+        node_id = node.get("id")
+        if node_id in self.nodes:
+            self._change_node(node)
+            return
+        refs = list(self.other_refs.get(node_id, ()))
+        for edge_id in refs:
+            self._unlink_edge(edge_id)
+        self.nodes[node_id] = node
+        self.device_types[node.get("type", "unknown")] += 1
+        self.incident[node_id] = set()
+        self.degree_histogram[0] += 1
+        component = self._new_component()
+        self.component_of[node_id] = component
+        self.members[component] = {node_id}
+        self._set_node_capacity(node_id, node)
+        if self._affects_sources(node):
+            self._capacity_dirty = True
+        for edge_id in refs:
+            self._link_edge(edge_id)
+
+    def _remove_node(self, node_id: Hashable):
+        if node_id not in self.nodes:
+            return
+        refs = list(self.incident[node_id]) + list(self.other_refs.get(node_id, ()))
+        for edge_id in refs:
+            self._unlink_edge(edge_id)
+        node = self.nodes.pop(node_id)
+        self._decrement(self.device_types, node.get("type", "unknown"))
+        self.incident.pop(node_id)
+        self._decrement(self.degree_histogram, 0)
+        component = self.component_of.pop(node_id)
+        self.members[component].discard(node_id)
+        if not self.members[component]:
+            del self.members[component]
+        self.device_capacity.pop(node_id, None)
+        self.demand.pop(node_id, None)
+        self.infrastructure.discard(node_id)
+        self.overloaded_devices.discard(node_id)
+        if self._affects_sources(node) or node_id in self.levels:
+            self._capacity_dirty = True
+        for edge_id in refs:
+            self._link_edge(edge_id)  # กลายเป็นสายที่อ้างถึงอุปกรณ์ที่ไม่มีอยู่
+
+    def _change_node(self, node: Dict[str, Any]):
+        node_id = node.get("id")
+        old = self.nodes[node_id]
+        self.nodes[node_id] = node
+        old_type, new_type = old.get("type", "unknown"), node.get("type", "unknown")
+        if old_type != new_type:
+            self._decrement(self.device_types, old_type)
+            self.device_types[new_type] += 1
+            self._capacity_dirty = True
+        if is_core(old) != is_core(node):
+            self._capacity_dirty = True
+
+        old_demand = self.demand.get(node_id, 0.0)
+        self._set_node_capacity(node_id, node)
+        if self._capacity_dirty:
+            return
+        self._check_device(node_id)
+        delta = self.demand.get(node_id, 0.0) - old_demand
+        if delta and self.levels.get(node_id, -1) >= 0:
+            self._propagate_demand(node_id, delta)
+
+    def _set_node_capacity(self, node_id: Hashable, node: Dict[str, Any]):
+        if node.get("type", "unknown") in INFRASTRUCTURE_TYPES:
+            rate = device_capacity(node)
+            self.device_capacity[node_id] = INF if rate is None else rate
+            self.demand[node_id] = 0.0
+            self.infrastructure.add(node_id)
+        else:
+            self.device_capacity[node_id] = INF
+            self.demand[node_id] = device_users(node) * self.per_user_bps
+            self.infrastructure.discard(node_id)
+
+    # ---- edges ----
+
+    def _add_edge(self, edge: Dict[str, Any]):
+        edge_id = self._edge_id(edge)
+        old = self.edges.get(edge_id)
+        if old is not None:
+            if old.get("source") == edge.get("source") and old.get("target") == edge.get("target"):
+                self._change_edge(edge_id, edge)
+                return
+            self._remove_edge(edge_id)  # ย้ายปลายสาย = ลบแล้วเพิ่มใหม่
+        self.edges[edge_id] = edge
+        self._link_edge(edge_id)
+
+    def _remove_edge(self, edge_id: Hashable):
+        edge = self.edges.get(edge_id)
+        if edge is None:
+            return
+        self._unlink_edge(edge_id)
+        del self.edges[edge_id]
+
+    def _change_edge(self, edge_id: Hashable, edge: Dict[str, Any]):
+        self.edges[edge_id] = edge
+        if edge_id not in self.edge_ends:
+            return
+        self._set_link_capacity(edge_id, edge)
+        if not self._capacity_dirty:
+            self._check_link(edge_id)
+
+    def _link_edge(self, edge_id: Hashable):
+        """ประเมินสถานะของสาย (ใช้งานได้ / อ้างถึงอุปกรณ์ที่ไม่มี / ต่อเข้าตัวเอง) แล้วอัปเดตโครงสร้าง"""
+        edge = self.edges[edge_id]
+        u, v = edge.get("source"), edge.get("target")
+        if u not in self.nodes or v not in self.nodes or u == v:
+            (self.dangling if u not in self.nodes or v not in self.nodes else self.self_loops).add(edge_id)
+            for node_id in {u, v}:
+                self.other_refs.setdefault(node_id, set()).add(edge_id)
+            return
+        self.edge_ends[edge_id] = (u, v)
+        for node_id in (u, v):
+            self._set_degree(node_id, edge_id, add=True)
+        pair = self._pair(u, v)
+        if self.pair_counts[pair]:
+            self.duplicate_links += 1
+        self.pair_counts[pair] += 1
+        self._merge_components(u, v)
+        self._set_link_capacity(edge_id, edge)
+        if not self._capacity_dirty:
+            self._capacity_link_added(edge_id, u, v)
+
+    def _unlink_edge(self, edge_id: Hashable):
+        if edge_id in self.dangling or edge_id in self.self_loops:
+            self.dangling.discard(edge_id)
+            self.self_loops.discard(edge_id)
+            edge = self.edges[edge_id]
+            for node_id in {edge.get("source"), edge.get("target")}:
+                refs = self.other_refs[node_id]
+                refs.discard(edge_id)
+                if not refs:
+                    del self.other_refs[node_id]
+            return
+        ends = self.edge_ends.pop(edge_id, None)
+        if ends is None:
+            return
+        u, v = ends
+        for node_id in (u, v):
+            self._set_degree(node_id, edge_id, add=False)
+        pair = self._pair(u, v)
+        self.pair_counts[pair] -= 1
+        if self.pair_counts[pair]:
+            self.duplicate_links -= 1
+        else:
+            del self.pair_counts[pair]
+            self._split_components(u, v)
+        if not self._capacity_dirty:
+            self._capacity_link_removed(edge_id, u, v)
+        if self.link_capacity.pop(edge_id) == INF:
+            self.links_without_bandwidth -= 1
+        self.load.pop(edge_id, None)
+        self.overloaded_links.discard(edge_id)
+
+    def _set_link_capacity(self, edge_id: Hashable, edge: Dict[str, Any]):
+        if self.link_capacity.get(edge_id) == INF:
+            self.links_without_bandwidth -= 1
+        rate = link_capacity(edge)
+        if rate is None:
+            self.links_without_bandwidth += 1
+        self.link_capacity[edge_id] = INF if rate is None else rate
+
+    def _set_degree(self, node_id: Hashable, edge_id: Hashable, add: bool):
+        incident = self.incident[node_id]
+        self._decrement(self.degree_histogram, len(incident))
+        if add:
+            incident.add(edge_id)
+        else:
+            incident.discard(edge_id)
+        self.degree_histogram[len(incident)] += 1
+
+    @staticmethod
+    def _pair(u: Hashable, v: Hashable) -> Tuple[Hashable, Hashable]:
+        return (u, v) if str(u) <= str(v) else (v, u)
+
+    @staticmethod
+    def _decrement(counter: Counter, key: Hashable):
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    # ---- components ----
+
+    def _new_component(self) -> int:
+        self._next_component += 1
+        return self._next_component
+
+    def _neighbors(self, node_id: Hashable) -> Iterable[Hashable]:
+        for edge_id in self.incident[node_id]:
+            a, b = self.edge_ends[edge_id]
+            yield b if a == node_id else a
+
+    def _merge_components(self, u: Hashable, v: Hashable):
+        cu, cv = self.component_of[u], self.component_of[v]
+        if cu == cv:
+            return
+        small, large = (cu, cv) if len(self.members[cu]) < len(self.members[cv]) else (cv, cu)
+        for node_id in self.members[small]:
+            self.component_of[node_id] = large
+        self.members[large] |= self.members.pop(small)
+
+    def _split_components(self, u: Hashable, v: Hashable):
+        """
+        หลังลบสายสุดท้ายระหว่าง u-v: BFS จากทั้งสองฝั่งสลับกัน หยุดทันทีที่สองฝั่งเจอกัน
+        ถ้าฝั่งใดหมดก่อน ฝั่งนั้นคือ component ใหม่ (ใช้เวลาตามขนาดฝั่งที่เล็กกว่า)
+        """
+        sides = [({u}, deque([u])), ({v}, deque([v]))]
+        turn = 0
+        while True:
+            seen, queue = sides[turn]
+            other_seen = sides[1 - turn][0]
+            if not queue:
+                break
+            node_id = queue.popleft()
+            for neighbor in self._neighbors(node_id):
+                if neighbor in other_seen:
+                    return
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+            turn = 1 - turn
+        old = self.component_of[u]
+        component = self._new_component()
+        self.members[old] -= seen
+        self.members[component] = seen
+        for node_id in seen:
+            self.component_of[node_id] = component
+
+    # ---- capacity ----
+
+    def _recompute_capacity(self):
+        self._load_capacity(TopologyGraph(list(self.nodes.values()), list(self.edges.values())))
+
+    def _load_capacity(self, graph: TopologyGraph):
+        """คำนวณ capacity ทั้งหมดด้วย CapacityAnalyzer แล้วเก็บ uplink/load/aggregate ตาม id ไว้ไล่ผลต่างภายหลัง"""
+        analyzer = CapacityAnalyzer(graph, self.per_user_bps)
+        ids = graph.ids
+        edge_ids = [self._edge_id(graph.edges[position]) for position in graph.edge_refs]
+        self.link_capacity = dict(zip(edge_ids, map(float, analyzer.link_capacity)))
+        self.links_without_bandwidth = analyzer.links_without_bandwidth
+        self.device_capacity = dict(zip(ids, map(float, analyzer.device_capacity)))
+        self.demand = dict(zip(ids, map(float, analyzer.demand)))
+        self.infrastructure = {node_id for node_id, infrastructure in zip(ids, analyzer.infrastructure) if infrastructure}
+
+        levels = analyzer.levels
+        load, aggregate = analyzer.link_loads()
+        self.levels = {ids[i]: level for i, level in enumerate(levels) if level >= 0}
+        self.aggregate = {ids[i]: float(aggregate[i]) for i, level in enumerate(levels) if level >= 0}
+        self.uplinks = {}
+        self.load = {}
+        for e, (a, b) in enumerate(zip(graph.edge_source, graph.edge_target)):
+            la, lb = levels[a], levels[b]
+            if la < 0 or lb < 0 or abs(la - lb) != 1:
+                continue
+            child, parent = (a, b) if la > lb else (b, a)
+            self.uplinks.setdefault(ids[child], []).append((edge_ids[e], ids[parent]))
+            self.load[edge_ids[e]] = float(load[e])
+
+        self.total_demand = sum(self.demand[node_id] for node_id in self.levels)
+        self.overloaded_links = set()
+        self.overloaded_devices = set()
+        for edge_id in self.load:
+            self._check_link(edge_id)
+        for node_id in self.infrastructure:
+            self._check_device(node_id)
+        self._capacity_dirty = False
+
+    def _propagate_demand(self, node_id: Hashable, delta: float):
+        self.total_demand += delta
+        self._propagate(node_id, delta)
+
+    def _propagate(self, node_id: Hashable, delta: float):
+        """ไล่ผลต่างของ demand ที่ผ่าน node_id ขึ้นไปตาม uplink ด้วยสัดส่วนเดียวกับการคำนวณเต็ม"""
+        stack = [(node_id, delta)]
+        while stack:
+            current, change = stack.pop()
+            self.aggregate[current] = self.aggregate.get(current, 0.0) + change
+            self._check_device(current)
+            links = self.uplinks.get(current, ())
+            for edge_id, parent in links:
+                share = change / len(links)
+                self.load[edge_id] = self.load.get(edge_id, 0.0) + share
+                self._check_link(edge_id)
+                stack.append((parent, share))
+
+    @staticmethod
+    def _affects_sources(node: Dict[str, Any]) -> bool:
+        """อุปกรณ์ที่อาจเป็นต้นทางของ demand (ดู core_device_indices)"""
+        return is_core(node) or node.get("type", "unknown") in ("router", "firewall")
+
+    def _capacity_link_added(self, edge_id: Hashable, u: Hashable, v: Hashable):
+        """
+        อัปเดต load เฉพาะส่วนเมื่อเพิ่มสาย ถ้าสายใหม่ไม่ทำให้ลำดับชั้นจาก Core เปลี่ยน:
+        สายระหว่างชั้นติดกัน (uplink เพิ่ม) หรืออุปกรณ์ปลายทางใหม่ที่ต่อเข้ากับเครือข่าย
+        กรณีอื่นให้คำนวณใหม่ทั้งหมด
+        """
+        lu, lv = self.levels.get(u, -1), self.levels.get(v, -1)
+        if lu < 0 and lv < 0:
+            return  # ทั้งสองฝั่งไปไม่ถึงจาก Core ไม่มีผลต่อ load
+        if lu >= 0 and lv >= 0:
+            if lu == lv:
+                return
+            if abs(lu - lv) > 1:
+                self._capacity_dirty = True
+                return
+            child, parent = (u, v) if lu > lv else (v, u)
+            self._set_uplinks(child, self.uplinks.get(child, []) + [(edge_id, parent)])
+            return
+        child, parent = (u, v) if lu < 0 else (v, u)
+        if len(self.incident[child]) != 1:
+            self._capacity_dirty = True
+            return
+        self.levels[child] = self.levels[parent] + 1
+        self.uplinks[child] = [(edge_id, parent)]
+        self.aggregate[child] = 0.0
+        self._propagate_demand(child, self.demand[child])
+
+    def _capacity_link_removed(self, edge_id: Hashable, u: Hashable, v: Hashable):
+        """กลับด้านของ _capacity_link_added (เรียกหลังเอาสายออกจาก incident แล้ว)"""
+        lu, lv = self.levels.get(u, -1), self.levels.get(v, -1)
+        if lu < 0 or lv < 0 or lu == lv:
+            return
+        child, parent = (u, v) if lu > lv else (v, u)
+        remaining = [link for link in self.uplinks[child] if link[0] != edge_id]
+        if remaining:
+            self._set_uplinks(child, remaining)
+            return
+        if self.incident[child]:
+            self._capacity_dirty = True  # uplink เส้นสุดท้ายหายไป ลำดับชั้นของ subtree เปลี่ยน
+            return
+        # อุปกรณ์ปลายทางถูกตัดออกจากเครือข่าย
+        self._propagate(parent, -self.aggregate[child])
+        self.total_demand -= self.demand[child]
+        del self.levels[child], self.uplinks[child], self.aggregate[child]
+        self.overloaded_devices.discard(child)
+
+    def _set_uplinks(self, child: Hashable, links: List[Tuple[Hashable, Hashable]]):
+        """แบ่ง demand ของ child ให้ uplink ชุดใหม่ แล้วไล่ผลต่างของแต่ละ uplink ขึ้นไป"""
+        old_links = self.uplinks.get(child, [])
+        aggregate = self.aggregate[child]
+        old_share = aggregate / len(old_links) if old_links else 0.0
+        new_share = aggregate / len(links)
+        kept = {edge_id for edge_id, _ in links}
+        self.uplinks[child] = links
+        for edge_id, parent in old_links:
+            if edge_id not in kept:
+                self.load[edge_id] = 0.0
+                self._propagate(parent, -old_share)
+        old = {edge_id for edge_id, _ in old_links}
+        for edge_id, parent in links:
+            delta = new_share - old_share if edge_id in old else new_share
+            self.load[edge_id] = self.load.get(edge_id, 0.0) + delta
+            self._check_link(edge_id)
+            self._propagate(parent, delta)
+
+    def _check_link(self, edge_id: Hashable):
+        if self.load.get(edge_id, 0.0) > self.link_capacity[edge_id] * (1 + EPSILON):
+            self.overloaded_links.add(edge_id)
+        else:
+            self.overloaded_links.discard(edge_id)
+
+    def _check_device(self, node_id: Hashable):
+        if node_id in self.infrastructure and self.aggregate.get(node_id, 0.0) > self.device_capacity[node_id] * (1 + EPSILON):
+            self.overloaded_devices.add(node_id)
+        else:
+            self.overloaded_devices.discard(node_id)
+
+    # ---- ผลลัพธ์ ----
+
+    def summary(self) -> Dict[str, Any]:
+        if self._capacity_dirty:
+            self._recompute_capacity()
+        capacity = None
+        if self.levels and self.total_demand > EPSILON:
+            capacity = {
+                "total_demand_bps": self.total_demand,
+                "links_without_bandwidth": self.links_without_bandwidth,
+                "overloaded_links": _sorted_ids(self.overloaded_links),
+                "overloaded_devices": _sorted_ids(self.overloaded_devices),
+            }
+        sizes = [len(members) for members in self.members.values()]
+        return {
+            "device_count": len(self.nodes),
+            "connection_count": len(self.edges),
+            "device_types": dict(self.device_types),
+            "components": len(sizes),
+            "segments": sum(1 for size in sizes if size > 1),
+            "largest_component": max(sizes, default=0),
+            "isolated_devices": self.degree_histogram.get(0, 0),
+            "max_degree": max(self.degree_histogram, default=0),
+            "duplicate_links": self.duplicate_links,
+            "dangling_links": len(self.dangling),
+            "self_loops": len(self.self_loops),
+            "capacity": capacity,
+        }
+
+
+def full_summary(nodes: List[Dict[str, Any]], edges: List[Dict[str, Any]], per_user_bps: float) -> Dict[str, Any]:
+    """ผลเดียวกับ TopologyState.summary() แต่คำนวณใหม่ทั้งหมดจาก TopologyGraph/CapacityAnalyzer"""
+    graph = TopologyGraph(nodes, edges)
+    sizes = graph.component_sizes()
+    degrees = graph.degrees()
+    device_types = Counter(node.get("type", "unknown") for node in nodes)
+
+    capacity = None
+    analyzer = CapacityAnalyzer(graph, per_user_bps)
+    demand = list(analyzer.demand)
+    total_demand = sum(d for d, level in zip(demand, analyzer.levels) if level >= 0)
+    if analyzer.sources and total_demand > EPSILON:
+        load, aggregate = analyzer.link_loads()
+        link_caps, device_caps = list(analyzer.link_capacity), list(analyzer.device_capacity)
+        capacity = {
+            "total_demand_bps": total_demand,
+            "links_without_bandwidth": analyzer.links_without_bandwidth,
+            "overloaded_links": _sorted_ids(
+                graph.edge_data(e).get("id") for e in range(graph.edge_count)
+                if load[e] > link_caps[e] * (1 + EPSILON)
+            ),
+            "overloaded_devices": _sorted_ids(
+                graph.ids[i] for i in range(graph.node_count)
+                if analyzer.infrastructure[i] and aggregate[i] > device_caps[i] * (1 + EPSILON)
+            ),
+        }
+    return {
+        "device_count": len(nodes),
+        "connection_count": len(edges),
+        "device_types": dict(device_types),
+        "components": len(sizes),
+        "segments": sum(1 for size in sizes if size > 1),
+        "largest_component": max(sizes, default=0),
+        "isolated_devices": sum(1 for degree in degrees if degree == 0),
+        "max_degree": max(degrees, default=0),
+        "duplicate_links": len(graph.duplicate_edges),
+        "dangling_links": len(graph.dangling_edges),
+        "self_loops": len(graph.self_loops),
+        "capacity": capacity,
+    }
+
+
+class TopologyStateStore:
+    """เก็บ TopologyState ต่อ (ผู้ใช้, project) ใน memory แบบ LRU"""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._states: "OrderedDict[Tuple[int, int], TopologyState]" = OrderedDict()
+        self._locks: Dict[Tuple[int, int], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def lock(self, key: Tuple[int, int]) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Tuple[int, int]) -> Optional[TopologyState]:
+        with self._lock:
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+            return state
+
+    def put(self, key: Tuple[int, int], state: TopologyState):
+        with self._lock:
+            self._states[key] = state
+            self._states.move_to_end(key)
+            while len(self._states) > self.max_entries:
+                evicted, _ = self._states.popitem(last=False)
+                self._locks.pop(evicted, None)
+
+    def discard(self, key: Tuple[int, int]):
+        with self._lock:
+            self._states.pop(key, None)
+
+
+# Global instance
+topology_states = TopologyStateStore(max_entries=settings.TOPOLOGY_STATE_MAX_PROJECTS)
@@ -0,0 +1,69 @@
+"""
+วิเคราะห์โครงสร้างของทุก project (หรือเฉพาะบาง project) แบบ batch เช่น ตั้งเป็น cron ทุกคืน
+
+ผลถูกเขียนลงตาราง batch_analysis_results และดูผ่าน API ได้ที่ GET /ai/batch/{run_id}/results
+
+    python batch_analyze.py                      # ทุก project, ไม่เรียก AI
+    python batch_analyze.py --user-id 3 --llm    # เฉพาะ project ของผู้ใช้ 3 และส่งให้ AI วิเคราะห์ต่อ
+    python batch_analyze.py --resume <run_id>    # ทำ run ที่ค้างอยู่ต่อ
+"""
+import argparse
+import asyncio
+import logging
+
+from app import models
+from app.database import SessionLocal, engine
+from app.ai_service import analyzer
+from app.batch_analysis import BatchAnalysisRunner
+from app.config import settings
+
+
+async def main(args):
+    models.Base.metadata.create_all(bind=engine)
+    runner = BatchAnalysisRunner(
+        SessionLocal,
+        analyzer,
+        workers=args.workers if args.workers is not None else settings.BATCH_ANALYSIS_WORKERS,
+        page_size=args.page_size,
+    )
+    if args.resume:
+        run_id = args.resume
+    else:
+        db = SessionLocal()
+        try:
+            run_id = runner.create_run(db, user_id=args.user_id, include_llm=args.llm, project_ids=args.project_id).id
+        finally:
+            db.close()
+
+    print(f"🚀 Batch analysis run {run_id} ({runner.workers} worker process(es))")
+    # เปิด connection ไป Ollama เฉพาะเมื่ออาจต้องเรียก AI
+    use_llm = args.llm or bool(args.resume)
+    if use_llm:
+        await analyzer.ollama_service.start()
+    try:
+        run = await runner.execute(run_id)
+    finally:
+        if use_llm:
+            await analyzer.ollama_service.close()
+    if run is None:
+        print("❌ ไม่พบ run หรือ run นี้เสร็จไปแล้ว")
+        return
+    print(
+        f"{'✅' if run.status == 'succeeded' else '❌'} {run.status}: {run.processed_count} diagram(s), "
+        f"{run.failed_count} failed, {run.elapsed_seconds or 0:.2f}s, "
+        f"{run.diagrams_per_second or 0:.1f} diagrams/s"
+    )
+    if run.error:
+        print(f"   {run.error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Batch topology analysis")
+    parser.add_argument("--user-id", type=int, default=None, help="เฉพาะ project ของผู้ใช้นี้ (ค่าเริ่มต้น: ทุก project)")
+    parser.add_argument("--project-id", type=int, action="append", help="เฉพาะ project นี้ (ระบุซ้ำได้)")
+    parser.add_argument("--llm", action="store_true", help="ส่งผลวิเคราะห์ให้ AI วิเคราะห์ต่อ")
+    parser.add_argument("--workers", type=int, default=None, help="จำนวน process (0 = จำนวน CPU)")
+    parser.add_argument("--page-size", type=int, default=settings.BATCH_ANALYSIS_PAGE_SIZE)
+    parser.add_argument("--resume", metavar="RUN_ID", help="ทำ run ที่ค้างอยู่ต่อ")
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
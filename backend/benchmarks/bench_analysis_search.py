@@ -0,0 +1,145 @@
+"""
+Benchmark: ค้นหาข้อความในประวัติการวิเคราะห์ AI ด้วยดัชนี FTS5 (analysis_search) เทียบกับ LIKE '%...%'
+
+สร้าง ai_analysis_history ใน SQLite ชั่วคราว (ข้อความวิเคราะห์ภาษาไทยปนศัพท์เทคนิคแบบที่ AI ตอบ)
+รัน migrate_add_analysis_search แล้ววัดเวลาค้นหา 20 อันดับแรกพร้อม snippet ของแต่ละคำ (เรียงตามความเกี่ยวข้อง
+และใหม่สุดก่อน) และขนาดฐานข้อมูลก่อน/หลัง
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_analysis_search --rows 100000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import analysis_search
+from migrate_add_analysis_search import migrate_database
+
+QUERIES = ["VLAN", "firewall", "Spanning Tree", "คอขวด", "OSPF area", "192.168.40"]
+
+MODELS = ["llama3.2:3b", "qwen2.5:7b", "gemma2:9b", "scb10x/typhoon2.1-gemma3-4b"]
+DEVICES = ["Core Switch", "Distribution Switch", "Access Switch", "Router", "Firewall", "Server", "Wireless AP"]
+SENTENCES = [
+    "{device} {n} เชื่อมต่อกับอุปกรณ์ {m} ตัว ควรตรวจสอบ bandwidth ของ uplink ว่าเพียงพอหรือไม่",
+    "พบจุดคอขวดระหว่าง {device} {n} และ {device2} {m} เนื่องจากลิงก์มีความเร็วเพียง {speed} Mbps",
+    "แนะนำให้แบ่ง VLAN {vlan} สำหรับแผนก{dept} เพื่อลด broadcast domain และเพิ่มความปลอดภัย",
+    "ควรติดตั้ง firewall ระหว่าง {device} {n} กับอินเทอร์เน็ต และกำหนด ACL ให้เปิดเฉพาะพอร์ตที่จำเป็น",
+    "โครงสร้างปัจจุบันไม่มี redundancy หาก {device} {n} เสีย เครือข่ายส่วน{dept}จะใช้งานไม่ได้ทั้งหมด",
+    "ควรเปิดใช้ Spanning Tree Protocol (RSTP) เพื่อป้องกัน loop เมื่อเพิ่มลิงก์สำรอง",
+    "subnet 192.168.{vlan}.0/24 ของแผนก{dept} มีอุปกรณ์ {m} เครื่อง ยังรองรับการขยายได้",
+    "การใช้ OSPF area {n} ระหว่าง router จะช่วยให้เลือกเส้นทางสำรองได้อัตโนมัติ",
+    "ความปลอดภัย: ควรปิดพอร์ตที่ไม่ได้ใช้บน {device} และเปิด port security",
+    "ประสิทธิภาพ: throughput รวมของ {device} {n} ประมาณ {speed} Mbps ยังไม่เกินขีดจำกัด",
+    "ควรพิจารณาอัปเกรดลิงก์ระหว่าง {device} กับ {device2} เป็น 10 Gbps เพื่อรองรับการเติบโต",
+    "การจัดวาง Wireless AP {n} ตัวครอบคลุมพื้นที่{dept} แต่ควรแยก SSID สำหรับผู้เยี่ยมชม",
+]
+DEPARTMENTS = ["บัญชี", "การตลาด", "ไอที", "บุคคล", "ผลิต", "ขาย"]
+HEADINGS = ["## ภาพรวมโครงสร้างเครือข่าย", "## จุดที่ควรปรับปรุง", "## ความปลอดภัย", "## ข้อเสนอแนะ"]
+
+
+def analysis_text(rng: random.Random) -> str:
+    """ข้อความวิเคราะห์หนึ่งรายการ ประมาณ 1,000-2,500 ตัวอักษร"""
+    lines = []
+    for heading in HEADINGS:
+        lines.append(heading)
+        for _ in range(rng.randint(2, 5)):
+            device, device2 = rng.sample(DEVICES, 2)
+            lines.append("- " + rng.choice(SENTENCES).format(
+                device=device, device2=device2, n=rng.randint(1, 12), m=rng.randint(2, 60),
+                vlan=rng.randint(10, 250), speed=rng.choice([100, 1000, 10000]), dept=rng.choice(DEPARTMENTS),
+            ))
+    return "\n".join(lines)
+
+
+def seed(db_path: str, count: int, users: int, seed: int = 1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE ai_analysis_history (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, project_id INTEGER, "
+        "revision_id INTEGER, model_used VARCHAR(100) NOT NULL, device_count INTEGER NOT NULL, device_types TEXT, "
+        "analysis_result TEXT NOT NULL, execution_time_seconds INTEGER, time_to_first_token_ms INTEGER, "
+        "is_cached BOOLEAN, created_at DATETIME)"
+    )
+    conn.execute("CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL)")
+    conn.executemany("INSERT INTO projects (name) VALUES (?)", [(f"Project {i}",) for i in range(200)])
+    for start in range(0, count, 5000):
+        conn.executemany(
+            "INSERT INTO ai_analysis_history (user_id, project_id, model_used, device_count, analysis_result, created_at) "
+            "VALUES (?, ?, ?, ?, ?, datetime('2026-01-01', ?))",
+            [
+                (1 + i % users, rng.randint(1, 200), rng.choice(MODELS), rng.randint(5, 300), analysis_text(rng), f"+{i} minutes")
+                for i in range(start, min(count, start + 5000))
+            ],
+        )
+    conn.commit()
+    conn.close()
+
+
+def scan(conn, user_id: int, query: str, limit: int = 20):
+    """แบบเดิม: LIKE '%...%' บน analysis_result (scan ทุกแถวของผู้ใช้) ใหม่สุดก่อน"""
+    return conn.execute(
+        "SELECT id FROM ai_analysis_history WHERE user_id = ? AND analysis_result LIKE ? ORDER BY created_at DESC LIMIT ?",
+        (user_id, f"%{query}%", limit),
+    ).fetchall()
+
+
+def best_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(rows: int, users: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "history.db")
+        started = time.perf_counter()
+        seed(db_path, rows, users)
+        seed_s = time.perf_counter() - started
+        size_before = os.path.getsize(db_path)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path)
+        migrate_s = time.perf_counter() - started
+        size_after = os.path.getsize(db_path)
+
+        engine = create_engine(f"sqlite:///{db_path}")
+        analysis_search.ensure_index(engine)
+        db = sessionmaker(bind=engine)()
+        conn = sqlite3.connect(db_path)
+        print(
+            f"📊 {rows} analyses, {users} users, db {size_before / 2**20:.0f}MB -> {size_after / 2**20:.0f}MB "
+            f"(seed {seed_s:.1f}s, index {migrate_s:.1f}s)"
+        )
+        print(f"{'query':<16} {'matches':>8} {'relevance':>10} {'recent':>9} {'LIKE':>10}")
+        for query in QUERIES:
+            hits = analysis_search.search(db, user_id=1, query=query, limit=20)
+            assert hits and all(hit["snippet"] for hit in hits)
+            (matches,) = conn.execute(
+                "SELECT count(*) FROM ai_analysis_history WHERE user_id = 1 AND analysis_result LIKE ?", (f"%{query}%",)
+            ).fetchone()
+            relevance_ms = best_ms(lambda: analysis_search.search(db, user_id=1, query=query, limit=20))
+            recent_ms = best_ms(lambda: analysis_search.search(db, user_id=1, query=query, sort="recent", limit=20))
+            scan_ms = best_ms(lambda: scan(conn, 1, query), repeat=1)
+            print(f"{query:<16} {matches:>8} {relevance_ms:>8.2f}ms {recent_ms:>7.2f}ms {scan_ms:>8.1f}ms")
+        print(f"ตัวอย่าง snippet: {hits[0]['snippet']}")
+        db.close()
+        conn.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1)
+    args = parser.parse_args()
+    main(args.rows, args.users)
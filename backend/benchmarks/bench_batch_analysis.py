@@ -0,0 +1,101 @@
+"""
+Benchmark: throughput (diagrams/s) ของการวิเคราะห์ batch จากฐานข้อมูล
+
+สร้าง project จำลองในฐานข้อมูล SQLite ชั่วคราว แล้วเทียบการเรียกวิเคราะห์ทีละ project (แบบ /ai/analyze
+โดยไม่รวมเวลา LLM) กับ BatchAnalysisRunner ที่จำนวน worker process ต่าง ๆ
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_batch_analysis --projects 500 --workers 1 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.ai_service import analyzer
+from app.batch_analysis import BatchAnalysisRunner
+from .topology_corpus import hierarchical_diagram
+
+
+def seed_projects(session_factory, count: int, seed: int = 1) -> int:
+    rng = random.Random(seed)
+    db = session_factory()
+    try:
+        user = models.User(email="batch@example.com", username="batch", hashed_password="x")
+        db.add(user)
+        db.commit()
+        rows = []
+        for i in range(count):
+            nodes, edges = hierarchical_diagram(
+                cores=rng.randint(1, 2),
+                distributions=rng.randint(1, 4),
+                access_per_distribution=rng.randint(2, 6),
+                hosts_per_access=rng.randint(5, 30),
+            )
+            rows.append({
+                "name": f"Project {i}",
+                "owner_id": user.id,
+                "diagram_data": json.dumps({"nodes": nodes, "edges": edges}),
+            })
+        db.execute(insert(models.Project), rows)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def sequential(session_factory) -> float:
+    """แบบเดิม: โหลด project ทีละตัวแล้ววิเคราะห์ใน process เดียว"""
+    db = session_factory()
+    try:
+        started = time.perf_counter()
+        ids = [row.id for row in db.query(models.Project.id).order_by(models.Project.id)]
+        for project_id in ids:
+            project = db.get(models.Project, project_id)
+            diagram = json.loads(project.diagram_data)
+            analyzer.analyze_network_topology(diagram["nodes"], diagram["edges"])
+        return len(ids) / (time.perf_counter() - started)
+    finally:
+        db.close()
+
+
+async def batch(session_factory, workers: int, page_size: int):
+    runner = BatchAnalysisRunner(session_factory, analyzer, workers=workers, page_size=page_size)
+    db = session_factory()
+    try:
+        run_id = runner.create_run(db, user_id=None).id
+    finally:
+        db.close()
+    return await runner.execute(run_id)
+
+
+def main(projects: int, workers_list, page_size: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        seed_projects(session_factory, projects)
+        print(f"📊 {projects} projects")
+        print(f"  {'sequential':<18} {sequential(session_factory):8.1f} diagrams/s")
+        for workers in workers_list:
+            run = asyncio.run(batch(session_factory, workers, page_size))
+            print(
+                f"  {f'batch x{workers}':<18} {run.diagrams_per_second:8.1f} diagrams/s "
+                f"({run.processed_count} ok, {run.failed_count} failed, {run.elapsed_seconds:.2f}s)"
+            )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--page-size", type=int, default=200)
+    args = parser.parse_args()
+    main(args.projects, args.workers, args.page_size)
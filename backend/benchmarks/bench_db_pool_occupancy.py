@@ -0,0 +1,121 @@
+"""
+Benchmark: จำนวน DB connection ที่ถูกยืมจาก pool ระหว่างการวิเคราะห์พร้อมกันหลายรายการ
+
+เทียบ flow เดิม (ถือ session ไว้ตลอดการรอ LLM) กับ handler ปัจจุบันของ /ai/analyze
+ที่คืน session ก่อน generate แล้วเปิด transaction สั้น ๆ ตอนบันทึกผล
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_db_pool_occupancy --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, models, schemas
+from app.ai_service import analyzer
+from app.routers import ai as ai_router
+from .stub_ollama import StubOllama
+
+NODES = [
+    {"id": f"node_{i}", "type": "switch" if i % 2 else "pc", "data": {"label": f"Device {i}"}}
+    for i in range(20)
+]
+EDGES = [{"id": f"edge_{i}", "source": f"node_{i}", "target": f"node_{i + 1}"} for i in range(19)]
+
+
+async def legacy_analyze(session_factory, user_id: int):
+    """จำลอง handler เดิม: session จาก get_db เปิดค้างไว้ตั้งแต่ตรวจสอบ token จนบันทึกผลเสร็จ"""
+    db = session_factory()
+    try:
+        user = db.get(models.User, user_id)  # เหมือน auth.get_current_user
+        started = time.time()
+        result = await analyzer.get_ai_analysis(NODES, EDGES, "")
+        crud.create_analysis_history(
+            db,
+            user_id=user.id,
+            project_id=None,
+            model_used=analyzer.ollama_service.model,
+            nodes=NODES,
+            analysis_result=result,
+            execution_time_seconds=int(time.time() - started),
+        )
+    finally:
+        db.close()
+
+
+async def current_analyze(session_factory, user_id: int):
+    """เรียก handler จริงของ /ai/analyze"""
+    db = session_factory()
+    try:
+        user = db.get(models.User, user_id)
+        request = schemas.AIAnalysisRequest(nodes=NODES, edges=EDGES, question="")
+        await ai_router.analyze_network_topology(request=request, current_user=user, db=db)
+    finally:
+        db.close()
+
+
+async def run(label, flow, engine, session_factory, user_id, concurrency):
+    samples = []
+    stop = asyncio.Event()
+
+    async def sampler():
+        while not stop.is_set():
+            samples.append(engine.pool.checkedout())
+            await asyncio.sleep(0.005)
+
+    sampler_task = asyncio.create_task(sampler())
+    started = time.perf_counter()
+    await asyncio.gather(*(flow(session_factory, user_id) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await sampler_task
+    print(
+        f"{label:<18} wall={elapsed:5.2f}s  peak_checked_out={max(samples):3d}  "
+        f"mean_checked_out={statistics.mean(samples):6.2f}"
+    )
+
+
+async def main(concurrency: int, delay: float):
+    stub = await StubOllama(delay=delay).start()
+    analyzer.ollama_service.base_url = stub.base_url
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # pool ใหญ่พอสำหรับทุก request เพื่อไม่ให้ flow เดิม block event loop ระหว่างรอ connection
+        engine = create_engine(
+            f"sqlite:///{os.path.join(tmp, 'bench.db')}",
+            pool_size=concurrency + 5,
+            max_overflow=0,
+            connect_args={"check_same_thread": False},
+        )
+        models.Base.metadata.create_all(bind=engine)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        ai_router.SessionLocal = session_factory
+
+        db = session_factory()
+        user = models.User(email="bench@example.com", username="bench", hashed_password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+        db.close()
+
+        print(f"📊 {concurrency} concurrent analyses, simulated LLM latency={delay}s")
+        try:
+            await run("hold session", legacy_analyze, engine, session_factory, user_id, concurrency)
+            await run("release session", current_analyze, engine, session_factory, user_id, concurrency)
+        finally:
+            await analyzer.ollama_service.close()
+            await stub.stop()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--delay", type=float, default=1.0, help="เวลาที่ stub Ollama ใช้ต่อคำตอบ (วินาที)")
+    args = parser.parse_args()
+    asyncio.run(main(args.concurrency, args.delay))
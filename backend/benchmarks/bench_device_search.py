@@ -0,0 +1,98 @@
+"""
+Benchmark: ค้นหาอุปกรณ์ข้ามโปรเจกต์ด้วยดัชนี FTS5 (device_search) เทียบกับโหลดและ parse diagram_data ทุก project
+
+สร้าง projects ใน SQLite ชั่วคราว (blob บีบอัดด้วย zlib) รัน migrate_add_device_search แล้ววัดเวลาค้นหาแต่ละคำ
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_device_search --projects 2000
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import device_search, diagram_codec, fast_json
+from migrate_add_device_search import migrate_database
+from .topology_corpus import hierarchical_diagram
+
+QUERIES = ["firewall", "core", "Access Switch 3-2", "Server 4", "10000"]
+
+
+def seed(db_path: str, count: int, owners: int, seed: int = 1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, owner_id INTEGER, diagram_data TEXT)")
+    rows = []
+    for i in range(count):
+        nodes, edges = hierarchical_diagram(
+            cores=rng.randint(1, 2),
+            distributions=rng.randint(1, 3),
+            access_per_distribution=rng.randint(2, 4),
+            hosts_per_access=rng.randint(3, 12),
+            seed=i,
+        )
+        rows.append((f"Project {i}", 1 + i % owners, diagram_codec.encode(fast_json.dumps({"nodes": nodes, "edges": edges}), "zlib")))
+    conn.executemany("INSERT INTO projects (name, owner_id, diagram_data) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def scan(conn, owner_id: int, query: str, limit: int = 50):
+    """แบบเดิม: โหลด diagram_data ของทุก project ของผู้ใช้แล้วหา substring ใน label/type/role"""
+    needle = query.lower()
+    hits = []
+    for project_id, value in conn.execute("SELECT id, diagram_data FROM projects WHERE owner_id = ?", (owner_id,)):
+        for node in fast_json.loads(diagram_codec.decode(value))["nodes"]:
+            data = node.get("data") or {}
+            text = " ".join(str(data.get(key, "")) for key in ("label", "type", "deviceRole", "maxThroughput")).lower()
+            if needle in text:
+                hits.append((project_id, node["id"]))
+    return hits[:limit]
+
+
+def best_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(projects: int, owners: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "projects.db")
+        seed(db_path, projects, owners)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path)
+        migrate_s = time.perf_counter() - started
+
+        engine = create_engine(f"sqlite:///{db_path}")
+        device_search.ensure_index(engine)
+        db = sessionmaker(bind=engine)()
+        conn = sqlite3.connect(db_path)
+        (indexed,) = conn.execute("SELECT count(*) FROM device_search").fetchone()
+        print(f"📊 {projects} projects, {owners} owners, {indexed} devices indexed (migration {migrate_s:.2f}s)")
+        print(f"{'query':<20} {'hits':>5} {'FTS5':>9} {'scan':>10}")
+        for query in QUERIES:
+            hits = device_search.search(db, owner_id=1, query=query)
+            fts_ms = best_ms(lambda: device_search.search(db, owner_id=1, query=query))
+            scan_ms = best_ms(lambda: scan(conn, 1, query), repeat=1)
+            print(f"{query:<20} {len(hits):>5} {fts_ms:>7.2f}ms {scan_ms:>8.1f}ms")
+        db.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=2000)
+    parser.add_argument("--owners", type=int, default=1)
+    args = parser.parse_args()
+    main(args.projects, args.owners)
@@ -0,0 +1,92 @@
+"""
+Benchmark: จำนวน bytes ที่ส่งและเขียนต่อการบันทึก และเวลาฝั่ง server ระหว่าง PUT ทั้งแผนผังกับ PATCH แบบ delta
+
+จำลองการแก้ไขเล็ก ๆ ระหว่าง autosave (ย้ายอุปกรณ์ เพิ่มอุปกรณ์และสาย) บนแผนผังขนาดต่าง ๆ
+ขั้นตอนฝั่ง server ทำเหมือน crud.update_project / crud.patch_project_diagram (ไม่รวม SQL)
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_diagram_patch
+"""
+import copy
+import hashlib
+import time
+
+from app import diagram_codec, diagram_patch, fast_json
+from .topology_corpus import corpus
+
+
+def edit_session(nodes, edges):
+    """การแก้ไขหนึ่งรอบ autosave: ย้าย 5 อุปกรณ์ เพิ่ม PC หนึ่งเครื่องพร้อมสาย"""
+    moved = []
+    for node in nodes[-5:]:
+        node = copy.deepcopy(node)
+        node["position"] = {"x": node["position"]["x"] + 40, "y": node["position"]["y"] + 20}
+        moved.append(node)
+    switch = next(node for node in reversed(nodes) if node["type"] == "switch")
+    new_node = copy.deepcopy(nodes[-1])
+    new_node.update(id="node_new", data={"label": "PC new", "type": "pc"})
+    new_edge = copy.deepcopy(edges[-1])
+    new_edge.update(id="edge_new", source=switch["id"], target="node_new")
+    delta = {
+        "nodes": {"added": [new_node], "removed": [], "changed": moved},
+        "edges": {"added": [new_edge], "removed": [], "changed": []},
+    }
+    first = len(nodes) - 5
+    json_patch = [
+        {"op": "replace", "path": f"/nodes/{first + i}/position", "value": node["position"]} for i, node in enumerate(moved)
+    ] + [
+        {"op": "add", "path": "/nodes/-", "value": new_node},
+        {"op": "add", "path": "/edges/-", "value": new_edge},
+    ]
+    return delta, json_patch
+
+
+def save(diagram_data: str, document=None) -> bytes:
+    """สิ่งที่ทุกการบันทึกทำ: นับ node/edge, hash และบีบอัดก่อนเขียนลงฐานข้อมูล"""
+    document = fast_json.loads(diagram_data) if document is None else document
+    len(document["nodes"]), len(document["edges"])
+    hashlib.sha256(diagram_data.encode("utf-8")).hexdigest()
+    return diagram_codec.encode(diagram_data)
+
+
+def best_ms(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main():
+    print(f"{'diagram':<12} {'nodes':>6} {'PUT body':>10} {'delta':>8} {'json-patch':>10} {'row write':>10} "
+          f"{'PUT ms':>7} {'delta ms':>9} {'patch ms':>9}")
+    for name, nodes, edges in corpus():
+        stored = diagram_codec.encode(fast_json.dumps({"nodes": nodes, "edges": edges}))
+        delta, json_patch = edit_session(nodes, edges)
+        edited = diagram_patch.apply_topology_diff(fast_json.loads(diagram_codec.decode(stored)), delta)
+        put_body = fast_json.dumps_bytes({"name": name, "diagram_data": fast_json.dumps(edited)})
+        delta_body = fast_json.dumps_bytes(delta)
+        patch_body = fast_json.dumps_bytes(json_patch)
+
+        def put():
+            save(fast_json.loads(put_body)["diagram_data"])
+
+        def patch(body, apply):
+            def run():
+                document = apply(diagram_patch.load_document(diagram_codec.decode(stored)), fast_json.loads(body))
+                diagram_data = fast_json.dumps(document)
+                return save(diagram_data, document)
+            return run
+
+        row = patch(delta_body, diagram_patch.apply_topology_diff)()
+        assert row == patch(patch_body, diagram_patch.apply_json_patch)()
+        print(
+            f"{name:<12} {len(nodes):>6} {len(put_body):>10} {len(delta_body):>8} {len(patch_body):>10} {len(row):>10} "
+            f"{best_ms(put):>7.2f} {best_ms(patch(delta_body, diagram_patch.apply_topology_diff)):>9.2f} "
+            f"{best_ms(patch(patch_body, diagram_patch.apply_json_patch)):>9.2f}"
+        )
+    print("row write = bytes ของ diagram_data ที่บีบอัดแล้วซึ่งถูกเขียนทับทุกการบันทึก (ทั้ง PUT และ PATCH)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark: พื้นที่ที่ประวัติแผนผังใช้และเวลาสร้าง revision กลับ เทียบระหว่างเก็บสำเนาเต็มทุกครั้งกับ snapshot + delta
+
+จำลองการบันทึก --saves ครั้ง (ย้ายอุปกรณ์ เพิ่มอุปกรณ์และสายทีละเล็กน้อย) ด้วยกติกาเดียวกับ project_revisions.record_revision
+(snapshot ทุก interval revision หรือเมื่อ delta ใหญ่เกินครึ่งของแผนผัง) ไม่รวม SQL
+เวลาสร้างกลับเป็นกรณีแย่สุด: revision สุดท้ายของ chain (snapshot + interval - 1 delta)
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_diagram_revisions --saves 100
+"""
+import argparse
+import copy
+import time
+
+from app import diagram_codec, diagram_patch, fast_json
+from .topology_corpus import corpus
+
+
+def edit(document, step):
+    """การบันทึกหนึ่งครั้ง: ย้าย 3 อุปกรณ์ เพิ่ม PC พร้อมสายต่อกับ switch"""
+    nodes, edges = document["nodes"], document["edges"]
+    for node in nodes[step % len(nodes)::max(1, len(nodes) // 3)][:3]:
+        node["position"] = {"x": node["position"]["x"] + 10, "y": node["position"]["y"] + 5}
+    switch = next(node for node in nodes if node["type"] == "switch")
+    pc = copy.deepcopy(nodes[-1])
+    pc.update(id=f"pc_rev_{step}", data={"label": f"PC rev {step}", "type": "pc"})
+    edge = copy.deepcopy(edges[-1])
+    edge.update(id=f"edge_rev_{step}", source=switch["id"], target=pc["id"])
+    nodes.append(pc)
+    edges.append(edge)
+
+
+def history(nodes, edges, saves):
+    """diagram_data ของทุก revision"""
+    document = {"nodes": copy.deepcopy(nodes), "edges": copy.deepcopy(edges)}
+    revisions = [fast_json.dumps(document)]
+    for step in range(saves - 1):
+        edit(document, step)
+        revisions.append(fast_json.dumps(document))
+    return revisions
+
+
+def store(revisions, interval):
+    """[(kind, ข้อมูลที่บีบอัดแล้ว)] ตามกติกาของ record_revision"""
+    rows, base, previous = [], 0, None
+    for number, diagram_data in enumerate(revisions):
+        document = fast_json.loads(diagram_data)
+        diff = None
+        if previous is not None and number - base < interval:
+            diff = diagram_patch.diff_documents(previous, document)
+        delta = fast_json.dumps(diff) if diff is not None else None
+        if delta is None or len(delta) * 2 >= len(diagram_data):
+            rows.append(("snapshot", diagram_codec.encode(diagram_data)))
+            base = number
+        else:
+            rows.append(("delta", diagram_codec.encode(delta)))
+        previous = document
+    return rows
+
+
+def rebuild(rows, number):
+    start = max(i for i in range(number + 1) if rows[i][0] == "snapshot")
+    document = fast_json.loads(diagram_codec.decode(rows[start][1]))
+    for _, data in rows[start + 1:number + 1]:
+        document = diagram_patch.apply_topology_diff(document, fast_json.loads(diagram_codec.decode(data)))
+    return document
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--saves", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{'diagram':<12} {'nodes':>6} {'interval':>8} {'stored KB':>10} {'snapshots':>9} {'rebuild ms':>10}")
+    for name, nodes, edges in corpus():
+        revisions = history(nodes, edges, args.saves)
+        for interval in (1, 10, 20, 50):
+            rows = store(revisions, interval)
+            # revision ที่อยู่ท้าย chain ยาวที่สุด
+            worst = max(range(len(rows)), key=lambda i: i - max(j for j in range(i + 1) if rows[j][0] == "snapshot"))
+            assert fast_json.dumps(rebuild(rows, worst)) == revisions[worst]
+            started = time.perf_counter()
+            rebuild(rows, worst)
+            elapsed = (time.perf_counter() - started) * 1000
+            label = "full" if interval == 1 else str(interval)
+            print(
+                f"{name:<12} {len(nodes):>6} {label:>8} {sum(len(data) for _, data in rows) / 1024:>10.1f} "
+                f"{sum(kind == 'snapshot' for kind, _ in rows):>9} {elapsed:>10.2f}"
+            )
+    print("interval full = เก็บสำเนาเต็ม (บีบอัด) ทุกการบันทึก")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: ขนาดฐานข้อมูลและเวลาอ่าน Project.diagram_data ก่อน/หลังบีบอัด
+
+สร้างตาราง projects ใน SQLite ชั่วคราวด้วยแผนผังจำลอง (ข้อความธรรมดาแบบเดิม) วัดผล แล้วรัน
+migrate_compress_diagram_data กับแต่ละ codec และวัดอีกครั้ง
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_diagram_storage --projects 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from app import diagram_codec, fast_json
+from migrate_compress_diagram_data import migrate_database
+from .topology_corpus import hierarchical_diagram
+
+
+def seed(db_path: str, count: int, seed: int = 1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, owner_id INTEGER, diagram_data TEXT)")
+    rows = []
+    for i in range(count):
+        nodes, edges = hierarchical_diagram(
+            cores=rng.randint(1, 2),
+            distributions=rng.randint(1, 4),
+            access_per_distribution=rng.randint(2, 6),
+            hosts_per_access=rng.randint(5, 30),
+            seed=i,
+        )
+        rows.append((f"Project {i}", 1 + i % 10, fast_json.dumps({"nodes": nodes, "edges": edges})))
+    conn.executemany("INSERT INTO projects (name, owner_id, diagram_data) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.execute("VACUUM")
+    conn.close()
+
+
+def measure(db_path: str, repeat: int = 3):
+    conn = sqlite3.connect(db_path)
+    ids = [row[0] for row in conn.execute("SELECT id FROM projects")]
+    rng = random.Random(0)
+
+    def list_owner():
+        # GET /projects/ แบบเดิม: โหลด diagram_data ของทุก project ของผู้ใช้
+        for (value,) in conn.execute("SELECT diagram_data FROM projects WHERE owner_id = ?", (1,)):
+            diagram_codec.decode(value)
+
+    def get_one():
+        for project_id in rng.sample(ids, min(100, len(ids))):
+            (value,) = conn.execute("SELECT diagram_data FROM projects WHERE id = ?", (project_id,)).fetchone()
+            diagram_codec.decode(value)
+
+    def best_ms(fn, per=1):
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - started)
+        return best * 1000 / per
+
+    result = (os.path.getsize(db_path), best_ms(list_owner), best_ms(get_one, min(100, len(ids))))
+    conn.close()
+    return result
+
+
+def main(projects: int, codecs):
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "plain.db")
+        seed(plain, projects)
+        print(f"📊 {projects} projects")
+        print(f"{'storage':<10} {'db size':>10} {'list (owner)':>13} {'get one':>9}")
+        size, list_ms, get_ms = measure(plain)
+        print(f"{'text':<10} {size / 1024:>8.0f}KB {list_ms:>11.1f}ms {get_ms:>7.2f}ms")
+        for codec in codecs:
+            if diagram_codec.available_codec(codec) != codec:
+                print(f"{codec:<10} (ไม่ได้ติดตั้ง)")
+                continue
+            db_path = os.path.join(tmp, f"{codec}.db")
+            with open(plain, "rb") as src, open(db_path, "wb") as dst:
+                dst.write(src.read())
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                migrate_database(db_path, codec=codec)
+            migrate_s = time.perf_counter() - started
+            size, list_ms, get_ms = measure(db_path)
+            print(f"{codec:<10} {size / 1024:>8.0f}KB {list_ms:>11.1f}ms {get_ms:>7.2f}ms  (migration {migrate_s:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=500)
+    parser.add_argument("--codecs", nargs="+", default=["zlib", "zstd"])
+    args = parser.parse_args()
+    main(args.projects, args.codecs)
@@ -0,0 +1,90 @@
+"""
+Benchmark: เวลา encode/decode JSON ของแต่ละ backend ใน fast_json (orjson / msgspec / json มาตรฐาน)
+
+วัดบนเส้นทางที่แผนผังขนาดใหญ่ผ่านจริง: parse request body, validate ด้วย schema (ถ้ามี pydantic),
+render response, hash สำหรับ analysis cache และ payload ที่ส่งไป Ollama, และ encode prompt
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_json --hosts 10000 --repeat 5
+"""
+import argparse
+import hashlib
+import time
+
+from app import fast_json
+from app.analysis_cache import topology_cache_key
+from app.topology_encoder import encode_context
+from .topology_corpus import hierarchical_diagram
+
+try:
+    from app.schemas import AIAnalysisRequest
+except ImportError:  # ไม่มี pydantic
+    AIAnalysisRequest = None
+
+
+def best_ms(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def cases(nodes, edges):
+    diagram = {"nodes": nodes, "edges": edges}
+    body = fast_json.dumps_bytes(diagram)  # body ของ /ai/analyze และ /ai/topology/state
+    stored = fast_json.dumps(diagram)  # Project.diagram_data
+    context = {"nodes": nodes[:500], "edges": edges[:500]}
+    payload = {"model": "llama3", "messages": [{"role": "user", "content": encode_context(context)}], "stream": False}
+
+    result = {
+        "parse request body": lambda: fast_json.loads(body),
+        "parse diagram_data": lambda: fast_json.loads(stored),
+        "render response": lambda: fast_json.dumps_bytes(diagram),
+        "analysis cache key": lambda: topology_cache_key(nodes, edges, "", "llama3", "v1"),
+        "Ollama payload key": lambda: hashlib.sha256(fast_json.dumps_bytes(payload, sort_keys=True)).hexdigest(),
+        "encode prompt (json)": lambda: fast_json.dumps(context, indent=True),
+    }
+    if AIAnalysisRequest is not None:
+        result["parse + validate"] = lambda: AIAnalysisRequest.model_validate(fast_json.loads(body))
+    return result
+
+
+def main(hosts: int, repeat: int):
+    access = max(1, hosts // 25)
+    nodes, edges = hierarchical_diagram(
+        cores=2, distributions=max(1, access // 10), access_per_distribution=min(access, 10), hosts_per_access=25,
+    )
+    backends = [name for name in fast_json.BACKENDS if _available(name)]
+    print(f"📊 {len(nodes)} nodes, {len(edges)} edges, {len(fast_json.dumps_bytes({'nodes': nodes, 'edges': edges})) / 1e6:.1f} MB")
+    print(f"{'case':<22}" + "".join(f"{name:>12}" for name in backends))
+    default = fast_json.backend()
+    try:
+        timings = {}
+        for name in backends:
+            fast_json.set_backend(name)
+            for case, fn in cases(nodes, edges).items():
+                timings.setdefault(case, {})[name] = best_ms(fn, repeat)
+    finally:
+        fast_json.set_backend(default)
+    for case, row in timings.items():
+        print(f"{case:<22}" + "".join(f"{row[name]:>10.1f}ms" for name in backends))
+
+
+def _available(name: str) -> bool:
+    current = fast_json.backend()
+    try:
+        fast_json.set_backend(name)
+        return True
+    except ValueError:
+        return False
+    finally:
+        fast_json.set_backend(current)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hosts", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.hosts, args.repeat)
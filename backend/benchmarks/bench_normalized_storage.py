@@ -0,0 +1,142 @@
+"""
+Benchmark: เก็บแผนผังเป็น blob (diagram_data) เทียบกับแบบ normalized (diagram_nodes/diagram_edges)
+
+สร้าง projects ใน SQLite ชั่วคราว (blob บีบอัดด้วย zlib) วัดผล แล้วรัน migrate_normalize_diagram_data และวัดอีกครั้ง
+- get one: โหลดแผนผังหนึ่ง project เป็น diagram_data
+- firewall: id ของ project ที่มี firewall
+- < 100 Mbps: อุปกรณ์ที่ throughput ต่ำกว่า 100 Mbps
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_normalized_storage --projects 500
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from app import capacity, diagram_codec, diagram_store, fast_json
+from migrate_normalize_diagram_data import migrate_database
+from .topology_corpus import hierarchical_diagram
+
+
+def seed(db_path: str, count: int, seed: int = 1):
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, description TEXT, owner_id INTEGER, "
+        "diagram_data TEXT, diagram_size INTEGER, content_hash VARCHAR(64))"
+    )
+    rows = []
+    for i in range(count):
+        nodes, edges = hierarchical_diagram(
+            cores=rng.randint(1, 2),
+            distributions=rng.randint(1, 4),
+            access_per_distribution=rng.randint(2, 6),
+            hosts_per_access=rng.randint(5, 30),
+            seed=i,
+        )
+        if rng.random() < 0.3:
+            nodes = [node for node in nodes if node["type"] != "firewall"]
+        for node in rng.sample(nodes, 3):
+            if node["type"] != "pc":
+                node["data"]["maxThroughput"] = "50"
+        rows.append((f"Project {i}", 1, diagram_codec.encode(fast_json.dumps({"nodes": nodes, "edges": edges}), "zlib")))
+    conn.executemany("INSERT INTO projects (name, owner_id, diagram_data) VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+
+def best_ms(fn, repeat=3, per=1):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000 / per
+
+
+def measure_blob(conn, ids):
+    def get_one():
+        for project_id in ids:
+            (value,) = conn.execute("SELECT diagram_data FROM projects WHERE id = ?", (project_id,)).fetchone()
+            diagram_codec.decode(value)
+
+    def documents():
+        for project_id, value in conn.execute("SELECT id, diagram_data FROM projects WHERE owner_id = 1"):
+            yield project_id, fast_json.loads(diagram_codec.decode(value))
+
+    def firewall():
+        return [project_id for project_id, document in documents()
+                if any(node["data"].get("type") == "firewall" for node in document["nodes"])]
+
+    def slow_devices():
+        return [(project_id, node["id"]) for project_id, document in documents() for node in document["nodes"]
+                if (capacity.device_capacity(node) or float("inf")) < 100e6]
+
+    return get_one, firewall, slow_devices
+
+
+def measure_normalized(conn, ids):
+    def get_one():
+        for project_id in ids:
+            diagram_store.assemble(
+                [row[0] for row in conn.execute("SELECT data FROM diagram_nodes WHERE project_id = ? ORDER BY seq", (project_id,))],
+                [row[0] for row in conn.execute("SELECT data FROM diagram_edges WHERE project_id = ? ORDER BY seq", (project_id,))],
+            )
+
+    def firewall():
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT n.project_id FROM diagram_nodes n JOIN projects p ON p.id = n.project_id "
+            "WHERE p.owner_id = 1 AND n.device_type = 'firewall' ORDER BY n.project_id"
+        )]
+
+    def slow_devices():
+        return conn.execute(
+            "SELECT n.project_id, n.node_id FROM diagram_nodes n JOIN projects p ON p.id = n.project_id "
+            "WHERE p.owner_id = 1 AND n.throughput_bps < ?", (100e6,)
+        ).fetchall()
+
+    return get_one, firewall, slow_devices
+
+
+def run(db_path, measure):
+    conn = sqlite3.connect(db_path)
+    ids = random.Random(0).sample([row[0] for row in conn.execute("SELECT id FROM projects")], 50)
+    get_one, firewall, slow_devices = measure(conn, ids)
+    result = (
+        os.path.getsize(db_path), best_ms(get_one, per=len(ids)), best_ms(firewall), best_ms(slow_devices),
+        len(firewall()), len(slow_devices()),
+    )
+    conn.close()
+    return result
+
+
+def main(projects: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "projects.db")
+        seed(db_path, projects)
+        print(f"📊 {projects} projects")
+        print(f"{'storage':<11} {'db size':>10} {'get one':>9} {'firewall':>10} {'< 100 Mbps':>11}")
+        blob = run(db_path, measure_blob)
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path)
+        migrate_s = time.perf_counter() - started
+        conn = sqlite3.connect(db_path)
+        conn.execute("VACUUM")
+        conn.close()
+        normalized = run(db_path, measure_normalized)
+        assert blob[4:] == normalized[4:], "ผลของ query ต้องตรงกัน"
+        for name, (size, get_ms, firewall_ms, slow_ms, *_) in (("blob zlib", blob), ("normalized", normalized)):
+            print(f"{name:<11} {size / 1024:>8.0f}KB {get_ms:>7.2f}ms {firewall_ms:>8.1f}ms {slow_ms:>9.1f}ms")
+        print(f"migration {migrate_s:.2f}s, {blob[4]} projects มี firewall, {blob[5]} อุปกรณ์ < 100 Mbps")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--projects", type=int, default=500)
+    args = parser.parse_args()
+    main(args.projects)
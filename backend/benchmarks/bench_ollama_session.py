@@ -0,0 +1,88 @@
+"""
+Benchmark: overhead ต่อ request ของการเปิด ClientSession ใหม่ทุกครั้ง เทียบกับ session ที่ใช้ร่วมกัน
+
+จำลอง flow ของ /ai/analyze (health check + chat completion) กับ stub Ollama ในเครื่อง
+เพื่อวัดเฉพาะต้นทุนฝั่ง client (connector, TCP handshake, session setup)
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_ollama_session --requests 500
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import aiohttp
+
+from app.ai_service import OllamaService
+from .stub_ollama import StubOllama
+
+PAYLOAD = {
+    "model": "deepseek-r1:14b",
+    "messages": [{"role": "user", "content": "ping"}],
+    "stream": False,
+}
+
+
+async def analyze_with_fresh_sessions(base_url: str):
+    """พฤติกรรมเดิม: เปิด ClientSession ใหม่สำหรับทุก call"""
+    async with aiohttp.ClientSession() as session:
+        async with session.get(f"{base_url}/v1/models") as response:
+            await response.read()
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{base_url}/v1/chat/completions", json=PAYLOAD) as response:
+            await response.json()
+
+
+async def analyze_with_shared_session(service: OllamaService):
+    """พฤติกรรมใหม่: ใช้ session และ connection pool เดียวกัน"""
+    await service.check_ollama_health()
+    await service.generate_response("ping")
+
+
+async def measure(label: str, call, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<16} total={elapsed:6.2f}s  req/s={requests / elapsed:8.1f}  "
+        f"mean={statistics.mean(latencies):6.2f}ms  p50={statistics.median(latencies):6.2f}ms  p95={p95:6.2f}ms"
+    )
+    return statistics.mean(latencies)
+
+
+async def main(requests: int, concurrency: int):
+    stub = await StubOllama().start()
+    service = OllamaService()
+    service.base_url = stub.base_url
+    await service.start()
+    try:
+        # warm-up เพื่อไม่ให้ import/JIT ของ event loop ปนในผล
+        await analyze_with_fresh_sessions(stub.base_url)
+        await analyze_with_shared_session(service)
+
+        print(f"📊 {requests} simulated analyses, concurrency={concurrency}")
+        before = await measure("fresh sessions", lambda: analyze_with_fresh_sessions(stub.base_url), requests, concurrency)
+        after = await measure("shared session", lambda: analyze_with_shared_session(service), requests, concurrency)
+        print(f"⚡ overhead saved per analysis: {before - after:.2f}ms ({before / after:.1f}x faster)")
+    finally:
+        await service.close()
+        await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency))
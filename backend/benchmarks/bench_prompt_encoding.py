@@ -0,0 +1,54 @@
+"""
+Benchmark: ขนาด prompt ระหว่าง JSON แบบเดิม (indent=2 พร้อม fields UI) กับ compact topology encoder
+
+จำนวน token ประมาณจากการนับคำ/ตัวเลข/เครื่องหมายแยกกัน (ใช้ tiktoken ถ้าติดตั้งไว้)
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_prompt_encoding
+"""
+import json
+import re
+import time
+
+from app.ai_service import NetworkTopologyAnalyzer
+from app.topology_encoder import encode_context
+from .topology_corpus import corpus
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+
+    def count_tokens(text: str) -> int:
+        return len(_encoding.encode(text))
+    TOKENIZER = "tiktoken cl100k_base"
+except ImportError:
+    _token_pattern = re.compile(r"\w+|[^\w\s]", re.UNICODE)
+
+    def count_tokens(text: str) -> int:
+        return len(_token_pattern.findall(text))
+    TOKENIZER = "regex word/punct approximation"
+
+
+def main():
+    analyzer = NetworkTopologyAnalyzer()
+    print(f"📊 token counter: {TOKENIZER}")
+    print(f"{'diagram':<12} {'nodes':>6} {'json bytes':>11} {'compact':>9} {'saved':>6} {'json tok':>9} {'compact':>8} {'saved':>6} {'encode ms':>9}")
+    total_before = total_after = 0
+    for name, nodes, edges in corpus():
+        _, context = analyzer.build_prompt(nodes, edges)
+        before = json.dumps(context, ensure_ascii=False, indent=2)
+        started = time.perf_counter()
+        after = encode_context(context)
+        encode_ms = (time.perf_counter() - started) * 1000
+        bytes_before, bytes_after = len(before.encode("utf-8")), len(after.encode("utf-8"))
+        tokens_before, tokens_after = count_tokens(before), count_tokens(after)
+        total_before += tokens_before
+        total_after += tokens_after
+        print(
+            f"{name:<12} {len(nodes):>6} {bytes_before:>11} {bytes_after:>9} {1 - bytes_after / bytes_before:>6.0%} "
+            f"{tokens_before:>9} {tokens_after:>8} {1 - tokens_after / tokens_before:>6.0%} {encode_ms:>9.2f}"
+        )
+    print(f"⚡ total token reduction: {1 - total_after / total_before:.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark: เวลาสร้าง TopologyGraph และวิเคราะห์ connectivity / articulation points / bridges / topology rules / capacity
+
+ค่าเริ่มต้นสร้างแผนผังประมาณ 100k อุปกรณ์ (เป้าหมายคือต่ำกว่า 1 วินาทีทั้งหมด)
+ถ้าติดตั้ง networkx ไว้ จะตรวจผลเทียบกับ networkx บนแผนผังเดียวกันด้วย
+
+รันจากโฟลเดอร์ backend:  python -m benchmarks.bench_topology_graph --hosts 100
+"""
+import argparse
+import time
+
+from app.ai_service import NetworkTopologyAnalyzer
+from app.capacity import CapacityAnalyzer
+from app.topology_graph import TopologyGraph
+from app.topology_rules import topology_rules
+from .topology_corpus import hierarchical_diagram
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"  {label:<24} {(time.perf_counter() - started) * 1000:8.1f} ms")
+    return result
+
+
+def verify_with_networkx(graph: TopologyGraph):
+    try:
+        import networkx as nx
+    except ImportError:
+        print("  (networkx ไม่ได้ติดตั้ง ข้ามการตรวจผล)")
+        return
+    reference = nx.MultiGraph()
+    reference.add_nodes_from(range(graph.node_count))
+    reference.add_edges_from(zip(graph.edge_source, graph.edge_target))
+    simple = nx.Graph(reference)
+    assert len(graph.component_sizes()) == nx.number_connected_components(reference)
+    assert set(graph.articulation_points()) == set(nx.articulation_points(simple))
+    # edge ที่ซ้ำกันไม่ใช่ bridge ใน MultiGraph จึงตัดออกก่อนเทียบ
+    multi = {pair for pair in simple.edges if reference.number_of_edges(*pair) > 1}
+    expected = {frozenset(pair) for pair in nx.bridges(simple) if pair not in multi}
+    actual = {frozenset((graph.edge_source[e], graph.edge_target[e])) for e in graph.bridges()}
+    assert actual == expected
+    print("  ✅ ผลตรงกับ networkx")
+
+
+def main(distributions: int, access: int, hosts: int, verify: bool):
+    nodes, edges = hierarchical_diagram(
+        cores=2, distributions=distributions, access_per_distribution=access, hosts_per_access=hosts,
+    )
+    print(f"📊 {len(nodes)} devices, {len(edges)} links")
+    started = time.perf_counter()
+    graph = timed("build index", lambda: TopologyGraph(nodes, edges))
+    timed("components", graph.components)
+    timed("articulation + bridges", graph.articulation_points)
+    print(f"  {'total':<24} {(time.perf_counter() - started) * 1000:8.1f} ms")
+    # index ที่ graph cache ไว้แล้ว (components, cuts) จะไม่ถูกคำนวณซ้ำใน rule
+    report = timed("topology rules", lambda: topology_rules.run(graph))
+    for name, ms in sorted(report.timings_ms.items(), key=lambda item: -item[1])[:5]:
+        print(f"    {name:<26} {ms:8.1f} ms")
+    print(
+        f"  components={len(graph.component_sizes())} articulation={len(graph.articulation_points())} "
+        f"critical={len(graph.critical_articulation_points())} bridges={len(graph.bridges())} "
+        f"backbone_bridges={len(graph.backbone_bridges())}"
+    )
+    capacity = timed("capacity (load + flow)", lambda: CapacityAnalyzer(graph, per_user_bps=10e6).analyze())
+    print(
+        f"  engine={capacity['engine']} demand={capacity['total_demand']} deliverable={capacity['deliverable']} "
+        f"overloaded_links={capacity['overloaded_link_count']}"
+    )
+    analyzer = NetworkTopologyAnalyzer()
+    timed("analyze_network_topology", lambda: analyzer.analyze_network_topology(nodes, edges))
+    if verify:
+        verify_with_networkx(graph)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--distributions", type=int, default=40)
+    parser.add_argument("--access", type=int, default=25)
+    parser.add_argument("--hosts", type=int, default=100, help="จำนวนเครื่องต่อ access switch")
+    parser.add_argument("--no-verify", action="store_true")
+    args = parser.parse_args()
+    main(args.distributions, args.access, args.hosts, not args.no_verify)
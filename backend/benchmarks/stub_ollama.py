@@ -0,0 +1,111 @@
+"""
+Stub Ollama server สำหรับ benchmark และการทดสอบแบบ local
+
+จำลอง endpoints v1 ที่ backend ใช้ (/v1/models และ /v1/chat/completions)
+โดยไม่ต้องมี GPU หรือ model จริง
+
+รันแยก:  python -m benchmarks.stub_ollama --port 11500 --delay 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from aiohttp import web
+
+DEFAULT_MODELS = ["deepseek-r1:14b", "llama3.2:latest", "mistral:latest"]
+
+
+class StubOllama:
+    def __init__(self, models=None, delay: float = 0.0, reply: str = "ผลการวิเคราะห์จำลองจาก stub Ollama"):
+        self.models = list(models or DEFAULT_MODELS)
+        self.delay = delay
+        self.reply = reply
+        self.healthy = True
+        self.request_counts = {"models": 0, "chat": 0}
+        self.app = web.Application()
+        self.app.router.add_get("/v1/models", self.handle_models)
+        self.app.router.add_post("/v1/chat/completions", self.handle_chat)
+        self._runner = None
+        self.port = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def handle_models(self, request: web.Request) -> web.Response:
+        self.request_counts["models"] += 1
+        if not self.healthy:
+            return web.json_response({"error": "unavailable"}, status=503)
+        return web.json_response({
+            "object": "list",
+            "data": [{"id": name, "object": "model", "owned_by": "library"} for name in self.models],
+        })
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        self.request_counts["chat"] += 1
+        if not self.healthy:
+            return web.json_response({"error": "unavailable"}, status=503)
+        payload = await request.json()
+        if payload.get("stream"):
+            return await self._stream_chat(request, payload)
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return web.json_response({
+            "id": f"chatcmpl-{int(time.time() * 1000)}",
+            "object": "chat.completion",
+            "model": payload.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": self.reply},
+                "finish_reason": "stop",
+            }],
+        })
+
+    async def _stream_chat(self, request: web.Request, payload: dict) -> web.StreamResponse:
+        """ส่งคำตอบเป็น SSE chunks แบบเดียวกับ Ollama (delay กระจายเท่า ๆ กันในแต่ละ chunk)"""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            if self.delay:
+                await asyncio.sleep(self.delay / len(words))
+            chunk = {
+                "object": "chat.completion.chunk",
+                "model": payload.get("model"),
+                "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}],
+            }
+            await response.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    async def start(self, port: int = 0):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(port: int, delay: float):
+    stub = await StubOllama(delay=delay).start(port)
+    print(f"🤖 Stub Ollama running at {stub.base_url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub Ollama server")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--delay", type=float, default=0.0, help="หน่วงเวลาต่อ chat request (วินาที)")
+    args = parser.parse_args()
+    asyncio.run(_serve(args.port, args.delay))
@@ -0,0 +1,93 @@
+"""
+สร้างแผนผังเครือข่ายจำลองในรูปแบบเดียวกับที่ frontend (React Flow) ส่งมา
+
+ใช้ร่วมกันระหว่าง benchmark ต่าง ๆ โครงสร้างเป็นลำดับชั้น Core -> Distribution -> Access -> PC/Server
+พร้อม fields ด้าน UI (position, measured, style, ...) เหมือนข้อมูลจริง
+"""
+import random
+import time
+
+
+def _node(node_id, device_type, label, x, y, role=None, throughput="1000"):
+    data = {"label": label, "type": device_type}
+    if device_type != "pc":
+        data["maxThroughput"] = throughput
+        data["throughputUnit"] = "Mbps"
+    if role:
+        data["deviceRole"] = role
+    return {
+        "id": node_id,
+        "type": device_type,
+        "position": {"x": x, "y": y},
+        "data": data,
+        "measured": {"width": 96, "height": 84},
+        "selected": False,
+        "dragging": False,
+    }
+
+
+def _edge(source, target, bandwidth="1000", unit="Mbps"):
+    return {
+        "id": f"edge_{source}_{target}_{int(time.time() * 1000)}",
+        "source": source,
+        "target": target,
+        "sourceHandle": "right",
+        "targetHandle": "left",
+        "type": "custom",
+        "animated": False,
+        "style": {"stroke": "#64748b", "strokeWidth": 2},
+        "data": {"label": f"{bandwidth} {unit}", "bandwidth": bandwidth, "bandwidthUnit": unit},
+    }
+
+
+def hierarchical_diagram(cores=2, distributions=4, access_per_distribution=4, hosts_per_access=10, seed=0):
+    """แผนผังแบบ 3 ชั้น คืน (nodes, edges)"""
+    rng = random.Random(seed)
+    nodes, edges = [], []
+    counter = [0]
+
+    def next_id():
+        counter[0] += 1
+        return f"node_{1700000000000 + counter[0]}"
+
+    firewall = next_id()
+    nodes.append(_node(firewall, "firewall", "Firewall 1", 0, 0, throughput="10000"))
+    router = next_id()
+    nodes.append(_node(router, "router", "Router 1", 0, 100, throughput="10000"))
+    edges.append(_edge(firewall, router, "10", "Gbps"))
+
+    core_ids = []
+    for c in range(cores):
+        core = next_id()
+        core_ids.append(core)
+        nodes.append(_node(core, "switch", f"Core Switch {c + 1}", c * 200, 200, role="Core", throughput="40000"))
+        edges.append(_edge(router, core, "10", "Gbps"))
+
+    for d in range(distributions):
+        dist = next_id()
+        nodes.append(_node(dist, "switch", f"Distribution Switch {d + 1}", d * 200, 300, role="Distribution", throughput="10000"))
+        for core in core_ids:
+            edges.append(_edge(core, dist, "10", "Gbps"))
+        for a in range(access_per_distribution):
+            access = next_id()
+            nodes.append(_node(access, "switch", f"Access Switch {d + 1}-{a + 1}", a * 150, 400, role="Access"))
+            edges.append(_edge(dist, access, "1", "Gbps"))
+            for h in range(hosts_per_access):
+                host = next_id()
+                if rng.random() < 0.1:
+                    nodes.append(_node(host, "server", f"Server {counter[0]}", h * 60, 500))
+                else:
+                    nodes.append(_node(host, "pc", f"PC {counter[0]}", h * 60, 500))
+                edges.append(_edge(access, host, "1000", "Mbps"))
+    return nodes, edges
+
+
+def corpus():
+    """ชุดแผนผังตั้งแต่ขนาดเล็กถึงใหญ่ คืน list ของ (ชื่อ, nodes, edges)"""
+    sizes = [
+        ("small-office", dict(cores=1, distributions=1, access_per_distribution=1, hosts_per_access=5)),
+        ("branch", dict(cores=1, distributions=2, access_per_distribution=3, hosts_per_access=8)),
+        ("campus", dict(cores=2, distributions=4, access_per_distribution=6, hosts_per_access=20)),
+        ("enterprise", dict(cores=2, distributions=10, access_per_distribution=10, hosts_per_access=24)),
+    ]
+    return [(name, *hierarchical_diagram(**params)) for name, params in sizes]
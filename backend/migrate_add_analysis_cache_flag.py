@@ -0,0 +1,36 @@
+"""
+Migration script to add is_cached column to ai_analysis_history
+"""
+import sqlite3
+
+def migrate_database():
+    conn = sqlite3.connect('network_topology.db')
+    cursor = conn.cursor()
+    
+    try:
+        print("Starting database migration...")
+        
+        print("Adding is_cached column to ai_analysis_history table...")
+        try:
+            cursor.execute("ALTER TABLE ai_analysis_history ADD COLUMN is_cached BOOLEAN DEFAULT 0")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Column is_cached already exists in ai_analysis_history table")
+            else:
+                raise e
+        
+        print("Updating existing analysis history...")
+        cursor.execute("UPDATE ai_analysis_history SET is_cached = 0 WHERE is_cached IS NULL")
+        
+        conn.commit()
+        print("Migration completed successfully!")
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
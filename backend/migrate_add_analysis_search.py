@@ -0,0 +1,47 @@
+"""
+Migration script to create the analysis history search index (FTS5 table analysis_search + triggers)
+
+รันซ้ำได้: สร้างดัชนีใหม่ทั้งหมดจาก ai_analysis_history (rebuild) แล้ว optimize
+"""
+import os
+import sqlite3
+import time
+
+from app import analysis_search
+
+
+def migrate_database(db_path='network_topology.db'):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Starting database migration...")
+        started = time.perf_counter()
+        size_before = os.path.getsize(db_path)
+
+        print("Creating analysis_search table and triggers...")
+        for statement in analysis_search.CREATE_STATEMENTS:
+            cursor.execute(statement)
+
+        print("Indexing existing analysis history...")
+        cursor.execute(analysis_search.REBUILD)
+        (rows,) = cursor.execute("SELECT count(*) FROM ai_analysis_history").fetchone()
+        conn.commit()
+        print(f"Indexed {rows} analyses")
+
+        print("Optimizing index...")
+        cursor.execute("INSERT INTO analysis_search (analysis_search) VALUES ('optimize')")
+        conn.commit()
+        size_after = os.path.getsize(db_path)
+        print(f"Database size: {size_before / 2**20:.1f}MB -> {size_after / 2**20:.1f}MB")
+        print(f"Migration completed successfully! ({time.perf_counter() - started:.1f}s)")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
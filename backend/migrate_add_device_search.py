@@ -0,0 +1,90 @@
+"""
+Migration script to create the device search index (FTS5 table device_search) and index existing projects
+
+รันซ้ำได้: สร้างดัชนีใหม่ทั้งหมดจาก diagram_data (blob) และ diagram_nodes (normalized)
+"""
+import sqlite3
+import time
+
+from app import device_search, diagram_codec, fast_json
+
+BATCH_SIZE = 200
+
+COLUMNS = ("rowid", "label", "device_type", "role", "attributes", "owner", "project_id", "node_id")
+
+
+def _project_nodes(cursor, rows):
+    """(project_id, owner_id, nodes) ของแต่ละ project ในหน้า"""
+    normalized = [project_id for project_id, _, storage, _ in rows if storage == "normalized"]
+    stored_nodes = {project_id: [] for project_id in normalized}
+    if normalized:
+        placeholders = ", ".join("?" * len(normalized))
+        for project_id, data in cursor.execute(
+            f"SELECT project_id, data FROM diagram_nodes WHERE project_id IN ({placeholders}) ORDER BY project_id, seq",
+            normalized,
+        ):
+            stored_nodes[project_id].append(fast_json.loads(data))
+    for project_id, owner_id, storage, diagram_data in rows:
+        if storage == "normalized":
+            yield project_id, owner_id, stored_nodes[project_id]
+            continue
+        try:
+            document = fast_json.loads(diagram_codec.decode(diagram_data)) if diagram_data else {}
+        except ValueError:
+            document = {}
+        nodes = document.get("nodes") if isinstance(document, dict) else None
+        yield project_id, owner_id, nodes if isinstance(nodes, list) else []
+
+
+def migrate_database(db_path='network_topology.db', batch_size=BATCH_SIZE):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Starting database migration...")
+        started = time.perf_counter()
+
+        print("Creating device_search table...")
+        cursor.execute(device_search.CREATE_TABLE)
+        cursor.execute("DELETE FROM device_search")
+
+        has_storage = "storage" in [row[1] for row in cursor.execute("PRAGMA table_info(projects)")]
+        storage_column = "storage" if has_storage else "'blob'"
+
+        print("Indexing devices of existing projects...")
+        last_id, projects, devices = 0, 0, 0
+        while True:
+            rows = cursor.execute(
+                f"SELECT id, owner_id, {storage_column}, diagram_data FROM projects WHERE id > ? ORDER BY id LIMIT ?",
+                (last_id, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            values = [
+                tuple(row[column] for column in COLUMNS)
+                for project_id, owner_id, nodes in _project_nodes(cursor, rows)
+                for row in device_search.node_rows(project_id, owner_id, nodes)
+            ]
+            cursor.executemany(
+                f"INSERT INTO device_search ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})", values
+            )
+            conn.commit()
+            last_id = rows[-1][0]
+            projects += len(rows)
+            devices += len(values)
+        print(f"Indexed {devices} devices in {projects} projects")
+
+        print("Optimizing index...")
+        cursor.execute("INSERT INTO device_search (device_search) VALUES ('optimize')")
+        conn.commit()
+        print(f"Migration completed successfully! ({time.perf_counter() - started:.1f}s)")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,61 @@
+"""
+Migration script to add content_hash (ETag) to projects
+"""
+import sqlite3
+
+from app import diagram_codec
+from app.crud import project_content_hash
+
+BATCH_SIZE = 500
+
+
+def migrate_database(db_path='network_topology.db'):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Starting database migration...")
+
+        print("Adding content_hash column to projects table...")
+        try:
+            cursor.execute("ALTER TABLE projects ADD COLUMN content_hash VARCHAR(64)")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Column content_hash already exists in projects table")
+            else:
+                raise e
+
+        print("Computing content hashes of existing projects...")
+        last_id, updated = 0, 0
+        while True:
+            rows = cursor.execute(
+                "SELECT id, name, description, diagram_data FROM projects "
+                "WHERE id > ? AND content_hash IS NULL ORDER BY id LIMIT ?",
+                (last_id, BATCH_SIZE),
+            ).fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE projects SET content_hash = ? WHERE id = ?",
+                [
+                    (project_content_hash(name, description, diagram_codec.decode(diagram_data)), row_id)
+                    for row_id, name, description, diagram_data in rows
+                ],
+            )
+            conn.commit()
+            last_id = rows[-1][0]
+            updated += len(rows)
+        print(f"Updated {updated} projects")
+
+        conn.commit()
+        print("Migration completed successfully!")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,62 @@
+"""
+Migration script to add diagram revision history (project_revisions) and ai_analysis_history.revision_id
+
+project เดิมไม่ต้องสร้าง revision ล่วงหน้า: การบันทึกแผนผังครั้งแรกหลัง migrate จะเก็บสถานะเดิมเป็น revision 1
+"""
+import sqlite3
+
+
+def migrate_database(db_path='network_topology.db'):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Starting database migration...")
+
+        print("Creating project_revisions table...")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS project_revisions (
+                id INTEGER NOT NULL PRIMARY KEY,
+                project_id INTEGER NOT NULL,
+                revision INTEGER NOT NULL,
+                kind VARCHAR(10) NOT NULL,
+                base_revision INTEGER NOT NULL,
+                data TEXT,
+                content_hash VARCHAR(64),
+                topology_hash VARCHAR(64),
+                node_count INTEGER,
+                edge_count INTEGER,
+                diagram_size INTEGER,
+                changed_count INTEGER,
+                created_at DATETIME,
+                UNIQUE (project_id, revision),
+                FOREIGN KEY(project_id) REFERENCES projects (id) ON DELETE CASCADE
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_project_revisions_id ON project_revisions (id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_project_revisions_project_id ON project_revisions (project_id)")
+
+        print("Adding revision_id column to ai_analysis_history table...")
+        try:
+            cursor.execute(
+                "ALTER TABLE ai_analysis_history ADD COLUMN revision_id INTEGER "
+                "REFERENCES project_revisions (id) ON DELETE SET NULL"
+            )
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Column revision_id already exists in ai_analysis_history table")
+            else:
+                raise e
+
+        conn.commit()
+        print("Migration completed successfully!")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
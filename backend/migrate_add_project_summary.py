@@ -0,0 +1,74 @@
+"""
+Migration script to add node_count, edge_count and diagram_size to projects
+
+ค่าถูกคำนวณจาก diagram_data ของแถวเดิมทีละ batch (รองรับทั้งแถวที่บีบอัดแล้วและยังไม่บีบอัด)
+"""
+import json
+import sqlite3
+
+from app import diagram_codec
+
+BATCH_SIZE = 500
+
+
+def summarize(value):
+    diagram_data = diagram_codec.decode(value)
+    if not diagram_data:
+        return 0, 0, 0
+    try:
+        diagram = json.loads(diagram_data)
+        node_count, edge_count = len(diagram.get("nodes") or []), len(diagram.get("edges") or [])
+    except (ValueError, AttributeError, TypeError):
+        node_count = edge_count = 0
+    return node_count, edge_count, len(diagram_data.encode("utf-8"))
+
+
+def migrate_database(db_path='network_topology.db'):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Starting database migration...")
+
+        print("Adding node_count, edge_count and diagram_size columns to projects table...")
+        for column in ("node_count", "edge_count", "diagram_size"):
+            try:
+                cursor.execute(f"ALTER TABLE projects ADD COLUMN {column} INTEGER DEFAULT 0")
+            except sqlite3.OperationalError as e:
+                if "duplicate column name" in str(e):
+                    print(f"Column {column} already exists in projects table")
+                else:
+                    raise e
+
+        print("Creating index on projects.owner_id...")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_projects_owner_id ON projects (owner_id)")
+
+        print("Computing summaries of existing diagrams...")
+        last_id, updated = 0, 0
+        while True:
+            rows = cursor.execute(
+                "SELECT id, diagram_data FROM projects WHERE id > ? ORDER BY id LIMIT ?", (last_id, BATCH_SIZE)
+            ).fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE projects SET node_count = ?, edge_count = ?, diagram_size = ? WHERE id = ?",
+                [(*summarize(value), row_id) for row_id, value in rows],
+            )
+            conn.commit()
+            last_id = rows[-1][0]
+            updated += len(rows)
+        print(f"Updated {updated} projects")
+
+        conn.commit()
+        print("Migration completed successfully!")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,33 @@
+"""
+Migration script to add time_to_first_token_ms column to ai_analysis_history
+"""
+import sqlite3
+
+def migrate_database():
+    conn = sqlite3.connect('network_topology.db')
+    cursor = conn.cursor()
+    
+    try:
+        print("Starting database migration...")
+        
+        print("Adding time_to_first_token_ms column to ai_analysis_history table...")
+        try:
+            cursor.execute("ALTER TABLE ai_analysis_history ADD COLUMN time_to_first_token_ms INTEGER")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" in str(e):
+                print("Column time_to_first_token_ms already exists in ai_analysis_history table")
+            else:
+                raise e
+        
+        conn.commit()
+        print("Migration completed successfully!")
+        
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    migrate_database()
@@ -0,0 +1,85 @@
+"""
+Migration script to compress projects.diagram_data (see app/diagram_codec.py)
+
+บีบอัดแถวเดิมทีละ batch (commit ทุก batch จึงหยุดกลางคันแล้วรันใหม่ได้) แล้วแสดงขนาดไฟล์และเวลาอ่านก่อน/หลัง
+
+    python migrate_compress_diagram_data.py                  # zlib, 500 แถวต่อ batch แล้ว VACUUM
+    python migrate_compress_diagram_data.py --codec zstd
+    python migrate_compress_diagram_data.py --decompress     # ย้อนกลับเป็นข้อความธรรมดา
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+from app import diagram_codec
+
+
+def read_all_ms(cursor):
+    """เวลาอ่าน diagram_data ทุกแถวและแปลงกลับเป็นข้อความ (เหมือน GET /projects/ เดิม)"""
+    started = time.perf_counter()
+    for (value,) in cursor.execute("SELECT diagram_data FROM projects"):
+        diagram_codec.decode(value)
+    return (time.perf_counter() - started) * 1000
+
+
+def migrate_database(db_path='network_topology.db', codec='zlib', batch_size=500,
+                     min_size=diagram_codec.DEFAULT_MIN_SIZE, decompress=False, vacuum=True):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    codec = diagram_codec.available_codec(codec)
+
+    try:
+        print("Starting database migration...")
+        size_before = os.path.getsize(db_path)
+        read_before = read_all_ms(cursor)
+
+        # แถวเดิมเป็น TEXT, แถวที่บีบอัดแล้วเป็น BLOB
+        pending_type = "blob" if decompress else "text"
+        print(f"{'Decompressing' if decompress else f'Compressing ({codec})'} projects.diagram_data...")
+        last_id, converted = 0, 0
+        while True:
+            rows = cursor.execute(
+                "SELECT id, diagram_data FROM projects WHERE id > ? AND typeof(diagram_data) = ? ORDER BY id LIMIT ?",
+                (last_id, pending_type, batch_size),
+            ).fetchall()
+            if not rows:
+                break
+            if decompress:
+                updates = [(diagram_codec.decode(value), row_id) for row_id, value in rows]
+            else:
+                updates = [(diagram_codec.encode(value, codec, min_size), row_id) for row_id, value in rows]
+            cursor.executemany("UPDATE projects SET diagram_data = ? WHERE id = ?", updates)
+            conn.commit()
+            last_id = rows[-1][0]
+            converted += len(rows)
+            print(f"  {converted} rows")
+
+        if vacuum:
+            print("Reclaiming free pages (VACUUM)...")
+            conn.execute("VACUUM")
+
+        size_after = os.path.getsize(db_path)
+        read_after = read_all_ms(cursor)
+        print(f"Converted {converted} rows")
+        print(f"Database size: {size_before / 1024:.0f} KB -> {size_after / 1024:.0f} KB")
+        print(f"Read all diagrams: {read_before:.1f} ms -> {read_after:.1f} ms")
+        print("Migration completed successfully!")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compress projects.diagram_data")
+    parser.add_argument("--db", default="network_topology.db")
+    parser.add_argument("--codec", choices=diagram_codec.CODECS, default="zlib")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--min-size", type=int, default=diagram_codec.DEFAULT_MIN_SIZE)
+    parser.add_argument("--decompress", action="store_true", help="ย้อนกลับเป็นข้อความธรรมดา")
+    parser.add_argument("--no-vacuum", action="store_true")
+    args = parser.parse_args()
+    migrate_database(args.db, args.codec, args.batch_size, args.min_size, args.decompress, not args.no_vacuum)
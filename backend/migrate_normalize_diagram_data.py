@@ -0,0 +1,189 @@
+"""
+Migration script to move Project.diagram_data blobs into diagram_nodes/diagram_edges (normalized storage)
+
+    python migrate_normalize_diagram_data.py                 # แปลงทุก project ที่แปลงได้
+    python migrate_normalize_diagram_data.py --reverse       # ย้ายกลับเป็น blob ใน diagram_data
+
+แผนผังที่มี field อื่นนอกจาก nodes/edges หรือมี item ที่ไม่มี id คงเป็น blob ไว้
+ตั้ง DIAGRAM_STORAGE=normalized ด้วยเพื่อให้การบันทึกครั้งถัดไปยังเก็บแบบ normalized (ไม่เช่นนั้นจะกลับเป็น blob)
+"""
+import argparse
+import sqlite3
+import time
+
+from app import diagram_codec, diagram_store, fast_json
+from app.config import settings
+from app.crud import project_content_hash
+
+BATCH_SIZE = 200
+
+NODE_COLUMNS = ("project_id", "seq", "node_id", "device_type", "role", "label", "throughput_bps", "data")
+EDGE_COLUMNS = ("project_id", "seq", "edge_id", "source", "target", "bandwidth_bps", "data")
+
+
+def create_tables(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS diagram_nodes (
+            id INTEGER NOT NULL PRIMARY KEY,
+            project_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            node_id VARCHAR NOT NULL,
+            device_type VARCHAR(50),
+            role VARCHAR(50),
+            label VARCHAR,
+            throughput_bps FLOAT,
+            data TEXT NOT NULL,
+            UNIQUE (project_id, seq),
+            FOREIGN KEY(project_id) REFERENCES projects (id) ON DELETE CASCADE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS diagram_edges (
+            id INTEGER NOT NULL PRIMARY KEY,
+            project_id INTEGER NOT NULL,
+            seq INTEGER NOT NULL,
+            edge_id VARCHAR,
+            source VARCHAR,
+            target VARCHAR,
+            bandwidth_bps FLOAT,
+            data TEXT NOT NULL,
+            UNIQUE (project_id, seq),
+            FOREIGN KEY(project_id) REFERENCES projects (id) ON DELETE CASCADE
+        )
+    """)
+    for table, column in (
+        ("diagram_nodes", "device_type"), ("diagram_nodes", "role"), ("diagram_nodes", "throughput_bps"),
+        ("diagram_edges", "source"), ("diagram_edges", "target"),
+    ):
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})")
+
+    try:
+        cursor.execute("ALTER TABLE projects ADD COLUMN storage VARCHAR(10) NOT NULL DEFAULT 'blob'")
+    except sqlite3.OperationalError as e:
+        if "duplicate column name" in str(e):
+            print("Column storage already exists in projects table")
+        else:
+            raise e
+
+
+def normalize(cursor, batch_size):
+    last_id, converted, skipped = 0, 0, 0
+    while True:
+        rows = cursor.execute(
+            "SELECT id, name, description, diagram_data FROM projects "
+            "WHERE id > ? AND storage = 'blob' AND diagram_data IS NOT NULL ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        ).fetchall()
+        if not rows:
+            break
+        node_rows, edge_rows, updates = [], [], []
+        for project_id, name, description, stored in rows:
+            diagram_data = diagram_codec.decode(stored)
+            try:
+                document = fast_json.loads(diagram_data) if diagram_data else None
+            except ValueError:
+                document = None
+            if not diagram_data or not diagram_store.normalizable(document):
+                skipped += 1
+                continue
+            serialized = diagram_store.serialize(document)
+            node_rows += [
+                tuple(diagram_store.node_row(project_id, seq, node, data)[column] for column in NODE_COLUMNS)
+                for seq, (node, data) in enumerate(zip(document.get("nodes", []), serialized["nodes"]))
+            ]
+            edge_rows += [
+                tuple(diagram_store.edge_row(project_id, seq, edge, data)[column] for column in EDGE_COLUMNS)
+                for seq, (edge, data) in enumerate(zip(document.get("edges", []), serialized["edges"]))
+            ]
+            canonical = diagram_store.assemble(serialized["nodes"], serialized["edges"])
+            updates.append((len(canonical.encode("utf-8")), project_content_hash(name, description, canonical), project_id))
+        project_ids = [(row[0],) for row in rows]
+        cursor.executemany("DELETE FROM diagram_nodes WHERE project_id = ?", project_ids)
+        cursor.executemany("DELETE FROM diagram_edges WHERE project_id = ?", project_ids)
+        cursor.executemany(f"INSERT INTO diagram_nodes ({', '.join(NODE_COLUMNS)}) VALUES ({', '.join('?' * len(NODE_COLUMNS))})", node_rows)
+        cursor.executemany(f"INSERT INTO diagram_edges ({', '.join(EDGE_COLUMNS)}) VALUES ({', '.join('?' * len(EDGE_COLUMNS))})", edge_rows)
+        cursor.executemany(
+            "UPDATE projects SET diagram_data = NULL, storage = 'normalized', diagram_size = ?, content_hash = ? WHERE id = ?",
+            updates,
+        )
+        cursor.connection.commit()
+        last_id = rows[-1][0]
+        converted += len(updates)
+    print(f"Normalized {converted} projects ({skipped} kept as blob)")
+
+
+def denormalize(cursor, batch_size):
+    last_id, restored = 0, 0
+    while True:
+        project_ids = [row[0] for row in cursor.execute(
+            "SELECT id FROM projects WHERE id > ? AND storage = 'normalized' ORDER BY id LIMIT ?",
+            (last_id, batch_size),
+        )]
+        if not project_ids:
+            break
+        parts = {project_id: {"diagram_nodes": [], "diagram_edges": []} for project_id in project_ids}
+        placeholders = ", ".join("?" * len(project_ids))
+        for table in ("diagram_nodes", "diagram_edges"):
+            for project_id, data in cursor.execute(
+                f"SELECT project_id, data FROM {table} WHERE project_id IN ({placeholders}) ORDER BY project_id, seq",
+                project_ids,
+            ):
+                parts[project_id][table].append(data)
+        cursor.executemany(
+            "UPDATE projects SET diagram_data = ?, storage = 'blob' WHERE id = ?",
+            [
+                (
+                    diagram_codec.encode(
+                        diagram_store.assemble(items["diagram_nodes"], items["diagram_edges"]),
+                        settings.DIAGRAM_COMPRESSION,
+                        settings.DIAGRAM_COMPRESSION_MIN_BYTES,
+                    ),
+                    project_id,
+                )
+                for project_id, items in parts.items()
+            ],
+        )
+        cursor.executemany("DELETE FROM diagram_nodes WHERE project_id = ?", [(project_id,) for project_id in project_ids])
+        cursor.executemany("DELETE FROM diagram_edges WHERE project_id = ?", [(project_id,) for project_id in project_ids])
+        cursor.connection.commit()
+        last_id = project_ids[-1]
+        restored += len(project_ids)
+    print(f"Restored {restored} projects to blob storage")
+
+
+def migrate_database(db_path='network_topology.db', reverse=False, batch_size=BATCH_SIZE):
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    try:
+        print("Starting database migration...")
+        started = time.perf_counter()
+
+        print("Creating diagram_nodes and diagram_edges tables...")
+        create_tables(cursor)
+        conn.commit()
+
+        if reverse:
+            print("Moving normalized diagrams back into projects.diagram_data...")
+            denormalize(cursor, batch_size)
+        else:
+            print("Moving projects.diagram_data into diagram_nodes and diagram_edges...")
+            normalize(cursor, batch_size)
+
+        conn.commit()
+        print(f"Migration completed successfully! ({time.perf_counter() - started:.1f}s)")
+
+    except Exception as e:
+        conn.rollback()
+        print(f"Migration failed: {e}")
+        raise e
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move project diagrams between blob and normalized storage")
+    parser.add_argument("--db", default="network_topology.db")
+    parser.add_argument("--reverse", action="store_true", help="ย้ายกลับเป็น blob ใน diagram_data")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    migrate_database(args.db, reverse=args.reverse, batch_size=args.batch_size)
@@ -25,6 +25,7 @@ import { ChevronDown, Save, FolderOpen, Plus, Trash2, Download, Edit3, LogOut, U
 import { useNetworkDiagram } from '@/hooks/useNetworkDiagram';
 import { useAuth } from '@/contexts/AuthContext';
 import { useProject } from '@/contexts/ProjectContext';
+import { computeDiagramDelta, isEmptyDelta } from '@/lib/diagramDelta';
 import { ProjectSelectionModal } from './ProjectSelectionModal';
 import AIEntryIcon from './ui/AIEntryIcon';
 import AIPanel from './AIPanel';
@@ -79,6 +80,7 @@ const NetworkDiagramFlow = React.memo(({ projectSelectionOpen, setProjectSelecti
     currentProject,
     createProject,
     updateProject,
+    patchProjectDiagram,
     deleteProject,
     clearCurrentProject
   } = useProject();
@@ -161,10 +163,20 @@ const NetworkDiagramFlow = React.memo(({ projectSelectionOpen, setProjectSelecti
     setIsAutoSaving(true);
     try {
       const diagramData = JSON.stringify({ nodes, edges });
-      await updateProject(currentProject.id, {
-        name: projectName,
-        diagram_data: diagramData
-      });
+      // ส่งเฉพาะส่วนที่เปลี่ยนจากที่บันทึกล่าสุด ถ้า delta ใหญ่เกินครึ่งของแผนผังหรือชื่อเปลี่ยนจึงส่งทั้งแผนผัง
+      const delta = projectName === currentProject.name
+        ? computeDiagramDelta(currentProject.diagram_data, nodes, edges)
+        : null;
+      if (delta && isEmptyDelta(delta)) {
+        // ไม่มีอะไรเปลี่ยน ไม่ต้องส่ง request
+      } else if (delta && JSON.stringify(delta).length < diagramData.length / 2) {
+        await patchProjectDiagram(currentProject.id, delta, diagramData);
+      } else {
+        await updateProject(currentProject.id, {
+          name: projectName,
+          diagram_data: diagramData
+        });
+      }
 
       // บันทึก backup ลง localStorage
       localStorage.setItem('network_diagram_backup', JSON.stringify({
@@ -182,7 +194,7 @@ const NetworkDiagramFlow = React.memo(({ projectSelectionOpen, setProjectSelecti
     } finally {
       setIsAutoSaving(false);
     }
-  }, [nodes, edges, currentProject, projectName, updateProject]);
+  }, [nodes, edges, currentProject, projectName, updateProject, patchProjectDiagram]);
 
   // เริ่ม auto-save เมื่อมีข้อมูลเปลี่ยนแปลง
   useEffect(() => {
@@ -441,9 +453,13 @@ const NetworkDiagramFlow = React.memo(({ projectSelectionOpen, setProjectSelecti
         toast.success('สร้างและบันทึกโปรเจกต์ใหม่สำเร็จ');
         setLastAutoSaved(new Date());
       }
-    } catch (error) {
+    } catch (error: any) {
       console.error('Save failed:', error);
-      toast.error('บันทึกไม่สำเร็จ');
+      if (error.response?.status === 412) {
+        toast.error('โปรเจกต์ถูกแก้ไขจากแท็บหรือเครื่องอื่น กรุณาโหลดโปรเจกต์ใหม่ก่อนบันทึก');
+      } else {
+        toast.error('บันทึกไม่สำเร็จ');
+      }
     }
   };
 
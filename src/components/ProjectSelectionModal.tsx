@@ -18,13 +18,15 @@ export const ProjectSelectionModal: React.FC<ProjectSelectionModalProps> = ({
   const { projects, selectProject, loading } = useProject();
   const { setProjectName, loadDiagramFromData } = useNetworkDiagram();
 
-  const handleProjectSelect = (project: any) => {
-    selectProject(project);
-    setProjectName(project.name);
+  const handleProjectSelect = async (project: any) => {
+    // รายการมีแค่ข้อมูลสรุป selectProject โหลด diagram_data ด้วย GET /projects/{id}
+    const fullProject = await selectProject(project);
+    if (!fullProject) return;
+    setProjectName(fullProject.name);
     
     // Load diagram data if exists
-    if (project.diagram_data) {
-      loadDiagramFromData(project.diagram_data);
+    if (fullProject.diagram_data) {
+      loadDiagramFromData(fullProject.diagram_data);
     }
     
     onClose();
@@ -64,6 +66,9 @@ export const ProjectSelectionModal: React.FC<ProjectSelectionModalProps> = ({
                     )}
                   </CardHeader>
                   <CardContent>
+                    <div className="text-sm text-gray-500">
+                      อุปกรณ์ {project.node_count ?? 0} · การเชื่อมต่อ {project.edge_count ?? 0}
+                    </div>
                     <div className="text-sm text-gray-500">
                       สร้างเมื่อ: {new Date(project.created_at).toLocaleDateString('th-TH')}
                     </div>
@@ -1,25 +1,42 @@
 import React, { createContext, useContext, useState, useEffect } from 'react';
 import { projectsAPI } from '../services/api';
+import type { DiagramDelta } from '../lib/diagramDelta';
 import { useAuth } from './AuthContext';
 
 interface Project {
   id: number;
   name: string;
   description?: string;
-  diagram_data?: string;
+  diagram_data?: string;  // มีเฉพาะ project ที่โหลดด้วย getById (รายการ project ไม่มี)
+  node_count?: number;
+  edge_count?: number;
+  diagram_size?: number;
+  analysis_count?: number;
+  last_analysis_at?: string;
+  content_hash?: string;  // ETag ของ project ใช้ป้องกันการบันทึกทับกันระหว่างแท็บ
   owner_id: number;
   created_at: string;
   updated_at?: string;
 }
 
+const PROJECT_PAGE_SIZE = 100;
+
+// เก็บในรายการเฉพาะข้อมูลสรุป ไม่เก็บแผนผังทั้งหมดของทุก project
+const toSummary = (project: Project): Project => {
+  const summary = { ...project };
+  delete summary.diagram_data;
+  return summary;
+};
+
 interface ProjectContextType {
   projects: Project[];
   currentProject: Project | null;
   loading: boolean;
   createProject: (data: { name: string; description?: string; diagram_data?: string }) => Promise<void>;
   loadProjects: () => Promise<void>;
-  selectProject: (project: Project) => void;
+  selectProject: (project: Project) => Promise<Project | null>;
   updateProject: (id: number, data: any) => Promise<void>;
+  patchProjectDiagram: (id: number, delta: DiagramDelta, diagramData: string) => Promise<void>;
   deleteProject: (id: number) => Promise<void>;
   clearCurrentProject: () => void;
 }
@@ -79,7 +96,9 @@ export const ProjectProvider: React.FC<{ children: React.ReactNode }> = ({ child
         const project = projects.find(p => p.id.toString() === savedProjectId);
         if (project) {
           console.log('Restoring project:', project.id, project.name);
-          setCurrentProject(project);
+          fetchProject(project.id).then(fullProject => {
+            if (fullProject) setCurrentProject(fullProject);
+          });
         } else {
           // ถ้าไม่พบโปรเจกต์ที่บันทึกไว้ ให้ลบออกจาก localStorage
           console.log('Saved project not found, clearing localStorage');
@@ -99,10 +118,16 @@ export const ProjectProvider: React.FC<{ children: React.ReactNode }> = ({ child
     try {
       console.log('Loading projects for user:', user.id);
       console.log('Token available:', !!localStorage.getItem('token'));
-      const response = await projectsAPI.getAll();
-      console.log('Loaded projects:', response.data.length);
-      console.log('Projects data:', response.data);
-      setProjects(response.data);
+      const loaded: Project[] = [];
+      let afterId = 0;
+      while (true) {
+        const response = await projectsAPI.getAll({ after_id: afterId, limit: PROJECT_PAGE_SIZE });
+        loaded.push(...response.data);
+        if (response.data.length < PROJECT_PAGE_SIZE) break;
+        afterId = response.data[response.data.length - 1].id;
+      }
+      console.log('Loaded projects:', loaded.length);
+      setProjects(loaded);
     } catch (error: any) {
       console.error('Failed to load projects:', error);
       console.error('Error details:', error.response?.data);
@@ -119,7 +144,7 @@ export const ProjectProvider: React.FC<{ children: React.ReactNode }> = ({ child
       const newProject = response.data;
       console.log('Created project:', newProject.id, newProject.name);
       
-      setProjects(prev => [...prev, newProject]);
+      setProjects(prev => [...prev, toSummary(newProject)]);
       setCurrentProject(newProject);
       localStorage.setItem('currentProjectId', newProject.id.toString());
       // ลบ flag เมื่อสร้าง project ใหม่
@@ -132,8 +157,21 @@ export const ProjectProvider: React.FC<{ children: React.ReactNode }> = ({ child
     }
   };
 
-  const selectProject = (project: Project) => {
-    setCurrentProject(project);
+  const fetchProject = async (id: number): Promise<Project | null> => {
+    try {
+      const response = await projectsAPI.getById(id);
+      return response.data;
+    } catch (error) {
+      console.error('Failed to load project:', error);
+      return null;
+    }
+  };
+
+  const selectProject = async (project: Project) => {
+    // รายการ project ไม่มี diagram_data จึงโหลด project เต็มก่อนเปิด
+    const fullProject = await fetchProject(project.id);
+    if (!fullProject) return null;
+    setCurrentProject(fullProject);
     localStorage.setItem('currentProjectId', project.id.toString());
     // ลบ flag เมื่อ user เลือก project เพื่อให้การ restore ทำงานปกติในครั้งต่อไป
     localStorage.removeItem('isFirstLoadAfterLogin');
@@ -141,12 +179,14 @@ export const ProjectProvider: React.FC<{ children: React.ReactNode }> = ({ child
     
     // อัปเดต URL เพื่อให้สามารถ bookmark ได้
     window.history.pushState({}, '', '/diagram');
+    return fullProject;
   };
 
   const updateProject = async (id: number, data: any) => {
     try {
-      const response = await projectsAPI.update(id, data);
-      setProjects(prev => prev.map(p => p.id === id ? response.data : p));
+      const contentHash = currentProject?.id === id ? currentProject.content_hash : undefined;
+      const response = await projectsAPI.update(id, data, contentHash);
+      setProjects(prev => prev.map(p => p.id === id ? toSummary(response.data) : p));
       if (currentProject?.id === id) {
         setCurrentProject(response.data);
       }
@@ -156,6 +196,21 @@ export const ProjectProvider: React.FC<{ children: React.ReactNode }> = ({ child
     }
   };
 
+  // บันทึกแผนผังด้วย delta (diagramData คือแผนผังเต็มหลังแก้ไข ใช้เป็นฐานของ delta ครั้งถัดไป)
+  const patchProjectDiagram = async (id: number, delta: DiagramDelta, diagramData: string) => {
+    try {
+      const contentHash = currentProject?.id === id ? currentProject.content_hash : undefined;
+      const response = await projectsAPI.patchDiagram(id, delta, contentHash);
+      setProjects(prev => prev.map(p => p.id === id ? { ...p, ...response.data } : p));
+      if (currentProject?.id === id) {
+        setCurrentProject({ ...currentProject, ...response.data, diagram_data: diagramData });
+      }
+    } catch (error) {
+      console.error('Failed to patch project diagram:', error);
+      throw error;
+    }
+  };
+
   const deleteProject = async (id: number) => {
     try {
       await projectsAPI.delete(id);
@@ -184,6 +239,7 @@ export const ProjectProvider: React.FC<{ children: React.ReactNode }> = ({ child
       loadProjects,
       selectProject,
       updateProject,
+      patchProjectDiagram,
       deleteProject,
       clearCurrentProject,
     }}>
@@ -0,0 +1,54 @@
+// delta ของ nodes/edges เทียบกับแผนผังที่บันทึกล่าสุด ใช้กับ PATCH /projects/{id}
+// รูปแบบเดียวกับ TopologyDiff ฝั่ง backend: removed เป็น id, added/changed เป็น object เต็ม
+
+interface DiagramItem {
+  id: string;
+}
+
+export interface DiagramChanges {
+  added: DiagramItem[];
+  removed: string[];
+  changed: DiagramItem[];
+}
+
+export interface DiagramDelta {
+  nodes: DiagramChanges;
+  edges: DiagramChanges;
+}
+
+const diffItems = (previous: DiagramItem[], current: DiagramItem[]): DiagramChanges => {
+  const before = new Map(previous.map(item => [item.id, JSON.stringify(item)]));
+  const added: DiagramItem[] = [];
+  const changed: DiagramItem[] = [];
+  for (const item of current) {
+    const saved = before.get(item.id);
+    if (saved === undefined) {
+      added.push(item);
+    } else {
+      if (saved !== JSON.stringify(item)) changed.push(item);
+      before.delete(item.id);
+    }
+  }
+  return { added, removed: [...before.keys()], changed };
+};
+
+// คืน null ถ้าไม่มีแผนผังที่บันทึกไว้ให้เทียบ (ต้องบันทึกทั้งแผนผังแทน)
+export const computeDiagramDelta = (
+  savedDiagramData: string | undefined,
+  nodes: DiagramItem[],
+  edges: DiagramItem[],
+): DiagramDelta | null => {
+  if (!savedDiagramData) return null;
+  try {
+    const saved = JSON.parse(savedDiagramData);
+    return {
+      nodes: diffItems(saved.nodes || [], nodes),
+      edges: diffItems(saved.edges || [], edges),
+    };
+  } catch {
+    return null;
+  }
+};
+
+export const isEmptyDelta = (delta: DiagramDelta) =>
+  [delta.nodes, delta.edges].every(part => !part.added.length && !part.removed.length && !part.changed.length);
@@ -1,4 +1,5 @@
 import axios from 'axios';
+import type { DiagramDelta } from '../lib/diagramDelta';
 
 // const API_BASE_URL = 'https://qnh4b9xx-8000.asse.devtunnels.ms/';
 
@@ -48,12 +49,18 @@ export const projectsAPI = {
   create: (data: { name: string; description?: string; diagram_data?: string }) =>
     api.post('/projects/', data),
   
-  getAll: () => api.get('/projects/'),
+  // รายการไม่มี diagram_data (ใช้ getById เพื่อโหลดแผนผัง) แบ่งหน้าด้วย after_id = id สุดท้ายของหน้าก่อน
+  getAll: (params?: { after_id?: number; limit?: number }) => api.get('/projects/', { params }),
   
   getById: (id: number) => api.get(`/projects/${id}`),
   
-  update: (id: number, data: { name?: string; description?: string; diagram_data?: string }) =>
-    api.put(`/projects/${id}`, data),
+  // contentHash: content_hash ของ project ที่โหลดไว้ ถ้ามีการบันทึกจากที่อื่นก่อนหน้า API ตอบ 412
+  update: (id: number, data: { name?: string; description?: string; diagram_data?: string }, contentHash?: string) =>
+    api.put(`/projects/${id}`, data, contentHash ? { headers: { 'If-Match': `"${contentHash}"` } } : undefined),
+  
+  // ส่งเฉพาะ nodes/edges ที่เปลี่ยน (ดู lib/diagramDelta.ts) คืน content_hash ใหม่โดยไม่ส่งแผนผังกลับ
+  patchDiagram: (id: number, delta: DiagramDelta, contentHash?: string) =>
+    api.patch(`/projects/${id}`, delta, contentHash ? { headers: { 'If-Match': `"${contentHash}"` } } : undefined),
   
   delete: (id: number) => api.delete(`/projects/${id}`),
 };
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ AdmissionController (admission control หน้า Ollama): ลำดับ priority, ความ fair ระหว่างผู้ใช้,
+การปฏิเสธด้วย 429 + Retry-After เมื่อคิวเต็ม และการคืน slot เมื่อ task ถูกยกเลิก
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.admission import AdmissionController, PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, QueueFullError
+from app.routers.ai import _queue_full
+
+
+async def _settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def _queue_then_release(controller, requests):
+    """
+    ถือ slot เดียวไว้ ให้ requests (user, priority) เข้าคิวตามลำดับ แล้วปล่อย slot
+    คืนลำดับที่แต่ละ request ได้ slot
+    """
+    order = []
+
+    async def request(name, user, priority):
+        async with controller.slot(user, priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    await controller.acquire("holder")
+    tasks = [asyncio.create_task(request(name, user, priority)) for name, user, priority in requests]
+    await _settle()
+    assert controller.queued == len(requests)
+    controller.release("holder")
+    await asyncio.gather(*tasks)
+    assert controller.active == 0 and controller.queued == 0
+    return order
+
+
+def test_priority_ordering():
+    async def run():
+        controller = AdmissionController(max_concurrency=1)
+        return await _queue_then_release(controller, [
+            ("background-1", 1, PRIORITY_BACKGROUND),
+            ("background-2", 2, PRIORITY_BACKGROUND),
+            ("interactive", 3, PRIORITY_INTERACTIVE),
+        ])
+
+    # interactive มาทีหลังแต่ได้ก่อน ภายใน priority เดียวกันตามลำดับการมาถึง
+    assert asyncio.run(run()) == ["interactive", "background-1", "background-2"]
+
+
+def test_per_user_fairness():
+    async def run():
+        controller = AdmissionController(max_concurrency=2)
+        order = []
+        gates = {}
+
+        async def request(name, user):
+            async with controller.slot(user, PRIORITY_BACKGROUND):
+                order.append(name)
+                gates[name] = asyncio.Event()
+                await gates[name].wait()
+
+        # user 1 ถือ slot อยู่หนึ่ง slot, slot ที่สองถือโดย holder
+        first = asyncio.create_task(request("a1", 1))
+        await _settle()
+        await controller.acquire("holder")
+        waiting = [asyncio.create_task(request(name, user)) for name, user in [("a2", 1), ("a3", 1), ("b1", 2)]]
+        await _settle()
+        assert controller.queued == 3
+
+        # slot ว่างหนึ่งที่: user 2 ยังไม่มี generation ทำงานอยู่ จึงได้ก่อน a2/a3 ที่มาก่อน
+        controller.release("holder")
+        await _settle()
+        assert order == ["a1", "b1"]
+
+        for name in ["a1", "b1", "a2", "a3"]:
+            await _settle()
+            gates[name].set()
+        await asyncio.gather(first, *waiting)
+        return order
+
+    assert asyncio.run(run()) == ["a1", "b1", "a2", "a3"]
+
+
+def test_queue_full_retry_after():
+    async def run():
+        controller = AdmissionController(max_concurrency=1, max_queue_depth=2, max_queue_per_user=1, min_retry_after=5)
+        await controller.acquire()
+        controller.release(duration=40.0)  # เวลาเฉลี่ยต่อ generation 40 วินาที
+        await controller.acquire(1)
+        waiting = asyncio.create_task(controller.acquire(1))
+        await _settle()
+
+        # คิวของผู้ใช้คนเดียวกันเต็ม
+        try:
+            await controller.acquire(1)
+            raise AssertionError("expected QueueFullError")
+        except QueueFullError as e:
+            assert "user" in e.reason
+            assert e.retry_after == 80  # 40s x (1 ที่รอ + 1) / 1 slot
+
+        other = asyncio.create_task(controller.acquire(2))
+        await _settle()
+        # คิวรวมเต็ม ผู้ใช้อื่นถูกปฏิเสธด้วย
+        try:
+            controller.check_capacity(3)
+            raise AssertionError("expected QueueFullError")
+        except QueueFullError as e:
+            error = _queue_full(e)
+        assert error.status_code == 429
+        assert error.headers["Retry-After"] == "120"
+        assert controller.metrics()["rejected"] == 2
+
+        # งานเบื้องหลังที่ไม่ให้ปฏิเสธ (reject_when_full=False) รอคิวได้แม้คิวเต็ม
+        background = asyncio.create_task(controller.acquire(3, PRIORITY_BACKGROUND, reject_when_full=False))
+        await _settle()
+        assert controller.queued == 3
+        for holder, task in ((1, waiting), (1, other), (2, background)):
+            controller.release(holder)
+            await asyncio.wait_for(task, timeout=1)
+        controller.release(3)
+        assert controller.active == 0 and controller.queued == 0
+
+    asyncio.run(run())
+
+
+def test_slot_released_on_cancellation():
+    async def run():
+        controller = AdmissionController(max_concurrency=1)
+        await controller.acquire(1)
+
+        # ยกเลิกระหว่างรอคิว: ถูกลบออกจากคิว ไม่ได้ slot
+        waiting = asyncio.create_task(controller.acquire(2))
+        await _settle()
+        waiting.cancel()
+        await asyncio.gather(waiting, return_exceptions=True)
+        assert controller.queued == 0 and controller.active == 1
+
+        # ได้ slot แล้วแต่ถูกยกเลิกก่อนกลับมาทำงาน: ต้องคืน slot
+        granted = asyncio.create_task(controller.acquire(2))
+        await _settle()
+        controller.release(1)
+        granted.cancel()
+        await asyncio.gather(granted, return_exceptions=True)
+        assert granted.cancelled()
+        assert controller.active == 0 and controller._active_by_user == {}
+
+        # ยกเลิกขณะรอคิวใน tick เดียวกับที่ slot ว่าง: _dispatch ข้าม waiter นี้ไป ต้องไม่คืน slot ซ้ำ
+        await controller.acquire(1)
+        queued = asyncio.create_task(controller.acquire(2))
+        behind = asyncio.create_task(controller.acquire(5))
+        await _settle()
+        queued.cancel()
+        controller.release(1)
+        await asyncio.gather(queued, return_exceptions=True)
+        await asyncio.wait_for(behind, timeout=1)
+        assert queued.cancelled()
+        assert controller.active == 1 and controller._active_by_user == {5: 1} and controller.queued == 0
+        controller.release(5)
+        assert controller.active == 0
+
+        # ยกเลิกระหว่างถือ slot (ใน async with) ก็คืน slot
+        async def holder():
+            async with controller.slot(3):
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(holder())
+        await _settle()
+        assert controller.active == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert controller.active == 0
+
+        # slot ที่คืนแล้วใช้ต่อได้ทันที
+        await asyncio.wait_for(controller.acquire(4), timeout=1)
+        assert controller.active == 1
+
+    asyncio.run(run())
+
+
+def main():
+    print("🧪 Testing Ollama admission control")
+    print("=" * 50)
+    test_priority_ordering()
+    print("✅ interactive requests are admitted before background ones")
+    test_per_user_fairness()
+    print("✅ a free slot goes to the user with the fewest active generations")
+    test_queue_full_retry_after()
+    print("✅ full queues are rejected with 429 and an estimated Retry-After")
+    test_slot_released_on_cancellation()
+    print("✅ cancelled tasks give their slot back")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ AnalysisCache: key ไม่ขึ้นกับ layout ของแผนผัง, TTL, LRU eviction และชั้น SQLite ที่อยู่รอดหลัง restart
+"""
+
+import asyncio
+import copy
+import os
+import sys
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import analysis_cache, auth, models
+from app.ai_service import AnalysisResult
+from app.analysis_cache import AnalysisCache, topology_cache_key
+from app.database import get_db
+from app.routers import ai
+
+NODES = [
+    {"id": "node_1", "type": "router", "data": {"label": "Router 1"}, "position": {"x": 0, "y": 0}},
+    {"id": "node_2", "type": "switch", "data": {"label": "Switch 1"}, "position": {"x": 100, "y": 50}},
+]
+EDGES = [{"id": "edge_1", "source": "node_1", "target": "node_2", "data": {"bandwidth": "1Gbps"}}]
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+def key_of(nodes, edges, question="ควรปรับปรุงอะไร"):
+    return topology_cache_key(nodes, edges, question, "llama3.2:3b", "v1")
+
+
+def test_layout_independent_key():
+    moved = copy.deepcopy(NODES)[::-1]
+    moved[0].update(position={"x": 999, "y": -5}, width=180, height=40, selected=True, dragging=False)
+    moved[1].update(positionAbsolute={"x": 1, "y": 2}, style={"opacity": 0.5})
+    redrawn = [dict(EDGES[0], id="reactflow__edge-node_1-node_2", sourceHandle="right", animated=True)]
+    assert key_of(moved, redrawn) == key_of(NODES, EDGES)
+
+    async def run():
+        cache = AnalysisCache()
+        await cache.set(key_of(NODES, EDGES), "ผลวิเคราะห์")
+        assert await cache.get(key_of(moved, redrawn)) == "ผลวิเคราะห์"
+
+    asyncio.run(run())
+
+    # เปลี่ยนเนื้อหาแผนผัง คำถาม หรือ model ต้องได้ key ใหม่
+    relabeled = copy.deepcopy(NODES)
+    relabeled[1]["data"]["label"] = "Switch 2"
+    slower = [dict(EDGES[0], data={"bandwidth": "100Mbps"})]
+    assert len({
+        key_of(NODES, EDGES), key_of(relabeled, EDGES), key_of(NODES, slower), key_of(NODES, EDGES, "อื่น"),
+        topology_cache_key(NODES, EDGES, "ควรปรับปรุงอะไร", "qwen2.5:7b", "v1"),
+    }) == 5
+
+
+def test_ttl_and_lru():
+    clock = FakeClock()
+    original_time = analysis_cache.time
+    analysis_cache.time = clock
+    try:
+        async def run():
+            cache = AnalysisCache(max_entries=2, ttl=60)
+            await cache.set("a", "A")
+            clock.now += 59
+            assert await cache.get("a") == "A"
+            clock.now += 1
+            assert await cache.get("a") is None  # ครบ ttl แล้ว
+            assert cache.stats()["entries"] == 0
+
+            await cache.set("a", "A")
+            await cache.set("b", "B")
+            assert await cache.get("a") == "A"  # a ถูกใช้ล่าสุด b จึงเก่าสุด
+            await cache.set("c", "C")
+            assert await cache.get("b") is None
+            assert await cache.get("a") == "A" and await cache.get("c") == "C"
+            assert cache.stats() == {"enabled": True, "entries": 2, "hits": 4, "misses": 2, "persistent": False}
+
+            await cache.invalidate("a")
+            assert await cache.get("a") is None and await cache.get("c") == "C"
+            await cache.invalidate()
+            assert await cache.get("c") is None
+
+            disabled = AnalysisCache(enabled=False)
+            await disabled.set("a", "A")
+            assert await disabled.get("a") is None
+
+        asyncio.run(run())
+    finally:
+        analysis_cache.time = original_time
+
+
+def test_sqlite_tier():
+    clock = FakeClock()
+    original_time = analysis_cache.time
+    analysis_cache.time = clock
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "cache.db")
+        try:
+            async def run():
+                loop_thread = threading.get_ident()
+                io_threads = set()
+
+                class TrackingCache(AnalysisCache):
+                    def _execute_persistent(self, sql, params):
+                        io_threads.add(threading.get_ident())
+                        super()._execute_persistent(sql, params)
+
+                    def _get_persistent(self, key, now):
+                        io_threads.add(threading.get_ident())
+                        return super()._get_persistent(key, now)
+
+                first = TrackingCache(max_entries=1, ttl=60, db_path=db_path)
+                await first.set("a", "A")
+                await first.set("b", "B")  # a หลุดจาก memory แต่ยังอยู่ใน SQLite
+                assert first.stats()["entries"] == 1
+                assert await first.get("a") == "A"
+
+                # process ใหม่ (memory ว่าง) อ่านจากไฟล์เดิม
+                restarted = TrackingCache(ttl=60, db_path=db_path)
+                assert restarted.stats()["persistent"]
+                assert await restarted.get("b") == "B" and restarted.stats()["entries"] == 1
+                clock.now += 60
+                assert await restarted.get("a") is None  # หมดอายุ: ลบออกจากไฟล์ด้วย
+                assert first._db.execute("SELECT count(*) FROM analysis_cache WHERE key = 'a'").fetchone()[0] == 0
+
+                await restarted.invalidate()
+                assert first._db.execute("SELECT count(*) FROM analysis_cache").fetchone()[0] == 0
+                # I/O ของไฟล์ SQLite ไม่ทำบน thread ของ event loop
+                assert io_threads and loop_thread not in io_threads
+                first._db.close()
+                restarted._db.close()
+
+            asyncio.run(run())
+        finally:
+            analysis_cache.time = original_time
+
+
+def _history_db(tmp):
+    """ฐานข้อมูล SQLite ชั่วคราวพร้อมผู้ใช้หนึ่งคน"""
+    engine = create_engine(f"sqlite:///{os.path.join(tmp, 'history.db')}")
+    models.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = session_factory()
+    user = models.User(email="cache@example.com", username="cacheuser", hashed_password="x")
+    db.add(user)
+    db.commit()
+    db.refresh(user)
+    db.close()
+    return engine, session_factory, user
+
+
+def _ai_app(session_factory, user):
+    """แอปที่มีเฉพาะ router /ai และใช้ฐานข้อมูลชั่วคราว"""
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    api = FastAPI()
+    api.include_router(ai.router, prefix="/ai")
+    api.dependency_overrides[get_db] = override_get_db
+    api.dependency_overrides[auth.get_current_active_user] = lambda: user
+    return api
+
+
+def test_endpoints_record_history():
+    """/ai/suggest-improvements และ /ai/security-analysis บันทึกประวัติพร้อม is_cached เหมือน /ai/analyze"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session_factory, user = _history_db(tmp)
+        questions = []
+
+        async def run_analysis(nodes, edges, user_question="", **kwargs):
+            questions.append(user_question)
+            return AnalysisResult(f"คำตอบ {len(questions)}", cached=len(questions) == 1)
+
+        original = ai.SessionLocal, ai.analyzer.run_analysis
+        ai.SessionLocal, ai.analyzer.run_analysis = session_factory, run_analysis
+        try:
+            client = TestClient(_ai_app(session_factory, user))
+            body = {"nodes": NODES, "edges": EDGES}
+            first = client.post("/ai/suggest-improvements", json=body).json()
+            second = client.post("/ai/security-analysis", json=body).json()
+        finally:
+            ai.SessionLocal, ai.analyzer.run_analysis = original
+
+        db = session_factory()
+        try:
+            rows = db.query(models.AIAnalysisHistory).order_by(models.AIAnalysisHistory.id).all()
+            assert [row.id for row in rows] == [first["analysis_id"], second["analysis_id"]]
+            assert [(row.analysis_result, row.is_cached, row.device_count) for row in rows] == [
+                ("คำตอบ 1", True, 2), ("คำตอบ 2", False, 2),
+            ]
+            # แบบไม่ streaming ไม่ได้วัดเวลาถึงข้อความแรก
+            assert [row.time_to_first_token_ms for row in rows] == [None, None]
+            assert db.get(models.User, user.id).total_analyses == 2
+        finally:
+            db.close()
+            engine.dispose()
+
+def test_failed_analysis_not_recorded():
+    """AI ตอบไม่สำเร็จ: endpoint แจ้ง error และไม่บันทึกประวัติหรือนับเป็นการวิเคราะห์"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, session_factory, user = _history_db(tmp)
+        failure = "ไม่สามารถเชื่อมต่อกับ AI ได้"
+
+        async def run_analysis(nodes, edges, user_question="", **kwargs):
+            return AnalysisResult(failure, ok=False)
+
+        async def stream_ai_analysis(nodes, edges, user_question="", **kwargs):
+            yield AnalysisResult("คำตอบบางส่วน")
+            yield AnalysisResult(failure, ok=False)
+
+        original = ai.SessionLocal, ai.analyzer.run_analysis, ai.analyzer.stream_ai_analysis
+        ai.SessionLocal, ai.analyzer.run_analysis, ai.analyzer.stream_ai_analysis = (
+            session_factory, run_analysis, stream_ai_analysis
+        )
+        try:
+            client = TestClient(_ai_app(session_factory, user))
+            body = {"nodes": NODES, "edges": EDGES, "question": "ควรปรับปรุงอะไร"}
+            for path in ("/ai/analyze", "/ai/suggest-improvements", "/ai/security-analysis"):
+                response = client.post(path, json=body)
+                assert response.status_code == 503
+                assert response.json()["detail"] == failure
+            stream = client.post("/ai/analyze/stream", json=body).text
+        finally:
+            ai.SessionLocal, ai.analyzer.run_analysis, ai.analyzer.stream_ai_analysis = original
+
+        assert "event: error" in stream and failure in stream
+        assert "event: done" not in stream
+
+        db = session_factory()
+        try:
+            assert db.query(models.AIAnalysisHistory).count() == 0
+            assert db.get(models.User, user.id).total_analyses == 0
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def main():
+    print("🧪 Testing analysis response cache")
+    print("=" * 50)
+    test_layout_independent_key()
+    print("✅ identical topologies share a key regardless of layout fields")
+    test_ttl_and_lru()
+    print("✅ entries expire after ttl and the least recently used entry is evicted")
+    test_sqlite_tier()
+    print("✅ SQLite tier survives restarts and runs off the event loop")
+    test_endpoints_record_history()
+    print("✅ suggest-improvements and security-analysis record history with is_cached")
+    test_failed_analysis_not_recorded()
+    print("✅ failed AI responses return an error and are not recorded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ Analysis Job Queue กับ stub Ollama ในเครื่อง (ไม่ต้องรัน Ollama หรือ backend จริง)
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import auth, models
+from app.ai_service import NetworkTopologyAnalyzer
+from app.analysis_jobs import AnalysisJobQueue, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED
+from app.database import get_db
+from app.routers import ai
+from benchmarks.stub_ollama import StubOllama
+
+SAMPLE_NODES = [
+    {"id": "node_1", "type": "router", "data": {"label": "Router 1"}},
+    {"id": "node_2", "type": "switch", "data": {"label": "Switch 1"}},
+]
+SAMPLE_EDGES = [{"id": "edge_1", "source": "node_1", "target": "node_2"}]
+
+
+def make_session_factory(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(bind=engine)
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+def create_user(session_factory):
+    db = session_factory()
+    try:
+        user = models.User(email="jobs@example.com", username="jobsuser", hashed_password="x")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+async def run_job_queue_flow(db_path):
+    stub = await StubOllama(delay=0.05).start()
+    analyzer = NetworkTopologyAnalyzer()
+    analyzer.ollama_service.base_url = stub.base_url
+    session_factory = make_session_factory(db_path)
+    user_id = create_user(session_factory)
+
+    queue = AnalysisJobQueue(session_factory, analyzer, workers=2)
+    await queue.start()
+    try:
+        db = session_factory()
+        try:
+            job = queue.submit(db, user_id=user_id, nodes=SAMPLE_NODES, edges=SAMPLE_EDGES, question="ควรปรับปรุงเครือข่ายนี้อย่างไร")
+            job_id = job.id
+            assert job.status == JOB_QUEUED
+        finally:
+            db.close()
+
+        print(f"🕒 job {job_id} queued, waiting for result...")
+        assert await queue.wait_for(job_id, timeout=10)
+
+        db = session_factory()
+        try:
+            job = db.get(models.AIAnalysisJob, job_id)
+            assert job.status == JOB_SUCCEEDED, job.error
+            history = db.get(models.AIAnalysisHistory, job.analysis_id)
+            assert history.analysis_result == stub.reply
+            assert db.get(models.User, user_id).total_analyses == 1
+            print(f"✅ job finished: {history.analysis_result}")
+        finally:
+            db.close()
+    finally:
+        await queue.stop()
+        await analyzer.ollama_service.close()
+        await stub.stop()
+    return session_factory, user_id
+
+
+async def run_recovery_flow(session_factory, user_id):
+    """งานที่ค้างสถานะ running จาก process ก่อนหน้าต้องถูกรันใหม่หลัง restart"""
+    stub = await StubOllama().start()
+    analyzer = NetworkTopologyAnalyzer()
+    analyzer.ollama_service.base_url = stub.base_url
+
+    db = session_factory()
+    try:
+        orphan = models.AIAnalysisJob(
+            user_id=user_id,
+            status=JOB_RUNNING,
+            request_data='{"nodes": [], "edges": [], "question": ""}',
+        )
+        db.add(orphan)
+        db.commit()
+        orphan_id = orphan.id
+    finally:
+        db.close()
+
+    queue = AnalysisJobQueue(session_factory, analyzer, workers=1)
+    await queue.start()
+    try:
+        assert await queue.wait_for(orphan_id, timeout=10)
+        db = session_factory()
+        try:
+            assert db.get(models.AIAnalysisJob, orphan_id).status == JOB_SUCCEEDED
+            print("✅ orphaned job recovered after restart")
+        finally:
+            db.close()
+    finally:
+        await queue.stop()
+        await analyzer.ollama_service.close()
+        await stub.stop()
+
+
+async def run_failure_flow(session_factory, user_id):
+    """Ollama เรียกไม่สำเร็จ: งานต้องจบเป็น failed พร้อม error และไม่บันทึกข้อความ error เป็นประวัติการวิเคราะห์"""
+    stub = await StubOllama().start()
+    closed_url = stub.base_url
+    await stub.stop()
+    analyzer = NetworkTopologyAnalyzer()
+    analyzer.ollama_service.base_url = closed_url
+
+    queue = AnalysisJobQueue(session_factory, analyzer, workers=1)
+    await queue.start()
+    try:
+        db = session_factory()
+        try:
+            history_before = db.query(models.AIAnalysisHistory).count()
+            job_id = queue.submit(db, user_id=user_id, nodes=SAMPLE_NODES, edges=SAMPLE_EDGES, question="ตรวจสอบเครือข่าย").id
+        finally:
+            db.close()
+        assert await queue.wait_for(job_id, timeout=10)
+        db = session_factory()
+        try:
+            job = db.get(models.AIAnalysisJob, job_id)
+            assert job.status == JOB_FAILED and job.error and job.analysis_id is None
+            assert db.query(models.AIAnalysisHistory).count() == history_before
+            print(f"✅ failed Ollama call marks job failed: {job.error}")
+        finally:
+            db.close()
+
+        # subscriber ที่หมดเวลาต้องไม่ทิ้ง Event ค้างไว้ใน _waiters
+        db = session_factory()
+        try:
+            pending = models.AIAnalysisJob(user_id=user_id, status=JOB_QUEUED, request_data="{}")
+            db.add(pending)
+            db.commit()
+            pending_id = pending.id
+        finally:
+            db.close()
+        assert not await queue.wait_for(pending_id, timeout=0.05)
+        assert queue._waiters == {}
+        print("✅ timed out waiters are removed")
+    finally:
+        await queue.stop()
+        await analyzer.ollama_service.close()
+
+
+def check_job_endpoints(session_factory, user_id):
+    """GET /ai/jobs/{id} และ SSE ของงานที่เสร็จแล้วต้องคืนข้อความผลวิเคราะห์ (ไม่ใช่ 500)"""
+    db = session_factory()
+    try:
+        user = db.get(models.User, user_id)
+        job = db.query(models.AIAnalysisJob).filter(models.AIAnalysisJob.status == JOB_SUCCEEDED).first()
+        job_id, expected = job.id, job.history.analysis_result
+    finally:
+        db.close()
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    api = FastAPI()
+    api.include_router(ai.router, prefix="/ai")
+    api.dependency_overrides[get_db] = override_get_db
+    api.dependency_overrides[auth.get_current_active_user] = lambda: user
+    original_session_local = ai.SessionLocal
+    ai.SessionLocal = session_factory
+    try:
+        client = TestClient(api)
+        response = client.get(f"/ai/jobs/{job_id}")
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert body["status"] == JOB_SUCCEEDED and body["analysis"] == expected
+
+        response = client.get(f"/ai/jobs/{job_id}/events")
+        assert response.status_code == 200
+        assert response.text.count("event: status") == 2 and expected in response.text
+        print("✅ finished job can be polled and streamed")
+    finally:
+        ai.SessionLocal = original_session_local
+
+
+def test_analysis_job_queue():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "jobs.db")
+        session_factory, user_id = asyncio.run(run_job_queue_flow(db_path))
+        asyncio.run(run_recovery_flow(session_factory, user_id))
+        check_job_endpoints(session_factory, user_id)
+        asyncio.run(run_failure_flow(session_factory, user_id))
+
+
+def main():
+    print("🧪 Testing analysis job queue against stub Ollama")
+    test_analysis_job_queue()
+    print("🎉 All job queue checks passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+ทดสอบการค้นหาประวัติการวิเคราะห์ (FTS5 analysis_search): การแปลงคำค้น snippet
+และ trigger ที่ทำให้ดัชนีตรงกับ ai_analysis_history หลัง insert/update/delete
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app import analysis_search, models
+
+
+def test_query_and_snippet():
+    assert analysis_search.phrases("OSPF area 5") == ["OSPF", "area 5"]
+    assert analysis_search.phrases("5 ports ab") == ["5 ports ab"]
+    assert analysis_search.phrases(" ab ") == []
+    assert analysis_search.match_query('say "hi" there') == '"say" """hi""" "there"'
+    assert analysis_search.match_query("ไฟ") is None
+
+    text = "<b>ภาพรวม</b>\n" + "x" * 200 + " ควรแบ่ง vlan 10 และ VLAN 20"
+    snippet = analysis_search.snippet(text, ["vlan"], width=60)
+    assert snippet.startswith("…") and "<b>" not in snippet
+    assert snippet.count("<mark>") == 2 and "<mark>VLAN</mark> 20" in snippet
+
+
+def test_index_follows_table():
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'test.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            def add(user_id, result, model="llama3.2:3b"):
+                row = models.AIAnalysisHistory(user_id=user_id, model_used=model, device_count=1, analysis_result=result)
+                db.add(row)
+                db.commit()
+                return row.id
+
+            # แถวที่มีอยู่ก่อนสร้างดัชนีถูก rebuild ตอน ensure_index ครั้งแรก
+            old = add(1, "พบจุดคอขวดที่ Core Switch")
+            assert analysis_search.ensure_index(engine)
+            once = add(1, "แบ่ง VLAN 10 ให้แผนกบัญชี", model="qwen2.5:7b")
+            twice = add(1, "VLAN 20 และ VLAN 30 ควรแยก firewall")
+            add(2, "VLAN ของผู้ใช้อื่น")
+
+            def ids(query, **kwargs):
+                return [hit["id"] for hit in analysis_search.search(db, user_id=1, query=query, **kwargs)]
+
+            assert ids("คอขวด") == [old]
+            assert ids("vlan") == [twice, once]  # พบสองครั้งอยู่ก่อน
+            assert ids("vlan", sort="recent", skip=1) == [once]
+            assert ids("vlan", model_filter="qwen") == [once]
+            assert ids("vlan firewall") == [twice]
+
+            db.query(models.AIAnalysisHistory).filter(models.AIAnalysisHistory.id == twice).update(
+                {"analysis_result": "ไม่มีปัญหา"}, synchronize_session=False
+            )
+            db.query(models.AIAnalysisHistory).filter(models.AIAnalysisHistory.id == old).delete()
+            db.commit()
+            assert ids("vlan") == [once] and ids("คอขวด") == [] and ids("ไม่มีปัญหา") == [twice]
+            db.execute(text("INSERT INTO analysis_search (analysis_search, rank) VALUES ('integrity-check', 1)"))
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def main():
+    print("🧪 Testing analysis history search")
+    print("=" * 50)
+    test_query_and_snippet()
+    print("✅ query text becomes substring phrases, snippets are escaped and highlighted")
+    test_index_follows_table()
+    print("✅ triggers keep the index in sync, results are ranked and per user")
+
+
+if __name__ == "__main__":
+    main()
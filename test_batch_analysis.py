@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+ทดสอบการวิเคราะห์ batch จากฐานข้อมูล (ไม่เรียก AI): ผลของแต่ละ project, project ที่ข้อมูลเสีย และการทำต่อหลัง restart
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import models
+from app.ai_service import NetworkTopologyAnalyzer
+from app.batch_analysis import BatchAnalysisRunner
+from app.analysis_jobs import JOB_SUCCEEDED
+
+DIAGRAM = {
+    "nodes": [
+        {"id": "r1", "type": "router", "data": {"label": "Router 1"}},
+        {"id": "s1", "type": "switch", "data": {"label": "Switch 1"}},
+        {"id": "pc1", "type": "pc", "data": {"label": "PC 1"}},
+    ],
+    "edges": [
+        {"id": "e1", "source": "r1", "target": "s1"},
+        {"id": "e2", "source": "s1", "target": "pc1"},
+        {"id": "e3", "source": "s1", "target": "pc1"},
+    ],
+}
+
+
+def setup_db(db_path):
+    engine = create_engine(f"sqlite:///{db_path}")
+    models.Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    db = session_factory()
+    try:
+        user = models.User(email="batch@example.com", username="batchuser", hashed_password="x")
+        db.add(user)
+        db.commit()
+        db.add_all([
+            models.Project(name="ok", owner_id=user.id, diagram_data=json.dumps(DIAGRAM)),
+            models.Project(name="broken", owner_id=user.id, diagram_data="{not json"),
+            models.Project(name="empty", owner_id=user.id, diagram_data=None),
+        ])
+        db.commit()
+        return session_factory, user.id
+    finally:
+        db.close()
+
+
+def test_batch_analysis():
+    with tempfile.TemporaryDirectory() as tmp:
+        session_factory, user_id = setup_db(os.path.join(tmp, "batch.db"))
+        runner = BatchAnalysisRunner(session_factory, NetworkTopologyAnalyzer(), workers=1, page_size=2)
+
+        db = session_factory()
+        try:
+            run_id = runner.create_run(db, user_id=user_id).id
+        finally:
+            db.close()
+        run = asyncio.run(runner.execute(run_id))
+        assert run.status == JOB_SUCCEEDED, run.error
+        assert (run.processed_count, run.failed_count) == (3, 1)
+        assert run.diagrams_per_second > 0
+
+        db = session_factory()
+        try:
+            results = db.query(models.BatchAnalysisResult).order_by(models.BatchAnalysisResult.project_id).all()
+            ok, broken, empty = results
+            assert ok.device_count == 3 and ok.connection_count == 3
+            assert any("ซ้ำซ้อน" in issue for issue in json.loads(ok.analysis)["potential_issues"])
+            assert broken.error and broken.analysis is None
+            assert empty.error is None and empty.device_count == 0
+        finally:
+            db.close()
+
+        # run ที่เสร็จแล้วรันซ้ำไม่ได้
+        assert asyncio.run(runner.execute(run_id)) is None
+
+
+def main():
+    print("🧪 Testing batch analysis")
+    print("=" * 50)
+    test_batch_analysis()
+    print("✅ batch results written per project, broken diagrams recorded as errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ CapacityAnalyzer: max-flow (Dinic) และ min-cut บนแผนผังเล็ก ๆ ที่คำนวณด้วยมือได้
+รันทั้งแบบ NumPy และแบบ list ของ Python (ถ้าติดตั้ง NumPy)
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app import capacity
+from app.capacity import CapacityAnalyzer
+from app.topology_graph import TopologyGraph
+
+MBPS = 1e6
+
+
+def device(node_id, device_type, **data):
+    return {"id": node_id, "type": device_type, "data": {"label": node_id, **data}}
+
+
+def link(source, target, bandwidth=None, **data):
+    if bandwidth is not None:
+        data.update(bandwidth=bandwidth, bandwidthUnit="Mbps")
+    return {"id": f"{source}-{target}", "source": source, "target": target, "data": data}
+
+
+def analyze(nodes, edges):
+    analyzer = CapacityAnalyzer(TopologyGraph(nodes, edges), per_user_bps=1 * MBPS)
+    flow, cut = analyzer.max_flow()
+    graph = analyzer.graph
+    names = [graph.edge_label(index) if kind == "link" else graph.label(index) for kind, index in cut]
+    return analyzer, flow, names
+
+
+def check_link_bottleneck():
+    # R-S1 100, R-S2 10, S1-S2 20: P2 (40 users) ได้ 10 ตรงจาก R และ 20 ผ่าน S1 รวมทั้งหมด 50 + 30 = 80
+    nodes = [
+        device("R", "router", deviceRole="Core"), device("S1", "switch"), device("S2", "switch"),
+        device("P1", "pc", userCapacity=50), device("P2", "pc", userCapacity=40),
+    ]
+    edges = [
+        link("R", "S1", 100), link("R", "S2", 10), link("S1", "S2", 20),
+        link("S1", "P1", 1000), link("S2", "P2", 1000),
+    ]
+    analyzer, flow, cut = analyze(nodes, edges)
+    assert abs(flow - 80 * MBPS) < 1
+    assert cut == ["R - S2", "S1 - S2"]
+
+    result = analyzer.analyze()
+    assert result["total_demand_bps"] == 90 * MBPS and result["satisfied_percent"] == 88.9
+    assert result["bottlenecks"] == ["R - S2", "S1 - S2"] and result["bottleneck_count"] == 2
+    # load แบบลำดับชั้น: S2 มี uplink เส้นเดียว (R-S2) ที่ level ถัดขึ้นไป จึงรับ 40 ทั้งหมดบนสาย 10
+    assert [item["link"] for item in result["overloaded_links"]] == ["R - S2"]
+
+
+def check_device_bottleneck():
+    # switch รับได้ 30 Mbps แม้สายทุกเส้นเป็น 1 Gbps
+    nodes = [
+        device("R", "router", deviceRole="Core"), device("S", "switch", maxThroughput=30, throughputUnit="Mbps"),
+        device("P1", "pc", userCapacity=20), device("P2", "pc", userCapacity=20),
+    ]
+    edges = [link("R", "S", 1000), link("S", "P1", 1000), link("S", "P2", 1000)]
+    analyzer, flow, cut = analyze(nodes, edges)
+    assert abs(flow - 30 * MBPS) < 1 and cut == ["S"]
+    assert [item["device"] for item in analyzer.analyze()["overloaded_devices"]] == ["S"]
+
+
+def check_missing_and_zero_bandwidth():
+    # สายที่ไม่ระบุ bandwidth ถือว่าไม่จำกัด สาย 0 ส่งอะไรไม่ได้ label แบบเดิม "5 Mbps" ยังอ่านได้
+    nodes = [
+        device("R", "router"), device("S", "switch"),
+        device("P1", "pc", userCapacity=10), device("P2", "pc", userCapacity=10), device("P3", "pc"),
+    ]
+    edges = [
+        link("R", "S"), link("S", "P1", 0), {"source": "S", "target": "P2", "data": {"label": "5 Mbps"}},
+        link("S", "P3"),
+    ]
+    analyzer, flow, cut = analyze(nodes, edges)
+    assert analyzer.links_without_bandwidth == 2
+    assert abs(flow - 6 * MBPS) < 1  # P2 ได้ 5 และ P3 (1 user) ได้ 1
+    assert cut == ["S - P1", "S - P2"]
+
+    # ถ้าสายเดียวระหว่าง Core กับปลายทางเป็น 0 ก็ไม่มี flow เลย
+    analyzer, flow, cut = analyze(nodes[:3], [link("R", "S", 0), link("S", "P1")])
+    assert flow == 0 and cut == ["R - S"]
+    result = analyzer.analyze()
+    assert result["satisfied_percent"] == 0.0 and result["bottlenecks"] == ["R - S"]
+    assert result["overloaded_links"][0]["utilization"] is None  # สาย 0: ไม่มีสัดส่วนที่เป็นตัวเลข
+
+    # ไม่มี demand ที่ไปถึงได้ (ไม่มีสาย) หรือไม่มี Core/router ไม่มีผล
+    assert CapacityAnalyzer(TopologyGraph(nodes, []), per_user_bps=MBPS).analyze() is None
+    assert CapacityAnalyzer(TopologyGraph(nodes[1:], edges[1:]), per_user_bps=MBPS).analyze() is None
+
+
+def test_max_flow():
+    engines = [capacity.np, None] if capacity.np is not None else [None]
+    original = capacity.np
+    try:
+        for engine in engines:
+            capacity.np = engine
+            check_link_bottleneck()
+            check_device_bottleneck()
+            check_missing_and_zero_bandwidth()
+    finally:
+        capacity.np = original
+
+
+def main():
+    print("🧪 Testing capacity max-flow / min-cut")
+    print("=" * 50)
+    test_max_flow()
+    print("✅ max-flow values, bottleneck links/devices and missing/zero bandwidth match hand-computed results")
+
+
+if __name__ == "__main__":
+    main()
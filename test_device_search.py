@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+ทดสอบดัชนีค้นหาอุปกรณ์ข้ามโปรเจกต์ (FTS5 device_search): การแปลงคำค้น แถวของ node
+migration ที่สร้างดัชนีของ project เดิม และการค้นหาที่เห็นเฉพาะ project ของเจ้าของ
+"""
+
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import device_search, diagram_codec, fast_json
+from migrate_add_device_search import migrate_database
+
+NODES = [
+    {"id": "fw", "type": "firewall", "data": {"label": "Edge Firewall", "type": "firewall", "ip": "10.0.0.1"}},
+    {"id": "core", "type": "switch", "data": {"label": "Core Switch", "type": "switch", "deviceRole": "Core", "maxThroughput": 40000}},
+    {"id": 7, "type": "pc", "data": {"label": "เครื่องบัญชี 7", "type": "pc", "flag": True, "ports": [1, 2]}},
+    {"data": {"label": "no id"}},
+]
+
+
+def test_match_query_and_rows():
+    assert device_search.match_query("core sw") == '"core" "sw"*'
+    # syntax ของ FTS5 ที่ผู้ใช้พิมพ์ถูกตัดทิ้ง
+    assert device_search.match_query('label:"fire" OR *') == '"label" "fire" "OR"*'
+    assert device_search.match_query(" -* ") is None
+
+    fw, core, pc = device_search.node_rows(3, 9, NODES)
+    assert fw["rowid"] == 3 * device_search.ROWID_STRIDE and fw["attributes"] == "ip 10.0.0.1"
+    assert (core["role"], core["attributes"], core["owner"]) == ("Core", "maxThroughput 40000", "9")
+    assert (pc["node_id"], pc["device_type"], pc["attributes"]) == ("7", "pc", "")
+
+
+def test_migration_and_search():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR, owner_id INTEGER, diagram_data TEXT)")
+        conn.executemany("INSERT INTO projects (name, owner_id, diagram_data) VALUES (?, ?, ?)", [
+            ("สำนักงาน", 1, diagram_codec.encode(fast_json.dumps({"nodes": NODES, "edges": []}), "zlib", 0)),
+            ("Lab", 1, fast_json.dumps({"nodes": [{"id": "s1", "data": {"label": "Core Router", "type": "router"}}]})),
+            ("Other", 2, fast_json.dumps({"nodes": NODES})),
+            ("Broken", 1, "not json"),
+        ])
+        conn.commit()
+        conn.close()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path, batch_size=2)
+
+        engine = create_engine(f"sqlite:///{db_path}")
+        assert device_search.ensure_index(engine)
+        db = sessionmaker(bind=engine)()
+        try:
+            hits = device_search.search(db, owner_id=1, query="core")
+            # node ที่ตรงใน project ของ owner 2 ไม่อยู่ในผล
+            assert sorted((hit["project_name"], hit["node_id"]) for hit in hits) == [("Lab", "s1"), ("สำนักงาน", "core")]
+            assert [hit["node_id"] for hit in device_search.search(db, 1, "core", device_type="router")] == ["s1"]
+            assert [hit["node_id"] for hit in device_search.search(db, 1, "10.0.0")] == ["fw"]
+            assert [hit["node_id"] for hit in device_search.search(db, 1, "เครื่องบัญชี")] == ["7"]
+            # คำค้นไม่ตรงกับคอลัมน์ owner (ไม่มี "2" ในข้อมูลอุปกรณ์ของ owner 2)
+            assert device_search.search(db, 2, "2") == []
+
+            device_search.index_project(db, 1, 1, {"nodes": NODES[:1]})
+            device_search.remove_project(db, 2)
+            db.commit()
+            assert device_search.search(db, 1, "core") == []
+            assert [hit["node_id"] for hit in device_search.search(db, 2, "core")] == ["core"]
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def main():
+    print("🧪 Testing device search index")
+    print("=" * 50)
+    test_match_query_and_rows()
+    print("✅ query text becomes a safe FTS5 prefix query, one row per node")
+    test_migration_and_search()
+    print("✅ migration indexes existing projects, search is ranked and per owner")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+ทดสอบการใช้ delta กับ diagram_data: RFC 6902 JSON Patch และ node/edge delta (PATCH /projects/{id})
+"""
+
+import copy
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app import crud, device_search, fast_json, models, schemas
+from app.diagram_patch import (
+    PatchError, PatchTestFailed, apply_json_patch, apply_topology_diff, diff_documents, load_document,
+)
+
+
+def diagram():
+    return {
+        "nodes": [
+            {"id": "n1", "position": {"x": 0, "y": 0}, "data": {"label": "Router 1", "type": "router"}},
+            {"id": "n2", "position": {"x": 100, "y": 0}, "data": {"label": "Switch 1", "type": "switch"}},
+            {"id": "n3", "position": {"x": 200, "y": 0}, "data": {"label": "PC 1", "type": "pc"}},
+        ],
+        "edges": [
+            {"id": "e1", "source": "n1", "target": "n2"},
+            {"id": "e2", "source": "n2", "target": "n3"},
+        ],
+        "viewport": {"zoom": 1},
+    }
+
+
+def test_json_patch():
+    doc = apply_json_patch(diagram(), [
+        {"op": "test", "path": "/nodes/1/data/label", "value": "Switch 1"},
+        {"op": "replace", "path": "/nodes/1/position", "value": {"x": 150, "y": 40}},
+        {"op": "add", "path": "/nodes/-", "value": {"id": "n4", "data": {"label": "a/b~c"}}},
+        {"op": "add", "path": "/edges/0", "value": {"id": "e0", "source": "n1", "target": "n4"}},
+        {"op": "remove", "path": "/edges/2"},
+        {"op": "copy", "from": "/nodes/0/data", "path": "/nodes/3/copied"},
+        {"op": "move", "from": "/viewport", "path": "/view"},
+    ])
+    assert doc["nodes"][1]["position"] == {"x": 150, "y": 40}
+    assert [node["id"] for node in doc["nodes"]] == ["n1", "n2", "n3", "n4"]
+    assert [edge["id"] for edge in doc["edges"]] == ["e0", "e1"]
+    assert doc["nodes"][3]["copied"] == {"label": "Router 1", "type": "router"}
+    assert "viewport" not in doc and doc["view"] == {"zoom": 1}
+
+    # JSON Pointer escape (~1 = "/", ~0 = "~") และแทนที่ทั้งเอกสาร
+    doc = apply_json_patch({"a/b": {"c~d": 1}}, [{"op": "replace", "path": "/a~1b/c~0d", "value": 2}])
+    assert doc == {"a/b": {"c~d": 2}}
+    assert apply_json_patch(diagram(), [{"op": "replace", "path": "", "value": {"nodes": []}}]) == {"nodes": []}
+
+    failures = [
+        ([{"op": "test", "path": "/nodes/0/data/label", "value": "Router 2"}], PatchTestFailed),
+        ([{"op": "test", "path": "/edges/0/target", "value": True}], PatchTestFailed),
+        ([{"op": "remove", "path": "/nodes/3"}], PatchError),
+        ([{"op": "replace", "path": "/missing", "value": 1}], PatchError),
+        ([{"op": "add", "path": "/nodes/01", "value": {}}], PatchError),
+        ([{"op": "add", "path": "nodes", "value": {}}], PatchError),
+        ([{"op": "add", "path": "/nodes/-"}], PatchError),
+        ([{"op": "move", "from": "/nodes", "path": "/nodes/0"}], PatchError),
+        ([{"op": "frobnicate", "path": "/nodes"}], PatchError),
+    ]
+    for operations, error in failures:
+        try:
+            apply_json_patch(diagram(), operations)
+            raise AssertionError(f"{operations} ต้อง raise {error.__name__}")
+        except error:
+            pass
+    # test ที่ผ่าน: 1 กับ 1.0 เท่ากันตาม JSON
+    apply_json_patch({"x": 1}, [{"op": "test", "path": "/x", "value": 1.0}])
+
+
+def test_topology_diff():
+    moved = copy.deepcopy(diagram()["nodes"][1])
+    moved["position"] = {"x": 120, "y": 60}
+    doc = apply_topology_diff(diagram(), {
+        "nodes": {
+            "added": [{"id": "n4", "data": {"label": "Server 1", "type": "server"}}],
+            "removed": ["n3", "missing"],
+            "changed": [moved],
+        },
+        "edges": {"added": [{"id": "e3", "source": "n2", "target": "n4"}], "removed": ["e2"], "changed": []},
+    })
+    assert [node["id"] for node in doc["nodes"]] == ["n1", "n2", "n4"]
+    assert doc["nodes"][1]["position"] == {"x": 120, "y": 60}
+    assert [edge["id"] for edge in doc["edges"]] == ["e1", "e3"]
+    assert doc["viewport"] == {"zoom": 1}
+
+    # removed แล้ว added id เดิมในครั้งเดียวกัน = แทนที่ (เหมือน TopologyState.apply_diff)
+    doc = apply_topology_diff(diagram(), {"nodes": {"removed": ["n1"], "added": [{"id": "n1", "data": {}}]}})
+    assert doc["nodes"][0] == {"id": "n1", "data": {}}
+
+    assert apply_topology_diff(load_document(None), {"nodes": {"added": [{"id": "a"}]}}) == {"nodes": [{"id": "a"}], "edges": []}
+    for bad in ({"nodes": {"added": [{"data": {}}]}}, {"edges": {"removed": [["x"]]}}):
+        try:
+            apply_topology_diff(diagram(), bad)
+            raise AssertionError(f"{bad} ต้อง raise PatchError")
+        except PatchError:
+            pass
+    try:
+        load_document("{not json")
+        raise AssertionError("diagram_data ที่ไม่ใช่ JSON ต้อง raise PatchError")
+    except PatchError:
+        pass
+
+
+def test_diff_documents():
+    # delta ของประวัติ revision ต้องสร้างเอกสารใหม่ได้ตรงทุก byte
+    new = diagram()
+    new["nodes"][1]["position"] = {"x": 150, "y": 40}
+    new["nodes"][2]["data"]["label"] = True
+    del new["nodes"][0]
+    new["nodes"].append({"id": "n4", "data": {"label": "Server 1", "type": "server"}})
+    new["edges"].append({"id": "e3", "source": "n2", "target": "n4"})
+    diff = diff_documents(diagram(), new)
+    assert [node["id"] for node in diff["nodes"]["changed"]] == ["n2", "n3"]
+    assert diff["nodes"]["removed"] == ["n1"] and diff["edges"]["added"][0]["id"] == "e3"
+    assert apply_topology_diff(diagram(), diff) == new
+
+    assert diff_documents(diagram(), diagram()) == {
+        key: {"added": [], "removed": [], "changed": []} for key in ("nodes", "edges")
+    }
+    reordered = diagram()
+    reordered["nodes"].reverse()
+    assert diff_documents(diagram(), reordered) is None
+    assert diff_documents(diagram(), reordered, keep_order=False)["nodes"] == {"added": [], "removed": [], "changed": []}
+    moved_view = diagram()
+    moved_view["viewport"] = {"zoom": 2}
+    assert diff_documents(diagram(), moved_view) is None
+    assert diff_documents(diagram(), {"nodes": [{"data": {}}]}) is None
+    assert diff_documents(diagram(), "not a diagram") is None
+
+def test_patch_project_rejects_invalid_document():
+    """JSON Patch ที่ทำให้เอกสารไม่ใช่ {"nodes": list, "edges": list} ถูกปฏิเสธ (422) และไม่บันทึก"""
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'patch.db')}")
+        models.Base.metadata.create_all(bind=engine)
+        device_search.ensure_index(engine)
+        db = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+        try:
+            user = models.User(email="patch@example.com", username="patchuser", hashed_password="x")
+            db.add(user)
+            db.commit()
+            project = crud.create_project(
+                db, schemas.ProjectCreate(name="Patch", diagram_data=fast_json.dumps(diagram())), owner_id=user.id
+            )
+            for patch in (
+                [{"op": "replace", "path": "/nodes", "value": "notalist"}],
+                [{"op": "remove", "path": ""}],
+                [{"op": "replace", "path": "", "value": [1, 2]}],
+            ):
+                try:
+                    crud.patch_project_diagram(
+                        db, project.id, user.id, lambda document: apply_json_patch(document, patch)
+                    )
+                    raise AssertionError(f"{patch} ต้อง raise PatchError")
+                except PatchError:
+                    pass
+            stored = crud.get_project(db, project.id, user.id)
+            assert fast_json.loads(stored.diagram_data) == diagram()
+
+            # patch ที่ถูกต้องยังบันทึกได้ตามปกติ
+            crud.patch_project_diagram(
+                db, project.id, user.id,
+                lambda document: apply_json_patch(document, [{"op": "remove", "path": "/edges/1"}]),
+            )
+            assert len(fast_json.loads(crud.get_project(db, project.id, user.id).diagram_data)["edges"]) == 1
+        finally:
+            db.close()
+            engine.dispose()
+
+
+def main():
+    print("🧪 Testing diagram patches")
+    print("=" * 50)
+    test_json_patch()
+    print("✅ RFC 6902 operations, pointers and failures")
+    test_topology_diff()
+    print("✅ node/edge delta keeps order and matches incremental analysis semantics")
+    test_diff_documents()
+    print("✅ diff_documents round-trips through apply_topology_diff")
+    test_patch_project_rejects_invalid_document()
+    print("✅ patches that break the nodes/edges shape are rejected before saving")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+ทดสอบการเก็บ diagram_data แบบบีบอัด: รูปแบบ version byte และ migration ที่บีบอัด/ย้อนกลับแถวเดิม
+"""
+
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app import diagram_codec
+from migrate_compress_diagram_data import migrate_database
+
+DIAGRAM = json.dumps({
+    "nodes": [{"id": f"node_{i}", "type": "pc", "data": {"label": f"เครื่อง {i}"}} for i in range(50)],
+    "edges": [],
+}, ensure_ascii=False)
+
+
+def test_codec_round_trip():
+    for codec in diagram_codec.CODECS:
+        encoded = diagram_codec.encode(DIAGRAM, codec)
+        assert diagram_codec.decode(encoded) == DIAGRAM
+    assert diagram_codec.encode(DIAGRAM, "zlib")[0] == diagram_codec.FORMAT_ZLIB
+    assert len(diagram_codec.encode(DIAGRAM, "zlib")) < len(DIAGRAM.encode("utf-8")) / 4
+    # แผนผังเล็กเก็บโดยไม่บีบอัด แถวเดิมที่เป็นข้อความอ่านได้ตามเดิม
+    assert diagram_codec.encode("{}", "zlib") == b"\x00{}"
+    assert diagram_codec.decode(DIAGRAM) == DIAGRAM
+    assert diagram_codec.encode(None) is None and diagram_codec.decode(None) is None
+    try:
+        diagram_codec.decode(b"\x7fxyz")
+        raise AssertionError("version ที่ไม่รู้จักต้อง error")
+    except ValueError:
+        pass
+
+
+def test_migration_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE projects (id INTEGER PRIMARY KEY, diagram_data TEXT)")
+        conn.executemany("INSERT INTO projects (diagram_data) VALUES (?)", [(DIAGRAM,)] * 7 + [(None,), ("{}",)])
+        conn.commit()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path, codec="zlib", batch_size=3)
+        types = [row[0] for row in conn.execute("SELECT typeof(diagram_data) FROM projects ORDER BY id")]
+        assert types == ["blob"] * 7 + ["null", "blob"]
+        values = [diagram_codec.decode(row[0]) for row in conn.execute("SELECT diagram_data FROM projects ORDER BY id")]
+        assert values == [DIAGRAM] * 7 + [None, "{}"]
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path, decompress=True, batch_size=3)
+        rows = conn.execute("SELECT typeof(diagram_data), diagram_data FROM projects ORDER BY id").fetchall()
+        assert rows == [("text", DIAGRAM)] * 7 + [("null", None), ("text", "{}")]
+        conn.close()
+
+
+def main():
+    print("🧪 Testing compressed diagram storage")
+    print("=" * 50)
+    test_codec_round_trip()
+    print("✅ version byte format round-trips, legacy text readable")
+    test_migration_round_trip()
+    print("✅ migration compresses and restores existing rows in batches")
+
+
+if __name__ == "__main__":
+    main()
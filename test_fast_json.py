@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ fast_json: ทุก backend ให้ผลเท่ากับ json มาตรฐาน และ error ของ loads เป็น json.JSONDecodeError
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app import fast_json
+
+SAMPLE = {
+    "nodes": [
+        {"id": "node_1", "type": "switch", "position": {"x": 10.5, "y": -3}, "data": {"label": "สวิตช์หลัก", "maxThroughput": "1000"}},
+        {"id": "node_2", "type": "pc", "data": {"label": "PC \"1\"\n", "userCapacity": None, "selected": True}},
+    ],
+    "edges": [{"id": "e1", "source": "node_1", "target": "node_2", "data": {"bandwidth": 1, "ratio": 0.25}}],
+    "big": 2 ** 70,
+}
+
+
+def available_backends():
+    current = fast_json.backend()
+    names = []
+    for name in fast_json.BACKENDS:
+        try:
+            fast_json.set_backend(name)
+            names.append(name)
+        except ValueError:
+            pass
+    fast_json.set_backend(current)
+    return names
+
+
+def test_backends_match_stdlib():
+    current = fast_json.backend()
+    try:
+        for name in available_backends():
+            fast_json.set_backend(name)
+            for sort_keys in (False, True):
+                expected = json.dumps(SAMPLE, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":"))
+                assert fast_json.dumps(SAMPLE, sort_keys=sort_keys) == expected, name
+                assert fast_json.dumps_bytes(SAMPLE, sort_keys=sort_keys) == expected.encode("utf-8"), name
+            assert fast_json.dumps(SAMPLE, indent=True) == json.dumps(SAMPLE, ensure_ascii=False, indent=2), name
+            assert fast_json.loads(expected) == SAMPLE
+            assert fast_json.loads(expected.encode("utf-8")) == SAMPLE
+    finally:
+        fast_json.set_backend(current)
+
+
+def test_loads_error_type():
+    current = fast_json.backend()
+    try:
+        for name in available_backends():
+            fast_json.set_backend(name)
+            for bad in ('{"nodes": [', b"\xff", ""):
+                try:
+                    fast_json.loads(bad)
+                    raise AssertionError(f"{name} ต้อง raise กับ {bad!r}")
+                except json.JSONDecodeError:
+                    pass
+    finally:
+        fast_json.set_backend(current)
+
+
+def main():
+    print(f"🧪 Testing fast_json (default backend: {fast_json.backend()})")
+    print("=" * 50)
+    test_backends_match_stdlib()
+    print(f"✅ {', '.join(available_backends())} match json.dumps output")
+    test_loads_error_type()
+    print("✅ invalid JSON raises json.JSONDecodeError")
+
+
+if __name__ == "__main__":
+    main()
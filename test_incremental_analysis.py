@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+ทดสอบการวิเคราะห์แบบ incremental (TopologyState) เทียบกับการคำนวณใหม่ทั้งหมด (full_summary)
+หลังทุก diff แบบสุ่ม (ย้ายสาย, ลบ/เพิ่มอุปกรณ์, เปลี่ยน bandwidth/throughput/userCapacity/deviceRole)
+"""
+
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app import capacity
+from app.topology_state import TopologyState, full_summary
+from benchmarks.topology_corpus import hierarchical_diagram
+
+PER_USER_BPS = 10e6
+BANDWIDTHS = [("100", "Mbps"), ("1000", "Mbps"), ("1", "Gbps"), ("10", "Gbps"), ("", "")]
+
+
+def assert_same(incremental, full):
+    incremental, full = dict(incremental), dict(full)
+    inc_capacity, full_capacity = incremental.pop("capacity"), full.pop("capacity")
+    assert incremental == full, (incremental, full)
+    assert (inc_capacity is None) == (full_capacity is None), (inc_capacity, full_capacity)
+    if inc_capacity is None:
+        return
+    # demand รวมถูกบวกลบทีละส่วน ผลต่างจากการคำนวณเต็มได้แค่ระดับ floating point
+    assert math.isclose(inc_capacity.pop("total_demand_bps"), full_capacity.pop("total_demand_bps"), rel_tol=1e-9)
+    assert inc_capacity == full_capacity, (inc_capacity, full_capacity)
+
+
+def random_diff(rng, state, counter):
+    node_ids = list(state.nodes)
+    edge_ids = list(state.edges)
+    diff = {"nodes": {"added": [], "removed": [], "changed": []},
+            "edges": {"added": [], "removed": [], "changed": []}}
+    action = rng.choice(["move", "move_host", "remove_edge", "add_edge", "remove_node", "add_node",
+                         "bandwidth", "throughput", "users", "role"])
+    if action == "move" and edge_ids:
+        edge = dict(state.edges[rng.choice(edge_ids)])
+        edge["target"] = rng.choice(node_ids)
+        diff["edges"]["changed"].append(edge)
+    elif action == "move_host" and edge_ids:
+        # ย้ายสายของ PC/Server ไปต่อกับ switch ตัวอื่น (กรณีที่พบบ่อยที่สุดระหว่างแก้แผนผัง)
+        hosts = [e for e in edge_ids if state.nodes.get(state.edges[e].get("target"), {}).get("type") in ("pc", "server")]
+        switches = [n for n in node_ids if state.nodes[n].get("type") == "switch"]
+        if hosts and switches:
+            edge = dict(state.edges[rng.choice(hosts)])
+            edge["source"] = rng.choice(switches)
+            diff["edges"]["changed"].append(edge)
+    elif action == "remove_edge" and edge_ids:
+        diff["edges"]["removed"].append(rng.choice(edge_ids))
+    elif action == "add_edge" and node_ids:
+        bandwidth, unit = rng.choice(BANDWIDTHS)
+        diff["edges"]["added"].append({
+            "id": f"edge_new_{counter}", "source": rng.choice(node_ids), "target": rng.choice(node_ids),
+            "data": {"bandwidth": bandwidth, "bandwidthUnit": unit},
+        })
+    elif action == "remove_node" and node_ids:
+        diff["nodes"]["removed"].append(rng.choice(node_ids))
+    elif action == "add_node":
+        node_id = f"node_new_{counter}"
+        diff["nodes"]["added"].append({"id": node_id, "type": "pc", "data": {"label": node_id, "userCapacity": "5"}})
+        if node_ids:
+            diff["edges"]["added"].append({
+                "id": f"edge_new_{counter}", "source": rng.choice(node_ids), "target": node_id,
+                "data": {"bandwidth": "100", "bandwidthUnit": "Mbps"},
+            })
+    elif action == "bandwidth" and edge_ids:
+        edge = dict(state.edges[rng.choice(edge_ids)])
+        bandwidth, unit = rng.choice(BANDWIDTHS)
+        edge["data"] = {**(edge.get("data") or {}), "bandwidth": bandwidth, "bandwidthUnit": unit}
+        diff["edges"]["changed"].append(edge)
+    elif action in ("throughput", "users", "role") and node_ids:
+        node = dict(state.nodes[rng.choice(node_ids)])
+        data = dict(node.get("data") or {})
+        if action == "throughput":
+            data["maxThroughput"], data["throughputUnit"] = rng.choice(["100", "1000", "1"]), rng.choice(["Mbps", "Gbps"])
+        elif action == "users":
+            data["userCapacity"] = str(rng.randint(0, 200))
+        else:
+            data["deviceRole"] = rng.choice(["Core", "Distribution", "Access"])
+        node["data"] = data
+        diff["nodes"]["changed"].append(node)
+    return diff
+
+
+def test_incremental_matches_full_recompute():
+    rng = random.Random(7)
+    nodes, edges = hierarchical_diagram(cores=2, distributions=3, access_per_distribution=3, hosts_per_access=6)
+    state = TopologyState(nodes, edges, PER_USER_BPS)
+    assert_same(state.summary(), full_summary(nodes, edges, PER_USER_BPS))
+
+    modes = set()
+    for step in range(400):
+        modes.add(state.apply_diff(random_diff(rng, state, step)))
+        # ไม่เรียก summary ทุกครั้ง เพื่อทดสอบ diff หลายชุดที่สะสมก่อนคำนวณ capacity ใหม่ด้วย
+        if step % 3 == 0:
+            current_nodes, current_edges = list(state.nodes.values()), list(state.edges.values())
+            assert_same(state.summary(), full_summary(current_nodes, current_edges, PER_USER_BPS))
+    assert "incremental" in modes
+
+
+def test_large_diff_falls_back_to_full_rebuild():
+    nodes, edges = hierarchical_diagram(cores=1, distributions=1, access_per_distribution=1, hosts_per_access=4)
+    state = TopologyState(nodes, edges, PER_USER_BPS)
+    diff = {"nodes": {"removed": [node["id"] for node in nodes[:6]]}, "edges": {}}
+    assert state.apply_diff(diff) == "full"
+    assert_same(state.summary(), full_summary(list(state.nodes.values()), list(state.edges.values()), PER_USER_BPS))
+
+def random_diagram(rng, size):
+    """แผนผังสุ่มที่ไม่เป็นลำดับชั้น มีสายซ้ำ, สายต่อเข้าตัวเอง และสายที่อ้างถึงอุปกรณ์ที่ไม่มีอยู่"""
+    types = ["router", "switch", "firewall", "pc", "server"]
+    nodes = []
+    for i in range(size):
+        data = {"label": f"Device {i}", "userCapacity": str(rng.randint(0, 50))}
+        if rng.random() < 0.15:
+            data["deviceRole"] = "Core"
+        if rng.random() < 0.3:
+            data["maxThroughput"], data["throughputUnit"] = rng.choice(["100", "1000", "1"]), rng.choice(["Mbps", "Gbps"])
+        nodes.append({"id": f"n{i}", "type": rng.choice(types), "data": data})
+    ids = [node["id"] for node in nodes] + ["missing"]
+    edges = []
+    for i in range(rng.randint(0, size * 2)):
+        bandwidth, unit = rng.choice(BANDWIDTHS)
+        edges.append({
+            "id": f"e{i}", "source": rng.choice(ids), "target": rng.choice(ids),
+            "data": {"bandwidth": bandwidth, "bandwidthUnit": unit},
+        })
+    return nodes, edges
+
+
+def test_random_diagrams_match_full_summary():
+    """state ที่สร้างจากแผนผังสุ่มและอัปเดตด้วย diff ตรงกับ full_summary ทั้งแบบใช้และไม่ใช้ NumPy"""
+    original_np = capacity.np
+    try:
+        for np_module in (original_np, None):
+            capacity.np = np_module
+            rng = random.Random(11)
+            for trial in range(60):
+                nodes, edges = random_diagram(rng, rng.randint(0, 40))
+                state = TopologyState(nodes, edges, PER_USER_BPS)
+                assert_same(state.summary(), full_summary(nodes, edges, PER_USER_BPS))
+                for step in range(10):
+                    state.apply_diff(random_diff(rng, state, f"{trial}_{step}"))
+                current_nodes, current_edges = list(state.nodes.values()), list(state.edges.values())
+                assert_same(state.summary(), full_summary(current_nodes, current_edges, PER_USER_BPS))
+    finally:
+        capacity.np = original_np
+
+
+def main():
+    print("🧪 Testing incremental topology analysis")
+    print("=" * 50)
+    test_incremental_matches_full_recompute()
+    print("✅ incremental summary == full recompute (400 random diffs)")
+    test_large_diff_falls_back_to_full_rebuild()
+    print("✅ large diff falls back to full rebuild")
+    test_random_diagrams_match_full_summary()
+    print("✅ random diagrams agree with full recompute (with and without NumPy)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ ModelCatalog (cache รายการ models ของ Ollama): caller พร้อมกันใช้ fetch เดียวกัน,
+exception ถึง caller ทุกตัว, TTL และการไม่ cache ผลว่าง
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app import model_catalog
+from app.model_catalog import ModelCatalog
+
+CALLERS = 20
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+class StubFetch:
+    """แทนการเรียก /v1/models นับจำนวนครั้งและรอจนกว่าจะถูกปล่อย"""
+
+    def __init__(self, models):
+        self.models = models
+        self.error = None
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return list(self.models)
+
+
+def run_with_clock(flow):
+    clock = FakeClock()
+    original = model_catalog.time
+    model_catalog.time = clock
+    try:
+        asyncio.run(flow(clock))
+    finally:
+        model_catalog.time = original
+
+
+async def concurrent_get(catalog, fetch, **kwargs):
+    fetch.release.clear()
+    callers = [asyncio.create_task(catalog.get_models(**kwargs)) for _ in range(CALLERS)]
+    await asyncio.sleep(0)
+    fetch.release.set()
+    return await asyncio.gather(*callers, return_exceptions=True)
+
+
+def test_concurrent_callers_fetch_once():
+    async def flow(clock):
+        fetch = StubFetch(["llama3.2:3b", "qwen2.5:7b"])
+        catalog = ModelCatalog(fetch, ttl=60)
+        results = await concurrent_get(catalog, fetch)
+        assert fetch.calls == 1 and all(result == fetch.models for result in results)
+
+        # ผู้เรียกแก้ list ที่ได้ไปแล้วต้องไม่กระทบ cache
+        results[0].append("changed")
+        assert await catalog.get_models() == fetch.models and fetch.calls == 1
+
+        # หมดอายุ: caller พร้อมกันทั้งหมดยังใช้ fetch เดียว
+        clock.now += 60
+        fetch.models = ["gemma2:9b"]
+        results = await concurrent_get(catalog, fetch)
+        assert fetch.calls == 2 and all(result == ["gemma2:9b"] for result in results)
+
+        # force_refresh พร้อมกันก็รวมเป็นครั้งเดียว
+        await concurrent_get(catalog, fetch, force_refresh=True)
+        assert fetch.calls == 3
+
+    run_with_clock(flow)
+
+
+def test_exception_reaches_every_caller():
+    async def flow(clock):
+        fetch = StubFetch(["llama3.2:3b"])
+        catalog = ModelCatalog(fetch, ttl=60)
+        fetch.error = ConnectionError("ollama down")
+        results = await concurrent_get(catalog, fetch)
+        assert fetch.calls == 1
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert not catalog.is_fresh()
+
+        # ผลว่างถือว่าดึงไม่สำเร็จ ไม่ถูก cache
+        fetch.error = None
+        fetch.models = []
+        assert await catalog.get_models() == [] and not catalog.is_fresh()
+        fetch.models = ["llama3.2:3b"]
+        assert await catalog.get_models() == ["llama3.2:3b"] and fetch.calls == 3
+
+    run_with_clock(flow)
+
+
+def test_contains_refreshes_once():
+    async def flow(clock):
+        fetch = StubFetch(["llama3.2:3b"])
+        catalog = ModelCatalog(fetch, ttl=60)
+        assert await catalog.contains("llama3.2:3b") and fetch.calls == 1
+        # model ที่เพิ่งถูก pull: cache ยังใหม่อยู่จึงดึงใหม่อีกหนึ่งครั้ง
+        fetch.models = ["llama3.2:3b", "qwen2.5:7b"]
+        assert await catalog.contains("qwen2.5:7b") and fetch.calls == 2
+        assert not await catalog.contains("missing:1b") and fetch.calls == 3
+
+    run_with_clock(flow)
+
+
+def main():
+    print("🧪 Testing Ollama model catalog cache")
+    print("=" * 50)
+    test_concurrent_callers_fetch_once()
+    print(f"✅ {CALLERS} concurrent callers trigger one fetch per refresh")
+    test_exception_reaches_every_caller()
+    print("✅ a failed fetch reaches every caller and nothing is cached")
+    test_contains_refreshes_once()
+    print("✅ contains() refreshes at most once for an unknown model")
+
+
+if __name__ == "__main__":
+    main()
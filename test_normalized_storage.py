@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+ทดสอบการเก็บแผนผังแบบ normalized (diagram_nodes/diagram_edges): แถวที่ query ได้ การประกอบ diagram_data กลับ
+และ migration ที่ย้าย blob เดิมไป/กลับ
+"""
+
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app import diagram_codec, diagram_store, fast_json
+from migrate_normalize_diagram_data import migrate_database
+
+DIAGRAM = {
+    "nodes": [
+        {"id": "fw", "type": "firewall", "data": {"label": "Firewall", "type": "firewall", "maxThroughput": "1", "throughputUnit": "Gbps"}},
+        {"id": "core", "type": "switch", "data": {"label": "Core", "type": "switch", "deviceRole": "Core", "maxThroughput": "50"}},
+        {"id": 7, "type": "pc", "position": {"x": 1, "y": 2}, "data": {"label": "เครื่อง 7", "type": "pc"}},
+    ],
+    "edges": [
+        {"id": "e1", "source": "fw", "target": "core", "data": {"bandwidth": "10", "bandwidthUnit": "Gbps"}},
+        {"id": "e2", "source": "core", "target": 7, "data": {"label": "100 Mbps"}},
+    ],
+}
+
+
+def test_rows_and_assemble():
+    assert diagram_store.normalizable(DIAGRAM) and diagram_store.normalizable({})
+    assert not diagram_store.normalizable({**DIAGRAM, "viewport": {}})
+    assert not diagram_store.normalizable({"nodes": [{"data": {}}]})
+
+    serialized = diagram_store.serialize(DIAGRAM)
+    # diagram_data ที่ประกอบจากแถวต้องเท่ากับ serialize ทั้งเอกสาร (content_hash และ revision ใช้ค่านี้)
+    assert diagram_store.assemble(serialized["nodes"], serialized["edges"]) == fast_json.dumps(DIAGRAM)
+    assert diagram_store.assemble([], []) == fast_json.dumps({"nodes": [], "edges": []})
+
+    fw, core, pc = (diagram_store.node_row(1, seq, node, data) for seq, (node, data) in enumerate(zip(DIAGRAM["nodes"], serialized["nodes"])))
+    assert (fw["device_type"], fw["throughput_bps"]) == ("firewall", 1e9)
+    assert (core["role"], core["throughput_bps"]) == ("Core", 50e6)
+    assert (pc["node_id"], pc["label"], pc["throughput_bps"]) == ("7", "เครื่อง 7", None)
+    edge = diagram_store.edge_row(1, 1, DIAGRAM["edges"][1], serialized["edges"][1])
+    assert (edge["target"], edge["bandwidth_bps"]) == ("7", 100e6)
+
+
+def test_migration_round_trip():
+    raw = json.dumps(DIAGRAM, indent=2, ensure_ascii=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "test.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE projects (id INTEGER PRIMARY KEY, name VARCHAR, description TEXT, "
+            "diagram_data TEXT, diagram_size INTEGER, content_hash VARCHAR(64))"
+        )
+        conn.executemany("INSERT INTO projects (name, diagram_data) VALUES (?, ?)", [
+            ("p", diagram_codec.encode(raw, "zlib", 0)), ("p", raw), ("p", '{"nodes": [], "viewport": {}}'), ("p", None),
+        ])
+        conn.commit()
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path, batch_size=2)
+        rows = conn.execute("SELECT storage, diagram_data FROM projects ORDER BY id").fetchall()
+        assert rows == [("normalized", None), ("normalized", None), ("blob", '{"nodes": [], "viewport": {}}'), ("blob", None)]
+        firewalls = conn.execute("SELECT project_id FROM diagram_nodes WHERE device_type = 'firewall' ORDER BY project_id").fetchall()
+        assert firewalls == [(1,), (2,)]
+        assert conn.execute("SELECT count(*) FROM diagram_edges").fetchone() == (4,)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate_database(db_path, reverse=True)
+        rows = conn.execute("SELECT storage, diagram_data FROM projects ORDER BY id LIMIT 2").fetchall()
+        assert [storage for storage, _ in rows] == ["blob", "blob"]
+        assert all(diagram_codec.decode(value) == fast_json.dumps(DIAGRAM) for _, value in rows)
+        assert conn.execute("SELECT count(*) FROM diagram_nodes").fetchone() == (0,)
+        conn.close()
+
+
+def main():
+    print("🧪 Testing normalized diagram storage")
+    print("=" * 50)
+    test_rows_and_assemble()
+    print("✅ queryable node/edge rows, diagram_data reassembles exactly")
+    test_migration_round_trip()
+    print("✅ migration moves blobs into node/edge tables and back")
+
+
+if __name__ == "__main__":
+    main()
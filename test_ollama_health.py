@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ OllamaHealthMonitor ด้วยนาฬิกาและ session จำลอง (ไม่ต้องรัน Ollama):
+circuit breaker closed -> open -> half-open -> closed และอายุของสถานะสุขภาพที่ cache ไว้
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import aiohttp
+
+from app import ollama_health
+from app.ai_service import OllamaService
+from app.ollama_health import CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def monotonic(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+    async def json(self, loads=None):
+        return {"choices": [{"message": {"content": "ผลวิเคราะห์"}}]}
+
+    async def text(self):
+        return "error"
+
+
+class FakeRequest:
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        if self.session.down:
+            raise aiohttp.ClientConnectionError("connection refused")
+        return FakeResponse(self.session.status)
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """แทน aiohttp.ClientSession นับจำนวน probe (GET) และ generation (POST)"""
+
+    closed = False
+
+    def __init__(self):
+        self.down = False
+        self.status = 200
+        self.probes = 0
+        self.generations = 0
+
+    def get(self, url, **kwargs):
+        self.probes += 1
+        return FakeRequest(self)
+
+    def post(self, url, **kwargs):
+        self.generations += 1
+        return FakeRequest(self)
+
+    async def close(self):
+        pass
+
+
+def make_service(clock):
+    service = OllamaService()
+    service._session = FakeSession()
+    health = service.health
+    health.interval = 30.0
+    health.failure_threshold = 3
+    health.reset_timeout = 30.0
+    return service, service._session, health
+
+
+def run_with_clock(flow):
+    clock = FakeClock()
+    original = ollama_health.time
+    ollama_health.time = clock
+    try:
+        asyncio.run(flow(clock))
+    finally:
+        ollama_health.time = original
+
+
+def test_circuit_transitions():
+    async def flow(clock):
+        service, session, health = make_service(clock)
+        assert (await service.complete("ทดสอบ")) == ("ผลวิเคราะห์", True)
+        assert health.circuit_state == CIRCUIT_CLOSED and health.healthy
+
+        # closed -> open: generate ล้มเหลวติดกันครบ failure_threshold
+        session.down = True
+        for attempt in range(3):
+            text, ok = await service.complete("ทดสอบ")
+            assert not ok
+            assert health.circuit_state == (CIRCUIT_OPEN if attempt == 2 else CIRCUIT_CLOSED)
+        assert session.generations == 4
+
+        # open: ตอบกลับทันทีโดยไม่เรียก Ollama จนกว่าจะครบ reset_timeout
+        clock.now += 29
+        assert (await service.complete("ทดสอบ")) == (service.unavailable_message(), False)
+        assert session.generations == 4
+
+        # open -> half-open: ปล่อย request ทดลองผ่านครั้งเดียว ถ้าล้มเหลวกลับเป็น open
+        clock.now += 1
+        assert health.allow_request() and health.circuit_state == CIRCUIT_HALF_OPEN
+        assert not health.allow_request()
+        health.record_failure("still down")
+        assert health.circuit_state == CIRCUIT_OPEN and not health.allow_request()
+
+        # half-open -> closed: request ทดลองสำเร็จ
+        session.down = False
+        clock.now += 30
+        assert (await service.complete("ทดสอบ")) == ("ผลวิเคราะห์", True)
+        assert health.circuit_state == CIRCUIT_CLOSED and health.consecutive_failures == 0
+        assert session.generations == 5
+
+        # probe ที่ล้มเหลวเปิด circuit ทันทีโดยไม่รอครบ threshold
+        session.status = 500
+        assert not await health.refresh()
+        assert health.circuit_state == CIRCUIT_OPEN
+        assert health.snapshot()["last_error"] == "health probe failed"
+
+    run_with_clock(flow)
+
+
+def test_cached_health_ttl():
+    async def flow(clock):
+        service, session, health = make_service(clock)
+        assert health.is_stale()
+        assert await health.current() and session.probes == 1
+
+        # อ่านซ้ำภายในอายุของสถานะไม่ probe ใหม่
+        clock.now += 59
+        assert await health.current() and session.probes == 1
+
+        # เก่ากว่าสองรอบของ interval (monitor ไม่ได้ทำงาน) จึง probe ใหม่
+        session.down = True
+        clock.now += 1
+        assert not await health.current() and session.probes == 2
+        assert health.circuit_state == CIRCUIT_OPEN
+
+        # ผลของ generate จริง (passive health) ทำให้สถานะใหม่โดยไม่ต้อง probe
+        session.down = False
+        clock.now += 60
+        health.record_success()
+        assert await health.current() and session.probes == 2
+
+    run_with_clock(flow)
+
+
+def main():
+    print("🧪 Testing Ollama health monitor and circuit breaker")
+    print("=" * 50)
+    test_circuit_transitions()
+    print("✅ circuit goes closed -> open -> half-open -> closed")
+    test_cached_health_ttl()
+    print("✅ cached health is reused until it is older than two monitor intervals")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ rule engine: คำถามเชิงโครงสร้างต้องได้คำตอบทันทีโดยไม่เรียก Ollama
+และคำถามที่ต้องการคำแนะนำต้องถูกส่งต่อให้ LLM
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.ai_service import NetworkTopologyAnalyzer
+from app.rule_engine import (
+    RuleEngine, INTENT_CONNECTIVITY, INTENT_DEVICE_COUNT, INTENT_DUPLICATES, INTENT_ISOLATED, INTENT_LINK_COUNT,
+    INTENT_SPOF, INTENT_USER_COUNT,
+)
+from benchmarks.topology_corpus import hierarchical_diagram
+
+
+def sample_diagram():
+    nodes, edges = hierarchical_diagram(cores=1, distributions=2, access_per_distribution=3, hosts_per_access=8)
+    nodes.append({"id": "lonely", "type": "pc", "data": {"label": "PC Lonely"}})
+    edges.append(dict(edges[-1], id="edge_duplicate"))
+    return nodes, edges
+
+
+def test_classifier():
+    rules = RuleEngine()
+    assert rules.classify("มี switch กี่ตัว") == [(INTENT_DEVICE_COUNT, ("switch",))]
+    assert rules.classify("How many routers and PCs?") == [(INTENT_DEVICE_COUNT, ("router", "pc"))]
+    assert [i.name for i in rules.classify("มีสายกี่เส้น")] == [INTENT_LINK_COUNT]
+    assert [i.name for i in rules.classify("Are there isolated devices?")] == [INTENT_ISOLATED]
+    assert [i.name for i in rules.classify("duplicate links?")] == [INTENT_DUPLICATES]
+    assert [i.name for i in rules.classify("มี single point of failure ไหม")] == [INTENT_SPOF]
+    assert rules.classify("มีอุปกรณ์ทั้งหมดกี่ตัว") == [(INTENT_DEVICE_COUNT, ())]
+    assert [i.name for i in rules.classify("number of users?")] == [INTENT_USER_COUNT]
+    # "ทั้งหมด" ไม่ได้ติดกับคำว่า "กี่" จึงเป็นคำถามเรื่องการเชื่อมต่อ ไม่ใช่การนับ
+    assert [i.name for i in rules.classify("switch ทั้งหมดเชื่อมต่อถึงกันไหม")] == [INTENT_CONNECTIVITY]
+    # คำถามที่ต้องการคำแนะนำ/คำอธิบาย หรือไม่มีคำถาม ต้องไปที่ LLM
+    for question in ["ควรเพิ่ม switch กี่ตัว", "Why is the network slow?", "แนะนำการปรับปรุง", "", None]:
+        assert rules.classify(question) == [], question
+    # คำถามเชิงออกแบบ/สมมติที่มี "how many", "bridge" หรือชื่ออุปกรณ์ปนอยู่ ต้องไปที่ LLM
+    for question in [
+        "We have a bridge between two buildings, how many switches do we need?",
+        "How many switches would a 200-user office need?",
+        "We use a bridge between floors. How many links are there?",
+        "Does the bridge count as a switch?",
+        "What is the total bandwidth of the switch uplinks?",
+        "Is a bridge in a ring topology a single point of failure?",
+        "ถ้าเพิ่ม PC อีก 50 เครื่อง ต้องใช้ switch กี่ตัว",
+        "จะรองรับผู้ใช้กี่คน",
+        "อยากมี router กี่ตัว",
+    ]:
+        assert rules.classify(question) == [], question
+
+
+def test_rule_answers_skip_ollama():
+    analyzer = NetworkTopologyAnalyzer()
+    analyzer.ollama_service.base_url = "http://127.0.0.1:9"  # ถ้าเรียก Ollama จะได้ข้อความ error แทนคำตอบ
+    nodes, edges = sample_diagram()
+
+    async def ask(question):
+        started = time.perf_counter()
+        result = await analyzer.run_analysis(nodes, edges, question)
+        return result, (time.perf_counter() - started) * 1000
+
+    expectations = {
+        "มี switch กี่ตัว": "switch: 9 ตัว",
+        "มีอุปกรณ์ที่ไม่ได้เชื่อมต่อไหม": "PC Lonely",
+        "are there duplicate links?": "ซ้ำซ้อน 1 เส้น",
+        "มีสายกี่เส้น": f"ทั้งหมด {len(edges)} เส้น",
+    }
+    try:
+        for question, expected in expectations.items():
+            result, elapsed_ms = asyncio.run(ask(question))
+            assert result.rule_based and not result.cached, question
+            assert expected in result.text, (question, result.text)
+            print(f"  {elapsed_ms:5.1f} ms  {question}")
+    finally:
+        asyncio.run(analyzer.ollama_service.close())
+    assert analyzer.rule_answers == len(expectations)
+
+
+def test_prompt_uses_findings():
+    analyzer = NetworkTopologyAnalyzer()
+    nodes, edges = sample_diagram()
+    _, context = analyzer.build_prompt(nodes, edges, "ควรปรับปรุงอะไร")
+    assert "analysis" not in context
+    assert any("ซ้ำซ้อน" in fact for fact in context["findings"])
+
+def test_analysis_runs_off_event_loop():
+    """การวิเคราะห์แผนผัง (rule engine และการสร้าง prompt) รันใน thread pool ไม่บล็อก event loop"""
+    analyzer = NetworkTopologyAnalyzer()
+    analyzer.ollama_service.base_url = "http://127.0.0.1:9"
+    nodes, edges = sample_diagram()
+    analyze = analyzer.analyze_network_topology
+    threads = []
+
+    def slow_analysis(*args, **kwargs):
+        threads.append(threading.current_thread())
+        time.sleep(0.05)
+        return analyze(*args, **kwargs)
+
+    analyzer.analyze_network_topology = slow_analysis
+
+    async def ask(question):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        try:
+            await analyzer.run_analysis(nodes, edges, question)
+        finally:
+            task.cancel()
+        return ticks
+
+    try:
+        # คำถามเชิงโครงสร้าง (rule engine) และคำถามที่ต้องสร้าง prompt ให้ Ollama
+        for question in ("มี switch กี่ตัว", "ควรปรับปรุงอะไร"):
+            threads.clear()
+            ticks = asyncio.run(ask(question))
+            assert threads and threading.main_thread() not in threads, question
+            assert ticks >= 3, (question, ticks)
+    finally:
+        asyncio.run(analyzer.ollama_service.close())
+
+
+def main():
+    print("🧪 Testing rule engine")
+    print("=" * 50)
+    test_classifier()
+    print("✅ classifier routes structural questions to rules and advice to the LLM")
+    test_rule_answers_skip_ollama()
+    print("✅ structural questions answered without Ollama")
+    test_prompt_uses_findings()
+    print("✅ LLM prompt carries rule findings")
+    test_analysis_runs_off_event_loop()
+    print("✅ topology analysis runs in the thread pool, off the event loop")
+
+
+if __name__ == "__main__":
+    main()
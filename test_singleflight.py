@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ SingleFlight และการรวม generation ที่เหมือนกันของ NetworkTopologyAnalyzer:
+caller พร้อมกัน N ตัวต้องเรียกงานจริงครั้งเดียว และ exception ต้องถึง caller ทุกตัว
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.ai_service import NetworkTopologyAnalyzer
+from app.analysis_cache import AnalysisCache
+from app.singleflight import SingleFlight
+from benchmarks.stub_ollama import StubOllama
+
+CALLERS = 20
+
+
+class StubCall:
+    """งานจำลองที่นับจำนวนครั้งที่ถูกเรียก และรอจนกว่าจะถูกปล่อย"""
+
+    def __init__(self, result=None, error=None):
+        self.calls = 0
+        self.result = result
+        self.error = error
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        flight = SingleFlight()
+        stub = StubCall(result=["llama3.2:3b"])
+        callers = [asyncio.create_task(flight.do("models", stub)) for _ in range(CALLERS)]
+        await asyncio.sleep(0)
+        assert flight.in_flight("models") and len(flight) == 1
+        stub.release.set()
+        results = await asyncio.gather(*callers)
+        assert stub.calls == 1
+        assert all(result is results[0] for result in results)
+        assert len(flight) == 0
+
+        # เสร็จแล้วไม่ถูกจำไว้: call ถัดไปเรียกงานใหม่
+        assert await flight.do("models", stub) == ["llama3.2:3b"] and stub.calls == 2
+
+    asyncio.run(run())
+
+
+def test_exception_reaches_every_waiter():
+    async def run():
+        flight = SingleFlight()
+        stub = StubCall(error=ConnectionError("ollama down"))
+        callers = [asyncio.create_task(flight.do("models", stub)) for _ in range(CALLERS)]
+        await asyncio.sleep(0)
+        stub.release.set()
+        results = await asyncio.gather(*callers, return_exceptions=True)
+        assert stub.calls == 1
+        assert all(isinstance(result, ConnectionError) and str(result) == "ollama down" for result in results)
+        assert len(flight) == 0
+
+        # ความล้มเหลวไม่ถูก cache: call ถัดไปลองใหม่
+        stub.error = None
+        stub.result = ["qwen2.5:7b"]
+        assert await flight.do("models", stub) == ["qwen2.5:7b"] and stub.calls == 2
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def run():
+        flight = SingleFlight()
+        stub = StubCall(result="done")
+        first = asyncio.create_task(flight.do("key", stub))
+        second = asyncio.create_task(flight.do("key", stub))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        stub.release.set()
+        assert await second == "done" and first.cancelled() and stub.calls == 1
+
+    asyncio.run(run())
+
+
+def test_analyzer_coalesces_identical_generations():
+    async def run():
+        stub = await StubOllama(delay=0.1).start()
+        analyzer = NetworkTopologyAnalyzer()
+        analyzer.ollama_service.base_url = stub.base_url
+        analyzer.cache = AnalysisCache(enabled=False)
+        nodes = [
+            {"id": "node_1", "type": "router", "data": {"label": "Router 1"}},
+            {"id": "node_2", "type": "switch", "data": {"label": "Switch 1"}},
+        ]
+        edges = [{"id": "edge_1", "source": "node_1", "target": "node_2"}]
+        try:
+            results = await asyncio.gather(*[
+                analyzer.run_analysis(nodes, edges, "ควรปรับปรุงเครือข่ายนี้อย่างไร", user_id=user_id)
+                for user_id in range(CALLERS)
+            ])
+            assert stub.request_counts["chat"] == 1
+            assert analyzer.coalesced_requests == CALLERS - 1
+            assert all(result.text == stub.reply and result.ok for result in results)
+            assert analyzer.in_flight_generations() == 0
+        finally:
+            await analyzer.ollama_service.close()
+            await stub.stop()
+
+    asyncio.run(run())
+
+
+def main():
+    print("🧪 Testing single-flight request coalescing")
+    print("=" * 50)
+    test_concurrent_callers_share_one_call()
+    print(f"✅ {CALLERS} concurrent callers share one call")
+    test_exception_reaches_every_waiter()
+    print("✅ an exception reaches every waiter and is not cached")
+    test_cancelled_caller_does_not_cancel_others()
+    print("✅ cancelling one caller does not cancel the shared call")
+    test_analyzer_coalesces_identical_generations()
+    print("✅ identical concurrent analyses make one Ollama request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+ทดสอบ topology rule registry: rule ด้านการออกแบบ, การสร้าง index ร่วมกันครั้งเดียว และเวลาของแต่ละ rule
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from app.topology_graph import TopologyGraph
+from app.topology_rules import RuleContext, TopologyRule, TopologyRuleRegistry, default_rules, sample_labels
+
+
+def node(node_id, node_type, **data):
+    return {"id": node_id, "type": node_type, "data": {"label": node_id, **data}}
+
+
+def link(source, target):
+    return {"id": f"{source}-{target}", "source": source, "target": target}
+
+
+def run(nodes, edges):
+    registry = TopologyRuleRegistry(default_rules())
+    return registry, registry.run(TopologyGraph(nodes, edges))
+
+
+def test_design_rules():
+    nodes = [
+        node("R1", "router"), node("FW1", "firewall"), node("SW1", "switch"), node("SW2", "switch"),
+        node("SW3", "switch"), node("PC1", "pc"), node("PC2", "pc"), node("SRV1", "server"),
+    ]
+    edges = [
+        link("R1", "FW1"), link("FW1", "SW1"),
+        # วงวนระหว่าง access switch ที่ไม่มี STP และ SW3 ต่อกับ router ตรงโดยไม่ผ่าน firewall
+        link("SW1", "SW2"), link("SW2", "SW3"), link("SW3", "SW1"), link("R1", "SW3"),
+        link("SW2", "PC1"), link("SW3", "PC2"), link("PC2", "SRV1"),
+    ]
+    _, report = run(nodes, edges)
+    text = "\n".join(report.issues)
+    assert "ไม่มีอุปกรณ์รองรับ STP 1 กลุ่ม" in text, text
+    assert "firewall ไม่ได้อยู่บนเส้นทาง" in text and "PC1" in text, text
+    assert "server ที่เข้าถึงได้ผ่าน PC เท่านั้น 1 ตัว: SRV1" in text, text
+
+    # switch ที่ระบุ STP, firewall อยู่บนทุกเส้นทาง และ server ต่อกับ switch ต้องไม่มีปัญหาเหล่านี้
+    nodes[2]["data"]["stp"] = True
+    edges = [e for e in edges if e["id"] not in ("R1-SW3", "PC2-SRV1")] + [link("SW3", "SRV1")]
+    _, report = run(nodes, edges)
+    text = "\n".join(report.issues)
+    assert "STP" not in text and "firewall" not in text and "server" not in text, text
+
+
+def test_shared_indexes_and_timings():
+    built = []
+
+    class CountingContext(RuleContext):
+        def _build_degrees(self):
+            built.append("degrees")
+            return super()._build_degrees()
+
+    class MaxDegreeRule(TopologyRule):
+        rule_id = "max_degree"
+        requires = ("degrees",)
+
+        def check(self, ctx):
+            return [f"max degree {max(ctx['degrees'], default=0)}"]
+
+    class UndeclaredRule(TopologyRule):
+        rule_id = "undeclared"
+
+        def check(self, ctx):
+            return [str(ctx["components"])]  # ไม่ได้ประกาศ requires จึงต้องล้มเหลวโดยไม่กระทบ rule อื่น
+
+    registry = TopologyRuleRegistry(default_rules())
+    registry.register(MaxDegreeRule())
+    registry.register(UndeclaredRule())
+    graph = TopologyGraph([node("A", "switch"), node("B", "pc"), node("C", "pc")], [link("A", "B"), link("A", "C")])
+    report = registry.run(graph, context=CountingContext(graph))
+    assert built == ["degrees"]  # isolated_devices และ max_degree ใช้ index เดียวกัน
+    assert "max degree 2" in report.issues
+    assert set(report.timings_ms) >= {rule.rule_id for rule in registry.rules} | {"index:degrees"}
+    assert registry.stats()["max_degree"]["runs"] == 1
+
+    try:
+        registry.register(MaxDegreeRule())
+        raise AssertionError("rule_id ซ้ำต้องลงทะเบียนไม่ได้")
+    except ValueError:
+        pass
+
+    class IncompleteRule(TopologyRule):
+        rule_id = "incomplete"
+        requires = ("degrees",)
+
+    try:
+        registry.register(IncompleteRule())
+        raise AssertionError("rule ที่ไม่มี check() ต้องลงทะเบียนไม่ได้")
+    except TypeError:
+        pass
+    assert "incomplete" not in registry.stats()
+
+def test_sample_labels():
+    labels = [f"SW{i}" for i in range(5)]
+    assert sample_labels(labels[:2], 3) == "SW0, SW1"
+    assert sample_labels(iter(labels), 3) == "SW0, SW1, SW2 และอีก 2 รายการ"
+    # labels เป็นตัวอย่างที่ตัดมาแล้ว: นับส่วนที่เหลือจาก total
+    assert sample_labels(labels, 3, total=12) == "SW0, SW1, SW2 และอีก 9 รายการ"
+    assert sample_labels(labels[:2], 3, total=2) == "SW0, SW1"
+
+
+def main():
+    print("🧪 Testing topology rules")
+    print("=" * 50)
+    test_design_rules()
+    print("✅ STP loop, firewall path and server-behind-PC rules")
+    test_shared_indexes_and_timings()
+    print("✅ shared indexes built once, per-rule timings recorded")
+    test_sample_labels()
+    print("✅ label sampling shared by rules, rule engine and capacity findings")
+
+
+if __name__ == "__main__":
+    main()